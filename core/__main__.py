@@ -43,6 +43,11 @@ group.add_argument('-p', '--profile', action='store_true',
         help='enables profiler')
 group.add_argument('-cg', '--callgraph', action='store_true',
         help='display dependencies between the methods/modules')
+parser.add_argument('-sp', '--sampling-profile', nargs='?', const='', default=None,
+        metavar='FILE', help='sample the stacks of all threads and write them to a collapsed '
+        'stack file for flame graphs (default: time stamped file in the log directory)')
+parser.add_argument('--sampling-rate', type=float, default=100,
+        help='samples per second of the sampling profiler (default: 100)')
 parser.add_argument('-m', '--manhole', action='store_true',
         help='manhole for debugging purposes')
 parser.add_argument('-g', '--no-gui', action='store_true',
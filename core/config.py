@@ -32,19 +32,22 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 from collections import OrderedDict
+import ast
 import numpy
 import re
 import os
+import struct
 import ruamel.yaml as yaml
-from io import BytesIO
+from io import BytesIO, StringIO
 
 
-def ordered_load(stream, Loader=yaml.Loader):
+def ordered_load(stream, Loader=yaml.Loader, constructors=None):
     """
     Loads a YAML formatted data from stream and puts it into an OrderedDict
 
     @param Stream stream: stream the data is read from
     @param Loader Loader: Loader base class
+    @param dict constructors: optional, additional constructor functions by YAML tag
 
     Returns OrderedDict with data. If stream is empty then an empty
     OrderedDict is returned.
@@ -126,6 +129,9 @@ def ordered_load(stream, Loader=yaml.Loader):
     OrderedLoader.add_constructor(
             yaml.resolver.BaseResolver.DEFAULT_SCALAR_TAG,
             construct_str)
+    if constructors is not None:
+        for tag, constructor in constructors.items():
+            OrderedLoader.add_constructor(tag, constructor)
 
     # load config file
     config = yaml.load(stream, OrderedLoader)
@@ -136,13 +142,14 @@ def ordered_load(stream, Loader=yaml.Loader):
         return OrderedDict()
 
 
-def ordered_dump(data, stream=None, Dumper=yaml.Dumper, **kwds):
+def ordered_dump(data, stream=None, Dumper=yaml.Dumper, representers=None, **kwds):
     """
     dumps (OrderedDict) data in YAML format
 
     @param OrderedDict data: the data
     @param Stream stream: where the data in YAML is dumped
     @param Dumper Dumper: The dumper that is used as a base class
+    @param dict representers: optional, additional representer functions by data type
     """
     class OrderedDumper(Dumper):
         """
@@ -199,11 +206,7 @@ def ordered_dump(data, stream=None, Dumper=yaml.Dumper, **kwds):
             node.tag = '!extndarray'
             dumper.external_ndarray_counter += 1
         except:
-            with BytesIO() as f:
-                numpy.savez_compressed(f, array=array_data)
-                compressed_string = f.getvalue()
-            node = dumper.represent_binary(compressed_string)
-            node.tag = '!ndarray'
+            node = represent_inline_ndarray(dumper, array_data)
         return node
 
     # add representers
@@ -222,11 +225,27 @@ def ordered_dump(data, stream=None, Dumper=yaml.Dumper, **kwds):
     # OrderedDumper.add_representer(numpy.float128, represent_float)
     OrderedDumper.add_representer(numpy.ndarray, represent_ndarray)
     OrderedDumper.add_representer(frozenset, represent_frozenset)
+    if representers is not None:
+        for data_type, representer in representers.items():
+            OrderedDumper.add_representer(data_type, representer)
 
     # dump data
     return yaml.dump(data, stream, OrderedDumper, **kwds)
 
 
+def represent_inline_ndarray(dumper, array_data):
+    """
+    Representer for numpy ndarrays embedded in the YAML file as compressed
+    binary string.
+    """
+    with BytesIO() as f:
+        numpy.savez_compressed(f, array=array_data)
+        compressed_string = f.getvalue()
+    node = dumper.represent_binary(compressed_string)
+    node.tag = '!ndarray'
+    return node
+
+
 def load(filename):
     """
     Loads a config file
@@ -248,3 +267,184 @@ def save(filename, data):
     """
     with open(filename, 'w') as f:
         ordered_dump(data, stream=f, Dumper=yaml.SafeDumper, default_flow_style=False)
+
+
+def save_atomic(filename, data):
+    """
+    saves data to filename in yaml format without ever leaving a partially
+    written file behind. The data is written to a temporary file in the same
+    directory, flushed to disk and renamed to filename. Numpy arrays are
+    embedded in the file instead of being saved to external npz files.
+
+    @param str filename: filename of config file
+    @param OrderedDict data: config values
+    """
+    with StringIO() as stream:
+        ordered_dump(data, stream=stream, Dumper=yaml.SafeDumper, default_flow_style=False)
+        text = stream.getvalue()
+    tmp_filename = '{0}.tmp'.format(filename)
+    with open(tmp_filename, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_filename, filename)
+    _sync_directory(filename)
+
+
+def _sync_directory(filename):
+    """
+    make a rename of filename persistent by syncing its directory (not
+    possible on Windows).
+
+    @param str filename: path of the renamed file
+    """
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(os.path.dirname(os.path.abspath(filename)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+# Binary container for status variables:
+#   prefix:  magic bytes, format version (uint32), header length (uint64)
+#   header:  YAML (utf-8) of all values. Arrays are replaced by !rawarray
+#            mappings holding their dtype, shape and data offset.
+#   data:    raw C ordered array buffers, each aligned to BINARY_ALIGNMENT
+#            bytes relative to the start of the file.
+BINARY_MAGIC = b'QUDISTAT'
+BINARY_VERSION = 1
+BINARY_ALIGNMENT = 64
+_BINARY_PREFIX = struct.Struct('<8sIQ')
+
+
+def _aligned(position):
+    """
+    @param int position: byte position in file
+    @return int: next position that is a multiple of BINARY_ALIGNMENT
+    """
+    return -(-position // BINARY_ALIGNMENT) * BINARY_ALIGNMENT
+
+
+def save_binary(filename, data):
+    """
+    saves data to filename in the binary status variable format. Small
+    values are stored as YAML header, numpy arrays as raw aligned buffers
+    that can be memory mapped by load_binary.
+
+    The file is written like in save_atomic. If filename can not be
+    replaced because its arrays are still memory mapped (Windows), the data
+    is written to filename + '.new' instead, which load_binary picks up.
+
+    @param str filename: filename of status file
+    @param OrderedDict data: values
+    """
+    arrays = list()
+    data_size = [0]
+
+    def represent_raw_ndarray(dumper, array_data):
+        """
+        Representer for numpy ndarrays as reference to a raw buffer
+        """
+        if array_data.dtype.hasobject:
+            return represent_inline_ndarray(dumper, array_data)
+        offset = _aligned(data_size[0])
+        data_size[0] = offset + array_data.nbytes
+        arrays.append((offset, array_data))
+        return dumper.represent_mapping(
+            '!rawarray',
+            OrderedDict([
+                ('dtype', repr(numpy.lib.format.dtype_to_descr(array_data.dtype))),
+                ('shape', list(array_data.shape)),
+                ('offset', offset)]).items())
+
+    with StringIO() as stream:
+        ordered_dump(data,
+                     stream=stream,
+                     Dumper=yaml.SafeDumper,
+                     representers={numpy.ndarray: represent_raw_ndarray},
+                     default_flow_style=False)
+        header = stream.getvalue().encode('utf-8')
+
+    data_start = _aligned(_BINARY_PREFIX.size + len(header))
+    tmp_filename = '{0}.tmp'.format(filename)
+    with open(tmp_filename, 'wb') as f:
+        f.write(_BINARY_PREFIX.pack(BINARY_MAGIC, BINARY_VERSION, len(header)))
+        f.write(header)
+        for offset, array_data in arrays:
+            f.write(b'\0' * (data_start + offset - f.tell()))
+            if array_data.size > 0:
+                f.write(numpy.ascontiguousarray(array_data).reshape(-1).view(numpy.uint8))
+        f.flush()
+        os.fsync(f.fileno())
+
+    new_filename = '{0}.new'.format(filename)
+    try:
+        os.replace(tmp_filename, filename)
+    except PermissionError:
+        os.replace(tmp_filename, new_filename)
+    else:
+        if os.path.isfile(new_filename):
+            try:
+                os.remove(new_filename)
+            except PermissionError:
+                pass
+    _sync_directory(filename)
+
+
+def load_binary(filename, mmap=True):
+    """
+    Loads a file saved with save_binary.
+
+    @param str filename: filename of status file
+    @param bool mmap: memory map arrays (copy on write) instead of reading
+                      them, so loading time does not depend on array size
+
+    Returns OrderedDict
+    """
+    # a newer version might have been written next to a file that was in use
+    new_filename = '{0}.new'.format(filename)
+    if os.path.isfile(new_filename) and (
+            not os.path.isfile(filename)
+            or os.path.getmtime(new_filename) >= os.path.getmtime(filename)):
+        try:
+            os.replace(new_filename, filename)
+        except PermissionError:
+            filename = new_filename
+
+    with open(filename, 'rb') as f:
+        prefix = f.read(_BINARY_PREFIX.size)
+        if len(prefix) != _BINARY_PREFIX.size:
+            raise ValueError('File {0} is too short for a binary status file.'.format(filename))
+        magic, version, header_length = _BINARY_PREFIX.unpack(prefix)
+        if magic != BINARY_MAGIC:
+            raise ValueError('File {0} is not a binary status file.'.format(filename))
+        if version > BINARY_VERSION:
+            raise ValueError('Binary status file {0} has unsupported version {1:d}.'
+                             ''.format(filename, version))
+        header = f.read(header_length).decode('utf-8')
+    data_start = _aligned(_BINARY_PREFIX.size + header_length)
+
+    def construct_raw_ndarray(loader, node):
+        """
+        The constructor for numpy arrays stored as raw buffer
+        """
+        spec = OrderedDict(loader.construct_pairs(node, deep=True))
+        dtype = numpy.lib.format.descr_to_dtype(ast.literal_eval(spec['dtype']))
+        shape = tuple(spec['shape'])
+        if int(numpy.prod(shape)) == 0 or dtype.itemsize == 0:
+            return numpy.empty(shape, dtype=dtype)
+        if mmap:
+            return numpy.memmap(filename,
+                                dtype=dtype,
+                                mode='c',
+                                offset=data_start + spec['offset'],
+                                shape=shape).view(numpy.ndarray)
+        return numpy.fromfile(filename,
+                              dtype=dtype,
+                              count=int(numpy.prod(shape)),
+                              offset=data_start + spec['offset']).reshape(shape)
+
+    return ordered_load(header,
+                        yaml.SafeLoader,
+                        constructors={'!rawarray': construct_raw_ndarray})
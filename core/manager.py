@@ -41,6 +41,8 @@ from .util.modules import toposort, is_base
 from collections import OrderedDict
 from .logger import register_exception_handler
 from .threadmanager import ThreadManager
+from .statuscheckpoint import StatusCheckpointer
+from .samplingprofiler import SamplingProfiler
 
 # try to import RemoteObjectManager. Might fail if rpyc is not installed.
 try:
@@ -76,6 +78,7 @@ class Manager(QtCore.QObject):
     sigManagerQuit = QtCore.Signal(object, bool)
     sigShutdownAcknowledge = QtCore.Signal(bool, bool)
     sigShowManager = QtCore.Signal()
+    sigStartupReport = QtCore.Signal(object)
 
     def __init__(self, args, **kwargs):
         """Constructor for Qudi main management class
@@ -106,6 +109,18 @@ class Manager(QtCore.QObject):
         self.baseDir = None
         self.alreadyQuit = False
         self.remote_server = False
+        # activation time in seconds of every module activated so far, by unique module name
+        self.activationTimes = OrderedDict()
+        # activation times and critical path of the last parallel startup, see _reportStartup
+        self.startupReport = None
+        self._pendingActivations = set()
+        self._activationLoop = None
+        # serializes writing of status variable files (deactivation and checkpoints)
+        self._statusLock = Mutex(recursive=True)
+        self.checkpointer = None
+        self.samplingProfiler = None
+        self._samplingProfileFile = None
+        self.logDir = getattr(args, 'logdir', '')
 
         try:
             # Initialize parent class QObject
@@ -118,6 +133,10 @@ class Manager(QtCore.QObject):
             self.tm = ThreadManager()
             logger.debug('Main thread is {0}'.format(QtCore.QThread.currentThreadId()))
 
+            # sampling profiler of all threads, started from the command line
+            if getattr(args, 'sampling_profile', None) is not None:
+                self.startSamplingProfiler(args.sampling_rate, args.sampling_profile or None)
+
             # Task runner
             self.tr = None
 
@@ -181,23 +200,42 @@ class Manager(QtCore.QObject):
 
             logger.info('Qudi started.')
 
+            # periodic crash-safe saving of status variables
+            checkpoint_interval = self.tree['global'].get('status_checkpoint_interval', 0)
+            if checkpoint_interval:
+                self.startStatusCheckpoints(checkpoint_interval)
+
             # Load startup things from config here
             if 'startup' in self.tree['global']:
                 # walk throug the list of loadable modules to be loaded on
                 # startup and load them if appropriate
-                for key in self.tree['global']['startup']:
-                    if key in self.tree['defined']['hardware']:
-                        self.startModule('hardware', key)
-                        self.sigModulesChanged.emit()
-                    elif key in self.tree['defined']['logic']:
-                        self.startModule('logic', key)
-                        self.sigModulesChanged.emit()
-                    elif self.hasGui and key in self.tree['defined']['gui']:
-                        self.startModule('gui', key)
-                        self.sigModulesChanged.emit()
-                    else:
-                        logger.error('Loading startup module {} failed, not '
-                                     'defined anywhere.'.format(key))
+                if self.isParallelStartup():
+                    startup_modules = list()
+                    for key in self.tree['global']['startup']:
+                        try:
+                            base = self.findBase(key)
+                        except KeyError:
+                            logger.error('Loading startup module {} failed, not '
+                                         'defined anywhere.'.format(key))
+                            continue
+                        if base != 'gui' or self.hasGui:
+                            startup_modules.append((base, key))
+                    self.startModulesParallel(startup_modules)
+                    self.sigModulesChanged.emit()
+                else:
+                    for key in self.tree['global']['startup']:
+                        if key in self.tree['defined']['hardware']:
+                            self.startModule('hardware', key)
+                            self.sigModulesChanged.emit()
+                        elif key in self.tree['defined']['logic']:
+                            self.startModule('logic', key)
+                            self.sigModulesChanged.emit()
+                        elif self.hasGui and key in self.tree['defined']['gui']:
+                            self.startModule('gui', key)
+                            self.sigModulesChanged.emit()
+                        else:
+                            logger.error('Loading startup module {} failed, not '
+                                         'defined anywhere.'.format(key))
         except:
             logger.exception('Error while configuring Manager:')
         finally:
@@ -787,6 +825,7 @@ class Manager(QtCore.QObject):
                         '',
                         defined_module['module.Class'])
 
+                    start_time = time.perf_counter()
                     modObj = self.importModule(base, module_name)
 
                     # Ensure that the namespace of a module is reloaded before 
@@ -800,6 +839,8 @@ class Manager(QtCore.QObject):
                     importlib.reload(modObj)  # keep the namespace of module up to date
 
                     self.configureModule(modObj, base, class_name, key, defined_module)
+                    logger.info('Loading of {0}.{1} took {2:.3f} s.'.format(
+                        base, key, time.perf_counter() - start_time))
                     if 'remoteaccess' in defined_module and defined_module['remoteaccess']:
                         if self.rm is None:
                             logger.error('Remote module sharing functionality disabled. Rpyc not'
@@ -954,6 +995,7 @@ class Manager(QtCore.QObject):
             return
         try:
             module.setStatusVariables(self.loadStatusVariables(base, name))
+            start_time = time.perf_counter()
             # start main loop for qt objects
             if module.is_module_threaded:
                 modthread = self.tm.newThread('mod-{0}-{1}'.format(base, name))
@@ -967,12 +1009,94 @@ class Manager(QtCore.QObject):
                     QtCore.Q_ARG(str, 'activate'))
             else:
                 success = module.module_state.activate()  # runs on_activate in main thread
-            logger.debug('Activation success: {}'.format(success))
+            self._recordActivationTime(base, name, time.perf_counter() - start_time, success)
         except:
             logger.exception(
                 '{0} module {1}: error during activation:'.format(base, name))
         QtCore.QCoreApplication.instance().processEvents()
 
+    def _recordActivationTime(self, base, name, duration, success):
+        """ Keep and log the time a module needed for activation.
+
+          @param str base: module base package (hardware, logic or gui)
+          @param str name: unique module name
+          @param float duration: activation time in seconds
+          @param bool success: whether the activation was successful
+        """
+        self.activationTimes[name] = duration
+        logger.debug('Activation success: {}'.format(success))
+        logger.info('Activation of {0}.{1} took {2:.3f} s.'.format(base, name, duration))
+
+    @QtCore.Slot(str, str, bool, float)
+    def _moduleActivated(self, base, name, success, duration):
+        """ Collect the result of a module activated by a ModuleActivator.
+
+          @param str base: module base package (hardware, logic or gui)
+          @param str name: unique module name
+          @param bool success: whether the activation was successful
+          @param float duration: activation time in seconds
+        """
+        self._recordActivationTime(base, name, duration, success)
+        self._pendingActivations.discard((base, name))
+        if len(self._pendingActivations) == 0 and self._activationLoop is not None:
+            self._activationLoop.quit()
+
+    def activateModulesConcurrently(self, concurrent, sequential=None):
+        """ Activate several independent modules at the same time.
+
+          @param list concurrent: (base, name) tuples of modules to activate in their own threads
+          @param list sequential: optional, (base, name) tuples of modules to activate in the main
+                                  thread while the other modules are activating
+
+        Threaded modules are activated in their module thread. Non-threaded modules are moved to a
+        temporary thread for activation and moved back to the main thread afterwards. This only
+        works for modules that do not create parentless Qt objects in on_activate and has to be
+        allowed with "parallel_activation: True" in their configuration.
+        """
+        if sequential is None:
+            sequential = list()
+        main_thread = QtCore.QThread.currentThread()
+        temporary_threads = list()
+        # keep references to the activators until all activations are finished
+        activators = list()
+        self._pendingActivations = set()
+        for base, name in concurrent:
+            module = self.tree['loaded'][base][name]
+            try:
+                module.setStatusVariables(self.loadStatusVariables(base, name))
+                if module.is_module_threaded:
+                    thread = self.tm.newThread('mod-{0}-{1}'.format(base, name))
+                    activator = ModuleActivator(module, base, name)
+                else:
+                    thread_name = 'activate-{0}-{1}'.format(base, name)
+                    thread = self.tm.newThread(thread_name)
+                    temporary_threads.append(thread_name)
+                    activator = ModuleActivator(module, base, name, return_thread=main_thread)
+                module.moveToThread(thread)
+                activator.moveToThread(thread)
+                activator.sigActivated.connect(self._moduleActivated, QtCore.Qt.QueuedConnection)
+                activators.append(activator)
+                self._pendingActivations.add((base, name))
+                thread.start()
+                QtCore.QMetaObject.invokeMethod(activator, 'activate', QtCore.Qt.QueuedConnection)
+            except:
+                logger.exception(
+                    '{0} module {1}: error during activation:'.format(base, name))
+
+        for base, name in sequential:
+            self.activateModule(base, name)
+
+        # wait for all concurrent activations while keeping the main event loop running
+        if len(self._pendingActivations) > 0:
+            self._activationLoop = QtCore.QEventLoop()
+            self._activationLoop.exec_()
+            self._activationLoop = None
+
+        for thread_name in temporary_threads:
+            self.tm.quitThread(thread_name)
+            self.tm.joinThread(thread_name)
+        QtCore.QCoreApplication.instance().processEvents()
+
     @QtCore.Slot(str, str)
     def deactivateModule(self, base, name):
         """Activated the module given in key with the help of base class.
@@ -1149,6 +1273,9 @@ class Manager(QtCore.QObject):
             If the module is an active GUI module, show its window.
         """
 
+        if self.isParallelStartup():
+            return self.startModulesParallel([(base, key)])
+
         deps = self.getRecursiveModuleDependencies(base, key)
         sorteddeps = toposort(deps)
         if len(sorteddeps) == 0:
@@ -1178,6 +1305,132 @@ class Manager(QtCore.QObject):
                         self.tree['loaded'][mbase][mkey].show()
         return 0
 
+    def isParallelStartup(self):
+        """ Whether independent modules are activated concurrently (global config option
+            "parallel_startup").
+
+          @return bool: parallel startup enabled
+        """
+        return bool(self.tree['global'].get('parallel_startup', False))
+
+    def startModulesParallel(self, modules):
+        """ Load and connect modules and their dependencies, then activate them grouped by
+            dependency level. Modules within one level do not depend on each other and threaded
+            modules or modules configured with "parallel_activation: True" are activated
+            concurrently.
+
+          @param list modules: (base, name) tuples of the modules to start
+
+          @return int: 0 on success, -1 on error
+        """
+        start_time = time.perf_counter()
+        deps = dict()
+        for base, key in modules:
+            module_deps = self.getRecursiveModuleDependencies(base, key)
+            if module_deps is None:
+                return -1
+            deps.update(module_deps)
+            deps.setdefault(key, list())
+        sorteddeps = toposort(deps)
+
+        # load and connect in dependency order
+        result = 0
+        levels = OrderedDict()
+        module_levels = dict()
+        for mkey in sorteddeps:
+            try:
+                mbase = self.findBase(mkey)
+            except KeyError:
+                continue
+            if mkey not in self.tree['loaded'][mbase]:
+                success = self.loadConfigureModule(mbase, mkey)
+                if success < 0:
+                    logger.warning('Stopping module loading after loading failure.')
+                    result = -1
+                    break
+                elif success > 0:
+                    logger.warning('Nonfatal loading error, going on.')
+                success = self.connectModule(mbase, mkey)
+                if success < 0:
+                    logger.warning('Stopping loading module {0}.{1} after '
+                                   'connection failure.'.format(mbase, mkey))
+                    result = -1
+                    break
+                if mkey not in self.tree['loaded'][mbase]:
+                    continue
+            level = 1 + max([module_levels.get(dep, -1) for dep in deps.get(mkey, [])], default=-1)
+            module_levels[mkey] = level
+            levels.setdefault(level, list()).append((mbase, mkey))
+
+        # activate level by level
+        activated = list()
+        for level in sorted(levels):
+            concurrent = list()
+            sequential = list()
+            for mbase, mkey in levels[level]:
+                module = self.tree['loaded'][mbase][mkey]
+                defined_module = self.tree['defined'][mbase][mkey]
+                if module.module_state() != 'deactivated':
+                    if mbase == 'gui' and 'remote' not in defined_module:
+                        module.show()
+                    continue
+                activated.append(mkey)
+                self.activationTimes.pop(mkey, None)
+                if 'remote' not in defined_module and (
+                        module.is_module_threaded
+                        or defined_module.get('parallel_activation', False)):
+                    concurrent.append((mbase, mkey))
+                else:
+                    sequential.append((mbase, mkey))
+            if len(concurrent) + len(sequential) > 0:
+                logger.info('Activating dependency level {0}: {1}'.format(
+                    level, ', '.join(m for b, m in concurrent + sequential)))
+                self.activateModulesConcurrently(concurrent, sequential)
+
+        self._reportStartup(activated, deps, time.perf_counter() - start_time)
+        return result
+
+    def _reportStartup(self, modules, deps, elapsed):
+        """ Log the total activation time of a parallel startup and its critical path, i.e. the
+            chain of dependent modules with the longest sum of activation times. The report is
+            kept in startupReport and sent with sigStartupReport to show it in the manager GUI.
+
+          @param list modules: names of the modules activated during startup
+          @param dict deps: module dependencies as used for toposort
+          @param float elapsed: total startup time in seconds
+        """
+        modules = [m for m in modules if m in self.activationTimes]
+        if len(modules) == 0:
+            return
+        finish = dict()
+        predecessor = dict()
+        for mkey in modules:
+            previous = [dep for dep in deps.get(mkey, []) if dep in finish]
+            before = max(previous, key=finish.get) if len(previous) > 0 else None
+            predecessor[mkey] = before
+            finish[mkey] = self.activationTimes[mkey] + (0 if before is None else finish[before])
+        mkey = max(finish, key=finish.get)
+        path = list()
+        while mkey is not None:
+            path.insert(0, mkey)
+            mkey = predecessor[mkey]
+        self.startupReport = {
+            'modules': len(modules),
+            'elapsed': elapsed,
+            'activation_time_sum': sum(self.activationTimes[m] for m in modules),
+            'critical_path': [(m, self.activationTimes[m]) for m in path],
+            'critical_path_time': finish[path[-1]]}
+        logger.info(
+            'Started {0:d} modules in {1:.3f} s (sum of activation times {2:.3f} s). '
+            'Critical path ({3:.3f} s): {4}'.format(
+                len(modules),
+                elapsed,
+                self.startupReport['activation_time_sum'],
+                self.startupReport['critical_path_time'],
+                ' -> '.join('{0} ({1:.3f} s)'.format(m, t)
+                            for m, t in self.startupReport['critical_path'])))
+        self.sigStartupReport.emit(self.startupReport)
+
     @QtCore.Slot(str, str)
     def stopModule(self, base, key):
         """ Figure out the module dependencies in terms of connections and deactivate module.
@@ -1258,6 +1511,10 @@ class Manager(QtCore.QObject):
         deps = self.getAllRecursiveModuleDependencies(self.tree['defined'])
         sorteddeps = toposort(deps)
 
+        if self.isParallelStartup():
+            self.startModulesParallel([(self.findBase(module), module) for module in sorteddeps])
+            sorteddeps = list()
+
         for module in sorteddeps:
             base = self.findBase(module)
             if self.startModule(base, module) < 0:
@@ -1275,6 +1532,38 @@ class Manager(QtCore.QObject):
             os.makedirs(appStatusDir)
         return appStatusDir
 
+    def getStatusFilePaths(self, classname, base, module):
+        """ Paths of the status variable files of a module.
+
+          @param str classname: class name of the module
+          @param str base: the module category
+          @param str module: the unique module name
+
+          @return tuple(str, str): path of the binary status file and of the legacy YAML status file
+        """
+        statusdir = self.getStatusDir()
+        filename = os.path.join(statusdir, 'status-{0}_{1}_{2}'.format(classname, base, module))
+        return '{0}.qstat'.format(filename), '{0}.cfg'.format(filename)
+
+    def _removeStatusFiles(self, filename):
+        """ Remove a status file together with temporary files and, for YAML status files, the
+            external npz files of its arrays.
+
+          @param str filename: path of the status file
+        """
+        stem = os.path.splitext(os.path.basename(filename))[0]
+        npz_pattern = re.compile(re.escape(stem) + r'-\d{6}\.npz$')
+        dirname = os.path.dirname(filename)
+        for name in os.listdir(dirname):
+            if (name in (os.path.basename(filename),
+                         '{0}.new'.format(os.path.basename(filename)),
+                         '{0}.tmp'.format(os.path.basename(filename)))
+                    or (filename.endswith('.cfg') and npz_pattern.match(name))):
+                try:
+                    os.remove(os.path.join(dirname, name))
+                except OSError:
+                    logger.warning('Could not remove status file {0}.'.format(name))
+
     @QtCore.Slot(str, str, dict)
     def saveStatusVariables(self, base, module, variables):
         """ If a module has status variables, save them to a file in the application status directory.
@@ -1282,19 +1571,112 @@ class Manager(QtCore.QObject):
           @param str base: the module category
           @param str module: the unique module name
           @param dict variables: a dictionary of status variable names and values
+
+        The file format is selected with the global config option "status_file_format": 'binary'
+        (default, see config.save_binary) or 'yaml'. The file in the other format is removed, which
+        migrates old YAML status files on the first save.
         """
         if len(variables) > 0:
             try:
-                statusdir = self.getStatusDir()
                 classname = self.tree['loaded'][base][module].__class__.__name__
-                filename = os.path.join(statusdir,
-                                        'status-{0}_{1}_{2}.cfg'.format(classname, base, module))
-                config.save(filename, variables)
+                binary_file, yaml_file = self.getStatusFilePaths(classname, base, module)
+                with self._statusLock:
+                    if self.tree['global'].get('status_file_format', 'binary') == 'yaml':
+                        config.save_atomic(yaml_file, variables)
+                        old_file = binary_file
+                    else:
+                        config.save_binary(binary_file, variables)
+                        old_file = yaml_file
+                    if os.path.isfile(old_file):
+                        self._removeStatusFiles(old_file)
             except:
                 print(variables)
                 logger.exception('Failed to save status variables of module '
                                  '{0}.{1}:\n{2}'.format(base, module, repr(variables)))
 
+    def checkpointStatusVariables(self, base, module, variables):
+        """ Save a snapshot of the status variables of an active module. Nothing is written if the
+            module is not active anymore, so the file saved on deactivation is never replaced by
+            an older snapshot.
+
+          @param str base: the module category
+          @param str module: the unique module name
+          @param dict variables: a dictionary of status variable names and values
+
+          @return bool: whether the status variables were written
+        """
+        with self._statusLock:
+            if not self.isModuleActive(base, module):
+                return False
+            self.saveStatusVariables(base, module, variables)
+        return True
+
+    def startStatusCheckpoints(self, interval):
+        """ Start saving the status variables of all active modules periodically.
+
+          @param float interval: time between checkpoints in seconds
+        """
+        if self.checkpointer is not None:
+            self.stopStatusCheckpoints()
+        if interval <= 0:
+            logger.error('Status variable checkpoint interval must be > 0 s.')
+            return
+        thread = self.tm.newThread('status-checkpoint')
+        self.checkpointer = StatusCheckpointer(self, interval)
+        self.checkpointer.moveToThread(thread)
+        thread.start()
+        QtCore.QMetaObject.invokeMethod(self.checkpointer, 'start', QtCore.Qt.QueuedConnection)
+
+    def stopStatusCheckpoints(self):
+        """ Stop the periodic saving of status variables. Waits for a running checkpoint.
+        """
+        if self.checkpointer is None:
+            return
+        QtCore.QMetaObject.invokeMethod(
+            self.checkpointer, 'stop', QtCore.Qt.BlockingQueuedConnection)
+        self.tm.quitThread('status-checkpoint')
+        self.tm.joinThread('status-checkpoint')
+        self.checkpointer = None
+
+    def startSamplingProfiler(self, rate=100, filename=None):
+        """ Start sampling the stacks of the main thread and all module threads.
+
+          @param float rate: samples per second
+          @param str filename: optional, collapsed stack file written by stopSamplingProfiler.
+                               Default is a time stamped file in the log directory.
+        """
+        if self.samplingProfiler is not None:
+            self.stopSamplingProfiler()
+        if not filename:
+            filename = os.path.join(
+                self.logDir,
+                'qudi_stacks_{0}.txt'.format(time.strftime('%Y%m%d-%H%M%S')))
+        try:
+            self.samplingProfiler = SamplingProfiler(self.tm, rate)
+        except ValueError as e:
+            logger.error('Could not start sampling profiler: {0}'.format(e))
+            return
+        self._samplingProfileFile = filename
+        self.samplingProfiler.start()
+
+    def stopSamplingProfiler(self):
+        """ Stop the sampling profiler and write the collected stacks to its file.
+
+          @return str: path of the written collapsed stack file, None if nothing was written
+        """
+        if self.samplingProfiler is None:
+            return None
+        self.samplingProfiler.stop()
+        filename = self._samplingProfileFile
+        try:
+            self.samplingProfiler.write(filename)
+        except OSError:
+            logger.exception('Could not write sampled stacks to {0}.'.format(filename))
+            filename = None
+        self.samplingProfiler = None
+        self._samplingProfileFile = None
+        return filename
+
     def loadStatusVariables(self, base, module):
         """ If a status variable file exists for a module, load it into a dictionary.
 
@@ -1302,14 +1684,17 @@ class Manager(QtCore.QObject):
           @param str module: the unique mduel name
 
           @return dict: dictionary of satus variable names and values
+
+        Arrays in binary status files are memory mapped (copy on write), so loading does not
+        depend on their size. Old YAML status files are still loaded.
         """
         try:
-            statusdir = self.getStatusDir()
             classname = self.tree['loaded'][base][module].__class__.__name__
-            filename = os.path.join(
-                statusdir, 'status-{0}_{1}_{2}.cfg'.format(classname, base, module))
-            if os.path.isfile(filename):
-                variables = config.load(filename)
+            binary_file, yaml_file = self.getStatusFilePaths(classname, base, module)
+            if os.path.isfile(binary_file) or os.path.isfile('{0}.new'.format(binary_file)):
+                variables = config.load_binary(binary_file)
+            elif os.path.isfile(yaml_file):
+                variables = config.load(yaml_file)
             else:
                 variables = OrderedDict()
         except:
@@ -1320,13 +1705,10 @@ class Manager(QtCore.QObject):
     @QtCore.Slot(str, str)
     def removeStatusFile(self, base, module):
         try:
-            statusdir = self.getStatusDir()
             classname = self.tree['defined'][base][
                 module]['module.Class'].split('.')[-1]
-            filename = os.path.join(
-                statusdir, 'status-{0}_{1}_{2}.cfg'.format(classname, base, module))
-            if os.path.isfile(filename):
-                os.remove(filename)
+            for filename in self.getStatusFilePaths(classname, base, module):
+                self._removeStatusFiles(filename)
         except:
             logger.exception('Failed to remove module status file.')
 
@@ -1356,6 +1738,7 @@ class Manager(QtCore.QObject):
     @QtCore.Slot(bool)
     def realQuit(self, restart=False):
         """ Stop all modules, no questions asked. """
+        self.stopStatusCheckpoints()
         deps = self.getAllRecursiveModuleDependencies(self.tree['loaded'])
         sorteddeps = toposort(deps)
         for b, mods in self.tree['loaded'].items():
@@ -1375,6 +1758,7 @@ class Manager(QtCore.QObject):
                 logger.info('Deactivating module {0}.{1}'.format(base, module))
                 self.deactivateModule(base, module)
             QtCore.QCoreApplication.processEvents()
+        self.stopSamplingProfiler()
         self.sigManagerQuit.emit(self, bool(restart))
 
     @QtCore.Slot(object)
@@ -1398,3 +1782,38 @@ class Manager(QtCore.QObject):
                 logger.error('You tried to remove the task runner but none was registered.')
             else:
                 logger.warning('Replacing task runner.')
+
+
+class ModuleActivator(QtCore.QObject):
+    """ Helper object living in the thread a module is activated in. Triggers the activation,
+        moves a non-threaded module back to its return thread and reports the activation time.
+    """
+    sigActivated = QtCore.Signal(str, str, bool, float)
+
+    def __init__(self, module, base, name, return_thread=None):
+        """
+          @param object module: Qudi module instance to activate
+          @param str base: module base package (hardware, logic or gui)
+          @param str name: unique module name
+          @param QThread return_thread: optional, thread to move the module to after activation
+        """
+        super().__init__()
+        self._module = module
+        self._base = base
+        self._name = name
+        self._return_thread = return_thread
+
+    @QtCore.Slot()
+    def activate(self):
+        """ Activate the module in the current thread and emit sigActivated. """
+        start_time = time.perf_counter()
+        try:
+            success = self._module.module_state.trigger('activate')
+        except:
+            logger.exception('{0} module {1}: error during activation:'.format(
+                self._base, self._name))
+            success = False
+        duration = time.perf_counter() - start_time
+        if self._return_thread is not None:
+            self._module.moveToThread(self._return_thread)
+        self.sigActivated.emit(self._base, self._name, bool(success), duration)
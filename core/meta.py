@@ -81,6 +81,7 @@ class ModuleMeta(QObjectMeta):
         new_class._conn = connectors
         new_class._config_options = config_options
         new_class._stat_vars = status_vars
+        new_class._stat_var_attributes = frozenset(var.var_name for var in status_vars.values())
 
         return new_class
 
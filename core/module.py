@@ -30,6 +30,7 @@ from .meta import ModuleMeta
 from .configoption import MissingOption
 from .connector import Connector
 from .statusvariable import StatusVar
+from .statuscheckpoint import fingerprint
 
 
 class ModuleStateMachine(QtCore.QObject, Fysom):
@@ -131,6 +132,8 @@ class BaseMixin(metaclass=ModuleMeta):
     """
     _threaded = False
     _connectors = dict()
+    # counts assignments of status variable attributes, see get_status_variable_snapshot
+    _status_variable_version = 0
 
     def __init__(self, manager, name, config=None, callbacks=None, **kwargs):
         """ Initialise Base class object and set up its state machine.
@@ -233,14 +236,74 @@ class BaseMixin(metaclass=ModuleMeta):
             raise e
         finally:
             # save status vars even if deactivation failed
-            for vname, var in self._stat_vars.items():
-                if hasattr(self, var.var_name):
-                    value = getattr(self, var.var_name)
-                    if not isinstance(value, StatusVar):
-                        if var.representer_function is None:
-                            self._statusVariables[var.name] = value
-                        else:
-                            self._statusVariables[var.name] = var.representer_function(self, value)
+            self._statusVariables.update(self.__represent_status_vars())
+
+    def __represent_status_vars(self):
+        """ Current values of all status variables, converted by their representer functions.
+
+            @return OrderedDict: status variable names and values
+        """
+        variables = OrderedDict()
+        for vname, var in self._stat_vars.items():
+            if hasattr(self, var.var_name):
+                value = getattr(self, var.var_name)
+                if not isinstance(value, StatusVar):
+                    if var.representer_function is None:
+                        variables[var.name] = value
+                    else:
+                        variables[var.name] = var.representer_function(self, value)
+        return variables
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in self._stat_var_attributes:
+            self._status_variable_version += 1
+
+    def status_variables_changed(self):
+        """ Mark the status variables as changed for the next checkpoint.
+
+            Assignments to status variables and changes of lists, dicts and scalars are detected
+            automatically. Call this after changing the elements of a numpy array in place.
+        """
+        self._status_variable_version += 1
+
+    def get_status_variable_snapshot(self, last_version=None):
+        """ Copy of all status variables as they would be saved on deactivation.
+
+            This is used for periodic checkpoints of active modules. Call it in the module thread
+            (see request_status_variable_snapshot), so the values do not change while they are
+            copied. Nothing is copied if the status variables did not change since last_version:
+            the version counts assignments of status variables and contains a checksum of the
+            values, where numpy arrays only contribute their dtype and shape.
+
+            @param tuple last_version: version of the last snapshot
+
+            @return tuple: version, OrderedDict of status variable names and copied values (None
+                           if nothing changed since last_version)
+        """
+        variables = OrderedDict(self._statusVariables)
+        variables.update(self.__represent_status_vars())
+        version = (self._status_variable_version, fingerprint(variables))
+        if version == last_version:
+            return version, None
+        return version, copy.deepcopy(variables)
+
+    @QtCore.Slot(object, object)
+    def request_status_variable_snapshot(self, callback, last_version):
+        """ Take a snapshot of the status variables and pass it to callback(version, variables).
+
+            Invoke with a queued connection, so the snapshot is taken in the module thread. The
+            callback is called with variables None if nothing changed or the snapshot failed.
+
+            @param callable callback: called with the version and the copied variables
+            @param tuple last_version: version of the last snapshot
+        """
+        try:
+            version, variables = self.get_status_variable_snapshot(last_version)
+        except:
+            self.log.exception('Snapshot of the status variables failed.')
+            version, variables = last_version, None
+        callback(version, variables)
 
     @property
     def log(self):
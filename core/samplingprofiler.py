@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a sampling profiler for the threads of qudi.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from .util.modules import get_main_dir
+
+logger = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """ Statistical profiler for the main thread and all threads of the ThreadManager.
+
+        A Python thread takes a snapshot of the stacks of all profiled threads (sys._current_frames)
+        at a fixed rate and counts identical stacks. Unlike cProfile, the profiled code is not
+        instrumented, so the overhead only depends on the sampling rate and the measurement loops
+        in module threads are profiled as well. Threads waiting in their Qt event loop have no
+        Python stack and are counted as idle.
+
+        The result is written in the collapsed stack format (one line "thread;outer;...;inner count"
+        per stack) that flamegraph.pl, speedscope or inferno read directly.
+    """
+
+    def __init__(self, thread_manager, rate=100, max_depth=256):
+        """
+          @param ThreadManager thread_manager: thread manager whose threads are profiled
+          @param float rate: samples per second
+          @param int max_depth: maximum number of frames per stack, the outermost frames are cut
+        """
+        if rate <= 0:
+            raise ValueError('Sampling rate must be > 0.')
+        self._thread_manager = thread_manager
+        self._interval = 1 / rate
+        self._max_depth = int(max_depth)
+        self._main_dir = os.path.join(get_main_dir(), '')
+        self._labels = dict()
+        self._stacks = Counter()
+        self._idle = Counter()
+        self._samples = 0
+        self._sample_time = 0
+        self._start_time = None
+        self._stop_time = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        """ Sampling rate in samples per second. """
+        return 1 / self._interval
+
+    @property
+    def is_running(self):
+        """ Whether the profiler is sampling. """
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """ Start sampling in a new Python thread.
+        """
+        if self.is_running:
+            return
+        self._stop_event.clear()
+        self._start_time = time.perf_counter()
+        self._stop_time = None
+        self._thread = threading.Thread(
+            target=self._run, name='qudi-sampling-profiler', daemon=True)
+        self._thread.start()
+        logger.info('Sampling profiler started with {0:.0f} samples/s.'.format(self.rate))
+
+    def stop(self):
+        """ Stop sampling. The collected stacks are kept.
+        """
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        self._stop_time = time.perf_counter()
+        stats = self.statistics()
+        logger.info('Sampling profiler stopped after {0:d} samples in {1:.1f} s (mean overhead '
+                    '{2:.1f} us/sample).'.format(stats['samples'], stats['duration'],
+                                                 stats['sample_time'] * 1e6))
+
+    def clear(self):
+        """ Forget all collected stacks.
+        """
+        with self._lock:
+            self._stacks.clear()
+            self._idle.clear()
+            self._samples = 0
+            self._sample_time = 0
+            self._start_time = time.perf_counter()
+
+    def _run(self):
+        """ Sampling loop running in the profiler thread.
+        """
+        next_time = time.perf_counter()
+        while not self._stop_event.is_set():
+            self.sample()
+            next_time += self._interval
+            wait_time = next_time - time.perf_counter()
+            if wait_time < -self._interval:
+                # do not catch up on missed samples (e.g. after a long GIL hold)
+                next_time = time.perf_counter()
+            elif wait_time > 0:
+                self._stop_event.wait(wait_time)
+
+    def sample(self):
+        """ Take one snapshot of the stacks of all profiled threads.
+        """
+        start = time.perf_counter()
+        threads = self._thread_manager.getThreadIdents()
+        threads[threading.main_thread().ident] = 'main'
+        frames = sys._current_frames()
+        stacks = list()
+        idle = list()
+        for ident, name in threads.items():
+            frame = frames.get(ident)
+            if frame is None:
+                idle.append(name)
+                continue
+            stack = list()
+            while frame is not None and len(stack) < self._max_depth:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(name)
+            stacks.append(tuple(reversed(stack)))
+        del frames
+        with self._lock:
+            self._stacks.update(stacks)
+            self._idle.update(idle)
+            self._samples += 1
+            self._sample_time += time.perf_counter() - start
+
+    def _label(self, code):
+        """ Frame label of a code object, e.g. "count_loop_body (logic/counter_logic.py:449)".
+
+          @param code code: code object of a frame
+
+          @return str: label
+        """
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            if filename.startswith(self._main_dir):
+                filename = filename[len(self._main_dir):]
+            elif 'site-packages' in filename:
+                filename = filename.split('site-packages', 1)[1][1:]
+            else:
+                filename = os.path.basename(filename)
+            label = '{0} ({1}:{2:d})'.format(
+                code.co_name, filename.replace(os.sep, '/'), code.co_firstlineno)
+            label = label.replace(';', ':')
+            self._labels[code] = label
+        return label
+
+    def statistics(self):
+        """ Summary of the collected samples.
+
+          @return dict: number of samples, profiled time in s, mean time per sample in s and the
+                        number of busy and idle samples per thread name
+        """
+        with self._lock:
+            busy = Counter()
+            for stack, count in self._stacks.items():
+                busy[stack[0]] += count
+            stop_time = time.perf_counter() if self._stop_time is None else self._stop_time
+            return {'samples': self._samples,
+                    'duration': 0 if self._start_time is None else stop_time - self._start_time,
+                    'sample_time': self._sample_time / max(self._samples, 1),
+                    'busy': dict(busy),
+                    'idle': dict(self._idle)}
+
+    def collapsed_stacks(self):
+        """ Collected stacks in the collapsed stack format, most frequent first.
+
+          @return list(str): lines "thread;outer frame;...;inner frame count"
+        """
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return ['{0} {1:d}'.format(';'.join(stack), count) for stack, count in stacks]
+
+    def write(self, filename):
+        """ Write the collected stacks to a collapsed stack file.
+
+          @param str filename: path of the file to write
+
+          @return int: number of written stacks
+        """
+        lines = self.collapsed_stacks()
+        with open(filename, 'w', encoding='utf-8') as f:
+            for line in lines:
+                f.write(line)
+                f.write('\n')
+        logger.info('Wrote {0:d} sampled stacks to {1}. Render them with e.g. '
+                    '"flamegraph.pl {1} > flamegraph.svg" or speedscope.'
+                    ''.format(len(lines), filename))
+        return len(lines)
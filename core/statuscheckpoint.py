@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the periodic checkpointing of module status variables.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import logging
+import time
+import zlib
+import numpy
+from qtpy import QtCore
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(value, checksum=0):
+    """ Cheap checksum of a (nested) status variable value to detect changes.
+
+      Numpy arrays only contribute their dtype and shape, so their data is never scanned. Changes
+      of array elements are detected with the version of the module, see
+      BaseMixin.get_status_variable_snapshot.
+
+      @param value: status variable value
+      @param int checksum: checksum to continue from
+
+      @return int: crc32 checksum
+    """
+    if isinstance(value, numpy.ndarray):
+        return zlib.crc32('{0}{1}'.format(value.dtype.str, value.shape).encode(), checksum)
+    elif isinstance(value, dict):
+        checksum = zlib.crc32(b'{', checksum)
+        for key, item in value.items():
+            checksum = fingerprint(item, fingerprint(key, checksum))
+        return checksum
+    elif isinstance(value, (list, tuple)):
+        checksum = zlib.crc32('{0}['.format(type(value).__name__).encode(), checksum)
+        for item in value:
+            checksum = fingerprint(item, checksum)
+        return checksum
+    return zlib.crc32('{0}:{1!r};'.format(type(value).__name__, value).encode(), checksum)
+
+
+class StatusCheckpointer(QtCore.QObject):
+    """ Periodically saves the status variables of all active modules, so that a crash does not
+        lose the values since the last deactivation.
+
+        Lives in its own thread. On every checkpoint each active module is asked for a snapshot
+        of its status variables with a queued call, so the values are copied in the module
+        thread and never while the module changes them (see
+        BaseMixin.request_status_variable_snapshot). Modules whose status variables did not
+        change since the last written snapshot do not copy anything. The snapshots are written in
+        this thread, files are replaced atomically, see Manager.saveStatusVariables.
+    """
+    sigCheckpointDone = QtCore.Signal(str, str, float)  # (base, module name, duration in s)
+    _sigSnapshot = QtCore.Signal(object)
+
+    def __init__(self, manager, interval):
+        """
+          @param Manager manager: the qudi manager
+          @param float interval: time between checkpoints in seconds
+        """
+        super().__init__()
+        self._manager = manager
+        self._interval = float(interval)
+        self._versions = dict()
+        # number of the pending snapshot request per module
+        self._pending = dict()
+        self._requests = 0
+        self._timer = None
+        self._sigSnapshot.connect(self._write_snapshot, QtCore.Qt.QueuedConnection)
+
+    @QtCore.Slot()
+    def start(self):
+        """ Start the checkpoint timer. Call in the thread of this object. """
+        if self._timer is None:
+            self._timer = QtCore.QTimer(self)
+            self._timer.timeout.connect(self.checkpoint)
+        self._timer.start(int(round(self._interval * 1000)))
+        logger.info('Checkpointing status variables every {0:.0f} s.'.format(self._interval))
+
+    @QtCore.Slot()
+    def stop(self):
+        """ Stop the checkpoint timer. Call in the thread of this object. """
+        if self._timer is not None:
+            self._timer.stop()
+
+    @QtCore.Slot()
+    def checkpoint(self):
+        """ Ask all active modules for a snapshot of their status variables. A module is only
+            asked again after its last snapshot arrived.
+        """
+        with self._manager.lock:
+            modules = [(base, name, module)
+                       for base, base_modules in self._manager.tree['loaded'].items()
+                       for name, module in base_modules.items()
+                       if 'remote' not in self._manager.tree['defined'][base].get(name, {})]
+        for base, name, module in modules:
+            key = (base, name)
+            try:
+                if module.module_state() not in ('idle', 'running', 'locked'):
+                    self._versions.pop(key, None)
+                    self._pending.pop(key, None)
+                    continue
+                if key in self._pending or not module._stat_vars:
+                    continue
+                self._requests += 1
+                self._pending[key] = self._requests
+                QtCore.QMetaObject.invokeMethod(
+                    module,
+                    'request_status_variable_snapshot',
+                    QtCore.Qt.QueuedConnection,
+                    QtCore.Q_ARG(object, self._snapshot_callback(key, self._requests)),
+                    QtCore.Q_ARG(object, self._versions.get(key)))
+            except:
+                self._pending.pop(key, None)
+                logger.exception('Checkpoint of status variables of {0}.{1} failed.'
+                                 ''.format(base, name))
+
+    def _snapshot_callback(self, key, request):
+        """ Callback for the snapshot of a module, passes the snapshot on to this thread. Called
+            in the module thread.
+
+          @param tuple key: base and name of the module
+          @param int request: number of the request
+
+          @return callable: callback(version, variables)
+        """
+        return lambda version, variables: self._sigSnapshot.emit(
+            (key, request, version, variables))
+
+    @QtCore.Slot(object)
+    def _write_snapshot(self, snapshot):
+        """ Write the snapshot of a module if its status variables changed.
+
+          @param tuple snapshot: (base, name), request number, version and copied variables (None
+                                 if unchanged)
+        """
+        (base, name), request, version, variables = snapshot
+        # snapshots of requests from before a deactivation of the module are dropped
+        if self._pending.get((base, name)) != request:
+            return
+        del self._pending[(base, name)]
+        if variables is None:
+            return
+        start_time = time.perf_counter()
+        try:
+            if self._manager.checkpointStatusVariables(base, name, variables):
+                self._versions[(base, name)] = version
+        except:
+            logger.exception('Checkpoint of status variables of {0}.{1} failed.'
+                             ''.format(base, name))
+            return
+        duration = time.perf_counter() - start_time
+        logger.debug('Checkpointed status variables of {0}.{1} in {2:.3f} s.'
+                     ''.format(base, name, duration))
+        self.sigCheckpointDone.emit(base, name, duration)
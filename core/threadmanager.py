@@ -22,6 +22,7 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 
 import logging
 logger = logging.getLogger(__name__)
+import threading
 from qtpy import QtCore
 from collections import OrderedDict
 from .util.mutex import Mutex
@@ -100,6 +101,15 @@ class ThreadManager(QtCore.QAbstractTableModel):
         for name in self._threads:
             self._threads[name].thread.quit()
 
+    def getThreadIdents(self):
+        """ Python thread identifiers of all running threads.
+
+          @return dict: thread names by identifier (see threading.get_ident)
+        """
+        with self.lock:
+            return {item.ident: name for name, item in self._threads.items()
+                    if item.ident is not None}
+
     def getItemByNumber(self, n):
         """ Get thread by number ins list.
 
@@ -210,12 +220,21 @@ class ThreadItem(QtCore.QObject):
         self.thread = QtCore.QThread()
         self.thread.setObjectName(name)
         self.name = name
+        self.ident = None
+        self.thread.started.connect(self.myThreadHasStarted, QtCore.Qt.DirectConnection)
         self.thread.finished.connect(self.myThreadHasQuit)
 
+    def myThreadHasStarted(self):
+        """ Signal handler for starting thread. Called in the new thread to remember its Python
+            thread identifier (e.g. for the sampling profiler).
+        """
+        self.ident = threading.get_ident()
+
     def myThreadHasQuit(self):
         """ Signal handler for quitting thread.
             Re-emits signal containing the unique thread name.
         """
+        self.ident = None
         self.sigThreadHasQuit.emit(self.name)
         logger.debug('Thread {0} has quit.'.format(self.name))
 
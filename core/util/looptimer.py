@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains timing instrumentation for measurement loops.
+
+Measurement loops in qudi logic modules usually run one iteration per call of a method that
+re-triggers itself via a queued signal or a QTimer. Decorating such a method with timed_loop
+records the duration of every call, the jitter of the interval between calls and the number of
+iterations that took longer than the target period. All loop timers are registered globally and
+shown in the "Loop timing" dock of the manager GUI.
+
+Usage example in a logic module:
+
+    from core.util.looptimer import timed_loop
+
+    @timed_loop(period=lambda self: self._counting_samples / self._count_frequency)
+    def count_loop_body(self):
+        ...
+
+or for a loop without a method per iteration:
+
+    timer = get_loop_timer('my_logic.acquisition', period=0.1)
+    while running:
+        with timer.iteration():
+            ...
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import functools
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+__all__ = ['LoopTimer', 'get_loop_timer', 'get_loop_timers', 'remove_loop_timer', 'timed_loop']
+
+_timers = OrderedDict()
+_timers_lock = threading.Lock()
+
+
+class LoopTimer:
+    """ Statistics of the iterations of one measurement loop.
+
+    The duration of each iteration is sorted into a histogram with logarithmic bins. The jitter is
+    the standard deviation of the interval between the starts of consecutive iterations. Intervals
+    with a pause of more than max(1 s, 10 periods) between two iterations (e.g. a stopped and
+    restarted measurement) are not counted. An overrun is an iteration that took longer than the
+    target period.
+    """
+
+    def __init__(self, name, period=None, min_time=1e-6, max_time=1e3, bins_per_decade=10):
+        """
+        @param str name: unique name of the loop
+        @param float period: optional, target period of the loop in s
+        @param float min_time: lower edge of the first histogram bin in s
+        @param float max_time: upper edge of the last histogram bin in s
+        @param int bins_per_decade: number of histogram bins per decade
+        """
+        self.name = name
+        self.period = period
+        self._log_min = math.log10(min_time)
+        self._bins_per_decade = int(bins_per_decade)
+        self._bin_count = int(round((math.log10(max_time) - self._log_min) * bins_per_decade))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """ Clear all statistics.
+        """
+        with self._lock:
+            self._counts = [0] * self._bin_count
+            self._iterations = 0
+            self._overruns = 0
+            self._total_time = 0
+            self._max_time = 0
+            self._last_time = 0
+            self._last_start = None
+            self._last_stop = None
+            self._intervals = 0
+            self._interval_mean = 0
+            self._interval_m2 = 0
+
+    @property
+    def bin_edges(self):
+        """ Edges of the histogram bins in s. """
+        return [10 ** (self._log_min + i / self._bins_per_decade)
+                for i in range(self._bin_count + 1)]
+
+    def start_iteration(self):
+        """ Mark the start of an iteration.
+
+        @return float: start time to pass to stop_iteration
+        """
+        return time.perf_counter()
+
+    def stop_iteration(self, start):
+        """ Mark the end of an iteration and record it.
+
+        @param float start: start time returned by start_iteration
+        """
+        stop = time.perf_counter()
+        self.record(stop - start, start)
+
+    @contextmanager
+    def iteration(self):
+        """ Context manager timing one iteration.
+        """
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.record(time.perf_counter() - start, start)
+
+    def record(self, duration, start=None):
+        """ Record one iteration.
+
+        @param float duration: duration of the iteration in s
+        @param float start: optional, time.perf_counter() at the start of the iteration. Needed for
+                            the jitter.
+        """
+        period = self.period
+        if duration > 0:
+            index = int((math.log10(duration) - self._log_min) * self._bins_per_decade)
+            index = min(max(index, 0), self._bin_count - 1)
+        else:
+            index = 0
+        with self._lock:
+            self._counts[index] += 1
+            self._iterations += 1
+            self._total_time += duration
+            self._last_time = duration
+            if duration > self._max_time:
+                self._max_time = duration
+            if period and duration > period:
+                self._overruns += 1
+            if start is None:
+                return
+            if self._last_start is not None \
+                    and start - self._last_stop < max(1, 10 * (period or 0)):
+                # Welford's online algorithm for the variance of the interval
+                interval = start - self._last_start
+                self._intervals += 1
+                delta = interval - self._interval_mean
+                self._interval_mean += delta / self._intervals
+                self._interval_m2 += delta * (interval - self._interval_mean)
+            self._last_start = start
+            self._last_stop = start + duration
+
+    def statistics(self):
+        """ Summary of the recorded iterations.
+
+        @return dict: number of iterations and overruns, target period, last, mean and maximum
+                      duration, mean interval and jitter (all times in s)
+        """
+        with self._lock:
+            iterations = self._iterations
+            return {'name': self.name,
+                    'period': self.period,
+                    'iterations': iterations,
+                    'overruns': self._overruns,
+                    'last_time': self._last_time,
+                    'mean_time': self._total_time / iterations if iterations else 0,
+                    'max_time': self._max_time,
+                    'mean_interval': self._interval_mean,
+                    'jitter': math.sqrt(self._interval_m2 / self._intervals)
+                              if self._intervals > 1 else 0}
+
+    def histogram(self):
+        """ Histogram of the iteration durations.
+
+        @return tuple: (list of bin edges in s, list of counts)
+        """
+        with self._lock:
+            counts = list(self._counts)
+        return self.bin_edges, counts
+
+
+def get_loop_timer(name, period=None):
+    """ Get the registered loop timer with a name, create it if it does not exist.
+
+    @param str name: unique name of the loop
+    @param float period: optional, target period of the loop in s. Updates an existing timer.
+
+    @return LoopTimer: the loop timer
+    """
+    with _timers_lock:
+        timer = _timers.get(name)
+        if timer is None:
+            timer = LoopTimer(name, period)
+            _timers[name] = timer
+        elif period is not None:
+            timer.period = period
+        return timer
+
+
+def get_loop_timers():
+    """ All registered loop timers.
+
+    @return list(LoopTimer): loop timers in the order of their creation
+    """
+    with _timers_lock:
+        return list(_timers.values())
+
+
+def remove_loop_timer(name):
+    """ Unregister a loop timer.
+
+    @param str name: name of the loop
+    """
+    with _timers_lock:
+        _timers.pop(name, None)
+
+
+def timed_loop(name=None, period=None):
+    """ Decorator recording every call of a (loop iteration) method in a LoopTimer.
+
+    @param str name: optional, name of the loop. Default is the function name, prefixed with the
+                     qudi module name if decorating a method of a qudi module.
+    @param period: optional, target period of the loop in s. Either a number or a callable that
+                   is called with the same arguments as the decorated function (i.e. the module
+                   instance for methods) after each iteration and returns the period.
+    """
+    def decorator(func):
+        loop_name = func.__name__ if name is None else name
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                module_name = getattr(args[0], '_name', None) if args else None
+                if isinstance(module_name, str):
+                    timer = get_loop_timer('{0}.{1}'.format(module_name, loop_name))
+                else:
+                    timer = get_loop_timer(loop_name)
+                if callable(period):
+                    try:
+                        timer.period = period(*args, **kwargs)
+                    except Exception:
+                        timer.period = None
+                elif period is not None:
+                    timer.period = period
+                timer.record(duration, start)
+        return wrapper
+    return decorator
@@ -0,0 +1,482 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains coordinate transforms for confocal scanner interfuses.
+
+A transform maps scanner coordinates given as array of shape (4, N) (rows x, y, z, a) from the
+coordinates used by the logic to the coordinates sent to the hardware. A TransformChain applies
+several transforms to a whole scan line in one vectorized pass:
+
+    chain = TransformChain([TiltTransform(slope_x=0.01), Polynomial2DTransform(poly_x, poly_y)],
+                           timer_name='scanner_interfuse.transform_line')
+    hardware_line = chain.forward(line_path)  # line_path is not modified
+    position = chain.inverse_point(hardware_position)
+
+Consecutive affine transforms (including the tilt) are fused into one matrix multiplication. The
+result is written into a buffer that is reused for lines of the same length, so the returned array
+is only valid until the next call of forward. Inverse transforms of single points (position
+readback) are cached.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import importlib
+from collections import OrderedDict
+
+import numpy as np
+from numpy.polynomial import polynomial
+
+from core.util.looptimer import get_loop_timer
+
+
+def polyval2d(x, y, coefficients):
+    """ Evaluate a 2D polynomial with Horner's scheme, like numpy.polynomial.polynomial.polyval2d
+    but with less temporary arrays (about 5 times faster for scan lines).
+
+    @param numpy.ndarray x: x values
+    @param numpy.ndarray y: y values of the same shape
+    @param numpy.ndarray coefficients: 2D array, coefficients[i, j] belongs to x**i * y**j
+
+    @return numpy.ndarray: polynomial values
+    """
+    y = np.asarray(y, dtype=float)
+
+    def polyval_y(row):
+        values = np.full(y.shape, row[-1])
+        for coefficient in row[-2::-1]:
+            values *= y
+            values += coefficient
+        return values
+
+    result = polyval_y(coefficients[-1])
+    for row in coefficients[-2::-1]:
+        result *= x
+        result += polyval_y(row)
+    return result
+
+
+class ScannerTransform:
+    """ Base class of the scanner coordinate transforms.
+
+    Subclasses implement forward and inverse and call _changed() whenever their parameters change,
+    so a TransformChain using them recompiles and clears its caches.
+    """
+
+    is_affine = False
+
+    def __init__(self, enabled=True):
+        self._enabled = bool(enabled)
+        self.version = 0
+
+    @property
+    def enabled(self):
+        """ Disabled transforms are skipped by a TransformChain. """
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value):
+        self._enabled = bool(value)
+        self._changed()
+
+    def _changed(self):
+        self.version += 1
+
+    def forward(self, points, out):
+        """ Transform points from logic to hardware coordinates.
+
+        @param numpy.ndarray points: float array of shape (4, N)
+        @param numpy.ndarray out: float array of shape (4, N) for the result. Can be points.
+        """
+        raise NotImplementedError
+
+    def inverse(self, points, out):
+        """ Transform points from hardware to logic coordinates.
+
+        @param numpy.ndarray points: float array of shape (4, N)
+        @param numpy.ndarray out: float array of shape (4, N) for the result. Can be points.
+        """
+        raise NotImplementedError
+
+
+class AffineTransform(ScannerTransform):
+    """ Affine transform hardware = matrix . logic + offset of the 4 scanner axes.
+    """
+
+    is_affine = True
+
+    def __init__(self, matrix=None, offset=None, enabled=True):
+        """
+        @param float[4][4] matrix: optional, transform matrix (default identity)
+        @param float[4] offset: optional, offset added after the matrix (default zero)
+        @param bool enabled: apply the transform
+        """
+        super().__init__(enabled)
+        self.set_parameters(matrix, offset)
+
+    def set_parameters(self, matrix=None, offset=None):
+        """ Change matrix and offset.
+
+        @param float[4][4] matrix: transform matrix, None for identity
+        @param float[4] offset: offset, None for zero
+        """
+        self.matrix = np.eye(4) if matrix is None else np.array(matrix, dtype=float)
+        self.offset = np.zeros(4) if offset is None else np.array(offset, dtype=float)
+        if self.matrix.shape != (4, 4) or self.offset.shape != (4,):
+            raise ValueError('Affine transform needs a 4x4 matrix and an offset of length 4.')
+        self._inverse_matrix = None
+        self._changed()
+
+    @property
+    def inverse_matrix(self):
+        """ Cached inverse of the matrix. """
+        if self._inverse_matrix is None:
+            self._inverse_matrix = np.linalg.inv(self.matrix)
+        return self._inverse_matrix
+
+    def forward(self, points, out):
+        out[...] = np.dot(self.matrix, points) + self.offset[:, np.newaxis]
+
+    def inverse(self, points, out):
+        out[...] = np.dot(self.inverse_matrix, points - self.offset[:, np.newaxis])
+
+
+class TiltTransform(AffineTransform):
+    """ Z correction of a tilted sample surface:
+
+        z_hardware = z - slope_x * (x - reference_x) - slope_y * (y - reference_y)
+    """
+
+    def __init__(self, slope_x=0., slope_y=0., reference_x=0., reference_y=0., enabled=True):
+        """
+        @param float slope_x: dz/dx of the surface
+        @param float slope_y: dz/dy of the surface
+        @param float reference_x: x position without correction
+        @param float reference_y: y position without correction
+        @param bool enabled: apply the transform
+        """
+        self._tilt = [slope_x, slope_y, reference_x, reference_y]
+        super().__init__(enabled=enabled)
+        self._update_matrix()
+
+    def _update_matrix(self):
+        slope_x, slope_y, reference_x, reference_y = self._tilt
+        matrix = np.eye(4)
+        matrix[2, 0] = -slope_x
+        matrix[2, 1] = -slope_y
+        offset = np.zeros(4)
+        offset[2] = slope_x * reference_x + slope_y * reference_y
+        self.set_parameters(matrix, offset)
+
+    def _tilt_property(index):
+        def getter(self):
+            return self._tilt[index]
+
+        def setter(self, value):
+            self._tilt[index] = value
+            self._update_matrix()
+        return property(getter, setter)
+
+    slope_x = _tilt_property(0)
+    slope_y = _tilt_property(1)
+    reference_x = _tilt_property(2)
+    reference_y = _tilt_property(3)
+    del _tilt_property
+
+    def dz(self, x, y):
+        """ Z correction at a lateral position.
+
+        @param float x: x position (or array)
+        @param float y: y position (or array)
+
+        @return float: z correction (0 if disabled)
+        """
+        if not self.enabled:
+            return 0.
+        slope_x, slope_y, reference_x, reference_y = self._tilt
+        return -((x - reference_x) * slope_x + (y - reference_y) * slope_y)
+
+
+class Polynomial2DTransform(ScannerTransform):
+    """ Lateral polynomial correction (x, y) -> (poly_x(x, y), poly_y(x, y)), z and a unchanged.
+
+    The coefficient matrices have the powers of y as rows and the powers of x as columns, i.e.
+    [[0, 1], [0, 0]] is x and [[0, 0], [1, 0]] is y. The inverse is calculated with Newton's method.
+    """
+
+    def __init__(self, poly2d_x=None, poly2d_y=None, enabled=True, tolerance=1e-12,
+                 max_iterations=50):
+        """
+        @param float[][] poly2d_x: coefficients of the x polynomial (default x)
+        @param float[][] poly2d_y: coefficients of the y polynomial (default y)
+        @param bool enabled: apply the transform
+        @param float tolerance: absolute tolerance of the inverse
+        @param int max_iterations: maximum number of Newton iterations of the inverse
+        """
+        super().__init__(enabled)
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.set_coefficients(poly2d_x, poly2d_y)
+
+    def set_coefficients(self, poly2d_x=None, poly2d_y=None):
+        """ Change the polynomial coefficients.
+
+        @param float[][] poly2d_x: coefficients of the x polynomial, None for x
+        @param float[][] poly2d_y: coefficients of the y polynomial, None for y
+        """
+        poly2d_x = [[0, 1], [0, 0]] if poly2d_x is None else poly2d_x
+        poly2d_y = [[0, 0], [1, 0]] if poly2d_y is None else poly2d_y
+        # polyval2d expects the powers of x as first index
+        self._coeff_x = np.array(poly2d_x, dtype=float).T
+        self._coeff_y = np.array(poly2d_y, dtype=float).T
+        if self._coeff_x.ndim != 2 or self._coeff_y.ndim != 2:
+            raise ValueError('Polynomial coefficients must be 2D arrays.')
+        self._jacobian = [[polynomial.polyder(c, axis=axis) for axis in (0, 1)]
+                          for c in (self._coeff_x, self._coeff_y)]
+        self._changed()
+
+    def convert(self, x, y):
+        """ Apply the polynomials to lateral positions.
+
+        @param float x: x position (or array)
+        @param float y: y position (or array)
+
+        @return tuple: converted x, y
+        """
+        return polyval2d(x, y, self._coeff_x), polyval2d(x, y, self._coeff_y)
+
+    def forward(self, points, out):
+        x, y = self.convert(points[0], points[1])
+        if out is not points:
+            out[2:] = points[2:]
+        out[0] = x
+        out[1] = y
+
+    def inverse(self, points, out):
+        target_x = np.array(points[0], dtype=float)
+        target_y = np.array(points[1], dtype=float)
+        x, y = target_x.copy(), target_y.copy()
+        for _ in range(self.max_iterations):
+            fx, fy = self.convert(x, y)
+            rx, ry = fx - target_x, fy - target_y
+            if np.all(np.abs(rx) <= self.tolerance) and np.all(np.abs(ry) <= self.tolerance):
+                break
+            (dxx, dxy), (dyx, dyy) = [[polyval2d(x, y, d) for d in row]
+                                      for row in self._jacobian]
+            determinant = dxx * dyy - dxy * dyx
+            x = x - (dyy * rx - dxy * ry) / determinant
+            y = y - (dxx * ry - dyx * rx) / determinant
+        if out is not points:
+            out[2:] = points[2:]
+        out[0] = x
+        out[1] = y
+
+
+class FunctionTransform(ScannerTransform):
+    """ Transform with user supplied functions mapping arrays of shape (4, N) to (4, N).
+    """
+
+    def __init__(self, forward, inverse=None, enabled=True):
+        """
+        @param forward: callable or dotted path 'package.module.function' of the forward map
+        @param inverse: optional, callable or dotted path of the inverse map
+        @param bool enabled: apply the transform
+        """
+        super().__init__(enabled)
+        self._forward = self._resolve(forward)
+        self._inverse = None if inverse is None else self._resolve(inverse)
+
+    @staticmethod
+    def _resolve(function):
+        if callable(function):
+            return function
+        module_name, function_name = function.rsplit('.', 1)
+        return getattr(importlib.import_module(module_name), function_name)
+
+    def forward(self, points, out):
+        out[...] = self._forward(points)
+
+    def inverse(self, points, out):
+        if self._inverse is None:
+            raise NotImplementedError('No inverse function given for this transform.')
+        out[...] = self._inverse(points)
+
+
+class TransformChain:
+    """ Applies a list of transforms in order to scan lines and positions.
+    """
+
+    def __init__(self, transforms=None, timer_name=None, cache_size=128):
+        """
+        @param list transforms: ScannerTransform instances applied in list order (logic to hardware)
+        @param str timer_name: optional, name of the LoopTimer recording the time per line
+        @param int cache_size: number of cached inverse points
+        """
+        self.transforms = list() if transforms is None else list(transforms)
+        self._timer = None if timer_name is None else get_loop_timer(timer_name)
+        self._cache_size = cache_size
+        self._inverse_cache = OrderedDict()
+        self._versions = None
+        self._steps = list()
+        self._buffers = (None, None)
+
+    @property
+    def timer(self):
+        """ LoopTimer of the line transforms, None if not timed. """
+        return self._timer
+
+    def set_line_period(self, period):
+        """ Set the duration of a line, so the timer counts transforms taking longer as overruns.
+
+        @param float period: duration of one line in s, None to clear
+        """
+        if self._timer is not None:
+            self._timer.period = period
+
+    def _compile(self):
+        """ Fuse consecutive affine transforms after a parameter change. """
+        versions = tuple((id(t), t.version) for t in self.transforms)
+        if versions == self._versions:
+            return
+        steps = list()
+        for transform in self.transforms:
+            if not transform.enabled:
+                continue
+            if transform.is_affine:
+                if steps and steps[-1][0] == 'affine':
+                    _, matrix, offset = steps[-1]
+                    steps[-1] = ('affine',
+                                 np.dot(transform.matrix, matrix),
+                                 np.dot(transform.matrix, offset) + transform.offset)
+                else:
+                    steps.append(('affine', transform.matrix.copy(), transform.offset.copy()))
+            else:
+                steps.append(('map', transform))
+        # affine steps: matrix, offset as column vector, inverse matrix for the position readback
+        self._steps = [('affine', step[1], step[2][:, np.newaxis], np.linalg.inv(step[1]))
+                       if step[0] == 'affine' else step for step in steps]
+        self._versions = versions
+        self._inverse_cache.clear()
+
+    @property
+    def is_identity(self):
+        """ True if no transform is enabled. """
+        self._compile()
+        return not self._steps
+
+    def _get_buffers(self, shape):
+        if self._buffers[0] is None or self._buffers[0].shape != shape:
+            self._buffers = (np.empty(shape), np.empty(shape))
+        return self._buffers
+
+    def forward(self, line_path):
+        """ Transform a scan line from logic to hardware coordinates.
+
+        @param numpy.ndarray line_path: positions of shape (4, N). Not modified.
+
+        @return numpy.ndarray: transformed positions of shape (4, N). The array is reused by the
+                               next call, copy it if it must be kept.
+        """
+        if self._timer is None:
+            return self._forward(line_path)
+        with self._timer.iteration():
+            return self._forward(line_path)
+
+    def _forward(self, line_path):
+        self._compile()
+        line_path = np.asarray(line_path, dtype=float)
+        if not self._steps:
+            return line_path
+        current, spare = self._get_buffers(line_path.shape)
+        source = line_path
+        for step in self._steps:
+            if step[0] == 'affine':
+                target = spare if source is current else current
+                np.dot(step[1], source, out=target)
+                target += step[2]
+                source = target
+            else:
+                if source is line_path:
+                    step[1].forward(source, current)
+                    source = current
+                else:
+                    step[1].forward(source, source)
+        return source
+
+    def forward_point(self, position):
+        """ Transform a single position from logic to hardware coordinates.
+
+        @param float[4] position: x, y, z, a
+
+        @return numpy.ndarray: transformed position
+        """
+        self._compile()
+        points = np.array(position, dtype=float).reshape(4, 1)
+        for step in self._steps:
+            if step[0] == 'affine':
+                points = np.dot(step[1], points) + step[2]
+            else:
+                step[1].forward(points, points)
+        return points[:, 0]
+
+    def inverse_point(self, position):
+        """ Transform a single position from hardware to logic coordinates. Results are cached.
+
+        @param float[4] position: x, y, z, a
+
+        @return numpy.ndarray: position in logic coordinates
+        """
+        self._compile()
+        key = tuple(float(value) for value in position)
+        cached = self._inverse_cache.get(key)
+        if cached is not None:
+            self._inverse_cache.move_to_end(key)
+            return cached.copy()
+        points = np.array(key).reshape(4, 1)
+        for step in reversed(self._steps):
+            if step[0] == 'affine':
+                points = np.dot(step[3], points - step[2])
+            else:
+                step[1].inverse(points, points)
+        result = points[:, 0]
+        self._inverse_cache[key] = result.copy()
+        if len(self._inverse_cache) > self._cache_size:
+            self._inverse_cache.popitem(last=False)
+        return result
+
+
+def transform_from_config(config):
+    """ Create a transform from a configuration dictionary.
+
+    Supported types and their options:
+        affine: matrix (4x4), offset (4)
+        tilt: slope_x, slope_y, reference_x, reference_y
+        poly2d: poly2d_x, poly2d_y
+        function: forward, inverse (dotted paths of functions)
+
+    @param dict config: options of the transform, key 'type' selects the transform
+
+    @return ScannerTransform: the transform
+    """
+    options = dict(config)
+    transform_type = options.pop('type', None)
+    types = {'affine': AffineTransform,
+             'tilt': TiltTransform,
+             'poly2d': Polynomial2DTransform,
+             'function': FunctionTransform}
+    if transform_type not in types:
+        raise ValueError('Unknown scanner transform type "{0}", use one of {1}.'.format(
+            transform_type, ', '.join(types)))
+    return types[transform_type](**options)
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Batched transfer of SCPI commands to instruments.
+
+Every write or query to an instrument is a bus round trip (GPIB, USB or LAN), and waiting for the
+instrument after every command multiplies them. ScpiBatch collects commands, joins them with ';'
+into as few messages as the instrument accepts and synchronizes once per batch with a trailing
+*OPC? query. Long lists of values can be sent as IEEE 488.2 definite length binary blocks.
+
+Usage example:
+
+    batch = ScpiBatch(self._gpib_connection)
+    batch.write(":LIST:SEL 'QUDI'")
+    batch.write_list(':LIST:FREQ', frequencies, fmt='{0:f}')
+    batch.write(':LIST:LEARN')
+    batch.flush()  # one transfer, returns when the instrument has finished all commands
+
+The connection can be any pyvisa resource (or object providing write_raw, read and optionally
+write_termination and encoding).
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import numpy as np
+
+
+def binary_block(values, datatype='f8', is_big_endian=False):
+    """ Encode values as IEEE 488.2 definite length arbitrary block ('#<digits><length><data>').
+
+    @param array_like values: values to encode
+    @param str datatype: numpy type of the values in the block, e.g. 'f8' (double) or 'f4'
+    @param bool is_big_endian: byte order of the values
+
+    @return bytes: the block
+    """
+    dtype = np.dtype(datatype).newbyteorder('>' if is_big_endian else '<')
+    data = np.ascontiguousarray(values, dtype=dtype).tobytes()
+    length = str(len(data))
+    return '#{0:d}{1}'.format(len(length), length).encode('ascii') + data
+
+
+def ascii_list(values, fmt='{0:f}', separator=','):
+    """ Format values as comma separated list.
+
+    @param array_like values: values to format
+    @param str fmt: format string of one value
+    @param str separator: separator between the values
+
+    @return str: the list
+    """
+    return separator.join([fmt.format(value) for value in values])
+
+
+class ScpiBatch:
+    """ Collects SCPI commands and sends them in as few transfers as possible.
+
+    Commands are joined with ';' into messages of at most max_length bytes. Commands that do not
+    start with ':' or '*' get a leading ':', so every command is interpreted from the root of the
+    command tree no matter what was sent before it in the same message.
+    """
+
+    def __init__(self, connection, max_length=None, sync_query='*OPC?'):
+        """
+        @param object connection: pyvisa resource of the instrument
+        @param int max_length: optional, maximum message length in bytes (None: unlimited)
+        @param str sync_query: query answered by the instrument when all commands are done
+        """
+        self._connection = connection
+        self._max_length = max_length
+        self._sync_query = sync_query
+        self._commands = list()
+        self.transfers = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
+        else:
+            self._commands = list()
+
+    @property
+    def pending(self):
+        """ Number of commands that are not sent yet. """
+        return len(self._commands)
+
+    def _encode(self, text):
+        return text.encode(getattr(self._connection, 'encoding', 'ascii') or 'ascii')
+
+    def write(self, command):
+        """ Add a command to the batch.
+
+        @param str command: SCPI command
+
+        @return ScpiBatch: this batch, so calls can be chained
+        """
+        command = command.strip()
+        if not command.startswith((':', '*')):
+            command = ':' + command
+        self._commands.append(self._encode(command))
+        return self
+
+    def wait(self):
+        """ Add *WAI, so the following commands only start after the previous ones are done.
+
+        @return ScpiBatch: this batch
+        """
+        return self.write('*WAI')
+
+    def write_list(self, header, values, fmt='{0:f}', binary=False, datatype='f8',
+                   is_big_endian=False):
+        """ Add a command with a list of values, e.g. ':LIST:FREQ 1e9,2e9'.
+
+        @param str header: command header without values
+        @param array_like values: values of the list
+        @param str fmt: format of the values in an ASCII list
+        @param bool binary: send the values as binary block (the instrument data format must be
+                            set accordingly, e.g. ':FORM PACK' or ':FORM REAL,64')
+        @param str datatype: numpy type of the values in the binary block
+        @param bool is_big_endian: byte order of the values in the binary block
+
+        @return ScpiBatch: this batch
+        """
+        if binary:
+            # write() strips the command, so the separating space is added with the block
+            self.write(header)
+            self._commands[-1] += b' ' + binary_block(values, datatype, is_big_endian)
+        else:
+            self.write(header + ' ' + ascii_list(values, fmt))
+        return self
+
+    def messages(self, synchronize=True):
+        """ Join the pending commands into messages.
+
+        @param bool synchronize: append the synchronization query to the last message
+
+        @return list(bytes): messages without termination
+        """
+        commands = list(self._commands)
+        if synchronize:
+            commands.append(self._encode(self._sync_query))
+        messages = list()
+        current = None
+        for command in commands:
+            if current is not None and (self._max_length is None
+                                        or len(current) + 1 + len(command) <= self._max_length):
+                current += b';' + command
+            else:
+                if current is not None:
+                    messages.append(current)
+                current = command
+        if current is not None:
+            messages.append(current)
+        return messages
+
+    def flush(self, synchronize=True):
+        """ Send all pending commands.
+
+        @param bool synchronize: wait until the instrument has executed all commands
+
+        @return str: answer to the synchronization query, None if not synchronized
+        """
+        if not self._commands:
+            return None
+        messages = self.messages(synchronize)
+        self._commands = list()
+        termination = self._encode(getattr(self._connection, 'write_termination', '\n') or '')
+        for message in messages:
+            self._connection.write_raw(message + termination)
+            self.transfers += 1
+        if synchronize:
+            return self._connection.read().strip()
+        return None
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a drop-in replacement for qtpy.uic that caches compiled Qt Designer forms.
+
+Parsing a .ui file with uic.loadUi is slow, since the XML is interpreted every time a widget is
+created. loadUi of this module compiles a .ui file once to a Python form class (the same code
+pyuic5 generates), stores it in the __pycache__ directory next to the .ui file and reuses it as
+long as the modification time and size of the .ui file are unchanged. If compiling is not
+possible (e.g. other Qt bindings than PyQt5 or a read-only installation), qtpy.uic.loadUi is
+used.
+
+Usage in GUI modules:
+
+    from core.util import uic
+    uic.loadUi(ui_file, self)
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import ast
+import io
+import os
+import logging
+import re
+import qtpy
+from qtpy import uic as _qtpy_uic
+from core.util.mutex import Mutex
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['loadUi', 'clear_form_cache']
+
+_CACHE_HEADER = '# qudi form cache 2: {0} {1:d} {2:d}\n'
+
+# file name literals of pixmaps and icons in the generated code, e.g. QtGui.QPixmap("icon.png")
+_IMAGE_PATH = re.compile(r'(QtGui\.Q(?:Pixmap|Icon)\()("(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\')\)')
+
+# compiled form classes by absolute .ui file path: (mtime_ns, size, form class)
+_form_classes = dict()
+_lock = Mutex()
+
+
+def _compiled_filename(ui_file):
+    """ Path of the cached Python form of a .ui file.
+
+    @param str ui_file: absolute path of the .ui file
+    @return str: path of the Python file in the __pycache__ directory next to the .ui file
+    """
+    from PyQt5.QtCore import PYQT_VERSION_STR
+    cache_dir = os.path.join(os.path.dirname(ui_file), '__pycache__')
+    name = os.path.splitext(os.path.basename(ui_file))[0]
+    return os.path.join(cache_dir, '{0}.pyqt-{1}.py'.format(name, PYQT_VERSION_STR))
+
+
+def _absolute_image_paths(source, ui_dir):
+    """ Make the image file paths in the compiled code of a form absolute.
+
+    uic.loadUi resolves relative paths of <iconset> and <pixmap> entries (e.g.
+    '../../artwork/icons/...') against the directory of the .ui file. In the compiled code they
+    would be resolved against the working directory of the process.
+
+    @param str source: Python source code of the form
+    @param str ui_dir: directory of the .ui file
+
+    @return str: source code with absolute image paths
+    """
+    def replace(match):
+        path = ast.literal_eval(match.group(2))
+        if not path or path.startswith(':'):
+            # empty or Qt resource path
+            return match.group(0)
+        path = os.path.normpath(os.path.join(ui_dir, path))
+        return '{0}{1!r})'.format(match.group(1), path)
+    return _IMAGE_PATH.sub(replace, source)
+
+
+def _compile_form(ui_file, mtime_ns, size):
+    """ Get the Python source of the form of a .ui file, from the file cache if it is up to date.
+
+    @param str ui_file: absolute path of the .ui file
+    @param int mtime_ns: modification time of the .ui file in ns
+    @param int size: size of the .ui file in bytes
+
+    @return str: Python source code of the form
+    """
+    header = _CACHE_HEADER.format(ui_file, mtime_ns, size)
+    compiled_file = _compiled_filename(ui_file)
+    try:
+        with open(compiled_file, 'r', encoding='utf-8') as f:
+            source = f.read()
+        if source.startswith(header):
+            return source
+    except OSError:
+        pass
+
+    from PyQt5.uic import compileUi
+    with io.StringIO() as stream:
+        compileUi(ui_file, stream)
+        source = header + _absolute_image_paths(stream.getvalue(), os.path.dirname(ui_file))
+    try:
+        os.makedirs(os.path.dirname(compiled_file), exist_ok=True)
+        tmp_file = '{0}.{1:d}.tmp'.format(compiled_file, os.getpid())
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(source)
+        os.replace(tmp_file, compiled_file)
+    except OSError:
+        logger.debug('Could not write compiled form of {0}, using it without file cache.'
+                     ''.format(ui_file))
+    return source
+
+
+def _form_class(ui_file):
+    """ Compiled form class of a .ui file.
+
+    @param str ui_file: path of the .ui file
+    @return type: form class with a setupUi(widget) method
+    """
+    ui_file = os.path.abspath(ui_file)
+    stat = os.stat(ui_file)
+    with _lock:
+        cached = _form_classes.get(ui_file)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+
+    source = _compile_form(ui_file, stat.st_mtime_ns, stat.st_size)
+    namespace = {'__name__': 'qudi_form_{0}'.format(
+        os.path.splitext(os.path.basename(ui_file))[0])}
+    exec(compile(source, _compiled_filename(ui_file), 'exec'), namespace)
+    form_classes = [obj for name, obj in namespace.items()
+                    if name.startswith('Ui_') and hasattr(obj, 'setupUi')]
+    if len(form_classes) != 1:
+        raise ValueError('Compiled form of {0} does not contain exactly one form class.'
+                         ''.format(ui_file))
+    with _lock:
+        _form_classes[ui_file] = (stat.st_mtime_ns, stat.st_size, form_classes[0])
+    return form_classes[0]
+
+
+def loadUi(uifile, baseinstance=None, *args, **kwargs):
+    """ Load a Qt Designer .ui file into a widget, like qtpy.uic.loadUi.
+
+    @param str uifile: path of the .ui file
+    @param QWidget baseinstance: widget to set up with the form. If None, qtpy.uic.loadUi
+                                 creates a new widget.
+
+    @return QWidget: the widget
+    """
+    if baseinstance is None or args or kwargs or qtpy.API_NAME != 'PyQt5':
+        return _qtpy_uic.loadUi(uifile, baseinstance, *args, **kwargs)
+    try:
+        form_class = _form_class(uifile)
+    except Exception:
+        logger.exception('Compiling {0} failed, loading it with uic.loadUi.'.format(uifile))
+        return _qtpy_uic.loadUi(uifile, baseinstance)
+
+    form = form_class()
+    form.setupUi(baseinstance)
+    # uic.loadUi makes all named child objects attributes of the widget
+    for name, value in vars(form).items():
+        setattr(baseinstance, name, value)
+    return baseinstance
+
+
+def clear_form_cache():
+    """ Forget all compiled form classes of this process. Cached files are kept and still
+    checked against the .ui files.
+    """
+    with _lock:
+        _form_classes.clear()
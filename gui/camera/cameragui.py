@@ -30,7 +30,7 @@ from gui.colordefs import ColorScaleInferno
 from qtpy import QtCore
 from qtpy import QtGui
 from qtpy import QtWidgets
-from qtpy import uic
+from core.util import uic
 from gui.guiutils import ColorBar
 
 import numpy as np
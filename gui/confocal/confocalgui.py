@@ -31,13 +31,14 @@ from core.statusvariable import StatusVar
 from qtwidgets.scan_plotwidget import ScanImageItem
 from gui.guibase import GUIBase
 from gui.guiutils import ColorBar
+from gui.plot_update_bus import PlotUpdateBus
 from gui.colordefs import ColorScaleInferno
 from gui.colordefs import QudiPalettePale as palette
 from gui.fitsettings import FitParametersWidget
 from qtpy import QtCore
 from qtpy import QtGui
 from qtpy import QtWidgets
-from qtpy import uic
+from core.util import uic
 
 
 class ConfocalMainWindow(QtWidgets.QMainWindow):
@@ -122,6 +123,7 @@ class ConfocalGui(GUIBase):
     image_x_padding = ConfigOption('image_x_padding', 0.02)
     image_y_padding = ConfigOption('image_y_padding', 0.02)
     image_z_padding = ConfigOption('image_z_padding', 0.02)
+    max_plot_fps = ConfigOption('max_plot_fps', 30)
 
     default_meter_prefix = ConfigOption('default_meter_prefix', None)  # assume the unit prefix of position spinbox
 
@@ -486,11 +488,17 @@ class ConfocalGui(GUIBase):
         self._mw.depth_cb_high_percentile_DoubleSpinBox.valueChanged.connect(self.shortcut_to_depth_cb_centiles)
 
         # Connect the emitted signal of an image change from the logic with
-        # a refresh of the GUI picture:
-        self._scanning_logic.signal_xy_image_updated.connect(self.refresh_xy_image)
-        self._scanning_logic.signal_xy_image_updated.connect(self.refresh_scan_line)
-        self._scanning_logic.signal_depth_image_updated.connect(self.refresh_scan_line)
-        self._scanning_logic.signal_depth_image_updated.connect(self.refresh_depth_image)
+        # a refresh of the GUI picture. Image updates are coalesced and frame rate limited:
+        self._update_bus = PlotUpdateBus(max_fps=self.max_plot_fps, parent=self)
+        self._update_bus.connect_signal(
+            self._scanning_logic.signal_xy_image_updated, 'xy_image', self.refresh_xy_image)
+        self._update_bus.connect_signal(
+            self._scanning_logic.signal_xy_image_updated, 'scan_line', self.refresh_scan_line)
+        self._update_bus.connect_signal(
+            self._scanning_logic.signal_depth_image_updated, 'scan_line', self.refresh_scan_line)
+        self._update_bus.connect_signal(
+            self._scanning_logic.signal_depth_image_updated, 'depth_image',
+            self.refresh_depth_image)
         self._optimizer_logic.sigImageUpdated.connect(self.refresh_refocus_image)
         self._scanning_logic.sigImageXYInitialized.connect(self.adjust_xy_window)
         self._scanning_logic.sigImageDepthInitialized.connect(self.adjust_depth_window)
@@ -648,6 +656,7 @@ class ConfocalGui(GUIBase):
 
         @return int: error code (0:OK, -1:error)
         """
+        self._update_bus.stop()
         self._mw.close()
         return 0
 
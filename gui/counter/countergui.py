@@ -29,7 +29,8 @@ from gui.colordefs import QudiPalettePale as palette
 from gui.guibase import GUIBase
 from qtpy import QtCore
 from qtpy import QtWidgets
-from qtpy import uic
+from core.util import uic
+from qtwidgets.decimated_plot import DecimatedPlotDataItem
 
 
 
@@ -89,14 +90,14 @@ class CounterGui(GUIBase):
             if i % 2 == 0:
                 # Create an empty plot curve to be filled later, set its pen
                 self.curves.append(
-                    pg.PlotDataItem(pen=pg.mkPen(palette.c1), symbol=None))
+                    DecimatedPlotDataItem(pen=pg.mkPen(palette.c1), symbol=None))
                 self._pw.addItem(self.curves[-1])
                 self.curves.append(
-                    pg.PlotDataItem(pen=pg.mkPen(palette.c2, width=3), symbol=None))
+                    DecimatedPlotDataItem(pen=pg.mkPen(palette.c2, width=3), symbol=None))
                 self._pw.addItem(self.curves[-1])
             else:
                 self.curves.append(
-                    pg.PlotDataItem(
+                    DecimatedPlotDataItem(
                         pen=pg.mkPen(palette.c3, style=QtCore.Qt.DotLine),
                         symbol='s',
                         symbolPen=palette.c3,
@@ -104,7 +105,7 @@ class CounterGui(GUIBase):
                         symbolSize=5))
                 self._pw.addItem(self.curves[-1])
                 self.curves.append(
-                    pg.PlotDataItem(pen=pg.mkPen(palette.c4, width=3), symbol=None))
+                    DecimatedPlotDataItem(pen=pg.mkPen(palette.c4, width=3), symbol=None))
                 self._pw.addItem(self.curves[-1])
 
         # setting the x axis length correctly
@@ -31,7 +31,7 @@ from gui.colordefs import QudiPalettePale as palette
 from gui.colordefs import QudiPalette as palettedark
 from qtpy import QtCore
 from qtpy import QtWidgets
-from qtpy import uic
+from core.util import uic
 
 
 class GatedCounterMainWindow(QtWidgets.QMainWindow):
@@ -31,7 +31,7 @@ from gui.guibase import GUIBase
 from interface.simple_laser_interface import ControlMode, ShutterState, LaserState
 from qtpy import QtCore
 from qtpy import QtWidgets
-from qtpy import uic
+from core.util import uic
 
 
 class TimeAxisItem(pg.AxisItem):
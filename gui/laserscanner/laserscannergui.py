@@ -31,7 +31,7 @@ from gui.guiutils import ColorBar
 from qtpy import QtCore
 from qtpy import QtGui
 from qtpy import QtWidgets
-from qtpy import uic
+from core.util import uic
 
 
 class VoltScanMainWindow(QtWidgets.QMainWindow):
@@ -25,7 +25,7 @@ import numpy as np
 import os
 import pyqtgraph as pg
 import pyqtgraph.exporters
-from qtpy import uic
+from core.util import uic
 
 from core.connector import Connector
 from core.statusvariable import StatusVar
@@ -24,15 +24,21 @@ Originally distributed under MIT/X11 license. See documentation/MITLicense.txt f
 """
 
 import qtpy
-from qtpy import QtCore, QtGui, QtWidgets, uic
+from qtpy import QtCore, QtGui, QtWidgets
+from core.util import uic
 import os
 import html
+import threading
+from collections import deque
 
 import sys
 
 
 class LogModel(QtCore.QAbstractTableModel):
     """ This is a Qt model that represents the log for dislpay in a QTableView.
+
+    An entry is a list [name, time, level, message, repeats]. Repeats counts identical consecutive
+    messages collapsed into the entry and is shown after the message.
     """
 
     def __init__(self, **kwargs):
@@ -91,7 +97,10 @@ class LogModel(QtCore.QAbstractTableModel):
                 print('fgcolor', self.entries[index.row()][2])
                 return QtGui.QColor('#FFF')
         elif role == QtCore.Qt.DisplayRole:
-            return self.entries[index.row()][index.column()]
+            entry = self.entries[index.row()]
+            if index.column() == 3 and len(entry) > 4 and entry[4] > 1:
+                return '{0} (repeated {1:d} times)'.format(entry[3], entry[4])
+            return entry[index.column()]
         elif role == QtCore.Qt.EditRole:
             return self.entries[index.row()][index.column()]
         else:
@@ -148,7 +157,7 @@ class LogModel(QtCore.QAbstractTableModel):
         self.beginInsertRows(parent, row, row + count - 1)
         insertion = list()
         for ii in range(count):
-            insertion.append([None, None, None, None])
+            insertion.append([None, None, None, None, 1])
         self.entries[row:row] = insertion
         self.endInsertRows()
         return True
@@ -167,18 +176,34 @@ class LogModel(QtCore.QAbstractTableModel):
         """ Add a log entries to model.
           @param int row: row before which to insert log entry
           @param list data: log entries in list format (list of lists of
-                            4 elements)
+                            4 or 5 elements)
           @param QModelIndex parent: parent model index
 
           @return bool: True if adding entry succeede, False otherwise
         """
         count = len(data)
+        if count == 0:
+            return True
         self.beginInsertRows(parent, row, row + count - 1)
         self.entries[row:row] = data
         self.endInsertRows()
-        topleft = self.createIndex(row, 0)
-        bottomright = self.createIndex(row, 3)
-        self.dataChanged.emit(topleft, bottomright)
+        return True
+
+    def addRepeats(self, row, repeats, timestamp):
+        """ Count repetitions of the message of a log entry.
+
+          @param int row: row of the log entry
+          @param int repeats: number of additional repetitions
+          @param str timestamp: time of the last repetition
+
+          @return bool: True if counting succeeded, False otherwise
+        """
+        entry = self.entries[row]
+        if len(entry) < 5:
+            entry.append(1)
+        entry[4] += repeats
+        entry[1] = timestamp
+        self.dataChanged.emit(self.createIndex(row, 1), self.createIndex(row, 3))
         return True
 
     def removeRows(self, row, count, parent=QtCore.QModelIndex()):
@@ -219,9 +244,8 @@ class LogFilter(QtCore.QSortFilterProxyModel):
           @return bool: True if row (log entry) should be shown, False
                         otherwise
         """
-        indexLevel = self.sourceModel().index(sourceRow, 2)
-        level = self.sourceModel().data(indexLevel,
-                                        QtCore.Qt.DisplayRole)
+        # direct access to the entries, this is called for every inserted row
+        level = self.sourceModel().entries[sourceRow][2]
         if level is None:
             return False
         return level in self.show_levels
@@ -286,6 +310,11 @@ class AutoToolTipDelegate(QtWidgets.QStyledItemDelegate):
 
 class LogWidget(QtWidgets.QWidget):
     """A widget to show log entries and filter them.
+
+    addEntry can be called from any thread. The entries are collected in a queue and added to the
+    model in batches every flushInterval ms. Identical consecutive messages are collapsed into one
+    entry with a repeat counter, so a loop logging the same warning at a high rate does not block
+    the GUI.
     """
     sigDisplayEntry = QtCore.Signal(object)  # for thread-safetyness
     sigAddEntry = QtCore.Signal(object)  # for thread-safetyness
@@ -306,6 +335,10 @@ class LogWidget(QtWidgets.QWidget):
         uic.loadUi(ui_file, self)
 
         self.logLength = 1000
+        self.flushInterval = 100  # ms
+        self._pending = deque()
+        self._pending_lock = threading.Lock()
+        self._lastEntryRepeatable = False
 
         # Set up data model and visibility filter
         self.model = LogModel()
@@ -326,7 +359,7 @@ class LogWidget(QtWidgets.QWidget):
             self.output.horizontalHeader().setResizeMode(
                 3, QtWidgets.QHeaderView.ResizeToContents)
             self.output.verticalHeader().setResizeMode(
-                QtWidgets.QHeaderView.ResizeToContents)
+                QtWidgets.QHeaderView.Interactive)
         else:
             self.output.horizontalHeader().setSectionResizeMode(
                 0, QtWidgets.QHeaderView.Interactive)
@@ -336,8 +369,11 @@ class LogWidget(QtWidgets.QWidget):
                 2, QtWidgets.QHeaderView.ResizeToContents)
             self.output.horizontalHeader().setSectionResizeMode(
                 3, QtWidgets.QHeaderView.ResizeToContents)
+            # Resizing all rows to their contents takes hundreds of ms for
+            # every change of the model. Only rows with several lines
+            # (exceptions) are resized, see _resizeMultilineRows.
             self.output.verticalHeader().setSectionResizeMode(
-                QtWidgets.QHeaderView.ResizeToContents)
+                QtWidgets.QHeaderView.Interactive)
         self.output.setTextElideMode(QtCore.Qt.ElideRight)
         self.output.setItemDelegate(AutoToolTipDelegate(self.output))
 
@@ -347,6 +383,10 @@ class LogWidget(QtWidgets.QWidget):
         self.sigAddEntry.connect(self.addEntry, QtCore.Qt.QueuedConnection)
         self.filterTree.itemChanged.connect(self.setCheckStates)
 
+        self._flush_timer = QtCore.QTimer(self)
+        self._flush_timer.timeout.connect(self.flushEntries)
+        self._flush_timer.start(self.flushInterval)
+
     def setManager(self, manager):
         """
         @param object manager: the manager
@@ -369,31 +409,91 @@ class LogWidget(QtWidgets.QWidget):
         pass
 
     def addEntry(self, entry):
-        """Add a log entry to the log view.
+        """Add a log entry to the log view. Thread safe, the entry is shown with
+           the next flush of the queued entries.
 
           @param dict entry: log entry in dict format
         """
         # All incoming messages begin here
-        # for thread-safetyness:
-        isGuiThread = QtCore.QThread.currentThread(
-        ) == QtCore.QCoreApplication.instance().thread()
-        if not isGuiThread:
-            self.sigAddEntry.emit(entry)
+        with self._pending_lock:
+            # pending entries are [entry, repeats, timestamp of last repeat]
+            if (self._pending and entry.get('exception') is None
+                    and self._isRepeat(self._pending[-1][0], entry)):
+                self._pending[-1][1] += 1
+                self._pending[-1][2] = entry['timestamp']
+                return
+            self._pending.append([entry, 1, entry['timestamp']])
+            # older entries would be removed from the model anyway
+            if len(self._pending) > self.logLength:
+                self._pending.popleft()
+
+    @staticmethod
+    def _isRepeat(previous, entry):
+        """ Whether a log entry repeats the previous one.
+
+          @param dict previous: previous log entry
+          @param dict entry: log entry
+
+          @return bool: same logger, level and message and no exception
+        """
+        return (previous.get('exception') is None
+                and previous['message'] == entry['message']
+                and previous['level'] == entry['level']
+                and previous['name'] == entry['name'])
+
+    def flushEntries(self):
+        """ Add the queued log entries to the model in one batch and remove
+            the oldest entries exceeding the log length.
+        """
+        with self._pending_lock:
+            if not self._pending:
+                return
+            pending = self._pending
+            self._pending = deque()
+
+        rows = list()
+        for entry, repeats, timestamp in pending:
+            if not rows and self.model.entries:
+                # collapse with the last entry in the model
+                last = self.model.entries[-1]
+                if (entry.get('exception') is None and last[0] == entry['name']
+                        and last[2] == entry['level'] and last[3] == entry['message']
+                        and self._lastEntryRepeatable):
+                    self.model.addRepeats(len(self.model.entries) - 1, repeats, timestamp)
+                    continue
+            text = entry['message']
+            if entry.get('exception') is not None:
+                if 'reasons' in entry['exception']:
+                    text += '\n' + entry['exception']['reasons']
+                if 'message' in entry['exception']:
+                    text += '\n' + entry['exception']['message']
+                for line in entry['exception']['traceback']:
+                    text += '\n' + str(line)
+            rows.append([entry['name'], timestamp, entry['level'], text, repeats])
+        if not rows:
             return
-        if self.model.rowCount() > self.logLength:
-            self.model.removeRows(0, self.model.rowCount() - self.logLength)
-        text = entry['message']
-        if entry.get('exception') is not None:
-            if 'reasons' in entry['exception']:
-                text += '\n' + entry['exception']['reasons']
-            if 'message' in entry['exception']:
-                text += '\n' + entry['exception']['message']
-            for line in entry['exception']['traceback']:
-                text += '\n' + str(line)
-        logEntry = [entry['name'], entry['timestamp'], entry['level'], text]
-        self.model.addRow(self.model.rowCount(), logEntry)
+        self._lastEntryRepeatable = pending[-1][0].get('exception') is None
+
+        rows = rows[-self.logLength:]
+        excess = self.model.rowCount() + len(rows) - self.logLength
+        if excess > 0:
+            self.model.removeRows(0, excess)
+        first = self.model.rowCount()
+        self.model.addRows(first, rows)
+        self._resizeMultilineRows(first)
         self.output.scrollToBottom()
 
+    def _resizeMultilineRows(self, first=0):
+        """ Resize the rows of log entries with several lines to their contents.
+
+          @param int first: first row of the model to check
+        """
+        for row in range(first, self.model.rowCount()):
+            if '\n' in self.model.entries[row][3]:
+                index = self.filtermodel.mapFromSource(self.model.index(row, 0))
+                if index.isValid():
+                    self.output.resizeRowToContents(index.row())
+
     def displayEntry(self, entry):
         """ Scroll to entry in QTableView.
 
@@ -410,6 +510,8 @@ class LogWidget(QtWidgets.QWidget):
         """
         if length > 0:
             self.logLength = length
+            if self.model.rowCount() > length:
+                self.model.removeRows(0, self.model.rowCount() - length)
 
     def setCheckStates(self, item, column):
         """ Set state of the checkbox in the filter list and update log view.
@@ -436,3 +538,4 @@ class LogWidget(QtWidgets.QWidget):
                 text = child.text(0)
                 levelFilter.append(str(text))
         self.filtermodel.setLevels(levelFilter)
+        self._resizeMultilineRows()
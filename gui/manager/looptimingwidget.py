@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the Qudi manager widget showing the timing statistics of measurement loops.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+import math
+import os
+import pyqtgraph as pg
+from qtpy import QtCore
+from qtpy.QtWidgets import QWidget, QTableWidgetItem
+from core.util import uic
+from core.util.looptimer import get_loop_timers
+
+
+class LoopTimingWidget(QWidget):
+    """ This widget shows the iteration time statistics of all loops instrumented with
+        core.util.looptimer and the iteration time histogram of the selected loop.
+    """
+
+    def __init__(self):
+        super().__init__()
+        this_dir = os.path.dirname(__file__)
+        ui_file = os.path.join(this_dir, 'ui_looptimingwidget.ui')
+
+        # Load it
+        uic.loadUi(ui_file, self)
+
+        self.loopTableWidget.horizontalHeader().setStretchLastSection(True)
+        self.histogramPlotWidget.setLabel('bottom', 'log10(iteration time / s)')
+        self.histogramPlotWidget.setLabel('left', 'Iterations')
+        self._histogram_item = pg.BarGraphItem(x0=[], x1=[], height=[], brush='y')
+        self._period_line = pg.InfiniteLine(angle=90, pen=pg.mkPen('r', style=QtCore.Qt.DashLine))
+        self.histogramPlotWidget.addItem(self._histogram_item)
+        self.histogramPlotWidget.addItem(self._period_line)
+        self._period_line.hide()
+
+        self.loopTableWidget.itemSelectionChanged.connect(self.update_histogram)
+        self.resetPushButton.clicked.connect(self.reset_statistics)
+
+    @QtCore.Slot()
+    def update_statistics(self):
+        """ Refresh the table and histogram. Does nothing while the widget is hidden.
+        """
+        if not self.isVisible():
+            return
+        timers = get_loop_timers()
+        table = self.loopTableWidget
+        table.setRowCount(len(timers))
+        for row, timer in enumerate(timers):
+            stats = timer.statistics()
+            period = '' if not stats['period'] else '{0:.3f}'.format(stats['period'] * 1e3)
+            values = (stats['name'],
+                      '{0:d}'.format(stats['iterations']),
+                      '{0:.3f}'.format(stats['mean_time'] * 1e3),
+                      '{0:.3f}'.format(stats['max_time'] * 1e3),
+                      '{0:.3f}'.format(stats['jitter'] * 1e3),
+                      period,
+                      '{0:d}'.format(stats['overruns']))
+            for column, value in enumerate(values):
+                item = table.item(row, column)
+                if item is None:
+                    table.setItem(row, column, QTableWidgetItem(value))
+                elif item.text() != value:
+                    item.setText(value)
+        self.update_histogram()
+
+    @QtCore.Slot()
+    def update_histogram(self):
+        """ Show the iteration time histogram of the selected loop.
+        """
+        timer = self._selected_timer()
+        if timer is None:
+            self._histogram_item.setOpts(x0=[], x1=[], height=[])
+            self._period_line.hide()
+            return
+        edges, counts = timer.histogram()
+        used = [i for i, count in enumerate(counts) if count > 0]
+        if used:
+            # show the occupied part of the histogram with one empty bin margin
+            start = max(used[0] - 1, 0)
+            stop = min(used[-1] + 2, len(counts))
+            edges = edges[start:stop + 1]
+            counts = counts[start:stop]
+        log_edges = [math.log10(edge) for edge in edges]
+        self._histogram_item.setOpts(x0=log_edges[:-1], x1=log_edges[1:], height=counts)
+        if timer.period:
+            self._period_line.setValue(math.log10(timer.period))
+            self._period_line.show()
+        else:
+            self._period_line.hide()
+
+    @QtCore.Slot()
+    def reset_statistics(self):
+        """ Reset the statistics of all loops.
+        """
+        for timer in get_loop_timers():
+            timer.reset()
+        self.update_statistics()
+
+    def _selected_timer(self):
+        """ Loop timer of the selected table row.
+
+          @return LoopTimer: selected loop timer, None if no loop is selected
+        """
+        rows = self.loopTableWidget.selectionModel().selectedRows()
+        if not rows:
+            return None
+        name = self.loopTableWidget.item(rows[0].row(), 0).text()
+        for timer in get_loop_timers():
+            if timer.name == name:
+                return timer
+        return None
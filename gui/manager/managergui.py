@@ -29,7 +29,8 @@ from core.statusvariable import StatusVar
 from core.util.modules import get_main_dir
 from .errordialog import ErrorDialog
 from gui.guibase import GUIBase
-from qtpy import QtCore, QtWidgets, uic
+from qtpy import QtCore, QtWidgets
+from core.util import uic
 from qtpy.QtGui import QPalette
 from qtpy.QtWidgets import QWidget
 
@@ -78,6 +79,7 @@ class ManagerGui(GUIBase):
     sigLoadConfig = QtCore.Signal(str, bool)
     sigSaveConfig = QtCore.Signal(str)
     sigRealQuit = QtCore.Signal()
+    sigShowError = QtCore.Signal(object)
 
     def __init__(self, **kwargs):
         """Create an instance of the module.
@@ -127,6 +129,11 @@ class ManagerGui(GUIBase):
                 version[0], version[1], configFile))
         self.versionLabel.setOpenExternalLinks(True)
         self._mw.statusBar().addWidget(self.versionLabel)
+        # activation time and critical path of the last parallel startup
+        self.startupLabel = QtWidgets.QLabel()
+        self._mw.statusBar().addPermanentWidget(self.startupLabel)
+        self.updateStartupReport(self._manager.startupReport)
+        self._manager.sigStartupReport.connect(self.updateStartupReport)
         # Connect up the buttons.
         self._mw.actionQuit.triggered.connect(self._manager.quit)
         self._mw.actionLoad_configuration.triggered.connect(self.getLoadFile)
@@ -145,7 +152,11 @@ class ManagerGui(GUIBase):
         self._mw.logwidget.setManager(self._manager)
         for loghandler in logging.getLogger().handlers:
             if isinstance(loghandler, core.logger.QtLogHandler):
-                loghandler.sigLoggedMessage.connect(self.handleLogEntry)
+                # the log widget queues the entries itself, so they are not sent through the
+                # event loop one by one
+                loghandler.sigLoggedMessage.connect(self.handleLogEntry,
+                                                    QtCore.Qt.DirectConnection)
+        self.sigShowError.connect(self.errorDialog.show, QtCore.Qt.QueuedConnection)
         # Module widgets
         self.sigStartModule.connect(self._manager.startModule)
         self.sigReloadModule.connect(self._manager.restartModuleRecursive)
@@ -164,6 +175,8 @@ class ManagerGui(GUIBase):
         self.startIPythonWidget()
         # thread widget
         self._mw.threadWidget.threadListView.setModel(self._manager.tm)
+        # loop timing widget
+        self.checkTimer.timeout.connect(self._mw.loopTimingWidget.update_statistics)
         # remote widget
         # hide remote menu item if rpyc is not available
         self._mw.actionRemoteView.setVisible(self._manager.rm is not None)
@@ -184,6 +197,7 @@ class ManagerGui(GUIBase):
         self._mw.configDisplayDockWidget.hide()
         self._mw.remoteDockWidget.hide()
         self._mw.threadDockWidget.hide()
+        self._mw.loopTimingDockWidget.hide()
         self._mw.show()
 
     def on_deactivate(self):
@@ -199,6 +213,11 @@ class ManagerGui(GUIBase):
         self.sigStopModule.disconnect()
         self.sigLoadConfig.disconnect()
         self.sigSaveConfig.disconnect()
+        for loghandler in logging.getLogger().handlers:
+            if isinstance(loghandler, core.logger.QtLogHandler):
+                loghandler.sigLoggedMessage.disconnect(self.handleLogEntry)
+        self.sigShowError.disconnect()
+        self._manager.sigStartupReport.disconnect(self.updateStartupReport)
         self._mw.actionQuit.triggered.disconnect()
         self._mw.actionLoad_configuration.triggered.disconnect()
         self._mw.actionSave_configuration.triggered.disconnect()
@@ -240,6 +259,7 @@ class ManagerGui(GUIBase):
         self._mw.consoleDockWidget.setVisible(True)
         self._mw.remoteDockWidget.setVisible(False)
         self._mw.threadDockWidget.setVisible(False)
+        self._mw.loopTimingDockWidget.setVisible(False)
         self._mw.logDockWidget.setVisible(True)
 
         self._mw.actionConfigurationView.setChecked(False)
@@ -252,23 +272,46 @@ class ManagerGui(GUIBase):
         self._mw.consoleDockWidget.setFloating(False)
         self._mw.remoteDockWidget.setFloating(False)
         self._mw.threadDockWidget.setFloating(False)
+        self._mw.loopTimingDockWidget.setFloating(False)
         self._mw.logDockWidget.setFloating(False)
 
         self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(8), self._mw.configDisplayDockWidget)
         self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(2), self._mw.consoleDockWidget)
         self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(8), self._mw.remoteDockWidget)
         self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(8), self._mw.threadDockWidget)
+        self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(8), self._mw.loopTimingDockWidget)
         self._mw.addDockWidget(QtCore.Qt.DockWidgetArea(8), self._mw.logDockWidget)
 
     def handleLogEntry(self, entry):
         """ Forward log entry to log widget and show an error popup if it is
-            an error message.
+            an error message. Called in the thread of the logging call.
 
             @param dict entry: Log entry
         """
         self._mw.logwidget.addEntry(entry)
         if entry['level'] == 'error' or entry['level'] == 'critical':
-            self.errorDialog.show(entry)
+            self.sigShowError.emit(entry)
+
+    def updateStartupReport(self, report):
+        """ Show the startup time in the status bar and the critical path as its tooltip.
+
+            @param dict report: startup report of the manager, None if there was no parallel
+                                startup
+        """
+        if report is None:
+            self.startupLabel.setText('')
+            self.startupLabel.setToolTip('')
+            return
+        self.startupLabel.setText('Startup {0:.2f} s, critical path {1:.2f} s'.format(
+            report['elapsed'], report['critical_path_time']))
+        self.startupLabel.setToolTip(
+            'Started {0:d} modules in {1:.3f} s (sum of activation times {2:.3f} s).\n'
+            'Critical path:\n{3}'.format(
+                report['modules'],
+                report['elapsed'],
+                report['activation_time_sum'],
+                '\n'.join('{0}: {1:.3f} s'.format(name, duration)
+                          for name, duration in report['critical_path'])))
 
     def startIPython(self):
         """ Create an IPython kernel manager and kernel.
@@ -684,3 +727,12 @@ class ModuleListItem(QtWidgets.QFrame):
                 self.cleanupButton.setEnabled(True)
 
             self.statusLabel.setText(state)
+            activation_time = self.manager.activationTimes.get(self.name)
+            if activation_time is None:
+                self.statusLabel.setToolTip('')
+            else:
+                tooltip = 'Last activation took {0:.3f} s'.format(activation_time)
+                report = self.manager.startupReport
+                if report is not None and self.name in dict(report['critical_path']):
+                    tooltip += '\nOn the critical path of the last startup'
+                self.statusLabel.setToolTip(tooltip)
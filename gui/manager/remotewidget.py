@@ -19,7 +19,7 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 from qtpy.QtWidgets import QWidget
-from qtpy import uic
+from core.util import uic
 import os
 
 
@@ -26,7 +26,8 @@ import pyqtgraph.exporters
 
 from core.connector import Connector
 from gui.guibase import GUIBase
-from qtpy import QtGui, QtWidgets, QtCore, uic
+from qtpy import QtGui, QtWidgets, QtCore
+from core.util import uic
 
 
 class NuclearOperationsMainWindow(QtWidgets.QMainWindow):
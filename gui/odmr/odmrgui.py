@@ -24,16 +24,18 @@ import os
 import pyqtgraph as pg
 
 from core.connector import Connector
+from core.configoption import ConfigOption
 from core.util import units
 from gui.guibase import GUIBase
 from gui.guiutils import ColorBar
 from gui.colordefs import ColorScaleInferno
 from gui.colordefs import QudiPalettePale as palette
 from gui.fitsettings import FitSettingsDialog, FitSettingsComboBox
+from gui.plot_update_bus import PlotUpdateBus
 from qtpy import QtCore
-from qtpy import QtCore, QtWidgets, uic
+from qtpy import QtCore, QtWidgets
+from core.util import uic
 from qtwidgets.scientific_spinbox import ScienDSpinBox
-from qtpy import uic
 from functools import partial
 
 
@@ -75,6 +77,9 @@ class ODMRGui(GUIBase):
     odmrlogic1 = Connector(interface='ODMRLogic')
     savelogic = Connector(interface='SaveLogic')
 
+    # config options
+    _max_plot_fps = ConfigOption('max_plot_fps', default=30)
+
     sigStartOdmrScan = QtCore.Signal()
     sigStopOdmrScan = QtCore.Signal()
     sigContinueOdmrScan = QtCore.Signal()
@@ -395,7 +400,9 @@ class ODMRGui(GUIBase):
                                                      QtCore.Qt.QueuedConnection)
         self._odmr_logic.sigOutputStateUpdated.connect(self.update_status,
                                                        QtCore.Qt.QueuedConnection)
-        self._odmr_logic.sigOdmrPlotsUpdated.connect(self.update_plots, QtCore.Qt.QueuedConnection)
+        self._update_bus = PlotUpdateBus(max_fps=self._max_plot_fps, parent=self)
+        self._update_bus.connect_signal(
+            self._odmr_logic.sigOdmrPlotsUpdated, 'odmr_plots', self.update_plots)
         self._odmr_logic.sigOdmrFitUpdated.connect(self.update_fit, QtCore.Qt.QueuedConnection)
         self._odmr_logic.sigOdmrElapsedTimeUpdated.connect(self.update_elapsedtime,
                                                            QtCore.Qt.QueuedConnection)
@@ -423,7 +430,7 @@ class ODMRGui(GUIBase):
         self._mw.action_Settings.triggered.disconnect()
         self._odmr_logic.sigParameterUpdated.disconnect()
         self._odmr_logic.sigOutputStateUpdated.disconnect()
-        self._odmr_logic.sigOdmrPlotsUpdated.disconnect()
+        self._update_bus.stop()
         self._odmr_logic.sigOdmrFitUpdated.disconnect()
         self._odmr_logic.sigOdmrElapsedTimeUpdated.disconnect()
         self.sigCwMwOn.disconnect()
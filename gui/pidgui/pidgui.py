@@ -29,7 +29,7 @@ from gui.colordefs import QudiPalettePale as palette
 from gui.guibase import GUIBase
 from qtpy import QtCore
 from qtpy import QtWidgets
-from qtpy import uic
+from core.util import uic
 
 
 class PIDMainWindow(QtWidgets.QMainWindow):
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file contains a frame rate limited, coalescing update bus for plots in qudi GUI modules.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import time
+import logging
+from collections import OrderedDict
+from qtpy import QtCore
+
+from core.util.mutex import Mutex
+
+logger = logging.getLogger(__name__)
+
+
+class PlotUpdateBus(QtCore.QObject):
+    """ Coalesces plot updates coming from (logic) threads and delivers them in the GUI thread with
+    a limited frame rate.
+
+    Every plot is registered with a key and a handler (the GUI method redrawing it). Posting an
+    update for a key only stores the latest arguments. Pending updates are delivered at most
+    max_fps times per second by calling the handlers with the latest arguments. Intermediate
+    updates of the same key are dropped.
+
+    Logic signals can be connected directly to the bus via connect_signal. The signal is then
+    connected with a direct connection, i.e. the emitting thread only stores the arguments instead
+    of queueing one event per emission in the Qt event loop of the GUI thread.
+
+    Usage example in a GUI module:
+
+        self._update_bus = PlotUpdateBus(max_fps=self._max_plot_fps, parent=self._mw)
+        self._update_bus.connect_signal(self._logic.sigDataChanged, 'trace', self.update_data)
+    """
+
+    # Internal signal to wake up the GUI thread. Emitted at most once per delivery cycle.
+    _sigWakeUp = QtCore.Signal()
+
+    def __init__(self, max_fps=30, parent=None):
+        """
+        @param float max_fps: maximum number of deliveries per second
+        @param QObject parent: optional, parent QObject living in the GUI thread
+        """
+        super().__init__(parent)
+        self._lock = Mutex()
+        self._max_fps = 30
+        self.max_fps = max_fps
+
+        self._handlers = OrderedDict()
+        self._pending = OrderedDict()
+        self._statistics = dict()
+        self._connections = list()
+        self._wakeup_requested = False
+        self._last_delivery = 0
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._deliver)
+        self._sigWakeUp.connect(self._schedule, QtCore.Qt.QueuedConnection)
+
+    @property
+    def max_fps(self):
+        """ Maximum number of deliveries per second. """
+        return self._max_fps
+
+    @max_fps.setter
+    def max_fps(self, value):
+        if value <= 0:
+            logger.error('Maximum frame rate of PlotUpdateBus must be > 0. Ignoring value {0}.'
+                         ''.format(value))
+            return
+        self._max_fps = float(value)
+
+    def register(self, key, handler):
+        """ Register a handler for plot updates posted under a key.
+
+        @param str key: unique name of the plot
+        @param callable handler: called in the GUI thread with the latest posted arguments
+        """
+        with self._lock:
+            self._handlers[key] = handler
+            if key in self._statistics:
+                return
+            self._statistics[key] = {'posted': 0,
+                                     'delivered': 0,
+                                     'dropped': 0,
+                                     'last_render_time': 0.0,
+                                     'mean_render_time': 0.0,
+                                     'max_render_time': 0.0}
+
+    def unregister(self, key):
+        """ Remove a registered handler and drop its pending update.
+
+        @param str key: name of the plot to remove
+        """
+        with self._lock:
+            self._handlers.pop(key, None)
+            self._pending.pop(key, None)
+            self._statistics.pop(key, None)
+
+    def connect_signal(self, signal, key, handler):
+        """ Register a handler and connect a (logic) signal to post updates for it.
+
+        @param signal: bound Qt signal whose arguments are passed to the handler
+        @param str key: unique name of the plot. Several signals may post to the same key.
+        @param callable handler: called in the GUI thread with the latest signal arguments
+        """
+        self.register(key, handler)
+        slot = lambda *args: self.post(key, *args)
+        signal.connect(slot, QtCore.Qt.DirectConnection)
+        self._connections.append((signal, slot))
+
+    def disconnect_signals(self):
+        """ Disconnect all signals connected via connect_signal.
+        """
+        for signal, slot in self._connections:
+            try:
+                signal.disconnect(slot)
+            except TypeError:
+                # Already disconnected elsewhere
+                pass
+        self._connections = list()
+
+    def post(self, key, *args, **kwargs):
+        """ Post an update for a plot. Thread-safe and cheap, may be called from any thread.
+        Replaces an update for the same key that has not been delivered yet.
+
+        @param str key: name of the plot to update
+        @param args: positional arguments for the handler
+        @param kwargs: keyword arguments for the handler
+        """
+        with self._lock:
+            if key not in self._handlers:
+                return
+            stats = self._statistics[key]
+            stats['posted'] += 1
+            if key in self._pending:
+                stats['dropped'] += 1
+            self._pending[key] = (args, kwargs)
+            if self._wakeup_requested:
+                return
+            self._wakeup_requested = True
+        self._sigWakeUp.emit()
+
+    def flush(self):
+        """ Deliver all pending updates immediately. Must be called from the GUI thread.
+        """
+        self._timer.stop()
+        self._deliver()
+
+    def stop(self):
+        """ Stop delivering, disconnect all signals and drop all pending updates. Must be called from
+        the GUI thread.
+        """
+        self.disconnect_signals()
+        self._timer.stop()
+        with self._lock:
+            self._pending.clear()
+            self._wakeup_requested = False
+
+    def get_statistics(self):
+        """ Statistics of all registered plots.
+
+        @return dict: dict of dicts with the number of posted, delivered and dropped updates and the
+                      last, mean and maximum render time (in s) for each key
+        """
+        with self._lock:
+            return {key: stats.copy() for key, stats in self._statistics.items()}
+
+    def reset_statistics(self):
+        """ Reset the statistics of all registered plots.
+        """
+        with self._lock:
+            for stats in self._statistics.values():
+                for entry in stats:
+                    stats[entry] = 0
+
+    @QtCore.Slot()
+    def _schedule(self):
+        """ Start the delivery timer so that the frame rate limit is respected. """
+        if self._timer.isActive():
+            return
+        wait_time = self._last_delivery + 1 / self._max_fps - time.perf_counter()
+        self._timer.start(max(0, int(round(wait_time * 1000))))
+
+    @QtCore.Slot()
+    def _deliver(self):
+        """ Call the handlers of all pending updates with their latest arguments. """
+        with self._lock:
+            pending = self._pending
+            self._pending = OrderedDict()
+            self._wakeup_requested = False
+        self._last_delivery = time.perf_counter()
+
+        for key, (args, kwargs) in pending.items():
+            handler = self._handlers.get(key)
+            if handler is None:
+                continue
+            start = time.perf_counter()
+            try:
+                handler(*args, **kwargs)
+            except:
+                logger.exception('Error while delivering plot update "{0}".'.format(key))
+            render_time = time.perf_counter() - start
+            with self._lock:
+                stats = self._statistics.get(key)
+                if stats is None:
+                    continue
+                stats['delivered'] += 1
+                stats['last_render_time'] = render_time
+                stats['mean_render_time'] += (
+                        render_time - stats['mean_render_time']) / stats['delivered']
+                stats['max_render_time'] = max(render_time, stats['max_render_time'])
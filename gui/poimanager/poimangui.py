@@ -34,7 +34,7 @@ from gui.colordefs import ColorScaleInferno
 from gui.colordefs import QudiPalettePale as palette
 from qtpy import QtCore, QtGui
 from qtpy import QtWidgets
-from qtpy import uic
+from core.util import uic
 from qtwidgets.scan_plotwidget import ScanImageItem
 
 
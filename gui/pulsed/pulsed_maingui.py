@@ -32,9 +32,11 @@ from core.util.helpers import natural_sort
 from gui.colordefs import QudiPalettePale as palette
 from gui.fitsettings import FitSettingsDialog
 from gui.guibase import GUIBase
-from qtpy import QtCore, QtWidgets, uic
+from qtpy import QtCore, QtWidgets
+from core.util import uic
 from qtwidgets.scientific_spinbox import ScienDSpinBox, ScienSpinBox
 from qtwidgets.loading_indicator import CircleLoadingIndicator
+from qtwidgets.decimated_plot import DecimatedPlotDataItem
 from enum import Enum
 
 
@@ -2882,7 +2884,7 @@ class PulsedMeasurementGui(GUIBase):
         self.ref_end_line = pg.InfiniteLine(pos=0,
                                             pen={'color': palette.c4, 'width': 1},
                                             movable=True)
-        self.lasertrace_image = pg.PlotDataItem(np.arange(10), np.zeros(10), pen=palette.c1)
+        self.lasertrace_image = DecimatedPlotDataItem(np.arange(10), np.zeros(10), pen=palette.c1)
         self._pe.laserpulses_PlotWidget.addItem(self.lasertrace_image)
         self._pe.laserpulses_PlotWidget.addItem(self.sig_start_line)
         self._pe.laserpulses_PlotWidget.addItem(self.sig_end_line)
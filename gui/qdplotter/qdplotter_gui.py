@@ -28,7 +28,7 @@ import numpy as np
 from itertools import cycle
 from qtpy import QtWidgets
 from qtpy import QtCore
-from qtpy import uic
+from core.util import uic
 from pyqtgraph import SignalProxy, mkColor
 
 from core.connector import Connector
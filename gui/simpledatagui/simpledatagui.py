@@ -28,7 +28,7 @@ from gui.guibase import GUIBase
 from gui.colordefs import QudiPalettePale as palette
 from qtpy import QtWidgets
 from qtpy import QtCore
-from qtpy import uic
+from core.util import uic
 
 
 class SimpleMainWindow(QtWidgets.QMainWindow):
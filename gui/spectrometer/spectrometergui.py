@@ -30,7 +30,7 @@ from gui.guibase import GUIBase
 from gui.fitsettings import FitSettingsDialog, FitSettingsComboBox
 from qtpy import QtCore
 from qtpy import QtWidgets
-from qtpy import uic
+from core.util import uic
 
 
 class SpectrometerWindow(QtWidgets.QMainWindow):
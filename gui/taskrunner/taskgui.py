@@ -25,7 +25,7 @@ from core.connector import Connector
 from gui.guibase import GUIBase
 from qtpy import QtWidgets
 from qtpy import QtCore
-from qtpy import uic
+from core.util import uic
 
 
 class TaskGui(GUIBase):
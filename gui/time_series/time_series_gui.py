@@ -28,10 +28,12 @@ from core.configoption import ConfigOption
 from core.statusvariable import StatusVar
 from gui.colordefs import QudiPalettePale as palette
 from gui.guibase import GUIBase
+from gui.plot_update_bus import PlotUpdateBus
 from qtpy import QtCore
 from qtpy import QtWidgets
-from qtpy import uic
+from core.util import uic
 from interface.data_instream_interface import StreamChannelType
+from qtwidgets.decimated_plot import DecimatedPlotDataItem
 
 
 class TimeSeriesMainWindow(QtWidgets.QMainWindow):
@@ -70,6 +72,7 @@ class TimeSeriesGui(GUIBase):
     time_series_gui:
         module.Class: 'time_series.time_series_gui.TimeSeriesGui'
         use_antialias: True  # optional, set to False if you encounter performance issues
+        max_plot_fps: 30  # optional, maximum rate of plot redraws
         connect:
             _time_series_logic_con: <TimeSeriesReaderLogic_name>
     """
@@ -79,6 +82,7 @@ class TimeSeriesGui(GUIBase):
 
     # declare ConfigOptions
     _use_antialias = ConfigOption('use_antialias', default=True)
+    _max_plot_fps = ConfigOption('max_plot_fps', default=30)
 
     # declare StatusVars
     _current_value_channel = StatusVar(name='current_value_channel', default=None)
@@ -171,16 +175,9 @@ class TimeSeriesGui(GUIBase):
             else:
                 pen1 = pg.mkPen(palette.c5, cosmetic=True)
                 pen2 = pg.mkPen(palette.c6, cosmetic=True)
-            self.averaged_curves[ch] = pg.PlotCurveItem(pen=pen1,
-                                                        clipToView=True,
-                                                        downsampleMethod='subsample',
-                                                        autoDownsample=True,
-                                                        antialias=self._use_antialias)
-            self.curves[ch] = pg.PlotCurveItem(pen=pen2,
-                                               clipToView=True,
-                                               downsampleMethod='subsample',
-                                               autoDownsample=True,
-                                               antialias=self._use_antialias)
+            self.averaged_curves[ch] = DecimatedPlotDataItem(pen=pen1,
+                                                             antialias=self._use_antialias)
+            self.curves[ch] = DecimatedPlotDataItem(pen=pen2, antialias=self._use_antialias)
 
         #####################
         # Set up channel settings dialog
@@ -238,9 +235,10 @@ class TimeSeriesGui(GUIBase):
             self._time_series_logic.configure_settings, QtCore.Qt.QueuedConnection)
 
         ##################
-        # Handling signals from the logic
-        self._time_series_logic.sigDataChanged.connect(
-            self.update_data, QtCore.Qt.QueuedConnection)
+        # Handling signals from the logic. Data updates are coalesced and frame rate limited.
+        self._update_bus = PlotUpdateBus(max_fps=self._max_plot_fps, parent=self)
+        self._update_bus.connect_signal(
+            self._time_series_logic.sigDataChanged, 'trace', self.update_data)
         self._time_series_logic.sigSettingsChanged.connect(
             self.update_settings, QtCore.Qt.QueuedConnection)
         self._time_series_logic.sigStatusChanged.connect(
@@ -281,7 +279,7 @@ class TimeSeriesGui(GUIBase):
         self.sigStartRecording.disconnect()
         self.sigStopRecording.disconnect()
         self.sigSettingsChanged.disconnect()
-        self._time_series_logic.sigDataChanged.disconnect()
+        self._update_bus.stop()
         self._time_series_logic.sigSettingsChanged.disconnect()
         self._time_series_logic.sigStatusChanged.disconnect()
 
@@ -34,7 +34,7 @@ from gui.colordefs import QudiPalettePale as palette
 from gui.fitsettings import FitSettingsDialog, FitSettingsComboBox
 from qtpy import QtWidgets
 from qtpy import QtCore
-from qtpy import uic
+from core.util import uic
 
 
 class WavemeterLogWindow(QtWidgets.QMainWindow):
@@ -25,6 +25,7 @@ import os
 import numpy as np
 
 from core.module import Base
+from core.connector import Connector
 from core.configoption import ConfigOption
 from core.util.modules import get_main_dir
 from interface.fast_counter_interface import FastCounterInterface
@@ -33,18 +34,52 @@ from interface.fast_counter_interface import FastCounterInterface
 class FastCounterDummy(Base, FastCounterInterface):
     """ Implementation of the FastCounter interface methods for a dummy usage.
 
+    By default the dummy returns a trace loaded from a file. If the option simulate_counts is set
+    and a PulserDummy is connected, the dummy instead simulates the photon counts of the pulse
+    sequence loaded in the pulser: Every laser pulse (rising to falling edge of the laser channel)
+    produces fluorescence with the rate count_rate on top of the background_rate. The spin
+    population of laser pulse k is
+        p_k = (1 - cos(2 pi k / spin_oscillation_period)) / 2
+    and reduces the fluorescence at the beginning of the laser pulse by
+        spin_contrast * p_k * exp(-t / polarization_time).
+    The counts are Poisson distributed and accumulate with the number of sequence repetitions
+    (sweeps) in the elapsed measurement time. In gated mode every gate starts with a rising edge
+    of the gate channel. No artificial waiting times are added in this mode.
+
     Example config for copy-paste:
 
     fastcounter_dummy:
         module.Class: 'fast_counter_dummy.FastCounterDummy'
         gated: False
         #load_trace: None # path to the saved dummy trace
+        #simulate_counts: True
+        #laser_channel: 'd_ch1'
+        #gate_channel: 'd_ch1'
+        #count_rate: 1e6 # in counts/s
+        #background_rate: 1e4 # in counts/s
+        #spin_contrast: 0.3
+        #spin_oscillation_period: 10 # in laser pulses
+        #polarization_time: 0.3e-6 # in s
+        #random_seed: 42
+        #connect:
+        #    pulser: 'pulser_dummy'
 
     """
 
+    pulser = Connector(interface='PulserDummy', optional=True)
+
     # config option
     _gated = ConfigOption('gated', False, missing='warn')
     trace_path = ConfigOption('load_trace', None)
+    _simulate_counts = ConfigOption('simulate_counts', False)
+    _laser_channel = ConfigOption('laser_channel', 'd_ch1')
+    _gate_channel = ConfigOption('gate_channel', None)
+    _count_rate = ConfigOption('count_rate', 1e6)
+    _background_rate = ConfigOption('background_rate', 1e4)
+    _spin_contrast = ConfigOption('spin_contrast', 0.3)
+    _spin_oscillation_period = ConfigOption('spin_oscillation_period', 10)
+    _polarization_time = ConfigOption('polarization_time', 0.3e-6)
+    _random_seed = ConfigOption('random_seed', None)
 
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
@@ -67,6 +102,20 @@ class FastCounterDummy(Base, FastCounterInterface):
         self.statusvar = 0
         self._binwidth = 1
         self._gate_length_bins = 8192
+        self._number_of_gates = 0
+
+        self._rng = np.random.RandomState(self._random_seed)
+        if self._simulate_counts and self.pulser() is None:
+            self.log.error('Simulation of the counts needs a connected PulserDummy. Using the '
+                           'trace from "{0}" instead.'.format(self.trace_path))
+            self._simulate_counts = False
+
+        # state of the count simulation
+        self._expected_counts = None
+        self._sweep_time = 0
+        self._elapsed_sweeps = 0
+        self._elapsed_time = 0
+        self._start_time = None
         return
 
     def on_deactivate(self):
@@ -136,6 +185,7 @@ class FastCounterDummy(Base, FastCounterInterface):
         self._gate_length_bins = int(np.rint(record_length_s / bin_width_s))
         actual_binwidth = self._binwidth * 1000 / 950e9
         actual_length = self._gate_length_bins * actual_binwidth
+        self._number_of_gates = int(number_of_gates)
         self.statusvar = 1
         return actual_binwidth, actual_length, number_of_gates
 
@@ -153,6 +203,17 @@ class FastCounterDummy(Base, FastCounterInterface):
         return self.statusvar
 
     def start_measure(self):
+        if self._simulate_counts:
+            self._expected_counts, self._sweep_time = self._simulate_expected_counts()
+            if self._expected_counts is None:
+                return -1
+            self._count_data = np.zeros(self._expected_counts.shape, dtype='int64')
+            self._elapsed_sweeps = 0
+            self._elapsed_time = 0
+            self._start_time = time.perf_counter()
+            self.statusvar = 2
+            return 0
+
         time.sleep(1)
         self.statusvar = 2
         try:
@@ -169,12 +230,23 @@ class FastCounterDummy(Base, FastCounterInterface):
 
         Fast counter must be initially in the run state to make it pause.
         """
+        if self._simulate_counts:
+            self._accumulate_counts()
+            self._start_time = None
+            self.statusvar = 3
+            return 0
+
         time.sleep(1)
         self.statusvar = 3
         return 0
 
     def stop_measure(self):
         """ Stop the fast counter. """
+        if self._simulate_counts:
+            self._accumulate_counts()
+            self._start_time = None
+            self.statusvar = 1
+            return 0
 
         time.sleep(1)
         self.statusvar = 1
@@ -185,7 +257,8 @@ class FastCounterDummy(Base, FastCounterInterface):
 
         If fast counter is in pause state, then fast counter will be continued.
         """
-
+        if self._simulate_counts and self._start_time is None:
+            self._start_time = time.perf_counter()
         self.statusvar = 2
         return 0
 
@@ -225,6 +298,12 @@ class FastCounterDummy(Base, FastCounterInterface):
         If the hardware does not support these features, the values should be None
         """
 
+        if self._simulate_counts:
+            self._accumulate_counts()
+            info_dict = {'elapsed_sweeps': self._elapsed_sweeps,
+                         'elapsed_time': self._elapsed_time}
+            return self._count_data.copy(), info_dict
+
         # include an artificial waiting time
         time.sleep(0.5)
         info_dict = {'elapsed_sweeps': None, 'elapsed_time': None}
@@ -234,3 +313,58 @@ class FastCounterDummy(Base, FastCounterInterface):
         freq = 950.
         time.sleep(0.5)
         return freq
+
+    def _accumulate_counts(self):
+        """ Add the counts of the sweeps since the last call to the simulated histogram.
+        """
+        if self._start_time is None or self._expected_counts is None:
+            return
+        now = time.perf_counter()
+        self._elapsed_time += now - self._start_time
+        self._start_time = now
+        sweeps = int(self._elapsed_time / self._sweep_time) - self._elapsed_sweeps
+        if sweeps > 0:
+            # the sum of Poisson distributed counts is Poisson distributed
+            self._count_data += self._rng.poisson(self._expected_counts * sweeps)
+            self._elapsed_sweeps += sweeps
+
+    def _simulate_expected_counts(self):
+        """ Calculate the expected counts per sweep and bin for the sequence loaded in the pulser.
+
+        @return (numpy.ndarray, float): expected counts per sweep (1D for an ungated counter, 2D
+                                        with one row per gate for a gated counter) and the duration
+                                        of one sweep in s. (None, 0) if no sequence is loaded.
+        """
+        pulser = self.pulser()
+        sample_rate = pulser.get_sample_rate()
+        laser_rising, laser_falling, length = pulser.get_loaded_digital_edges(self._laser_channel)
+        if length == 0 or len(laser_rising) == 0:
+            self.log.error('Unable to simulate counts. No pulse sequence with laser pulses on '
+                           'channel "{0}" loaded in the pulser.'.format(self._laser_channel))
+            return None, 0
+        laser_rising = laser_rising / sample_rate
+        laser_falling = laser_falling / sample_rate
+        sweep_time = length / sample_rate
+
+        bin_width = self.get_binwidth()
+        bin_times = (np.arange(self._gate_length_bins) + 0.5) * bin_width
+        if self._gated:
+            gate_channel = self._laser_channel if self._gate_channel is None else self._gate_channel
+            gate_starts = pulser.get_loaded_digital_edges(gate_channel)[0] / sample_rate
+            if self._number_of_gates > 0:
+                gate_starts = gate_starts[:self._number_of_gates]
+            times = gate_starts[:, np.newaxis] + bin_times
+        else:
+            times = bin_times
+
+        # index of the last laser pulse started before each bin
+        laser_index = np.searchsorted(laser_rising, times, side='right') - 1
+        started = laser_index >= 0
+        laser_index[~started] = 0
+        laser_on = started & (times < laser_falling[laser_index]) & (times < sweep_time)
+
+        population = 0.5 * (1 - np.cos(2 * np.pi * laser_index / self._spin_oscillation_period))
+        laser_time = times - laser_rising[laser_index]
+        signal = 1 - self._spin_contrast * population * np.exp(-laser_time / self._polarization_time)
+        rate = self._background_rate + self._count_rate * signal * laser_on
+        return rate * bin_width, sweep_time
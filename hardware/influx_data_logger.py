@@ -19,15 +19,35 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import json
+import os
+import threading
+import time
+from collections import deque
+
 from core.module import Base
 from core.configoption import ConfigOption
 from interface.data_logger_interface import DataLoggerInterface
 
 from influxdb import InfluxDBClient
 
+
 class InfluxLogger(Base, DataLoggerInterface):
     """ Log instrument values to InfluxDB.
 
+    log_to_channel only puts the point into an in-memory buffer and returns immediately. A writer
+    thread sends the buffered points in batches of up to batch_size points, at the latest
+    flush_interval seconds after a point was logged. The buffer holds at most buffer_size points;
+    if it is full, the oldest points are dropped.
+    If a write fails (e.g. the server is unreachable), the batch is appended to the journal file
+    and no write is tried for retry_interval seconds; meanwhile buffered points go to the journal
+    as well. After the next successful write the journal is replayed and deleted batch by batch.
+
+    Channels are set with set_log_channels({name: spec}). The spec is a dict with optional 'tags'
+    (dict of tags of the points) and 'fields' (list of field names for values given as list).
+    Values logged to a channel are a dict of fields, a list (matching the 'fields' of the spec) or
+    a single number (field from the config option 'field').
+
     Example config for copy-paste:
 
     influx_data_logger:
@@ -40,6 +60,12 @@ class InfluxLogger(Base, DataLoggerInterface):
         dataseries: 'data_series_name'
         field: 'field_name'
         criterion: 'criterion_name'
+        batch_size: 1000
+        flush_interval: 1  # in s
+        buffer_size: 100000
+        retry_interval: 10  # in s
+        timeout: 5  # in s, of a write request
+        journal_file: 'C:/qudi/influx_journal.jsonl'  # optional, default in the app status dir
 
     """
 
@@ -51,24 +77,55 @@ class InfluxLogger(Base, DataLoggerInterface):
     series = ConfigOption('dataseries', missing='error')
     field = ConfigOption('field', missing='error')
     cr = ConfigOption('criterion', missing='error')
+    _batch_size = ConfigOption('batch_size', 1000)
+    _flush_interval = ConfigOption('flush_interval', 1)
+    _buffer_size = ConfigOption('buffer_size', 100000)
+    _retry_interval = ConfigOption('retry_interval', 10)
+    _journal_file = ConfigOption('journal_file', None)
+    _timeout = ConfigOption('timeout', 5)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.log_channels = {}
+        self._buffer = deque()
+        self._buffer_condition = threading.Condition()
+        self._writer = None
+        self._stop_writer = False
+        self._flush_requested = False
+        self._writing = False
+        self._statistics = dict()
 
     def on_activate(self):
         """ Activate module.
         """
+        if self._journal_file is None:
+            self.journal_file = os.path.join(
+                self._manager.getStatusDir(), 'influx_journal_{0}.jsonl'.format(self._name))
+        else:
+            self.journal_file = self._journal_file
+        self.reset_statistics()
+        self._retry_time = 0
         self.connect_db()
 
+        self._stop_writer = False
+        self._writer = threading.Thread(
+            target=self._write_loop, name='{0} writer'.format(self._name), daemon=True)
+        self._writer.start()
+
     def on_deactivate(self):
         """ Deactivate module.
         """
+        with self._buffer_condition:
+            self._stop_writer = True
+            self._buffer_condition.notify()
+        self._writer.join()
+        self._writer = None
         del self.conn
 
     def connect_db(self):
         """ Connect to Influx database """
-        self.conn = InfluxDBClient(self.host, self.port, self.user, self.pw, self.dbname)
+        self.conn = InfluxDBClient(self.host, self.port, self.user, self.pw, self.dbname,
+                                   timeout=self._timeout, retries=1)
 
     def get_log_channels(self):
         """ Get number of logging channels
@@ -80,33 +137,54 @@ class InfluxLogger(Base, DataLoggerInterface):
     def set_log_channels(self, channelspec):
         """ Set number of logging channels.
 
-            @param channelspec dict: name, spec
+            @param channelspec dict: name, spec (dict with optional 'tags' and 'fields' or None to
+                                     remove the channel)
         """
         for name, spec in channelspec.items():
-            if spec is None and name in self.log_channels:
-                self.log_channels.pop(name)
-            elif name in self.log_channels:
-                pass
+            if spec is None:
+                self.log_channels.pop(name, None)
             else:
-                pass
-                if True:
-                    pass
+                self.log_channels[name] = {'tags': dict(spec.get('tags', dict())),
+                                           'fields': list(spec.get('fields', list()))}
 
     def log_to_channel(self, channel, values):
         """ Log values to a specific channel.
 
             @param channel str: channel name
-            @param values list: data to be logged
+            @param values dict|list|float: data to be logged
         """
-        if channel in self.log_channels.keys() and len(values) == len(self.log_channels[channel][values]):
-            conn.write_points(format_data(channel, values, channeltags))
+        if channel not in self.log_channels:
+            self.log.error('Channel "{0}" is not a log channel.'.format(channel))
+            return
+        spec = self.log_channels[channel]
+        if isinstance(values, dict):
+            fields = values
+        elif isinstance(values, (list, tuple)):
+            if len(values) != len(spec['fields']):
+                self.log.error('Channel "{0}" expects values for the fields {1}.'.format(
+                    channel, spec['fields']))
+                return
+            fields = dict(zip(spec['fields'], values))
+        else:
+            fields = {self.field: values}
+
+        point = self.format_data(channel, fields, spec['tags'])[0]
+        point['time'] = int(time.time() * 1e9)
+        with self._buffer_condition:
+            if len(self._buffer) >= self._buffer_size:
+                self._buffer.popleft()
+                self._statistics['dropped_points'] += 1
+            self._buffer.append(point)
+            self._statistics['logged_points'] += 1
+            if len(self._buffer) >= self._batch_size:
+                self._buffer_condition.notify()
 
     def format_data(self, channel_name, values, tags):
         """ Format data according to InfluxDB JSON API.
 
             @param channel_name str: channel name
-            @param values list: data
-            @param tags list(str): list of tags
+            @param values dict: data
+            @param tags dict: tags
         """
         return [{
              'measurement': channel_name,
@@ -114,3 +192,165 @@ class InfluxLogger(Base, DataLoggerInterface):
              'tags': tags
             }]
 
+    def get_statistics(self):
+        """ Counters of the buffered writing.
+
+            @return dict: logged, written, dropped, journaled and replayed points, write requests,
+                          failed writes and the maximal time from logging to writing a point in s
+        """
+        with self._buffer_condition:
+            statistics = dict(self._statistics)
+            statistics['buffered_points'] = len(self._buffer)
+        return statistics
+
+    def reset_statistics(self):
+        """ Reset the counters of get_statistics. """
+        with self._buffer_condition:
+            self._statistics = {'logged_points': 0,
+                                'written_points': 0,
+                                'dropped_points': 0,
+                                'journaled_points': 0,
+                                'replayed_points': 0,
+                                'write_requests': 0,
+                                'failed_writes': 0,
+                                'max_latency': 0}
+
+    def flush(self, timeout=None):
+        """ Wait until all points logged so far are written (or journaled).
+
+            @param float timeout: optional, maximum time to wait in s
+
+            @return bool: all points written or journaled
+        """
+        stop = None if timeout is None else time.monotonic() + timeout
+        with self._buffer_condition:
+            self._flush_requested = True
+            self._buffer_condition.notify()
+            while self._buffer or self._writing:
+                remaining = None if stop is None else stop - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._buffer_condition.wait(remaining)
+        return True
+
+    def _take_batch(self):
+        """ Wait for a batch of points to write.
+
+            @return list: the points, empty if the writer is stopped and the buffer is empty
+        """
+        with self._buffer_condition:
+            deadline = time.monotonic() + self._flush_interval
+            while (len(self._buffer) < self._batch_size and not self._stop_writer
+                   and not self._flush_requested):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._buffer_condition.wait(remaining)
+            number = min(len(self._buffer), self._batch_size)
+            batch = [self._buffer.popleft() for _ in range(number)]
+            if not self._buffer:
+                self._flush_requested = False
+            self._writing = bool(batch)
+            return batch
+
+    def _write_loop(self):
+        """ Write the buffered points until the module is deactivated. Runs in the writer thread.
+        """
+        while True:
+            batch = self._take_batch()
+            if batch:
+                try:
+                    if time.monotonic() < self._retry_time:
+                        self._write_journal(batch)
+                    elif self._write(batch):
+                        self._replay_journal()
+                    else:
+                        self._write_journal(batch)
+                        self._retry_time = time.monotonic() + self._retry_interval
+                except Exception:
+                    # keep the writer thread alive, otherwise flush would wait forever
+                    self.log.exception('Error while writing a batch of {0} points to InfluxDB.'
+                                       ''.format(len(batch)))
+                finally:
+                    with self._buffer_condition:
+                        self._writing = False
+                        self._buffer_condition.notify_all()
+            elif self._stop_writer:
+                break
+
+    def _write(self, points):
+        """ Send points to the database.
+
+            @param list points: points in the InfluxDB JSON format with time in ns
+
+            @return bool: success
+        """
+        try:
+            self.conn.write_points(points, time_precision='n', batch_size=self._batch_size)
+        except Exception as e:
+            self.log.warning('Writing {0} points to InfluxDB failed, they are kept in the journal '
+                             '{1}: {2}'.format(len(points), self.journal_file, e))
+            with self._buffer_condition:
+                self._statistics['failed_writes'] += 1
+            return False
+        latency = time.time() - min(point['time'] for point in points) / 1e9
+        with self._buffer_condition:
+            self._statistics['written_points'] += len(points)
+            self._statistics['write_requests'] += 1
+            self._statistics['max_latency'] = max(self._statistics['max_latency'], latency)
+        return True
+
+    def _write_journal(self, points):
+        """ Append points to the journal file.
+
+            @param list points: points in the InfluxDB JSON format
+        """
+        try:
+            with open(self.journal_file, 'a') as file:
+                file.write(json.dumps(points) + '\n')
+        except OSError:
+            self.log.exception('Writing {0} points to the journal failed, they are lost.'.format(
+                len(points)))
+            return
+        with self._buffer_condition:
+            self._statistics['journaled_points'] += len(points)
+
+    def _replay_journal(self):
+        """ Write the points of the journal file to the database and delete the file.
+
+            The journal is renamed to <journal_file>.replay first, so new failed batches go to a
+            new journal. The batches are replayed from the end of the file, and the file is
+            truncated after every written batch, so a batch is only removed once it is in the
+            database. A replay file left by an interrupted replay is replayed first. Batches that
+            can not be written stay in the replay file, corrupt lines are skipped.
+        """
+        replay_file = self.journal_file + '.replay'
+        replayed = 0
+        while True:
+            if not os.path.isfile(replay_file):
+                if not os.path.isfile(self.journal_file):
+                    break
+                os.replace(self.journal_file, replay_file)
+            with open(replay_file, 'rb') as file:
+                lines = file.readlines()
+            offsets = [0]
+            for line in lines:
+                offsets.append(offsets[-1] + len(line))
+            for index in reversed(range(len(lines))):
+                if lines[index].strip():
+                    try:
+                        points = json.loads(lines[index].decode('utf-8'))
+                    except ValueError as e:
+                        self.log.error('Skipping corrupt line {0:d} of the InfluxDB journal: {1}'
+                                       ''.format(index + 1, e))
+                    else:
+                        if not self._write(points):
+                            self._retry_time = time.monotonic() + self._retry_interval
+                            return
+                        replayed += 1
+                        with self._buffer_condition:
+                            self._statistics['replayed_points'] += len(points)
+                os.truncate(replay_file, offsets[index])
+            os.remove(replay_file)
+        if replayed:
+            self.log.info('Replayed {0} journaled batches to InfluxDB.'.format(replayed))
@@ -29,6 +29,7 @@ import numpy as np
 
 from core.module import Base
 from core.configoption import ConfigOption
+from core.util.scpi import ScpiBatch
 from interface.microwave_interface import MicrowaveInterface
 from interface.microwave_interface import MicrowaveLimits
 from interface.microwave_interface import MicrowaveMode
@@ -280,25 +281,27 @@ class MicrowaveAnritsu(Base, MicrowaveInterface):
         if is_running:
             self.off()
 
+        # All list settings are sent in one transfer and synchronized once at the end
+        batch = ScpiBatch(self._gpib_connection)
         if mode != 'list':
-            self._command_wait(':FREQ:MODE LIST')
-        self._command_wait(':LIST:IND 0')
+            batch.write(':FREQ:MODE LIST')
+            batch.wait()
+        batch.write(':LIST:IND 0')
 
         if frequency is not None:
-            s = ' {0:f},'.format(frequency[0])
-            for f in frequency[:-1]:
-                s += ' {0:f},'.format(f)
-            s += ' {0:f}'.format(frequency[-1])
-            self._command_wait(':LIST:FREQ' + s)
-            self._command_wait(':LIST:STAR 0')
-            self._command_wait(':LIST:STOP {0}'.format(len(frequency)-1))
-        self._gpib_connection.write(':LIST:MODE MAN')
+            # The first frequency is repeated (trigger issues of the list mode)
+            batch.write_list(':LIST:FREQ', np.concatenate((frequency[:1], frequency)),
+                             fmt='{0:f}')
+            batch.write(':LIST:STAR 0')
+            batch.write(':LIST:STOP {0}'.format(len(frequency)-1))
+        batch.write(':LIST:MODE MAN')
 
         if power is not None:
-            self._command_wait(':LIST:IND 0')
-            self._command_wait(':LIST:POW {0}'.format((len(frequency)-1)*(str(power)+', ')+str(power)))
+            batch.write(':LIST:IND 0')
+            batch.write_list(':LIST:POW', [power] * len(frequency), fmt='{0}')
 
-        self._command_wait(':LIST:IND 0')
+        batch.write(':LIST:IND 0')
+        batch.flush()
 
         actual_power = self.get_power()
         actual_freq = self.get_frequency()
@@ -29,6 +29,7 @@ import numpy as np
 
 from core.module import Base
 from core.configoption import ConfigOption
+from core.util.scpi import ScpiBatch
 from interface.microwave_interface import MicrowaveInterface
 from interface.microwave_interface import MicrowaveLimits
 from interface.microwave_interface import MicrowaveMode
@@ -50,6 +51,7 @@ class MicrowaveSmiq(Base, MicrowaveInterface):
         frequency_max: 3e6  # optional, in Hz
         power_min: -100  # optional, in dBm
         power_max: 13  # optional, in dBm
+        binary_list_transfer: False  # optional, send frequency lists as binary block (:FORM PACK)
     """
 
     _gpib_address = ConfigOption('gpib_address', missing='error')
@@ -59,6 +61,7 @@ class MicrowaveSmiq(Base, MicrowaveInterface):
     _config_freq_max = ConfigOption('frequency_max', None)
     _config_power_min = ConfigOption('power_min', None)
     _config_power_max = ConfigOption('power_max', None)
+    _binary_list_transfer = ConfigOption('binary_list_transfer', False)
 
     # Indicate how fast frequencies within a list or sweep mode can be changed:
     _FREQ_SWITCH_SPEED = 0.003  # Frequency switching speed in s (acc. to specs)
@@ -100,10 +103,7 @@ class MicrowaveSmiq(Base, MicrowaveInterface):
 
         @param command_str: The command to be written
         """
-        self._gpib_connection.write(command_str)
-        self._gpib_connection.write('*WAI')
-        while int(float(self._gpib_connection.query('*OPC?'))) != 1:
-            time.sleep(0.2)
+        ScpiBatch(self._gpib_connection).write(command_str).flush()
         return
 
     def get_limits(self):
@@ -334,33 +334,37 @@ class MicrowaveSmiq(Base, MicrowaveInterface):
         if mode != 'cw':
             self.set_cw()
 
-        self._gpib_connection.write(":LIST:SEL 'QUDI'")
-        self._gpib_connection.write('*WAI')
+        # All list settings are sent in one transfer and synchronized once at the end
+        batch = ScpiBatch(self._gpib_connection)
+        batch.write(":LIST:SEL 'QUDI'")
 
-        # Set list frequencies
+        # Set list frequencies. The first frequency is repeated (trigger issues of the list mode).
         if frequency is not None:
-            s = ' {0:f},'.format(frequency[0])
-            for f in frequency[:-1]:
-                s += ' {0:f},'.format(f)
-            s += ' {0:f}'.format(frequency[-1])
-            self._gpib_connection.write(':LIST:FREQ' + s)
-            self._gpib_connection.write('*WAI')
-            self._gpib_connection.write(':LIST:MODE STEP')
-            self._gpib_connection.write('*WAI')
+            frequency = np.asarray(frequency, dtype=float)
+            frequency = np.concatenate((frequency[:1], frequency))
+            if self._binary_list_transfer:
+                batch.write(':FORM PACK')
+                batch.write_list(':LIST:FREQ', frequency, binary=True)
+                batch.write(':FORM ASC')
+            else:
+                batch.write_list(':LIST:FREQ', frequency, fmt='{0:f}')
+            batch.write(':LIST:MODE STEP')
 
         # Set list power
         if power is not None:
-            self._gpib_connection.write(':LIST:POW {0:f}'.format(power))
-            self._gpib_connection.write('*WAI')
+            batch.write(':LIST:POW {0:f}'.format(power))
 
-        self._command_wait(':TRIG1:LIST:SOUR EXT')
+        batch.write(':TRIG1:LIST:SOUR EXT')
 
         # Apply settings in hardware
-        self._command_wait(':LIST:LEARN')
+        batch.wait()
+        batch.write(':LIST:LEARN')
         # If there are timeout  problems after this command, update the smiq  firmware to > 5.90
         # as there was a problem with excessive wait times after issuing :LIST:LEARN over a
         # GPIB connection in firmware 5.88
-        self._command_wait(':FREQ:MODE LIST')
+        batch.wait()
+        batch.write(':FREQ:MODE LIST')
+        batch.flush()
 
         actual_freq = self.get_frequency()
         actual_power = self.get_power()
@@ -413,23 +417,26 @@ class MicrowaveSmiq(Base, MicrowaveInterface):
         if is_running:
             self.off()
 
+        batch = ScpiBatch(self._gpib_connection)
         if mode != 'sweep':
-            self._command_wait(':FREQ:MODE SWEEP')
+            batch.write(':FREQ:MODE SWEEP')
+            batch.wait()
 
         if (start is not None) and (stop is not None) and (step is not None):
-            self._gpib_connection.write(':SWE:MODE STEP')
-            self._gpib_connection.write(':SWE:SPAC LIN')
-            self._gpib_connection.write('*WAI')
-            self._gpib_connection.write(':FREQ:START {0:f}'.format(start - step))
-            self._gpib_connection.write(':FREQ:STOP {0:f}'.format(stop))
-            self._gpib_connection.write(':SWE:STEP:LIN {0:f}'.format(step))
-            self._gpib_connection.write('*WAI')
+            batch.write(':SWE:MODE STEP')
+            batch.write(':SWE:SPAC LIN')
+            batch.wait()
+            batch.write(':FREQ:START {0:f}'.format(start - step))
+            batch.write(':FREQ:STOP {0:f}'.format(stop))
+            batch.write(':SWE:STEP:LIN {0:f}'.format(step))
+            batch.wait()
 
         if power is not None:
-            self._gpib_connection.write(':POW {0:f}'.format(power))
-            self._gpib_connection.write('*WAI')
+            batch.write(':POW {0:f}'.format(power))
+            batch.wait()
 
-        self._command_wait(':TRIG1:SWE:SOUR EXT')
+        batch.write(':TRIG1:SWE:SOUR EXT')
+        batch.flush()
 
         actual_power = self.get_power()
         freq_list = self.get_frequency()
@@ -26,6 +26,7 @@ import time
 
 from core.module import Base
 from core.configoption import ConfigOption
+from core.util.scpi import ScpiBatch
 from interface.microwave_interface import MicrowaveInterface
 from interface.microwave_interface import MicrowaveLimits
 from interface.microwave_interface import MicrowaveMode
@@ -367,41 +368,38 @@ class MicrowaveSMR(Base, MicrowaveInterface):
 
         else:
 
-            self._write(':SOUR:LIST:MODE STEP')
+            # All list settings are sent in one transfer and synchronized once at the end
+            batch = ScpiBatch(self._gpib_connection)
+            batch.write(':SOUR:LIST:MODE STEP')
 
             # It seems that we have to set a DWEL for the device, but it is not so
             # clear why it is necessary. At least there was a hint in the manual for
             # that and the instrument displays an error, when this parameter is not
             # set in the list mode (even it should be set by default):
-            self._write(':SOUR:LIST:DWEL {0}'.format(self._LIST_DWELL))
+            batch.write(':SOUR:LIST:DWEL {0}'.format(self._LIST_DWELL))
 
-            self._write(':TRIG1:LIST:SOUR EXT')
-            self._write(':TRIG1:SLOP NEG')
+            batch.write(':TRIG1:LIST:SOUR EXT')
+            batch.write(':TRIG1:SLOP NEG')
 
             # delete all list entries and create/select a new list
-            self._write(':SOUR:LIST:DEL:ALL')
-            self._write(':SOUR:LIST:SEL "LIST1"')
+            batch.write(':SOUR:LIST:DEL:ALL')
+            batch.wait()
+            batch.write(':SOUR:LIST:SEL "LIST1"')
 
-            FreqString = ''
-            PowerString = ''
-
-            for f in frequency[:-1]:
-                FreqString += ' {0:f}Hz,'.format(f)
-                PowerString +=' {0:f}dBm,'.format(power)
-            FreqString += ' {0:f}Hz'.format(frequency[-1])
-            PowerString +=' {0:f}dBm'.format(power)
-
-            self._write(':SOUR:LIST:FREQ' + FreqString)
-            self._write(':SOUR:LIST:POW' + PowerString)
-            self._write(':OUTP:AMOD FIX')
+            batch.write_list(':SOUR:LIST:FREQ', frequency, fmt='{0:f}Hz')
+            batch.write_list(':SOUR:LIST:POW', [power] * len(frequency), fmt='{0:f}dBm')
+            batch.write(':OUTP:AMOD FIX')
 
             # Apply settings in hardware
-            self._write(':LIST:LEARN')
+            batch.wait()
+            batch.write(':LIST:LEARN')
             # If there are timeout problems after this command, update the smiq
             # firmware to > 5.90 as there was a problem with excessive wait
             # times after issuing :LIST:LEARN over a GPIB connection in
             # firmware 5.88.
-            self._write(':FREQ:MODE LIST')
+            batch.wait()
+            batch.write(':FREQ:MODE LIST')
+            batch.flush()
 
             N = int(np.round(float(self._ask(':SOUR:LIST:FREQ:POIN?'))))
 
@@ -31,22 +31,34 @@ from interface.odmr_counter_interface import ODMRCounterInterface
 class ODMRCounterDummy(Base, ODMRCounterInterface):
     """ Dummy hardware class to simulate the controls for a simple ODMR.
 
+    The simulated spectrum has Lorentzian dips at the relative positions dip_positions of the
+    sweep with the half width dip_sigma (in pixel). Channel i (counted from 1) has the offset
+    i * 50000 counts/s and the contrast given by contrast (a single value for all channels or a
+    list with one value per channel). Uniformly distributed noise between 0 and 50000 counts/s is
+    added to each line.
+
     Example config for copy-paste:
 
     odmr_counter_dummy:
         module.Class: 'odmr_counter_dummy.ODMRCounterDummy'
         clock_frequency: 100 # in Hz
         number_of_channels: 2
-        fitlogic: 'fitlogic' # name of the fitlogic module, see default config
+        dip_positions: [0.333, 0.667] # relative to the sweep length
+        dip_sigma: 3 # in pixel
+        contrast: 0.6 # or a list with one value per channel
 
     """
 
     # connectors
-    fitlogic = Connector(interface='FitLogic')
+    # not needed anymore, kept optional for compatibility with existing configurations
+    fitlogic = Connector(interface='FitLogic', optional=True)
 
     # config options
     _clock_frequency = ConfigOption('clock_frequency', 100, missing='warn')
     _number_of_channels = ConfigOption('number_of_channels', 2, missing='warn')
+    _dip_positions = ConfigOption('dip_positions', [1/3, 2/3])
+    _dip_sigma = ConfigOption('dip_sigma', 3.)
+    _contrast = ConfigOption('contrast', 0.6)
 
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
@@ -56,11 +68,12 @@ class ODMRCounterDummy(Base, ODMRCounterInterface):
         self._pulse_out_channel = 'dummy'
         self._lock_in_active = False
         self._oversampling = 10
+        self._spectrum = None
 
     def on_activate(self):
         """ Initialisation performed during activation of the module.
         """
-        self._fit_logic = self.fitlogic()
+        self._spectrum = None
 
     def on_deactivate(self):
         """ Deinitialisation performed during deactivation of the module.
@@ -137,25 +150,11 @@ class ODMRCounterDummy(Base, ODMRCounterInterface):
 
         self._odmr_length = length
 
-        lorentians, params = self._fit_logic.make_lorentziandouble_model()
-
-        sigma = 3.
-
-        params.add('l0_amplitude', value=-30000)
-        params.add('l0_center', value=length/3)
-        params.add('l0_sigma', value=sigma)
-        params.add('l1_amplitude', value=-30000)
-        params.add('l1_center', value=2*length/3)
-        params.add('l1_sigma', value=sigma)
-        params.add('offset', value=50000.)
+        if self._spectrum is None or self._spectrum.shape != (self._number_of_channels, length):
+            self._spectrum = self._calculate_spectrum(length)
 
-        ret = np.empty((self._number_of_channels, length))
-
-        for chnl_index in range(self._number_of_channels):
-            count_data = np.random.uniform(0, 5e4, length)
-            count_data += (chnl_index + 1) * lorentians.eval(x=np.arange(1, length + 1, 1),
-                                                             params=params)
-            ret[chnl_index] = count_data
+        ret = np.random.uniform(0, 5e4, self._spectrum.shape)
+        ret += self._spectrum
 
         time.sleep(self._odmr_length*1./self._clock_frequency)
 
@@ -163,6 +162,24 @@ class ODMRCounterDummy(Base, ODMRCounterInterface):
         return False, ret
 
 
+    def _calculate_spectrum(self, length):
+        """ Noise free ODMR spectrum of all channels.
+
+        @param int length: length of microwave sweep in pixel
+
+        @return numpy.ndarray: counts per second with shape (number of channels, length)
+        """
+        x = np.arange(1, length + 1, dtype=float)
+        centers = np.asarray(self._dip_positions, dtype=float)[:, np.newaxis] * length
+        sigma = float(self._dip_sigma)
+        # Lorentzian dips with unit depth
+        dips = (sigma ** 2 / ((x - centers) ** 2 + sigma ** 2)).sum(axis=0)
+
+        contrast = np.broadcast_to(np.asarray(self._contrast, dtype=float),
+                                   (self._number_of_channels,))
+        offset = 5e4 * np.arange(1, self._number_of_channels + 1)
+        return offset[:, np.newaxis] * (1 - contrast[:, np.newaxis] * dips)
+
     def close_odmr(self):
         """ Closes the odmr and cleans up afterwards.
 
@@ -21,6 +21,7 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 import time
+import numpy as np
 from collections import OrderedDict
 
 from core.module import Base
@@ -73,6 +74,11 @@ class PulserDummy(Base, PulserInterface):
         self.waveform_set = set()
         self.sequence_dict = dict()
 
+        # digital edges of the written waveforms for the simulation in the FastCounterDummy
+        self._digital_edges = dict()
+        self._waveform_nametags = dict()
+        self._sequence_steps = dict()
+
         self.current_loaded_assets = dict()
 
         self.use_sequencer = True
@@ -314,6 +320,9 @@ class PulserDummy(Base, PulserInterface):
                 time.sleep(number_of_samples * 8 / 1024 ** 3)
 
         self.waveform_set.update(waveforms)
+        self._record_digital_edges(name, digital_samples, number_of_samples, is_first_chunk)
+        for waveform in waveforms:
+            self._waveform_nametags[waveform] = name
 
         self.log.info('Waveforms with nametag "{0}" directly written on dummy pulser.'.format(name))
         return number_of_samples, waveforms
@@ -340,6 +349,9 @@ class PulserDummy(Base, PulserInterface):
             del self.sequence_dict[name]
 
         self.sequence_dict[name] = len(sequence_parameter_list[0][0])
+        self._sequence_steps[name] = [
+            (self._waveform_nametags.get(waveform_tuple[0]), param_dict.get('repetitions', 0))
+            for waveform_tuple, param_dict in sequence_parameter_list]
         time.sleep(1)
 
         self.log.info('Sequence with name "{0}" directly written on dummy pulser.'.format(name))
@@ -375,6 +387,9 @@ class PulserDummy(Base, PulserInterface):
             if waveform in self.waveform_set:
                 self.waveform_set.remove(waveform)
                 deleted_waveforms.append(waveform)
+                nametag = self._waveform_nametags.pop(waveform, None)
+                if nametag not in self._waveform_nametags.values():
+                    self._digital_edges.pop(nametag, None)
 
         return deleted_waveforms
 
@@ -393,6 +408,7 @@ class PulserDummy(Base, PulserInterface):
         for sequence in sequence_name:
             if sequence in self.sequence_dict:
                 del self.sequence_dict[sequence]
+                self._sequence_steps.pop(sequence, None)
                 deleted_sequences.append(sequence)
 
         return deleted_sequences
@@ -543,6 +559,87 @@ class PulserDummy(Base, PulserInterface):
 
         return self.current_loaded_assets, asset_type
 
+    def get_loaded_digital_edges(self, channel):
+        """ Rising and falling edges of a digital channel in the currently loaded waveform or
+        sequence. Sequence steps are unrolled with their repetitions (infinite repetitions are
+        played once).
+
+        This method is specific to the dummy. The FastCounterDummy uses it to simulate the
+        photon counts of the loaded pulse sequence.
+
+        @param str channel: the generic digital channel name (i.e. 'd_ch1')
+
+        @return (numpy.ndarray, numpy.ndarray, int): indices of the samples with a rising and a
+                                                     falling edge and the total number of samples
+                                                     of the loaded asset. Empty arrays and 0 if
+                                                     nothing is loaded.
+        """
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), 0)
+        loaded_assets, asset_type = self.get_loaded_assets()
+        if not loaded_assets:
+            return empty
+
+        asset_name = loaded_assets[min(loaded_assets)]
+        if asset_type == 'waveform':
+            steps = [(self._waveform_nametags.get(asset_name), 0)]
+        else:
+            steps = self._sequence_steps.get(asset_name.rsplit('_', 1)[0], list())
+
+        rising = list()
+        falling = list()
+        offset = 0
+        for nametag, repetitions in steps:
+            edges = self._digital_edges.get(nametag)
+            if edges is None:
+                return empty
+            repetitions = max(repetitions, 0) + 1
+            length = edges['length']
+            offsets = offset + length * np.arange(repetitions, dtype=np.int64)
+            if channel in edges['rising']:
+                step_rising = np.concatenate(edges['rising'][channel])
+                step_falling = np.concatenate(edges['falling'][channel])
+                if edges['last_state'][channel]:
+                    # high at the end of the waveform
+                    step_falling = np.append(step_falling, length)
+                rising.append((offsets[:, np.newaxis] + step_rising).ravel())
+                falling.append((offsets[:, np.newaxis] + step_falling).ravel())
+            offset += length * repetitions
+        if not rising:
+            return empty[0], empty[1], offset
+        return np.concatenate(rising), np.concatenate(falling), offset
+
+    def _record_digital_edges(self, name, digital_samples, number_of_samples, is_first_chunk):
+        """ Remember the edges of the digital samples of a written waveform chunk.
+
+        @param str name: the name of the waveform
+        @param dict digital_samples: keys are the generic digital channel names and values are
+                                     1D numpy arrays of type bool containing the marker states
+        @param int number_of_samples: number of samples in the chunk
+        @param bool is_first_chunk: Flag indicating if it is the first chunk of the waveform
+        """
+        edges = self._digital_edges.get(name)
+        if is_first_chunk or edges is None:
+            edges = {'length': 0,
+                     'rising': {chnl: list() for chnl in digital_samples},
+                     'falling': {chnl: list() for chnl in digital_samples},
+                     'last_state': {chnl: False for chnl in digital_samples}}
+            self._digital_edges[name] = edges
+        for chnl, samples in digital_samples.items():
+            if chnl not in edges['rising']:
+                continue
+            if len(samples) == 0:
+                continue
+            samples = np.asarray(samples, dtype=np.int8)
+            steps = np.diff(samples)
+            offset = edges['length'] + 1
+            if samples[0] != edges['last_state'][chnl]:
+                steps = np.concatenate(([samples[0] - edges['last_state'][chnl]], steps))
+                offset -= 1
+            edges['rising'][chnl].append(np.flatnonzero(steps > 0) + offset)
+            edges['falling'][chnl].append(np.flatnonzero(steps < 0) + offset)
+            edges['last_state'][chnl] = bool(samples[-1])
+        edges['length'] += number_of_samples
+
     def clear_all(self):
         """ Clears all loaded waveform from the pulse generators RAM.
 
@@ -554,6 +651,9 @@ class PulserDummy(Base, PulserInterface):
         self.current_loaded_assets = dict()
         self.waveform_set = set()
         self.sequence_dict = dict()
+        self._digital_edges = dict()
+        self._waveform_nametags = dict()
+        self._sequence_steps = dict()
         return 0
 
     def get_status(self):
@@ -21,7 +21,6 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 
 import numpy as np
 
-import random
 import time
 
 from core.module import Base
@@ -44,6 +43,7 @@ class SlowCounterDummy(Base, SlowCounterInterface):
         count_distribution: 'dark_bright_gaussian' # other options are:
             # 'uniform, 'exponential', 'single_poisson', 'dark_bright_poisson'
             #  and 'single_gaussian'.
+        random_seed: 42 # optional, seed of the random number generator for reproducible counts
 
     """
 
@@ -52,6 +52,7 @@ class SlowCounterDummy(Base, SlowCounterInterface):
     _samples_number = ConfigOption('samples_number', 10, missing='warn')
     source_channels = ConfigOption('source_channels', 2, missing='warn')
     dist = ConfigOption('count_distribution', 'dark_bright_gaussian')
+    _random_seed = ConfigOption('random_seed', None)
 
     # 'No parameter "count_distribution" given in the configuration for the'
     # 'Slow Counter Dummy. Possible distributions are "dark_bright_gaussian",'
@@ -79,9 +80,10 @@ class SlowCounterDummy(Base, SlowCounterInterface):
         self.life_time_dark = 0.04  # 40 milliseconds
 
         # needed for the life time simulation
-        self.current_dec_time = self.life_time_bright
         self.curr_state_b = True
-        self.total_time = 0.0
+        self._dwell_samples_left = None
+
+        self._rng = np.random.RandomState(self._random_seed)
 
     def on_deactivate(self):
         """ Deinitialisation performed during deactivation of the module.
@@ -160,7 +162,7 @@ class SlowCounterDummy(Base, SlowCounterInterface):
 
         @param int samples: if defined, number of samples to read in one go
 
-        @return float: the photon counts per second
+        @return numpy.ndarray: the photon counts per second
         """
 
         if samples is None:
@@ -168,58 +170,76 @@ class SlowCounterDummy(Base, SlowCounterInterface):
         else:
             samples = int(samples)
 
-        timestep = 1 / self._clock_frequency * samples
-
-        # count data will be written here in the NumPy array
-        count_data = np.empty([samples], dtype=np.uint32)
-
-        for i in range(samples):
-            if self.dist == 'single_gaussian':
-                count_data[i] = np.random.normal(self.mean_signal, self.noise_amplitude / 2)
-            elif self.dist == 'dark_bright_gaussian':
-                self.total_time = self.total_time + timestep
-                if self.total_time > self.current_dec_time:
-                    if self.curr_state_b:
-                        self.curr_state_b = False
-                        self.current_dec_time = np.random.exponential(self.life_time_dark)
-                        count_data[i] = np.random.poisson(self.mean_signal)
-                    else:
-                        self.curr_state_b = True
-                        self.current_dec_time = np.random.exponential(self.life_time_bright)
-                    self.total_time = 0.0
-
-                count_data[i] = (np.random.normal(self.mean_signal, self.noise_amplitude) * self.curr_state_b
-                                + np.random.normal(self.mean_signal2, self.noise_amplitude) * (1-self.curr_state_b))
-
-            elif self.dist == 'uniform':
-                count_data[i] = self.mean_signal + random.uniform(-self.noise_amplitude / 2, self.noise_amplitude / 2)
-
-            elif self.dist == 'exponential':
-                count_data[i] = np.random.exponential(self.mean_signal)
-
-            elif self.dist == 'single_poisson':
-                count_data[i] = np.random.poisson(self.mean_signal)
-
-            elif self.dist == 'dark_bright_poisson':
-                self.total_time = self.total_time + timestep
-
-                if self.total_time > self.current_dec_time:
-                    if self.curr_state_b:
-                        self.curr_state_b = False
-                        self.current_dec_time = np.random.exponential(self.life_time_dark)
-                        count_data[i] = np.random.poisson(self.mean_signal)
-                    else:
-                        self.curr_state_b = True
-                        self.current_dec_time = np.random.exponential(self.life_time_bright)
-                    self.total_time = 0.0
-
-                count_data[i] = (np.random.poisson(self.mean_signal) * self.curr_state_b
-                                + np.random.poisson(self.mean_signal2) * (1-self.curr_state_b))
-            else:
-                # make uniform as default
-                count_data[0][i] = self.mean_signal + random.uniform(-self.noise_amplitude/2, self.noise_amplitude/2)
+        rng = self._rng
+        if self.dist == 'single_gaussian':
+            count_data = rng.normal(self.mean_signal, self.noise_amplitude / 2, samples)
+        elif self.dist == 'dark_bright_gaussian':
+            bright = self._simulate_bright_states(samples)
+            count_data = rng.normal(0, self.noise_amplitude, samples)
+            count_data += np.where(bright, self.mean_signal, self.mean_signal2)
+        elif self.dist == 'exponential':
+            count_data = rng.exponential(self.mean_signal, samples)
+        elif self.dist == 'single_poisson':
+            count_data = rng.poisson(self.mean_signal, samples)
+        elif self.dist == 'dark_bright_poisson':
+            bright = self._simulate_bright_states(samples)
+            count_data = rng.poisson(np.where(bright, self.mean_signal, self.mean_signal2))
+        else:
+            # make uniform as default
+            count_data = rng.uniform(self.mean_signal - self.noise_amplitude / 2,
+                                     self.mean_signal + self.noise_amplitude / 2,
+                                     samples)
 
-        return count_data
+        return count_data.astype(np.uint32)
+
+    def _simulate_bright_states(self, samples):
+        """ Simulate the blinking of the emitter (telegraph process) for the next samples.
+
+        The emitter stays bright or dark for an exponentially distributed dwell time with the mean
+        life_time_bright or life_time_dark. The state changes with the first sample after the dwell
+        time has elapsed, so a dwell time D lasts int(D * clock_frequency) + 1 samples. The dwell
+        times of many following states are drawn at once and the state switches are found in their
+        cumulative sum. The state and the remaining samples of the current dwell time are kept for
+        the next call.
+
+        @param int samples: number of samples to simulate
+
+        @return numpy.ndarray: bool array, True for the samples in the bright state
+        """
+        sample_time = 1 / self._clock_frequency
+        if self._dwell_samples_left is None:
+            # the emitter starts bright with the mean bright life time
+            self._dwell_samples_left = int(self.life_time_bright / sample_time)
+
+        first = min(self._dwell_samples_left, samples)
+        states = [np.full(first, self.curr_state_b, dtype=bool)]
+        self._dwell_samples_left -= first
+        filled = first
+        mean_cycle_samples = (self.life_time_bright + self.life_time_dark) / sample_time + 2
+        while filled < samples:
+            missing = samples - filled
+            # draw enough dwell times to cover the missing samples with high probability
+            count = 2 * int(missing / mean_cycle_samples) + 16
+            # the following states alternate, starting with the opposite of the current state
+            next_states = (np.arange(count) % 2 == 0) != self.curr_state_b
+            life_times = np.where(next_states, self.life_time_bright, self.life_time_dark)
+            dwell_samples = (self._rng.exponential(life_times) / sample_time).astype(np.int64) + 1
+            switches = np.cumsum(dwell_samples)
+            last = np.searchsorted(switches, missing)
+            if last == count:
+                # not enough dwell times drawn, continue after the last one
+                states.append(np.repeat(next_states, dwell_samples))
+                filled += switches[-1]
+                self.curr_state_b = bool(next_states[-1])
+                self._dwell_samples_left = 0
+            else:
+                dwell_samples = dwell_samples[:last + 1]
+                dwell_samples[last] -= switches[last] - missing
+                states.append(np.repeat(next_states[:last + 1], dwell_samples))
+                filled = samples
+                self.curr_state_b = bool(next_states[last])
+                self._dwell_samples_left = int(switches[last] - missing)
+        return np.concatenate(states)
 
     def close_counter(self):
         """ Closes the counter and cleans up afterwards.
@@ -38,17 +38,23 @@ class SpectrometerInterfaceDummy(Base,SpectrometerInterface):
 
     spectrometer_dummy:
         module.Class: 'spectrometer.spectrometer_dummy.SpectrometerInterfaceDummy'
-        fitlogic: 'fitlogic' # name of the fitlogic module, see default config
 
     """
 
-    fitlogic = Connector(interface='FitLogic')
+    # not used anymore, the spectrum is calculated with numpy
+    fitlogic = Connector(interface='FitLogic', optional=True)
+
+    # SiV zero phonon lines: amplitude, center in nm, sigma in nm
+    _siv_lines = ((2000, 736.46, 0.075),
+                  (5800, 736.545, 0.05),
+                  (7500, 736.923, 0.05),
+                  (1000, 736.99, 0.075))
 
     def on_activate(self):
         """ Activate module.
         """
-        self._fitLogic = self.fitlogic()
         self.exposure = 0.1
+        self._spectrum = None
 
     def on_deactivate(self):
         """ Deactivate module.
@@ -60,35 +66,28 @@ class SpectrometerInterfaceDummy(Base,SpectrometerInterface):
 
             @return ndarray: 1024-value ndarray containing wavelength and intensity of simulated spectrum
         """
-        length = 1024
-
-        data = np.empty((2, length), dtype=np.double)
-        data[0] = np.arange(730, 750, 20/length)
-        data[1] = np.random.uniform(0, 2000, length)
-
-        lorentz, params = self._fitLogic.make_multiplelorentzian_model(no_of_functions=4)
-        sigma = 0.05
-        params.add('l0_amplitude', value=2000)
-        params.add('l0_center', value=736.46)
-        params.add('l0_sigma', value=1.5*sigma)
-        params.add('l1_amplitude', value=5800)
-        params.add('l1_center', value=736.545)
-        params.add('l1_sigma', value=sigma)
-        params.add('l2_amplitude', value=7500)
-        params.add('l2_center', value=736.923)
-        params.add('l2_sigma', value=sigma)
-        params.add('l3_amplitude', value=1000)
-        params.add('l3_center', value=736.99)
-        params.add('l3_sigma', value=1.5*sigma)
-        params.add('offset', value=50000.)
-
-        data[1] += lorentz.eval(x=data[0], params=params)
-
-        data[0] = data[0] * 1e-9  # return to logic in SI units (m)
+        if self._spectrum is None:
+            self._spectrum = self._calculate_spectrum(1024)
+
+        data = self._spectrum.copy()
+        data[1] += np.random.uniform(0, 2000, data.shape[1])
 
         time.sleep(self.exposure)
         return data
 
+    def _calculate_spectrum(self, length):
+        """ Noise free spectrum: SiV lines (Lorentzians) on a constant offset.
+
+            @param int length: number of wavelengths
+
+            @return ndarray: wavelengths in m and intensities, shape (2, length)
+        """
+        wavelength = np.arange(730, 750, 20/length)
+        spectrum = np.full(length, 50000.)
+        for amplitude, center, sigma in self._siv_lines:
+            spectrum += amplitude * sigma**2 / ((wavelength - center)**2 + sigma**2)
+        return np.vstack((wavelength * 1e-9, spectrum))  # return to logic in SI units (m)
+
     def saveSpectrum(self, path, postfix = ''):
         """ Dummy save function.
 
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Dummy hardware module with an artificial activation delay to test and benchmark module startup.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import time
+
+from core.module import Base
+from core.configoption import ConfigOption
+from core.connector import Connector
+
+
+class StartupDelayDummy(Base):
+    """ Hardware dummy that blocks for a configurable time during activation, like a slow
+    instrument connection would. Other delay dummies can be connected to build a dependency tree.
+
+    Example config for copy-paste:
+
+    startup_delay_dummy:
+        module.Class: 'startup_delay_dummy.StartupDelayDummy'
+        activation_delay: 1.5  # in s
+        parallel_activation: True
+        connect:
+            dependency: 'other_startup_delay_dummy'
+
+    """
+
+    dependency = Connector(interface='StartupDelayDummy', optional=True)
+    second_dependency = Connector(interface='StartupDelayDummy', optional=True)
+
+    _activation_delay = ConfigOption('activation_delay', 1.0, missing='warn')
+
+    def on_activate(self):
+        """ Activate module.
+        """
+        time.sleep(self._activation_delay)
+
+    def on_deactivate(self):
+        """ Deactivate module.
+        """
+        pass
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file contains a qudi dummy time tagger streaming the tags of an antibunched single photon
+source.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import numpy as np
+import time
+
+from core.module import Base
+from core.configoption import ConfigOption
+from core.util.mutex import Mutex
+from interface.time_tag_stream_interface import TimeTagStreamInterface, TimeTagStreamConstraints
+
+
+class TimeTagStreamDummy(Base, TimeTagStreamInterface):
+    """ Dummy time tagger streaming the photons of a single emitter in a Hanbury Brown-Twiss setup.
+
+    The emitter is excited either continuously (repetition_rate: 0) or by laser pulses, and each
+    emitted photon is sent to one of two detectors ('det 1', 'det 2'). After an emission the emitter
+    has to be excited again, so the photon statistics is antibunched (g2(0) = 0 apart from the
+    uncorrelated dark counts). With pulsed excitation every laser pulse is tagged on the 'sync'
+    channel and the photons are delayed by the exponentially distributed decay time.
+
+    Drawing random numbers for every tag is too slow for high count rates, so a pool of pool_size
+    tags is simulated on activation and replayed periodically in real time. The stream is therefore
+    periodic with the pool duration (pool_size / count rate), which does not matter for
+    correlations on much shorter time scales.
+
+    Example config for copy-paste:
+
+    timetag_dummy:
+        module.Class: 'time_tag_stream_dummy.TimeTagStreamDummy'
+        count_rate: 10e6  # detected photons per second on both detectors
+        lifetime: 12e-9  # lifetime of the excited state in s
+        detection_efficiency: 0.5
+        dark_count_rate: 1000  # per detector
+        repetition_rate: 0  # laser repetition rate in Hz, 0 for continuous excitation
+        pool_size: 2097152
+        buffer_size: 10000000
+        random_seed: 42
+    """
+
+    _count_rate = ConfigOption('count_rate', 10e6, missing='nothing')
+    _lifetime = ConfigOption('lifetime', 12e-9, missing='nothing')
+    _detection_efficiency = ConfigOption('detection_efficiency', 0.5, missing='nothing')
+    _dark_count_rate = ConfigOption('dark_count_rate', 1000, missing='nothing')
+    _repetition_rate = ConfigOption('repetition_rate', 0, missing='nothing')
+    _pool_size = ConfigOption('pool_size', 2**21, missing='nothing')
+    _default_buffer_size = ConfigOption('buffer_size', 10000000, missing='nothing')
+    _random_seed = ConfigOption('random_seed', None, missing='nothing')
+
+    _time_resolution = 1e-12
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._thread_lock = Mutex()
+        self._constraints = None
+        self._active_channels = tuple()
+        self._buffer_size = 0
+        self._pool = None
+        self._pool_times = None
+        self._pool_channels = None
+        self._pool_period = 0
+        self._start_time = None
+        self._read_index = 0
+        self._has_overflown = False
+
+    def on_activate(self):
+        """ Initialisation performed during activation of the module.
+        """
+        channels = ('det 1', 'det 2')
+        if self._repetition_rate > 0:
+            channels += ('sync', )
+        self._constraints = TimeTagStreamConstraints(channels=channels,
+                                                     time_resolution=self._time_resolution,
+                                                     max_buffer_size=2**31 - 1,
+                                                     max_count_rate=np.inf)
+        self._pool = self._simulate_pool()
+        self._start_time = None
+        self._has_overflown = False
+        self.configure(active_channels=channels, buffer_size=self._default_buffer_size)
+
+    def on_deactivate(self):
+        """ Deinitialisation performed during deactivation of the module.
+        """
+        self._start_time = None
+        self._pool = None
+        self._pool_times = None
+        self._pool_channels = None
+
+    def _simulate_pool(self):
+        """ Simulate the tags of all channels, which are replayed periodically.
+
+        @return tuple(numpy.ndarray, numpy.ndarray, int): sorted timestamps, channel indices (into
+                                                          the channels of the constraints) and
+                                                          the period of the pool in ps
+        """
+        random_state = np.random.RandomState(self._random_seed)
+        efficiency = min(max(self._detection_efficiency, 1e-6), 1)
+        emission_rate = self._count_rate / efficiency
+        emissions = int(np.ceil(self._pool_size / efficiency))
+
+        if self._repetition_rate > 0:
+            excitation_probability = emission_rate / self._repetition_rate
+            if excitation_probability > 1:
+                raise ValueError('The count rate of {0:.3g}/s needs more than one emission per '
+                                 'laser pulse. Reduce the count rate or increase the detection '
+                                 'efficiency or repetition rate.'.format(self._count_rate))
+            # every pulse excites with excitation_probability
+            pulses = random_state.geometric(excitation_probability, emissions).cumsum()
+            times = pulses / self._repetition_rate
+            times += random_state.exponential(self._lifetime, emissions)
+        else:
+            # the emitter is excited with the rate needed for emission_rate and decays with the
+            # lifetime, a new excitation can only happen after the decay
+            excitation_time = 1 / emission_rate - self._lifetime
+            if excitation_time <= 0:
+                raise ValueError('The count rate of {0:.3g}/s can not be reached with a lifetime of '
+                                 '{1:.3g} s. Reduce the count rate or increase the detection '
+                                 'efficiency.'.format(self._count_rate, self._lifetime))
+            times = random_state.exponential(excitation_time, emissions)
+            times += random_state.exponential(self._lifetime, emissions)
+            times = times.cumsum()
+        times = times[random_state.random_sample(emissions) < efficiency]
+        if self._repetition_rate > 0:
+            # the pool has to contain whole laser periods to be replayed periodically
+            sync = np.arange(int(times[-1] * self._repetition_rate)) / self._repetition_rate
+            duration = sync.size / self._repetition_rate
+            times = times[times < duration]
+        else:
+            duration = times[-1] + 1 / emission_rate
+        channels = random_state.randint(0, 2, times.size).astype(np.uint8)
+
+        dark_counts = random_state.poisson(2 * self._dark_count_rate * duration)
+        times = np.concatenate((times, random_state.uniform(0, duration, dark_counts)))
+        channels = np.concatenate(
+            (channels, random_state.randint(0, 2, dark_counts).astype(np.uint8)))
+        if self._repetition_rate > 0:
+            times = np.concatenate((times, sync))
+            channels = np.concatenate((channels, np.full(sync.size, 2, dtype=np.uint8)))
+
+        times = np.round(times / self._time_resolution).astype(np.int64)
+        order = np.argsort(times, kind='mergesort')
+        return times[order], channels[order], int(round(duration / self._time_resolution))
+
+    def get_constraints(self):
+        """ Return the constraints of the time tagger.
+
+        @return TimeTagStreamConstraints: constraints of the device
+        """
+        return self._constraints
+
+    @property
+    def time_resolution(self):
+        """ The duration of one timestamp unit in s. """
+        return self._time_resolution
+
+    @property
+    def active_channels(self):
+        """ The names of the active channels. """
+        return self._active_channels
+
+    @property
+    def buffer_size(self):
+        """ The number of tags that can be buffered. """
+        return self._buffer_size
+
+    @property
+    def available_tags(self):
+        """ The number of tags that are buffered and can be read. """
+        with self._thread_lock:
+            if self._start_time is None:
+                return 0
+            return min(self._tags_until_now() - self._read_index, self._buffer_size)
+
+    @property
+    def buffer_overflown(self):
+        """ Flag indicating that tags have been lost since the stream was started. """
+        return self._has_overflown
+
+    @property
+    def is_running(self):
+        """ Flag indicating if the stream is running. """
+        return self._start_time is not None
+
+    def configure(self, active_channels=None, buffer_size=None):
+        """ Configure the stream. Only possible while it is not running.
+
+        @param iterable active_channels: optional, names of the channels to stream
+        @param int buffer_size: optional, number of tags to buffer
+
+        @return dict: all current settings ('active_channels', 'buffer_size')
+        """
+        with self._thread_lock:
+            if self.is_running:
+                self.log.error('Unable to configure the time tagger while it is running.')
+            else:
+                if buffer_size is not None:
+                    if 0 < buffer_size <= self._constraints.max_buffer_size:
+                        self._buffer_size = int(buffer_size)
+                    else:
+                        self.log.error('Invalid buffer size {0}.'.format(buffer_size))
+                if active_channels is not None:
+                    active_channels = tuple(str(ch) for ch in active_channels)
+                    if not active_channels or any(
+                            ch not in self._constraints.channels for ch in active_channels):
+                        self.log.error('Invalid active channels {0}. Available channels are {1}.'
+                                       ''.format(active_channels, self._constraints.channels))
+                    else:
+                        self._set_active_channels(active_channels)
+            return {'active_channels': self._active_channels, 'buffer_size': self._buffer_size}
+
+    def _set_active_channels(self, active_channels):
+        """ Select the tags of the active channels from the pool and renumber their channels. """
+        times, channels, self._pool_period = self._pool
+        lookup = np.full(len(self._constraints.channels), 255, dtype=np.uint8)
+        for index, channel in enumerate(active_channels):
+            lookup[self._constraints.channels.index(channel)] = index
+        channels = lookup[channels]
+        mask = channels != 255
+        self._pool_times = times[mask]
+        self._pool_channels = channels[mask]
+        self._active_channels = active_channels
+
+    def start_stream(self):
+        """ Start streaming tags.
+
+        @return int: error code (0: OK, -1: error)
+        """
+        with self._thread_lock:
+            if self.is_running:
+                self.log.warning('Time tag stream is already running.')
+                return 0
+            self._read_index = 0
+            self._has_overflown = False
+            self._start_time = time.perf_counter()
+        return 0
+
+    def stop_stream(self):
+        """ Stop streaming tags.
+
+        @return int: error code (0: OK, -1: error)
+        """
+        with self._thread_lock:
+            self._start_time = None
+        return 0
+
+    def _tags_until_now(self):
+        """ Total number of tags with a timestamp before now. """
+        now = int((time.perf_counter() - self._start_time) / self._time_resolution)
+        periods, remainder = divmod(now, self._pool_period)
+        return periods * self._pool_times.size + int(
+            np.searchsorted(self._pool_times, remainder, side='right'))
+
+    def read_tags_into_buffer(self, timestamps, channels):
+        """ Read the available tags into the given arrays, without waiting for more tags.
+
+        @param numpy.ndarray timestamps: 1D array of dtype numpy.int64 to write the timestamps to
+        @param numpy.ndarray channels: 1D array of dtype numpy.uint8 and the same size as
+                                       timestamps to write the channel indices to
+
+        @return int: number of tags read; negative value indicates error
+        """
+        if timestamps.dtype != np.int64 or channels.dtype != np.uint8 \
+                or timestamps.shape != channels.shape or timestamps.ndim != 1:
+            self.log.error('Tags must be read into 1D arrays of equal size with dtype int64 '
+                           '(timestamps) and uint8 (channels).')
+            return -1
+        with self._thread_lock:
+            if not self.is_running:
+                self.log.error('Unable to read tags. Time tag stream is not running.')
+                return -1
+            end = self._tags_until_now()
+            if end - self._read_index > self._buffer_size:
+                self._has_overflown = True
+                self._read_index = end - self._buffer_size
+            end = min(end, self._read_index + timestamps.size)
+
+            # copy the tags period by period from the pool
+            pool_size = self._pool_times.size
+            written = 0
+            index = self._read_index
+            while index < end:
+                period, start = divmod(index, pool_size)
+                number = min(end - index, pool_size - start)
+                out = timestamps[written:written + number]
+                out[:] = self._pool_times[start:start + number]
+                out += period * self._pool_period
+                channels[written:written + number] = self._pool_channels[start:start + number]
+                written += number
+                index += number
+            self._read_index = end
+        return written
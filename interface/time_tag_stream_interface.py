@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+"""
+Interface for a continuous stream of time tags (time-correlated single photon counting).
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+from core.interface import abstract_interface_method
+from core.meta import InterfaceMetaclass
+
+
+class TimeTagStreamInterface(metaclass=InterfaceMetaclass):
+    """
+    Interface for a time tagger streaming every detected event as (timestamp, channel) pair.
+
+    Timestamps are integers (numpy.int64) in units of the time resolution of the device, counted
+    from the start of the stream, and are sorted in time. Channels are given as index into the
+    list of active channels (numpy.uint8). The tags are collected in a buffer of the hardware
+    (or its driver) and are read chunk by chunk into arrays preallocated by the caller, so no
+    memory has to be allocated per read.
+    """
+
+    @abstract_interface_method
+    def get_constraints(self):
+        """
+        Return the constraints of the time tagger.
+
+        @return TimeTagStreamConstraints: constraints of the device
+        """
+        pass
+
+    @property
+    @abstract_interface_method
+    def time_resolution(self):
+        """
+        Read-only property.
+        The duration of one timestamp unit.
+
+        @return float: time resolution in s
+        """
+        pass
+
+    @property
+    @abstract_interface_method
+    def active_channels(self):
+        """
+        Read-only property.
+        The names of the active channels. The channel index of a tag refers to this tuple.
+
+        @return tuple(str): names of the active channels
+        """
+        pass
+
+    @property
+    @abstract_interface_method
+    def buffer_size(self):
+        """
+        Read-only property.
+        The number of tags that can be buffered by the hardware before tags get lost.
+
+        @return int: buffer size in tags
+        """
+        pass
+
+    @property
+    @abstract_interface_method
+    def available_tags(self):
+        """
+        Read-only property.
+        The number of tags that are buffered and can be read.
+
+        @return int: number of available tags
+        """
+        pass
+
+    @property
+    @abstract_interface_method
+    def buffer_overflown(self):
+        """
+        Read-only property.
+        Flag indicating that tags have been lost since the stream was started, because they were
+        not read fast enough.
+
+        @return bool: buffer has overflown (True) or not (False)
+        """
+        pass
+
+    @property
+    @abstract_interface_method
+    def is_running(self):
+        """
+        Read-only property.
+        Flag indicating if the stream is running.
+
+        @return bool: stream is running (True) or not (False)
+        """
+        pass
+
+    @abstract_interface_method
+    def configure(self, active_channels=None, buffer_size=None):
+        """
+        Configure the stream. Only possible while it is not running.
+
+        @param iterable active_channels: optional, names of the channels to stream
+        @param int buffer_size: optional, number of tags to buffer
+
+        @return dict: all current settings ('active_channels', 'buffer_size')
+        """
+        pass
+
+    @abstract_interface_method
+    def start_stream(self):
+        """
+        Start streaming tags. Resets the timestamps, the buffer and the overflow flag.
+
+        @return int: error code (0: OK, -1: error)
+        """
+        pass
+
+    @abstract_interface_method
+    def stop_stream(self):
+        """
+        Stop streaming tags.
+
+        @return int: error code (0: OK, -1: error)
+        """
+        pass
+
+    @abstract_interface_method
+    def read_tags_into_buffer(self, timestamps, channels):
+        """
+        Read the available tags into the given arrays, without waiting for more tags.
+        At most timestamps.size tags are read, the oldest ones first. Remaining tags stay in the
+        buffer for the next call.
+
+        @param numpy.ndarray timestamps: 1D array of dtype numpy.int64 to write the timestamps to
+        @param numpy.ndarray channels: 1D array of dtype numpy.uint8 and the same size as
+                                       timestamps to write the channel indices to
+
+        @return int: number of tags read; negative value indicates error
+        """
+        pass
+
+
+class TimeTagStreamConstraints:
+    """
+    Collection of constraints for hardware modules implementing TimeTagStreamInterface.
+    """
+    def __init__(self, channels=None, time_resolution=None, max_buffer_size=None,
+                 max_count_rate=None):
+        """
+        @param iterable channels: names of all channels of the device
+        @param float time_resolution: duration of one timestamp unit in s
+        @param int max_buffer_size: maximum number of tags that can be buffered
+        @param float max_count_rate: maximum number of tags per second the device can stream
+        """
+        self.channels = tuple() if channels is None else tuple(channels)
+        self.time_resolution = time_resolution
+        self.max_buffer_size = max_buffer_size
+        self.max_count_rate = max_count_rate
@@ -24,6 +24,7 @@ import numpy as np
 
 from core.connector import Connector
 from core.configoption import ConfigOption
+from core.util.looptimer import get_loop_timer
 from core.util.mutex import Mutex
 from logic.generic_logic import GenericLogic
 from qtpy import QtCore
@@ -31,12 +32,237 @@ import matplotlib.pyplot as plt
 import matplotlib as mpl
 
 import datetime
+import json
+import os
+import threading
+import time
 from collections import OrderedDict
 
 
+class FrameRingBuffer:
+    """ Preallocated ring buffer of the last frames of a camera.
+
+    Frames are numbered consecutively from 0. The buffer keeps the last size frames with their
+    timestamps; older frames are overwritten. The buffer is allocated with the shape and type of the
+    first frame and reallocated if they change. All methods are thread safe.
+    """
+
+    def __init__(self, size):
+        """
+        @param int size: number of frames in the buffer
+        """
+        self.size = max(int(size), 1)
+        self._frames = None
+        self._timestamps = np.zeros(self.size)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def count(self):
+        """ Number of frames put into the buffer. """
+        return self._count
+
+    def clear(self):
+        """ Forget all frames (the memory is kept). """
+        with self._lock:
+            self._count = 0
+
+    def put(self, frame, timestamp):
+        """ Copy a frame into the buffer.
+
+        @param numpy.ndarray frame: image data
+        @param float timestamp: time of the frame (time.time())
+
+        @return int: number of the frame
+        """
+        frame = np.asarray(frame)
+        with self._lock:
+            if (self._frames is None or self._frames.shape[1:] != frame.shape
+                    or self._frames.dtype != frame.dtype):
+                self._frames = np.empty((self.size, ) + frame.shape, dtype=frame.dtype)
+                self._count = 0
+            index = self._count % self.size
+            self._frames[index] = frame
+            self._timestamps[index] = timestamp
+            self._count += 1
+            return self._count - 1
+
+    def latest(self):
+        """ Copy of the last frame.
+
+        @return (numpy.ndarray, float, int): frame, timestamp and number, (None, None, -1) if empty
+        """
+        with self._lock:
+            if self._count == 0:
+                return None, None, -1
+            index = (self._count - 1) % self.size
+            return self._frames[index].copy(), self._timestamps[index], self._count - 1
+
+    def read(self, first, max_frames=None):
+        """ Copy of the frames starting at a frame number.
+
+        @param int first: number of the first frame to read
+        @param int max_frames: optional, maximum number of frames to read
+
+        @return (numpy.ndarray, numpy.ndarray, int, int): frames, timestamps, number of the first
+                returned frame and number of requested frames that were overwritten already
+        """
+        with self._lock:
+            oldest = max(self._count - self.size, 0)
+            dropped = max(oldest - first, 0)
+            first = max(first, oldest)
+            stop = self._count if max_frames is None else min(self._count, first + max_frames)
+            if stop <= first:
+                return None, np.zeros(0), first, dropped
+            indices = np.arange(first, stop) % self.size
+            return self._frames[indices], self._timestamps[indices], first, dropped
+
+
+class FrameRecording:
+    """ Video recorded to chunks of memory mapped .npy files.
+
+    Frames are stored in frames_XXXXX.npy with chunk_frames frames each, their timestamps in
+    timestamps_XXXXX.npy. recording.json contains the number of frames, the dropped frames and the
+    acquisition parameters when the recording is closed. Load a recording with
+    FrameRecording.load(directory).
+    """
+
+    def __init__(self, directory, shape, dtype, chunk_frames=100, parameters=None):
+        """
+        @param str directory: directory of the recording (created)
+        @param tuple shape: shape of one frame
+        @param dtype: data type of the frames
+        @param int chunk_frames: number of frames per chunk file
+        @param dict parameters: optional, acquisition parameters stored in recording.json
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.chunk_frames = int(chunk_frames)
+        self.parameters = OrderedDict() if parameters is None else OrderedDict(parameters)
+        self.frames = 0
+        self.dropped_frames = 0
+        self._frame_chunks = list()
+        self._timestamp_chunks = list()
+
+    def _open(self, name, shape, dtype):
+        filename = os.path.join(self.directory, name)
+        return np.lib.format.open_memmap(filename, mode='w+', dtype=dtype, shape=shape)
+
+    def write(self, frames, timestamps):
+        """ Append frames.
+
+        @param numpy.ndarray frames: frames of shape (n, ) + shape
+        @param numpy.ndarray timestamps: n timestamps
+        """
+        written = 0
+        while written < len(frames):
+            chunk, row = divmod(self.frames, self.chunk_frames)
+            if chunk == len(self._frame_chunks):
+                self._frame_chunks.append(self._open(
+                    'frames_{0:05d}.npy'.format(chunk),
+                    (self.chunk_frames, ) + self.shape, self.dtype))
+                self._timestamp_chunks.append(self._open(
+                    'timestamps_{0:05d}.npy'.format(chunk), (self.chunk_frames, ), np.float64))
+            number = min(len(frames) - written, self.chunk_frames - row)
+            self._frame_chunks[chunk][row:row + number] = frames[written:written + number]
+            self._timestamp_chunks[chunk][row:row + number] = timestamps[written:written + number]
+            written += number
+            self.frames += number
+
+    def frame(self, index):
+        """ A recorded frame.
+
+        @param int index: number of the frame in the recording
+
+        @return numpy.ndarray: the frame, view of the memory map
+        """
+        chunk, row = divmod(index, self.chunk_frames)
+        return self._frame_chunks[chunk][row]
+
+    def timestamps(self):
+        """ Timestamps of all frames.
+
+        @return numpy.ndarray: timestamps (time.time()) of the frames
+        """
+        if not self._timestamp_chunks:
+            return np.zeros(0)
+        return np.concatenate(self._timestamp_chunks)[:self.frames]
+
+    def to_array(self):
+        """ All frames in one array (copied into memory).
+
+        @return numpy.ndarray: frames of shape (frames, ) + shape
+        """
+        if not self._frame_chunks:
+            return np.zeros((0, ) + self.shape, dtype=self.dtype)
+        return np.concatenate(self._frame_chunks)[:self.frames]
+
+    def close(self):
+        """ Write all frames to the files and save recording.json. """
+        for chunk in self._frame_chunks + self._timestamp_chunks:
+            chunk.flush()
+        info = OrderedDict()
+        info['frames'] = self.frames
+        info['dropped_frames'] = self.dropped_frames
+        info['shape'] = list(self.shape)
+        info['dtype'] = self.dtype.str
+        info['chunk_frames'] = self.chunk_frames
+        info['parameters'] = self.parameters
+        with open(os.path.join(self.directory, 'recording.json'), 'w') as file:
+            json.dump(info, file, indent=4)
+
+    @classmethod
+    def load(cls, directory):
+        """ Open a closed recording for reading.
+
+        @param str directory: directory of the recording
+
+        @return FrameRecording: the recording
+        """
+        with open(os.path.join(directory, 'recording.json')) as file:
+            info = json.load(file)
+        recording = cls.__new__(cls)
+        recording.directory = directory
+        recording.shape = tuple(info['shape'])
+        recording.dtype = np.dtype(info['dtype'])
+        recording.chunk_frames = info['chunk_frames']
+        recording.parameters = OrderedDict(info['parameters'])
+        recording.frames = info['frames']
+        recording.dropped_frames = info['dropped_frames']
+        chunks = -(-recording.frames // recording.chunk_frames)
+        recording._frame_chunks = [
+            np.load(os.path.join(directory, 'frames_{0:05d}.npy'.format(i)), mmap_mode='r')
+            for i in range(chunks)]
+        recording._timestamp_chunks = [
+            np.load(os.path.join(directory, 'timestamps_{0:05d}.npy'.format(i)), mmap_mode='r')
+            for i in range(chunks)]
+        return recording
+
+
 class CameraLogic(GenericLogic):
     """
     Control a camera.
+
+    While the video runs, frames are read from the hardware in an acquisition thread as fast as the
+    camera delivers them (live acquisition: once per exposure time) and put into a ring buffer of
+    buffer_frames frames. The display is updated at most with the display rate (config option
+    default_exposure, in frames per second), independent of the acquisition rate.
+    A recording streams all frames of the ring buffer to disk (see FrameRecording). Frames that
+    were overwritten in the ring buffer before they could be written are counted as dropped frames,
+    acquisitions that came later than one exposure time after the previous one as missed frames.
+
+    Example config for copy-paste:
+
+    camera_logic:
+        module.Class: 'camera_logic.CameraLogic'
+        default_exposure: 20  # maximum display rate in Hz
+        buffer_frames: 100
+        recording_chunk_frames: 100
+        connect:
+            hardware: 'camera_dummy'
+            savelogic: 'savelogic'
     """
 
     # declare connectors
@@ -44,11 +270,14 @@ class CameraLogic(GenericLogic):
     savelogic = Connector(interface='SaveLogic')
     _max_fps = ConfigOption('default_exposure', 20)
     _fps = _max_fps
+    _buffer_frames = ConfigOption('buffer_frames', 100)
+    _recording_chunk_frames = ConfigOption('recording_chunk_frames', 100)
 
     # signals
     sigUpdateDisplay = QtCore.Signal()
     sigAcquisitionFinished = QtCore.Signal()
     sigVideoFinished = QtCore.Signal()
+    sigRecordingFinished = QtCore.Signal(str)
     timer = None
 
     enabled = False
@@ -61,6 +290,15 @@ class CameraLogic(GenericLogic):
         super().__init__(config=config, **kwargs)
 
         self.threadlock = Mutex()
+        self._hardware_lock = threading.Lock()
+        self._stop_acquisition = threading.Event()
+        self._acquisition_thread = None
+        self._recording_thread = None
+        self._recording = None
+        self._stop_recording = threading.Event()
+        self._recording_stop_frame = None
+        self._displayed_frame = -1
+        self.missed_frames = 0
 
     def on_activate(self):
         """ Initialisation performed during activation of the module.
@@ -73,30 +311,38 @@ class CameraLogic(GenericLogic):
         self.get_exposure()
         self.get_gain()
 
+        self._frame_buffer = FrameRingBuffer(self._buffer_frames)
+        self._acquisition_timer = get_loop_timer('{0}.acquire_frame'.format(self._name))
+
         self.timer = QtCore.QTimer()
         self.timer.setSingleShot(True)
         self.timer.timeout.connect(self.loop)
 
     def on_deactivate(self):
         """ Perform required deactivation. """
-        pass
+        if self.enabled:
+            self.stop_loop()
 
     def set_exposure(self, time):
         """ Set exposure of hardware """
-        self._hardware.set_exposure(time)
+        with self._hardware_lock:
+            self._hardware.set_exposure(time)
         self.get_exposure()
 
     def get_exposure(self):
         """ Get exposure of hardware """
-        self._exposure = self._hardware.get_exposure()
+        with self._hardware_lock:
+            self._exposure = self._hardware.get_exposure()
         self._fps = min(1 / self._exposure, self._max_fps)
         return self._exposure
 
     def set_gain(self, gain):
-        self._hardware.set_gain(gain)
+        with self._hardware_lock:
+            self._hardware.set_gain(gain)
 
     def get_gain(self):
-        gain = self._hardware.get_gain()
+        with self._hardware_lock:
+            gain = self._hardware.get_gain()
         self._gain = gain
         return gain
 
@@ -112,32 +358,173 @@ class CameraLogic(GenericLogic):
     def start_loop(self):
         """ Start the data recording loop.
         """
+        if self.enabled:
+            return
         self.enabled = True
-        self.timer.start(1000*1/self._fps)
+        self.missed_frames = 0
+        self._frame_buffer.clear()
+        self._displayed_frame = -1
+        self._acquisition_timer.period = self._exposure
 
         if self._hardware.support_live_acquisition():
             self._hardware.start_live_acquisition()
-        else:
-            self._hardware.start_single_acquisition()
+
+        self._stop_acquisition.clear()
+        self._acquisition_thread = threading.Thread(
+            target=self._acquisition_loop, name='{0} acquisition'.format(self._name), daemon=True)
+        self._acquisition_thread.start()
+        self.timer.start(int(1000 / self._fps))
 
     def stop_loop(self):
         """ Stop the data recording loop.
         """
         self.timer.stop()
+        self._stop_acquisition.set()
+        if self._acquisition_thread is not None:
+            self._acquisition_thread.join()
+            self._acquisition_thread = None
+        self.stop_recording()
         self.enabled = False
         self._hardware.stop_acquisition()
+        self.loop()
         self.sigVideoFinished.emit()
 
+    def _acquisition_loop(self):
+        """ Read frames from the hardware into the ring buffer until the loop is stopped.
+
+        Runs in the acquisition thread.
+        """
+        live = self._hardware.support_live_acquisition()
+        last_timestamp = None
+        next_frame_time = time.perf_counter()
+        while not self._stop_acquisition.is_set():
+            with self._acquisition_timer.iteration():
+                try:
+                    with self._hardware_lock:
+                        if not live:
+                            # the hardware has to check it's not busy
+                            self._hardware.start_single_acquisition()
+                        frame = self._hardware.get_acquired_data()
+                except Exception:
+                    self.log.exception('Reading a frame from the camera failed, video stopped.')
+                    break
+                timestamp = time.time()
+                self._frame_buffer.put(frame, timestamp)
+                if live and last_timestamp is not None:
+                    late = int((timestamp - last_timestamp) / self._exposure - 0.5)
+                    self.missed_frames += max(late, 0)
+                last_timestamp = timestamp
+            if live:
+                # a live camera delivers a new frame every exposure time
+                now = time.perf_counter()
+                next_frame_time = max(next_frame_time + self._exposure, now)
+                self._stop_acquisition.wait(next_frame_time - now)
 
     def loop(self):
-        """ Execute step in the data recording loop: save one of each control and process values
+        """ Update the displayed image with the last frame of the ring buffer (if there is a new one).
         """
-        self._last_image = self._hardware.get_acquired_data()
-        self.sigUpdateDisplay.emit()
+        frame, timestamp, number = self._frame_buffer.latest()
+        if number > self._displayed_frame:
+            self._displayed_frame = number
+            self._last_image = frame
+            self.sigUpdateDisplay.emit()
         if self.enabled:
-            self.timer.start(1000 * 1 / self._fps)
-            if not self._hardware.support_live_acquisition():
-                self._hardware.start_single_acquisition()  # the hardware has to check it's not busy
+            self.timer.start(int(1000 / self._fps))
+
+    @property
+    def acquired_frames(self):
+        """ Number of frames acquired since the start of the video. """
+        return self._frame_buffer.count
+
+    @property
+    def dropped_frames(self):
+        """ Number of frames that were overwritten before the recording could write them. """
+        return 0 if self._recording is None else self._recording.dropped_frames
+
+    def is_recording(self):
+        """ Whether a recording is running.
+
+        @return bool: recording
+        """
+        return self._recording_thread is not None
+
+    def start_recording(self, directory=None):
+        """ Record the video to disk. Starts the video if it is not running.
+
+        @param str directory: optional, directory of the recording. Default: new directory in the
+                              camera data directory.
+
+        @return str: directory of the recording, None if a recording is running already
+        """
+        if self.is_recording():
+            self.log.error('A recording is running already.')
+            return None
+        if directory is None:
+            directory = os.path.join(
+                self._save_logic.get_path_for_module('Camera'),
+                datetime.datetime.now().strftime('%Y%m%d-%H%M-%S_video'))
+        if not self.enabled:
+            self.start_loop()
+        first = self._frame_buffer.count
+        self._recording = None
+        self._stop_recording.clear()
+        self._recording_thread = threading.Thread(
+            target=self._recording_loop, args=(directory, first),
+            name='{0} recording'.format(self._name), daemon=True)
+        self._recording_thread.start()
+        return directory
+
+    def stop_recording(self):
+        """ Stop the recording after writing all acquired frames.
+
+        @return str: directory of the recording, None if there was no recording
+        """
+        if not self.is_recording():
+            return None
+        self._recording_stop_frame = self._frame_buffer.count
+        self._stop_recording.set()
+        self._recording_thread.join()
+        self._recording_thread = None
+        if self._recording is None:
+            return None
+        self._recording.close()
+        self.log.info('Recorded {0} frames ({1} dropped) to {2}.'.format(
+            self._recording.frames, self._recording.dropped_frames, self._recording.directory))
+        self.sigRecordingFinished.emit(self._recording.directory)
+        return self._recording.directory
+
+    def _recording_loop(self, directory, first):
+        """ Write the frames of the ring buffer to the recording until the recording is stopped.
+
+        Runs in the recording thread.
+
+        @param str directory: directory of the recording
+        @param int first: number of the first frame to record
+        """
+        next_frame = first
+        chunk = max(self._frame_buffer.size // 2, 1)
+        while True:
+            if self._stop_recording.is_set():
+                # write the frames acquired until the stop
+                chunk = min(chunk, self._recording_stop_frame - next_frame)
+                if chunk <= 0:
+                    break
+            frames, timestamps, first_read, dropped = self._frame_buffer.read(next_frame, chunk)
+            if frames is not None:
+                if self._recording is None:
+                    parameters = OrderedDict()
+                    parameters['Exposure time (s)'] = self._exposure
+                    parameters['Gain'] = self._gain
+                    self._recording = FrameRecording(
+                        directory, frames.shape[1:], frames.dtype,
+                        chunk_frames=self._recording_chunk_frames, parameters=parameters)
+                self._recording.dropped_frames += dropped
+                self._recording.write(frames, timestamps)
+                next_frame = first_read + len(frames)
+            elif self._stop_recording.is_set():
+                break
+            else:
+                self._stop_recording.wait(min(self._exposure, 0.05))
 
     def get_last_image(self):
         """ Return last acquired image """
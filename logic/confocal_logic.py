@@ -21,16 +21,21 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 
 from qtpy import QtCore
 from collections import OrderedDict
-from copy import copy
+import os
+import re
 import time
+import uuid
 import datetime
 import numpy as np
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 
 from logic.generic_logic import GenericLogic
+from logic.save_worker import DeferredFigure
 from core.util.mutex import Mutex
+from core.util.looptimer import timed_loop
 from core.connector import Connector
+from core.configoption import ConfigOption
 from core.statusvariable import StatusVar
 
 
@@ -41,6 +46,232 @@ class OldConfigFileError(Exception):
         super().__init__('Old configuration file detected. Ignoring confocal history.')
 
 
+class ConfocalScanImage:
+    """ Compact representation of a confocal scan image.
+
+    The scan axes are stored once as 1D vectors: the horizontal axis (pixels of a line), the
+    vertical axis (lines) and the position of the remaining scanner axis for each line (e.g. the z
+    position of each line in a xy scan). The counts are stored per channel as float32 array of
+    shape (lines, pixels, channels) which is backed by a memory mapped .npy file if a filename is
+    given. The file is only opened on first access of the counts.
+
+    For backwards compatibility the image can be indexed like the former dense image array of shape
+    (lines, pixels, 3 + channels) holding x, y, z and the counts of each channel for every pixel.
+    The coordinate channels are computed on the fly from the axes.
+    """
+
+    def __init__(self, plane, horizontal_axis, vertical_axis, line_positions, channel_count,
+                 filename=None, counts=None):
+        """
+        @param str plane: scan plane, one of 'xy', 'xz' and 'yz'
+        @param numpy.ndarray horizontal_axis: positions of the pixels in each line
+        @param numpy.ndarray vertical_axis: positions of the lines
+        @param numpy.ndarray line_positions: position of the remaining scanner axis for each line
+        @param int channel_count: number of count channels
+        @param str filename: optional, .npy file backing the counts
+        @param numpy.ndarray counts: optional, counts array of shape (lines, pixels, channels)
+        """
+        if plane not in ('xy', 'xz', 'yz'):
+            raise ValueError('Scan plane must be one of "xy", "xz" and "yz" but is "{0}".'
+                             ''.format(plane))
+        self.plane = plane
+        self.horizontal_axis = np.array(horizontal_axis, dtype=float)
+        self.vertical_axis = np.array(vertical_axis, dtype=float)
+        self.line_positions = np.array(line_positions, dtype=float)
+        self.channel_count = int(channel_count)
+        self.filename = filename
+        self._counts = counts
+
+    @classmethod
+    def create(cls, plane, horizontal_axis, vertical_axis, line_position, channel_count,
+               directory=None, prefix='scan'):
+        """ Allocate a new empty scan image.
+
+        @param str plane: scan plane, one of 'xy', 'xz' and 'yz'
+        @param numpy.ndarray horizontal_axis: positions of the pixels in each line
+        @param numpy.ndarray vertical_axis: positions of the lines
+        @param float line_position: initial position of the remaining scanner axis
+        @param int channel_count: number of count channels
+        @param str directory: optional, directory for the memory mapped counts file. The counts are
+                              kept in memory if None.
+        @param str prefix: optional, file name prefix of the counts file
+
+        @return ConfocalScanImage: the new image
+        """
+        shape = (len(vertical_axis), len(horizontal_axis), channel_count)
+        line_positions = np.full(len(vertical_axis), line_position, dtype=float)
+        if directory is None:
+            return cls(plane, horizontal_axis, vertical_axis, line_positions, channel_count,
+                       counts=np.zeros(shape, dtype=np.float32))
+        filename = os.path.join(directory,
+                                '{0}_{1}_{2}.npy'.format(prefix, plane, uuid.uuid4().hex))
+        counts = np.lib.format.open_memmap(filename, mode='w+', dtype=np.float32, shape=shape)
+        return cls(plane, horizontal_axis, vertical_axis, line_positions, channel_count,
+                   filename=filename, counts=counts)
+
+    @classmethod
+    def from_array(cls, image, plane, directory=None, prefix='scan'):
+        """ Convert a dense image array of shape (lines, pixels, 3 + channels) as used in former
+        versions of the confocal logic.
+
+        @param numpy.ndarray image: dense image array with x, y, z and counts for every pixel
+        @param str plane: scan plane, one of 'xy', 'xz' and 'yz'
+        @param str directory: optional, directory for the memory mapped counts file
+        @param str prefix: optional, file name prefix of the counts file
+
+        @return ConfocalScanImage: the converted image
+        """
+        horizontal_index = 'xyz'.index(plane[0])
+        vertical_index = 'xyz'.index(plane[1])
+        line_index = 3 - horizontal_index - vertical_index
+        new_image = cls.create(plane,
+                               image[0, :, horizontal_index],
+                               image[:, 0, vertical_index],
+                               0,
+                               image.shape[2] - 3,
+                               directory,
+                               prefix)
+        new_image.line_positions[:] = image[:, 0, line_index]
+        new_image.counts[...] = image[:, :, 3:]
+        return new_image
+
+    @classmethod
+    def from_dict(cls, serialized):
+        """ Restore a scan image from a dict created by to_dict. The counts are loaded lazily.
+
+        @param dict serialized: serialized image
+
+        @return ConfocalScanImage: the restored image
+        """
+        counts = serialized.get('counts')
+        filename = serialized.get('filename')
+        if counts is None and (filename is None or not os.path.isfile(filename)):
+            raise FileNotFoundError('Counts file "{0}" of confocal scan image not found.'
+                                    ''.format(filename))
+        return cls(serialized['plane'],
+                   serialized['horizontal_axis'],
+                   serialized['vertical_axis'],
+                   serialized['line_positions'],
+                   serialized['channel_count'],
+                   filename=filename,
+                   counts=counts)
+
+    def to_dict(self):
+        """ Serialize the image. Memory mapped counts are flushed and only referenced by filename.
+
+        @return dict: serialized image
+        """
+        serialized = {'plane': self.plane,
+                      'horizontal_axis': self.horizontal_axis,
+                      'vertical_axis': self.vertical_axis,
+                      'line_positions': self.line_positions,
+                      'channel_count': self.channel_count}
+        if self.filename is None:
+            serialized['counts'] = self.counts
+        else:
+            self.flush()
+            serialized['filename'] = self.filename
+        return serialized
+
+    def copy(self, directory=None, prefix='scan'):
+        """ Copy of the image with its own counts array.
+
+        @param str directory: optional, directory for the memory mapped counts file
+        @param str prefix: optional, file name prefix of the counts file
+
+        @return ConfocalScanImage: the copy
+        """
+        new_image = self.create(self.plane,
+                                self.horizontal_axis,
+                                self.vertical_axis,
+                                0,
+                                self.channel_count,
+                                directory,
+                                prefix)
+        new_image.line_positions[:] = self.line_positions
+        new_image.counts[...] = self.counts
+        return new_image
+
+    @property
+    def counts(self):
+        """ Counts of shape (lines, pixels, channels). Opens the memory mapped file on first access.
+        """
+        if self._counts is None:
+            self._counts = np.load(self.filename, mmap_mode='r+')
+        return self._counts
+
+    @property
+    def is_loaded(self):
+        return self._counts is not None
+
+    @property
+    def shape(self):
+        return len(self.vertical_axis), len(self.horizontal_axis), 3 + self.channel_count
+
+    @property
+    def ndim(self):
+        return 3
+
+    def flush(self):
+        """ Write memory mapped counts to disk. """
+        if isinstance(self._counts, np.memmap):
+            self._counts.flush()
+
+    def close(self):
+        """ Release the memory mapped counts. They are opened again on next access. """
+        if self.filename is not None:
+            self.flush()
+            self._counts = None
+
+    def delete(self):
+        """ Release the memory mapped counts and delete their file.
+
+        @return bool: True if the file was deleted (or there is none), False otherwise
+        """
+        if self.filename is None:
+            return True
+        self._counts = None
+        try:
+            os.remove(self.filename)
+        except OSError:
+            return False
+        return True
+
+    def coordinate(self, index):
+        """ Read-only (lines, pixels) view of a coordinate of all pixels without copying.
+
+        @param int index: 0 for x, 1 for y and 2 for z
+
+        @return numpy.ndarray: coordinates of all pixels
+        """
+        shape = self.shape[:2]
+        axis = self.plane.find('xyz'[index])
+        if axis == 0:
+            return np.broadcast_to(self.horizontal_axis, shape)
+        if axis == 1:
+            return np.broadcast_to(self.vertical_axis[:, np.newaxis], shape)
+        return np.broadcast_to(self.line_positions[:, np.newaxis], shape)
+
+    def _channel(self, index):
+        if index < 3:
+            return self.coordinate(index)
+        return self.counts[:, :, index - 3]
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if len(key) > 3:
+            raise IndexError('Too many indices for confocal scan image.')
+        key = key + (slice(None),) * (3 - len(key))
+        channels = np.arange(self.shape[2])[key[2]]
+        if np.ndim(channels) == 0:
+            return self._channel(int(channels))[key[:2]]
+        return np.stack([self._channel(ch)[key[:2]] for ch in channels], axis=-1)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self[:, :, :], dtype=dtype)
+
+
 class ConfocalHistoryEntry(QtCore.QObject):
     """ This class contains all relevant parameters of a Confocal scan.
         It provides methods to extract, restore and serialize this data.
@@ -50,6 +281,10 @@ class ConfocalHistoryEntry(QtCore.QObject):
         """ Make a confocal data setting with default values. """
         super().__init__()
 
+        # directory and file name prefix for the memory mapped counts of converted old style images
+        self._scan_data_dir = confocal.scan_data_dir
+        self._scan_file_prefix = confocal.scan_file_prefix
+
         self.depth_scan_dir_is_xz = True
         self.depth_img_is_xz = True
 
@@ -130,20 +365,22 @@ class ConfocalHistoryEntry(QtCore.QObject):
         confocal._scanning_device.tilt_reference_y = self.tilt_reference_y
         confocal._scanning_device.tiltcorrection = self.tilt_correction
 
-        confocal.initialize_image()
-        try:
-            if confocal.xy_image.shape == self.xy_image.shape:
-                confocal.xy_image = np.copy(self.xy_image)
-        except AttributeError:
-            self.xy_image = np.copy(confocal.xy_image)
+        # The images are only referenced. They are copied by the confocal logic before a restored
+        # scan is continued and their counts are loaded on first access.
+        confocal.initialize_image(allocate_image=False)
+        if confocal.scan_image_matches(getattr(self, 'xy_image', None)):
+            confocal.xy_image = self.xy_image
+        else:
+            confocal.initialize_image()
+            self.xy_image = confocal.xy_image
 
         confocal._zscan = True
-        confocal.initialize_image()
-        try:
-            if confocal.depth_image.shape == self.depth_image.shape:
-                confocal.depth_image = np.copy(self.depth_image)
-        except AttributeError:
-            self.depth_image = np.copy(confocal.depth_image)
+        confocal.initialize_image(allocate_image=False)
+        if confocal.scan_image_matches(getattr(self, 'depth_image', None)):
+            confocal.depth_image = self.depth_image
+        else:
+            confocal.initialize_image()
+            self.depth_image = confocal.depth_image
         confocal._zscan = False
 
     def snapshot(self, confocal):
@@ -172,8 +409,9 @@ class ConfocalHistoryEntry(QtCore.QObject):
         self.point1 = np.copy(confocal.point1)
         self.point2 = np.copy(confocal.point2)
         self.point3 = np.copy(confocal.point3)
-        self.xy_image = np.copy(confocal.xy_image)
-        self.depth_image = np.copy(confocal.depth_image)
+        # reference the images instead of copying them
+        self.xy_image = confocal.xy_image
+        self.depth_image = confocal.depth_image
 
     def serialize(self):
         """ Give out a dictionary that can be saved via the usual means """
@@ -197,8 +435,8 @@ class ConfocalHistoryEntry(QtCore.QObject):
         serialized['tilt_point3'] = list(self.point3)
         serialized['tilt_reference'] = [self.tilt_reference_x, self.tilt_reference_y]
         serialized['tilt_slope'] = [self.tilt_slope_x, self.tilt_slope_y]
-        serialized['xy_image'] = self.xy_image
-        serialized['depth_image'] = self.depth_image
+        serialized['xy_image'] = self.xy_image.to_dict()
+        serialized['depth_image'] = self.depth_image.to_dict()
         return serialized
 
     def deserialize(self, serialized):
@@ -237,13 +475,21 @@ class ConfocalHistoryEntry(QtCore.QObject):
         if 'tilt_point3' in serialized and len(serialized['tilt_point3']) == 3:
             self.point3 = np.array(serialized['tilt_point3'])
         if 'xy_image' in serialized:
-            if isinstance(serialized['xy_image'], np.ndarray):
-                self.xy_image = serialized['xy_image']
+            if isinstance(serialized['xy_image'], dict):
+                self.xy_image = ConfocalScanImage.from_dict(serialized['xy_image'])
+            elif isinstance(serialized['xy_image'], np.ndarray):
+                self.xy_image = ConfocalScanImage.from_array(
+                    serialized['xy_image'], 'xy', self._scan_data_dir, self._scan_file_prefix)
             else:
                 raise OldConfigFileError()
         if 'depth_image' in serialized:
-            if isinstance(serialized['depth_image'], np.ndarray):
-                self.depth_image = serialized['depth_image'].copy()
+            if isinstance(serialized['depth_image'], dict):
+                self.depth_image = ConfocalScanImage.from_dict(serialized['depth_image'])
+            elif isinstance(serialized['depth_image'], np.ndarray):
+                plane = 'xz' if self.depth_img_is_xz else 'yz'
+                self.depth_image = ConfocalScanImage.from_array(
+                    serialized['depth_image'], plane, self._scan_data_dir,
+                    self._scan_file_prefix)
             else:
                 raise OldConfigFileError()
 
@@ -257,6 +503,10 @@ class ConfocalLogic(GenericLogic):
     confocalscanner1 = Connector(interface='ConfocalScannerInterface')
     savelogic = Connector(interface='SaveLogic')
 
+    # config options
+    # directory of the memory mapped scan images, defaults to <app_status>/confocal_scans/<name>
+    _scan_data_dir = ConfigOption('scan_data_dir', None)
+
     # status vars
     _clock_frequency = StatusVar('clock_frequency', 500)
     return_slowness = StatusVar(default=50)
@@ -311,6 +561,16 @@ class ConfocalLogic(GenericLogic):
         self.y_range = self._scanning_device.get_position_range()[1]
         self.z_range = self._scanning_device.get_position_range()[2]
 
+        # directory for the memory mapped scan images referenced by the history
+        if self._scan_data_dir is None:
+            self.scan_data_dir = os.path.join(
+                self._manager.getStatusDir(), 'confocal_scans', self._name)
+        else:
+            self.scan_data_dir = self._scan_data_dir
+        os.makedirs(self.scan_data_dir, exist_ok=True)
+        # the module name in the file names keeps the files of other instances sharing the directory
+        self.scan_file_prefix = 'scan_{0}'.format(self._name)
+
         # restore here ...
         self.history = []
         for i in reversed(range(1, self.max_history_length)):
@@ -361,8 +621,87 @@ class ConfocalLogic(GenericLogic):
         for state in reversed(self.history):
             self._statusVariables['history_{0}'.format(histindex)] = state.serialize()
             histindex += 1
+        self._remove_unused_scan_files()
         return 0
 
+    def _referenced_scan_images(self):
+        """ All scan images referenced by the logic and the history.
+
+        @return list: list of ConfocalScanImage
+        """
+        images = [getattr(self, 'xy_image', None), getattr(self, 'depth_image', None)]
+        for entry in self.history:
+            images.append(getattr(entry, 'xy_image', None))
+            images.append(getattr(entry, 'depth_image', None))
+        return [image for image in images if image is not None]
+
+    def _remove_unused_scan_files(self):
+        """ Delete the scan image files of this module in the scan data directory which are not
+        referenced anymore. Files of other modules sharing the directory are kept.
+        """
+        used_files = {os.path.normcase(os.path.abspath(image.filename))
+                      for image in self._referenced_scan_images() if image.filename is not None}
+        own_file = re.compile(re.escape(self.scan_file_prefix) + r'_(xy|xz|yz)_[0-9a-f]{32}\.npy')
+        for filename in os.listdir(self.scan_data_dir):
+            path = os.path.normcase(os.path.abspath(os.path.join(self.scan_data_dir, filename)))
+            if own_file.fullmatch(filename) is None:
+                continue
+            if path in used_files:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                # e.g. still memory mapped by an unreferenced image. Removed on next deactivation.
+                self.log.debug('Could not remove unused scan image file "{0}".'.format(path))
+
+    def _release_history_entry(self, entry):
+        """ Delete the scan image files of a history entry which are not referenced anymore.
+
+        @param ConfocalHistoryEntry entry: removed history entry
+        """
+        self._release_scan_image(getattr(entry, 'xy_image', None))
+        self._release_scan_image(getattr(entry, 'depth_image', None))
+
+    def _release_scan_image(self, image):
+        """ Delete the file of a scan image unless it is still referenced by the logic or the
+        history.
+
+        @param ConfocalScanImage image: image which has been removed or replaced
+        """
+        if image is None or image.filename is None:
+            return
+        if any(image is used for used in self._referenced_scan_images()):
+            return
+        if not image.delete():
+            # removed on deactivation at the latest
+            self.log.debug('Could not remove scan image file "{0}".'.format(image.filename))
+
+    def scan_image_axes(self):
+        """ Scan plane and axes of the current scan as set up by initialize_image.
+
+        @return tuple: plane ('xy', 'xz' or 'yz'), horizontal axis and vertical axis
+        """
+        if self._zscan:
+            if self.depth_img_is_xz:
+                return 'xz', self._X, self._Z
+            return 'yz', self._Y, self._Z
+        return 'xy', self._X, self._Y
+
+    def scan_image_matches(self, image):
+        """ Check if a scan image fits to the current scan as set up by initialize_image.
+
+        @param ConfocalScanImage image: the image to check
+
+        @return bool: True if plane, number of pixels, lines and channels match
+        """
+        if image is None:
+            return False
+        plane, horizontal_axis, vertical_axis = self.scan_image_axes()
+        return (image.plane == plane
+                and image.shape == (len(vertical_axis),
+                                    len(horizontal_axis),
+                                    3 + len(self.get_scanner_count_channels())))
+
     def switch_hardware(self, to_on=False):
         """ Switches the Hardware off or on.
 
@@ -433,9 +772,12 @@ class ConfocalLogic(GenericLogic):
         self.signal_stop_scanning.emit()
         return 0
 
-    def initialize_image(self):
+    def initialize_image(self, allocate_image=True):
         """Initalization of the image.
 
+        @param bool allocate_image: optional, if False only the scan axes are initialized and the
+                                    current image is kept
+
         @return int: error code (0:OK, -1:error)
         """
         # x1: x-start-value, x2: x-end-value
@@ -497,70 +839,41 @@ class ConfocalLogic(GenericLogic):
             self._image_vert_axis = self._Z
             # update image scan direction from setting
             self.depth_img_is_xz = self.depth_scan_dir_is_xz
-            # depth scan is in xz plane
-            if self.depth_img_is_xz:
-                #self._image_horz_axis = self._X
-                # creates an image where each pixel will be [x,y,z,counts]
-                self.depth_image = np.zeros((
-                        len(self._image_vert_axis),
-                        len(self._X),
-                        3 + len(self.get_scanner_count_channels())
-                    ))
-
-                self.depth_image[:, :, 0] = np.full(
-                    (len(self._image_vert_axis), len(self._X)), self._XL)
-
-                self.depth_image[:, :, 1] = self._current_y * np.ones(
-                    (len(self._image_vert_axis), len(self._X)))
-
-                z_value_matrix = np.full((len(self._X), len(self._image_vert_axis)), self._Z)
-                self.depth_image[:, :, 2] = z_value_matrix.transpose()
-
             # depth scan is yz plane instead of xz plane
-            else:
-                #self._image_horz_axis = self._Y
-                # creats an image where each pixel will be [x,y,z,counts]
-                self.depth_image = np.zeros((
-                        len(self._image_vert_axis),
-                        len(self._Y),
-                        3 + len(self.get_scanner_count_channels())
-                    ))
-
-                self.depth_image[:, :, 0] = self._current_x * np.ones(
-                    (len(self._image_vert_axis), len(self._Y)))
-
-                self.depth_image[:, :, 1] = np.full(
-                    (len(self._image_vert_axis), len(self._Y)), self._YL)
-
-                z_value_matrix = np.full((len(self._Y), len(self._image_vert_axis)), self._Z)
-                self.depth_image[:, :, 2] = z_value_matrix.transpose()
-
+            if not self.depth_img_is_xz:
                 # now we are scanning along the y-axis, so we need a new return line along Y:
                 self._return_YL = np.linspace(self._YL[-1], self._YL[0], self.return_slowness)
                 self._return_AL = np.zeros(self._return_YL.shape)
 
+            if allocate_image:
+                # creates an image where each pixel will be [x,y,z,counts]
+                plane, horizontal_axis, vertical_axis = self.scan_image_axes()
+                old_image = getattr(self, 'depth_image', None)
+                self.depth_image = ConfocalScanImage.create(
+                    plane,
+                    horizontal_axis,
+                    vertical_axis,
+                    self._current_y if self.depth_img_is_xz else self._current_x,
+                    len(self.get_scanner_count_channels()),
+                    self.scan_data_dir,
+                    self.scan_file_prefix)
+                self._release_scan_image(old_image)
             self.sigImageDepthInitialized.emit()
 
         # xy scan is in xy plane
         else:
-            #self._image_horz_axis = self._X
             self._image_vert_axis = self._Y
-            # creats an image where each pixel will be [x,y,z,counts]
-            self.xy_image = np.zeros((
-                    len(self._image_vert_axis),
-                    len(self._X),
-                    3 + len(self.get_scanner_count_channels())
-                ))
-
-            self.xy_image[:, :, 0] = np.full(
-                (len(self._image_vert_axis), len(self._X)), self._XL)
-
-            y_value_matrix = np.full((len(self._X), len(self._image_vert_axis)), self._Y)
-            self.xy_image[:, :, 1] = y_value_matrix.transpose()
-
-            self.xy_image[:, :, 2] = self._current_z * np.ones(
-                (len(self._image_vert_axis), len(self._X)))
-
+            if allocate_image:
+                # creates an image where each pixel will be [x,y,z,counts]
+                old_image = getattr(self, 'xy_image', None)
+                self.xy_image = ConfocalScanImage.create('xy',
+                                                         self._X,
+                                                         self._Y,
+                                                         self._current_z,
+                                                         len(self.get_scanner_count_channels()),
+                                                         self.scan_data_dir,
+                                                         self.scan_file_prefix)
+                self._release_scan_image(old_image)
             self.sigImageXYInitialized.emit()
         return 0
 
@@ -595,6 +908,7 @@ class ConfocalLogic(GenericLogic):
             self.set_position('scanner')
             return -1
 
+        self._start_spectral_scan(new=True)
         self.signal_scan_lines_next.emit()
         return 0
 
@@ -606,6 +920,14 @@ class ConfocalLogic(GenericLogic):
         self.module_state.lock()
         self._scanning_device.module_state.lock()
 
+        # the image might be referenced by the history, continue on a copy
+        history_images = [getattr(entry, 'depth_image' if self._zscan else 'xy_image', None)
+                          for entry in self.history]
+        if self._zscan and any(self.depth_image is image for image in history_images):
+            self.depth_image = self.depth_image.copy(self.scan_data_dir, self.scan_file_prefix)
+        elif not self._zscan and any(self.xy_image is image for image in history_images):
+            self.xy_image = self.xy_image.copy(self.scan_data_dir, self.scan_file_prefix)
+
         clock_status = self._scanning_device.set_up_scanner_clock(
             clock_frequency=self._clock_frequency)
 
@@ -624,9 +946,19 @@ class ConfocalLogic(GenericLogic):
             self.set_position('scanner')
             return -1
 
+        self._start_spectral_scan(new=False)
         self.signal_scan_lines_next.emit()
         return 0
 
+    def _start_spectral_scan(self, new):
+        """ Tell a hyperspectral scanner (SpectrometerScannerInterfuse) that the lines until
+        kill_scanner belong to a scan, so only the lines with pixel clock record spectra.
+
+        @param bool new: new scan (True) or continued scan (False)
+        """
+        if hasattr(self._scanning_device, 'start_spectral_scan'):
+            self._scanning_device.start_spectral_scan(new=new)
+
     def kill_scanner(self):
         """Closing the scanner device.
 
@@ -712,6 +1044,7 @@ class ConfocalLogic(GenericLogic):
         """
         return self._scanning_device.get_scanner_count_channels()
 
+    @timed_loop()
     def _scan_line(self):
         """scanning an image in either depth or xy
 
@@ -734,7 +1067,7 @@ class ConfocalLogic(GenericLogic):
                 new_history.snapshot(self)
                 self.history.append(new_history)
                 if len(self.history) > self.max_history_length:
-                    self.history.pop(0)
+                    self._release_history_entry(self.history.pop(0))
                 self.history_index = len(self.history) - 1
                 return
 
@@ -764,8 +1097,7 @@ class ConfocalLogic(GenericLogic):
 
             # adjust z of line in image to current z before building the line
             if not self._zscan:
-                z_shape = image[self._scan_counter, :, 2].shape
-                image[self._scan_counter, :, 2] = self._current_z * np.ones(z_shape)
+                image.line_positions[self._scan_counter] = self._current_z
 
             # make a line in the scan, _scan_counter says which one it is
             lsx = image[self._scan_counter, :, 0]
@@ -822,14 +1154,10 @@ class ConfocalLogic(GenericLogic):
                 return
 
             # update image with counts from the line we just scanned
+            image.counts[self._scan_counter, :, :s_ch] = line_counts
             if self._zscan:
-                if self.depth_img_is_xz:
-                    self.depth_image[self._scan_counter, :, 3:3 + s_ch] = line_counts
-                else:
-                    self.depth_image[self._scan_counter, :, 3:3 + s_ch] = line_counts
                 self.signal_depth_image_updated.emit()
             else:
-                self.xy_image[self._scan_counter, :, 3:3 + s_ch] = line_counts
                 self.signal_xy_image_updated.emit()
 
             # next line in scan
@@ -906,12 +1234,14 @@ class ConfocalLogic(GenericLogic):
         axes = ['X', 'Y']
         crosshair_pos = [self.get_position()[0], self.get_position()[1]]
 
-        figs = {ch: self.draw_figure(data=self.xy_image[:, :, 3 + n],
-                                     image_extent=image_extent,
-                                     scan_axis=axes,
-                                     cbar_range=colorscale_range,
-                                     percentile_range=percentile_range,
-                                     crosshair_pos=crosshair_pos)
+        figs = {ch: DeferredFigure(draw_scan_image_figure,
+                                   data=self.xy_image[:, :, 3 + n],
+                                   image_extent=image_extent,
+                                   scan_axis=axes,
+                                   cbar_range=colorscale_range,
+                                   percentile_range=percentile_range,
+                                   crosshair_pos=crosshair_pos,
+                                   style=self._save_logic.mpl_qd_style)
                 for n, ch in enumerate(self.get_scanner_count_channels())}
 
         # Save the image data and figure
@@ -1015,12 +1345,14 @@ class ConfocalLogic(GenericLogic):
                         self.image_z_range[0],
                         self.image_z_range[1]]
 
-        figs = {ch: self.draw_figure(data=self.depth_image[:, :, 3 + n],
-                                     image_extent=image_extent,
-                                     scan_axis=axes,
-                                     cbar_range=colorscale_range,
-                                     percentile_range=percentile_range,
-                                     crosshair_pos=crosshair_pos)
+        figs = {ch: DeferredFigure(draw_scan_image_figure,
+                                   data=self.depth_image[:, :, 3 + n],
+                                   image_extent=image_extent,
+                                   scan_axis=axes,
+                                   cbar_range=colorscale_range,
+                                   percentile_range=percentile_range,
+                                   crosshair_pos=crosshair_pos,
+                                   style=self._save_logic.mpl_qd_style)
                 for n, ch in enumerate(self.get_scanner_count_channels())}
 
         # Save the image data and figure
@@ -1083,122 +1415,13 @@ class ConfocalLogic(GenericLogic):
 
         @return: fig fig: a matplotlib figure object to be saved to file.
         """
-        if scan_axis is None:
-            scan_axis = ['X', 'Y']
-
-        # If no colorbar range was given, take full range of data
-        if cbar_range is None:
-            cbar_range = [np.min(data), np.max(data)]
-
-        # Scale color values using SI prefix
-        prefix = ['', 'k', 'M', 'G']
-        prefix_count = 0
-        image_data = data
-        draw_cb_range = np.array(cbar_range)
-        image_dimension = image_extent.copy()
-
-        while draw_cb_range[1] > 1000:
-            image_data = image_data/1000
-            draw_cb_range = draw_cb_range/1000
-            prefix_count = prefix_count + 1
-
-        c_prefix = prefix[prefix_count]
-
-
-        # Scale axes values using SI prefix
-        axes_prefix = ['', 'm', r'$\mathrm{\mu}$', 'n']
-        x_prefix_count = 0
-        y_prefix_count = 0
-
-        while np.abs(image_dimension[1]-image_dimension[0]) < 1:
-            image_dimension[0] = image_dimension[0] * 1000.
-            image_dimension[1] = image_dimension[1] * 1000.
-            x_prefix_count = x_prefix_count + 1
-
-        while np.abs(image_dimension[3] - image_dimension[2]) < 1:
-            image_dimension[2] = image_dimension[2] * 1000.
-            image_dimension[3] = image_dimension[3] * 1000.
-            y_prefix_count = y_prefix_count + 1
-
-        x_prefix = axes_prefix[x_prefix_count]
-        y_prefix = axes_prefix[y_prefix_count]
-
-        # Use qudi style
-        plt.style.use(self._save_logic.mpl_qd_style)
-
-        # Create figure
-        fig, ax = plt.subplots()
-
-        # Create image plot
-        cfimage = ax.imshow(image_data,
-                            cmap=plt.get_cmap('inferno'), # reference the right place in qd
-                            origin="lower",
-                            vmin=draw_cb_range[0],
-                            vmax=draw_cb_range[1],
-                            interpolation='none',
-                            extent=image_dimension
-                            )
-
-        ax.set_aspect(1)
-        ax.set_xlabel(scan_axis[0] + ' position (' + x_prefix + 'm)')
-        ax.set_ylabel(scan_axis[1] + ' position (' + y_prefix + 'm)')
-        ax.spines['bottom'].set_position(('outward', 10))
-        ax.spines['left'].set_position(('outward', 10))
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
-        ax.get_xaxis().tick_bottom()
-        ax.get_yaxis().tick_left()
-
-        # draw the crosshair position if defined
-        if crosshair_pos is not None:
-            trans_xmark = mpl.transforms.blended_transform_factory(
-                ax.transData,
-                ax.transAxes)
-
-            trans_ymark = mpl.transforms.blended_transform_factory(
-                ax.transAxes,
-                ax.transData)
-
-            ax.annotate('', xy=(crosshair_pos[0]*np.power(1000,x_prefix_count), 0),
-                        xytext=(crosshair_pos[0]*np.power(1000,x_prefix_count), -0.01), xycoords=trans_xmark,
-                        arrowprops=dict(facecolor='#17becf', shrink=0.05),
-                        )
-
-            ax.annotate('', xy=(0, crosshair_pos[1]*np.power(1000,y_prefix_count)),
-                        xytext=(-0.01, crosshair_pos[1]*np.power(1000,y_prefix_count)), xycoords=trans_ymark,
-                        arrowprops=dict(facecolor='#17becf', shrink=0.05),
-                        )
-
-        # Draw the colorbar
-        cbar = plt.colorbar(cfimage, shrink=0.8)#, fraction=0.046, pad=0.08, shrink=0.75)
-        cbar.set_label('Fluorescence (' + c_prefix + 'c/s)')
-
-        # remove ticks from colorbar for cleaner image
-        cbar.ax.tick_params(which=u'both', length=0)
-
-        # If we have percentile information, draw that to the figure
-        if percentile_range is not None:
-            cbar.ax.annotate(str(percentile_range[0]),
-                             xy=(-0.3, 0.0),
-                             xycoords='axes fraction',
-                             horizontalalignment='right',
-                             verticalalignment='center',
-                             rotation=90
-                             )
-            cbar.ax.annotate(str(percentile_range[1]),
-                             xy=(-0.3, 1.0),
-                             xycoords='axes fraction',
-                             horizontalalignment='right',
-                             verticalalignment='center',
-                             rotation=90
-                             )
-            cbar.ax.annotate('(percentile)',
-                             xy=(-0.3, 0.5),
-                             xycoords='axes fraction',
-                             horizontalalignment='right',
-                             verticalalignment='center',
-                             rotation=90
-                             )
+        fig = draw_scan_image_figure(data=data,
+                                     image_extent=image_extent,
+                                     scan_axis=scan_axis,
+                                     cbar_range=cbar_range,
+                                     percentile_range=percentile_range,
+                                     crosshair_pos=crosshair_pos,
+                                     style=self._save_logic.mpl_qd_style)
         self.signal_draw_figure_completed.emit()
         return fig
 
@@ -1269,3 +1492,144 @@ class ConfocalLogic(GenericLogic):
             self._change_position('history')
             self.signal_change_position.emit('history')
             self.signal_history_event.emit()
+
+
+def draw_scan_image_figure(data, image_extent, scan_axis=None, cbar_range=None,
+                           percentile_range=None, crosshair_pos=None, style=None):
+    """ Create a 2-D color map figure of the scan image.
+
+    @param: array data: The NxM array of count values from a scan with NxM pixels.
+
+    @param: list image_extent: The scan range in the form [hor_min, hor_max, ver_min, ver_max]
+
+    @param: list axes: Names of the horizontal and vertical axes in the image
+
+    @param: list cbar_range: (optional) [color_scale_min, color_scale_max].  If not supplied then a default of
+                             data_min to data_max will be used.
+
+    @param: list percentile_range: (optional) Percentile range of the chosen cbar_range.
+
+    @param: list crosshair_pos: (optional) crosshair position as [hor, vert] in the chosen image axes.
+
+    @param: dict style: (optional) matplotlib style, e.g. SaveLogic.mpl_qd_style
+
+    @return: fig fig: a matplotlib figure object to be saved to file.
+    """
+    if scan_axis is None:
+        scan_axis = ['X', 'Y']
+
+    # If no colorbar range was given, take full range of data
+    if cbar_range is None:
+        cbar_range = [np.min(data), np.max(data)]
+
+    # Scale color values using SI prefix
+    prefix = ['', 'k', 'M', 'G']
+    prefix_count = 0
+    image_data = data
+    draw_cb_range = np.array(cbar_range)
+    image_dimension = image_extent.copy()
+
+    while draw_cb_range[1] > 1000:
+        image_data = image_data/1000
+        draw_cb_range = draw_cb_range/1000
+        prefix_count = prefix_count + 1
+
+    c_prefix = prefix[prefix_count]
+
+
+    # Scale axes values using SI prefix
+    axes_prefix = ['', 'm', r'$\mathrm{\mu}$', 'n']
+    x_prefix_count = 0
+    y_prefix_count = 0
+
+    while np.abs(image_dimension[1]-image_dimension[0]) < 1:
+        image_dimension[0] = image_dimension[0] * 1000.
+        image_dimension[1] = image_dimension[1] * 1000.
+        x_prefix_count = x_prefix_count + 1
+
+    while np.abs(image_dimension[3] - image_dimension[2]) < 1:
+        image_dimension[2] = image_dimension[2] * 1000.
+        image_dimension[3] = image_dimension[3] * 1000.
+        y_prefix_count = y_prefix_count + 1
+
+    x_prefix = axes_prefix[x_prefix_count]
+    y_prefix = axes_prefix[y_prefix_count]
+
+    # Use qudi style
+    if style is not None:
+        plt.style.use(style)
+
+    # Create figure
+    fig, ax = plt.subplots()
+
+    # Create image plot
+    cfimage = ax.imshow(image_data,
+                        cmap=plt.get_cmap('inferno'), # reference the right place in qd
+                        origin="lower",
+                        vmin=draw_cb_range[0],
+                        vmax=draw_cb_range[1],
+                        interpolation='none',
+                        extent=image_dimension
+                        )
+
+    ax.set_aspect(1)
+    ax.set_xlabel(scan_axis[0] + ' position (' + x_prefix + 'm)')
+    ax.set_ylabel(scan_axis[1] + ' position (' + y_prefix + 'm)')
+    ax.spines['bottom'].set_position(('outward', 10))
+    ax.spines['left'].set_position(('outward', 10))
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.get_xaxis().tick_bottom()
+    ax.get_yaxis().tick_left()
+
+    # draw the crosshair position if defined
+    if crosshair_pos is not None:
+        trans_xmark = mpl.transforms.blended_transform_factory(
+            ax.transData,
+            ax.transAxes)
+
+        trans_ymark = mpl.transforms.blended_transform_factory(
+            ax.transAxes,
+            ax.transData)
+
+        ax.annotate('', xy=(crosshair_pos[0]*np.power(1000,x_prefix_count), 0),
+                    xytext=(crosshair_pos[0]*np.power(1000,x_prefix_count), -0.01), xycoords=trans_xmark,
+                    arrowprops=dict(facecolor='#17becf', shrink=0.05),
+                    )
+
+        ax.annotate('', xy=(0, crosshair_pos[1]*np.power(1000,y_prefix_count)),
+                    xytext=(-0.01, crosshair_pos[1]*np.power(1000,y_prefix_count)), xycoords=trans_ymark,
+                    arrowprops=dict(facecolor='#17becf', shrink=0.05),
+                    )
+
+    # Draw the colorbar
+    cbar = plt.colorbar(cfimage, shrink=0.8)#, fraction=0.046, pad=0.08, shrink=0.75)
+    cbar.set_label('Fluorescence (' + c_prefix + 'c/s)')
+
+    # remove ticks from colorbar for cleaner image
+    cbar.ax.tick_params(which=u'both', length=0)
+
+    # If we have percentile information, draw that to the figure
+    if percentile_range is not None:
+        cbar.ax.annotate(str(percentile_range[0]),
+                         xy=(-0.3, 0.0),
+                         xycoords='axes fraction',
+                         horizontalalignment='right',
+                         verticalalignment='center',
+                         rotation=90
+                         )
+        cbar.ax.annotate(str(percentile_range[1]),
+                         xy=(-0.3, 1.0),
+                         xycoords='axes fraction',
+                         horizontalalignment='right',
+                         verticalalignment='center',
+                         rotation=90
+                         )
+        cbar.ax.annotate('(percentile)',
+                         xy=(-0.3, 0.5),
+                         xycoords='axes fraction',
+                         horizontalalignment='right',
+                         verticalalignment='center',
+                         rotation=90
+                         )
+    return fig
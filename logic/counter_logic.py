@@ -30,6 +30,7 @@ from core.statusvariable import StatusVar
 from logic.generic_logic import GenericLogic
 from interface.slow_counter_interface import CountingMode
 from core.util.mutex import Mutex
+from core.util.looptimer import timed_loop
 
 
 class CounterLogic(GenericLogic):
@@ -446,6 +447,7 @@ class CounterLogic(GenericLogic):
                 self.stopRequested = True
         return
 
+    @timed_loop(period=lambda self: self._counting_samples / self._count_frequency)
     def count_loop_body(self):
         """ This method gets the count data from the hardware for the continuous counting mode (default).
 
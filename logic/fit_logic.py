@@ -22,11 +22,11 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 
 import importlib
 import inspect
-import lmfit
 from qtpy import QtCore
 import numpy as np
 import os
 import sys
+import time
 from collections import OrderedDict
 from distutils.version import LooseVersion
 
@@ -60,7 +60,6 @@ class FitLogic(GenericLogic):
         # locking for thread safety
         self.lock = Mutex()
 
-        filenames = []
         # for path in directories:
         path_list = [os.path.join(get_main_dir(), 'logic', 'fitmethods')]
         # adding additional path, to be defined in the config
@@ -82,18 +81,66 @@ class FitLogic(GenericLogic):
                 self.log.error('ConfigOption additional_predefined_methods_path needs to either be a string or '
                                'a list of strings.')
 
-        for path in path_list:
+        self._fit_method_paths = path_list
+
+        # A dictionary containing all fit methods and their estimators. The fit methods are
+        # imported on first access, since importing lmfit and all fit method files is slow.
+        self._fit_list = None
+        self._fit_list_lock = Mutex()
+
+    @property
+    def fit_list(self):
+        """ Dictionary of all fit methods and their estimators, sorted by dimension.
+
+        The fit methods are imported from logic/fitmethods (and the additional paths given in the
+        config) on first access.
+        """
+        if self._fit_list is None:
+            self._import_fit_methods()
+        return self._fit_list
+
+    def __getattr__(self, name):
+        """ Import the fit methods when a make_* or estimate_* method is used before fit_list.
+        """
+        if (name.startswith('make_') or name.startswith('estimate_')) \
+                and self.__dict__.get('_fit_list', True) is None:
+            self._import_fit_methods()
+            return getattr(self, name)
+        raise AttributeError('{0!r} object has no attribute {1!r}'.format(
+            type(self).__name__, name))
+
+    def _import_fit_methods(self):
+        """ Import all fit methods into FitLogic and build the fit_list dictionary.
+        """
+        with self._fit_list_lock:
+            if self._fit_list is not None:
+                return
+            import lmfit
+            if LooseVersion(lmfit.__version__) < LooseVersion('0.9.2'):
+                raise Exception('lmfit needs to be at least version 0.9.2!')
+            start_time = time.perf_counter()
+            self._fit_list = self._collect_fit_methods()
+            self.log.debug('Importing fit methods took {0:.3f} s.'.format(
+                time.perf_counter() - start_time))
+
+    def _collect_fit_methods(self):
+        """ Import the fit method files and sort their make_*_fit, make_*_model and estimate_*
+        methods into a fit_list dictionary.
+
+        @return OrderedDict: fit_list dictionary
+        """
+        filenames = []
+        for path in self._fit_method_paths:
             for f in os.listdir(path):
                 if os.path.isfile(os.path.join(path, f)) and f.endswith('.py'):
                     filenames.append(f[:-3])
                     if path not in sys.path:
                         sys.path.append(path)
 
-        # A dictionary containing all fit methods and their estimators.
-        self.fit_list = OrderedDict()
-        self.fit_list['1d'] = OrderedDict()
-        self.fit_list['2d'] = OrderedDict()
-        self.fit_list['3d'] = OrderedDict()
+        fit_list = OrderedDict()
+        fit_list['1d'] = OrderedDict()
+        fit_list['2d'] = OrderedDict()
+        fit_list['3d'] = OrderedDict()
 
         # Go through the fitmethods files and import all methods.
         # Also determine which methods need to be added to the fit_list dictionary
@@ -138,13 +185,13 @@ class FitLogic(GenericLogic):
                 dimension = '1d'
 
             # Attach make_*_fit method to fit_list
-            if fit_name not in self.fit_list[dimension]:
-                self.fit_list[dimension][fit_name] = OrderedDict()
-            self.fit_list[dimension][fit_name]['make_fit'] = getattr(self, fit_method)
+            if fit_name not in fit_list[dimension]:
+                fit_list[dimension][fit_name] = OrderedDict()
+            fit_list[dimension][fit_name]['make_fit'] = getattr(self, fit_method)
 
             # Attach make_*_model method to fit_list
             if fit_name in models_for_dict:
-                self.fit_list[dimension][fit_name]['make_model'] = getattr(self, model_method)
+                fit_list[dimension][fit_name]['make_model'] = getattr(self, model_method)
             else:
                 self.log.error('No make_*_model method for fit "{0}" found in FitLogic.'
                                ''.format(fit_name))
@@ -154,11 +201,11 @@ class FitLogic(GenericLogic):
             for estimator_name in estimators_for_dict:
                 estimator_method = 'estimate_' + estimator_name
                 if fit_name == estimator_name:
-                    self.fit_list[dimension][fit_name]['generic'] = getattr(self, estimator_method)
+                    fit_list[dimension][fit_name]['generic'] = getattr(self, estimator_method)
                     found_estimator = True
                 elif estimator_name.startswith(fit_name + '_'):
                     custom_name = estimator_name.split('_', 1)[1]
-                    self.fit_list[dimension][fit_name][custom_name] = getattr(self, estimator_method)
+                    fit_list[dimension][fit_name][custom_name] = getattr(self, estimator_method)
                     found_estimator = True
             if not found_estimator:
                 self.log.error('No estimator method for fit "{0}" found in FitLogic.'
@@ -166,14 +213,13 @@ class FitLogic(GenericLogic):
 
         self.log.info('Methods were included to FitLogic, but only if naming is right: check the'
                       ' doxygen documentation if you added a new method and it does not show.')
+        return fit_list
 
     def on_activate(self):
         """ Initialisation performed during activation of the module.
         """
         # FIXME: load all the fits here, otherwise reloading this module is really questionable
-        fitversion = LooseVersion(lmfit.__version__)
-        if fitversion < LooseVersion('0.9.2'):
-            raise Exception('lmfit needs to be at least version 0.9.2!')
+        pass
 
     def on_deactivate(self):
         """ """
@@ -216,6 +262,7 @@ class FitLogic(GenericLogic):
                                'make_model': self.fit_list[dim][fname]['make_model'],
                                'estimator': self.fit_list[dim][fname][fit['estimator']]}
                     try:
+                        import lmfit
                         par = lmfit.parameter.Parameters()
                         par.loads(fit['parameters'])
                     except:
@@ -289,8 +336,10 @@ class FitContainer(QtCore.QObject):
     """
     sigFitUpdated = QtCore.Signal()
     sigCurrentFit = QtCore.Signal(str)
-    sigNewFitResult = QtCore.Signal(str, lmfit.model.ModelResult)
-    sigNewFitParameters = QtCore.Signal(str, lmfit.parameter.Parameters)
+    # (fit name, lmfit.model.ModelResult) and (fit name, lmfit.parameter.Parameters). Declared
+    # as object, so that lmfit is not imported when FitLogic is loaded.
+    sigNewFitResult = QtCore.Signal(str, object)
+    sigNewFitParameters = QtCore.Signal(str, object)
 
     def __init__(self, fit_logic, name, dimension):
         """ Create a fit container.
@@ -316,7 +365,7 @@ class FitContainer(QtCore.QObject):
         # variables for fitting
         self.fit_granularity_fact = 10
         self.current_fit = 'No Fit'
-        self.current_fit_param = lmfit.parameter.Parameters()
+        self.current_fit_param = _new_parameters()
         self.current_fit_result = None
         self.use_settings = None
         self.units = ['independent variable {0}'.format(i+1) for i in range(self.dim)]
@@ -352,7 +401,7 @@ class FitContainer(QtCore.QObject):
     def clear_result(self):
         """ Reset fit result and fit parameters from result for this container.
         """
-        self.current_fit_param = lmfit.parameter.Parameters()
+        self.current_fit_param = _new_parameters()
         self.current_fit_result = None
 
     @QtCore.Slot(dict)
@@ -378,7 +427,7 @@ class FitContainer(QtCore.QObject):
             self.current_fit = current_fit
             if current_fit != 'No Fit':
                 use_settings = self.fit_list[self.current_fit]['use_settings']
-                self.use_settings = lmfit.parameter.Parameters()
+                self.use_settings = _new_parameters()
                 # Update the use parameter dictionary
                 for para in use_settings:
                     if use_settings[para]:
@@ -462,3 +511,10 @@ class FitContainer(QtCore.QObject):
         self.sigFitUpdated.emit()
 
         return fit_x, fit_y, result
+
+
+def _new_parameters():
+    """ New empty lmfit.parameter.Parameters object. lmfit is imported on first use.
+    """
+    from lmfit.parameter import Parameters
+    return Parameters()
@@ -19,7 +19,12 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import os
+import shutil
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
 from core.module import Base
@@ -28,19 +33,158 @@ from core.connector import Connector
 from interface.confocal_scanner_interface import ConfocalScannerInterface
 
 
+class SpectralCube:
+    """ Spectra of a hyperspectral scan, stored in chunks of lines in memory mapped .npy files.
+
+    Every scan line gets a line index. Spectra are float32 of shape (pixels, wavelengths) per line,
+    the scanner positions of the pixels are stored per line as well. A new chunk file is allocated
+    every chunk_lines lines, so the cube grows with the scan without knowing the number of lines.
+    """
+
+    def __init__(self, directory, wavelengths, pixels, axes=4, chunk_lines=16):
+        """
+        @param str directory: directory for the files of this cube (created)
+        @param numpy.ndarray wavelengths: wavelengths of the spectra in m
+        @param int pixels: number of pixels per line
+        @param int axes: number of scanner axes of the positions
+        @param int chunk_lines: number of lines per chunk file
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.wavelengths = np.array(wavelengths, dtype=float)
+        np.save(os.path.join(directory, 'wavelengths.npy'), self.wavelengths)
+        self.pixels = int(pixels)
+        self.axes = int(axes)
+        self.chunk_lines = int(chunk_lines)
+        self.lines = 0
+        self._spectra_chunks = list()
+        self._position_chunks = list()
+
+    def _open(self, name, shape):
+        filename = os.path.join(self.directory, name)
+        return np.lib.format.open_memmap(filename, mode='w+', dtype=np.float32, shape=shape)
+
+    def new_line(self, positions):
+        """ Allocate the next line.
+
+        @param numpy.ndarray positions: scanner positions of the pixels, shape (axes, pixels)
+
+        @return int: index of the new line
+        """
+        index = self.lines
+        chunk, row = divmod(index, self.chunk_lines)
+        if chunk == len(self._spectra_chunks):
+            self._spectra_chunks.append(self._open(
+                'spectra_{0:05d}.npy'.format(chunk),
+                (self.chunk_lines, self.pixels, self.wavelengths.size)))
+            self._position_chunks.append(self._open(
+                'positions_{0:05d}.npy'.format(chunk),
+                (self.chunk_lines, self.axes, self.pixels)))
+        self._position_chunks[chunk][row] = positions
+        self.lines += 1
+        return index
+
+    def write(self, line, pixel, spectrum):
+        """ Store the spectrum of a pixel.
+
+        @param int line: line index from new_line
+        @param int pixel: pixel in the line
+        @param numpy.ndarray spectrum: intensities, one per wavelength
+        """
+        chunk, row = divmod(line, self.chunk_lines)
+        self._spectra_chunks[chunk][row, pixel] = spectrum
+
+    def line(self, index):
+        """ Spectra of a line.
+
+        @param int index: line index
+
+        @return numpy.ndarray: spectra of shape (pixels, wavelengths), view of the memory map
+        """
+        chunk, row = divmod(index, self.chunk_lines)
+        return self._spectra_chunks[chunk][row]
+
+    def positions(self, index):
+        """ Scanner positions of a line.
+
+        @param int index: line index
+
+        @return numpy.ndarray: positions of shape (axes, pixels), view of the memory map
+        """
+        chunk, row = divmod(index, self.chunk_lines)
+        return self._position_chunks[chunk][row]
+
+    def to_array(self):
+        """ All spectra in one array (copied into memory).
+
+        @return numpy.ndarray: spectra of shape (lines, pixels, wavelengths)
+        """
+        if not self._spectra_chunks:
+            return np.zeros((0, self.pixels, self.wavelengths.size), dtype=np.float32)
+        return np.concatenate(self._spectra_chunks)[:self.lines]
+
+    def flush(self):
+        """ Write all changes to the files. """
+        for chunk in self._spectra_chunks + self._position_chunks:
+            chunk.flush()
+
+    def delete(self):
+        """ Close and delete the files of the cube. """
+        self._spectra_chunks = list()
+        self._position_chunks = list()
+        self.lines = 0
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
 class SpectrometerScannerInterfuse(Base, ConfocalScannerInterface):
 
-    """This is the Interface class to define the controls for the simple
-    microwave hardware.
+    """ Interfuse to do confocal scans with a spectrometer instead of a photon counter.
+
+    The scanner is moved pixel by pixel and a spectrum is recorded at every pixel. The timing is
+    given by the exposure of the spectrometer (plus an optional settling time of the stage). The
+    spectra are processed in a worker thread while the stage moves to the next pixel: they are
+    stored in a SpectralCube (memory mapped files in cube_directory) and integrated over the
+    configured wavelength bands. The integral over the whole spectrum and the band integrals are
+    the count channels of the confocal image. The cube of the last scan is available from
+    get_spectral_cube().
+
+    The confocal logic announces its scans with start_spectral_scan(). During such a scan only the
+    lines with pixel clock are data lines, the lines without pixel clock (to the start of the scan
+    and back to the start of the next line) only move the scanner. Lines scanned outside of an
+    announced scan (e.g. by the optimizer logic) record spectra on every pixel into a separate
+    cube, so they never touch the cube of the confocal scan. The cube of a scan is only replaced
+    when a new scan is started or the geometry of the lines changes, a continued scan appends its
+    lines to it.
+
+    Example config for copy-paste:
+
+    spectrometer_scanner:
+        module.Class: 'interfuse.confocal_scanner_spectrometer_interfuse.SpectrometerScannerInterfuse'
+        settling_time: 0  # in s, wait after each move before the acquisition
+        exposure_from_clock: False  # set the exposure to 1/clock frequency of the confocal logic
+        bands:  # optional, name: [start, stop] in m
+            ZPL: [736.0e-9, 737.5e-9]
+            PSB: [740.0e-9, 750.0e-9]
+        cube_directory: 'C:/Data/hyperspectral'  # optional, default <app_status>/hyperspectral_scans
+        keep_spectral_cubes: False  # keep the files of previous scans
+        connect:
+            confocalscanner1: 'scanner_dummy'
+            spectrometer1: 'spectrometer_dummy'
     """
 
     # connectors
-    fitlogic = Connector(interface='FitLogic')
+    fitlogic = Connector(interface='FitLogic', optional=True)
     confocalscanner1 = Connector(interface='ConfocalScannerInterface')
     spectrometer1 = Connector(interface='SpectrometerInterface')
 
     # config options
     _clock_frequency = ConfigOption('clock_frequency', 100, missing='warn')
+    _settling_time = ConfigOption('settling_time', 0)
+    _exposure_from_clock = ConfigOption('exposure_from_clock', False)
+    _bands = ConfigOption('bands', dict())
+    _cube_directory = ConfigOption('cube_directory', None)
+    _keep_cubes = ConfigOption('keep_spectral_cubes', False)
+    _chunk_lines = ConfigOption('chunk_lines', 16)
 
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
@@ -58,14 +202,31 @@ class SpectrometerScannerInterfuse(Base, ConfocalScannerInterface):
     def on_activate(self):
         """ Initialisation performed during activation of the module.
         """
-
-        self._fit_logic = self.fitlogic()
         self._scanner_hw = self.confocalscanner1()
         self._spectrometer_hw = self.spectrometer1()
 
+        if self._cube_directory is None:
+            self.cube_directory = os.path.join(self._manager.getStatusDir(), 'hyperspectral_scans')
+        else:
+            self.cube_directory = self._cube_directory
+        os.makedirs(self.cube_directory, exist_ok=True)
+
+        self._band_names = list(self._bands)
+        self._band_limits = np.array([sorted(self._bands[name]) for name in self._band_names],
+                                     dtype=float).reshape(-1, 2)
+        # integration weights of the channels for the current wavelengths
+        self._band_matrix = None
+        self._band_wavelengths = None
+        # 'scan': lines of the confocal scan, 'lines': lines scanned outside of a confocal scan
+        self._cubes = {'scan': None, 'lines': None}
+        self._new_cube = {'scan': True, 'lines': True}
+        self._scan_active = False
+        self._executor = ThreadPoolExecutor(max_workers=1)
 
     def on_deactivate(self):
         self.reset_hardware()
+        self._executor.shutdown()
+        self._flush_cubes()
 
     def reset_hardware(self):
         """ Resets the hardware, so the connection is lost and other programs can access it.
@@ -123,6 +284,8 @@ class SpectrometerScannerInterfuse(Base, ConfocalScannerInterface):
         """
 
         #return self._scanner_hw.set_up_scanner_clock(clock_frequency=clock_frequency, clock_channel=clock_channel)
+        if self._exposure_from_clock and clock_frequency:
+            self._spectrometer_hw.setExposure(1 / clock_frequency)
         return 0
 
     def set_up_scanner(self, counter_channel = None, photon_source = None, clock_channel = None, scanner_ao_channels = None):
@@ -137,13 +300,44 @@ class SpectrometerScannerInterfuse(Base, ConfocalScannerInterface):
 
         @return int: error code (0:OK, -1:error)
         """
-        self.log.warning('ConfocalScannerInterfaceDummy>set_up_scanner')
+        # lines scanned outside of a confocal scan start a new cube, the cube of the scan is kept
+        self._new_cube['lines'] = True
         return 0
 
+    def start_spectral_scan(self, new=True):
+        """ Announce the lines of a confocal scan, until close_scanner.
+
+        Only the lines with pixel clock are recorded into the cube of the scan, the other lines are
+        moves of the scanner.
+
+        @param bool new: start a new cube (True) or append to the cube of the previous scan (False)
+        """
+        self._scan_active = True
+        if new:
+            self._new_cube['scan'] = True
+
     def get_scanner_axes(self):
         """ Pass through scanner axes. """
         return self._scanner_hw.get_scanner_axes()
 
+    def get_scanner_count_channels(self):
+        """ Integral of the whole spectrum and the integrals of the configured bands. """
+        return ['Spectrum'] + self._band_names
+
+    def get_spectral_cube(self, name='scan'):
+        """ Spectra of the last scan.
+
+        @param str name: 'scan' for the confocal scan, 'lines' for the lines scanned outside of a
+                         confocal scan (e.g. by the optimizer)
+
+        @return SpectralCube: the cube, None if no spectrum was recorded yet
+        """
+        return self._cubes[name]
+
+    def new_spectral_cube(self):
+        """ Start a new cube with the next line of the confocal scan. """
+        self._new_cube['scan'] = True
+
     def scanner_set_position(self, x = None, y = None, z = None, a = None):
         """Move stage to x, y, z, a (where a is the fourth voltage channel).
         This is a direct pass-through to the scanner HW
@@ -187,33 +381,93 @@ class SpectrometerScannerInterfuse(Base, ConfocalScannerInterface):
         @return float[]: the photon counts per second
         """
 
-        #if self.module_state() == 'locked':
-        #    self.log.error('A scan_line is already running, close this one first.')
-        #    return -1
-        #
-        #self.module_state.lock()
-
         if not isinstance( line_path, (frozenset, list, set, tuple, np.ndarray, ) ):
             self.log.error('Given voltage list is no array type.')
             return np.array([-1.])
 
+        line_path = np.asarray(line_path, dtype=float)
         self.set_up_line(np.shape(line_path)[1])
+        axes = 'xyza'[:line_path.shape[0]]
+        count_data = np.zeros((self._line_length, len(self.get_scanner_count_channels())))
+
+        if self._scan_active and not pixel_clock:
+            # move to the start of the (next) line of the confocal scan, which needs no spectra
+            self.scanner_set_position(**dict(zip(axes, line_path[:, -1])))
+            return count_data
+
+        name = 'scan' if self._scan_active else 'lines'
+        cube = None
+        line_index = None
+        pending = list()
+        try:
+            for i in range(self._line_length):
+                self.scanner_set_position(**dict(zip(axes, line_path[:, i])))
+                if self._settling_time > 0:
+                    time.sleep(self._settling_time)
+
+                # record spectral data, the exposure of the spectrometer gives the pixel timing
+                spectrum = np.asarray(self._spectrometer_hw.recordSpectrum())
+                if cube is None:
+                    cube = self._prepare_cube(name, spectrum[0], line_path)
+                    line_index = cube.new_line(line_path)
+
+                # store and integrate while the stage moves to the next pixel
+                pending.append(self._executor.submit(
+                    self._process_spectrum, cube, spectrum, line_index, i, count_data))
+        finally:
+            for future in pending:
+                future.result()
+        return count_data
 
-        count_data = np.zeros(self._line_length)
+    def _prepare_cube(self, name, wavelengths, line_path):
+        """ Set up cube and band integrals for a new line.
 
-        for i in xrange(self._line_length):
-            coords = line_path[:, i]
-            self.scanner_set_position(x=coords[0], y=coords[1], z=coords[2], a=coords[3])
-            print(coords)
-            print(i)
+        The cube is replaced if a new one was requested or the geometry of the line changed, the
+        files of the old cube are kept if keep_spectral_cubes is set.
 
-            # record spectral data
-            this_spectrum_data = self._spectrometer_hw.recordSpectrum()
-            #this_spectrum_data = [1,2,3,4,5]
-            count_data[i] = np.sum(this_spectrum_data)
-            time.sleep(0.2)
+        @param str name: 'scan' or 'lines'
+        @param numpy.ndarray wavelengths: wavelengths of the spectra in m
+        @param numpy.ndarray line_path: scanner positions of the line
 
-        return count_data
+        @return SpectralCube: cube for the line
+        """
+        if self._band_wavelengths is None or not np.array_equal(self._band_wavelengths,
+                                                                 wavelengths):
+            matrix = np.ones((1 + len(self._band_names), wavelengths.size))
+            matrix[1:] = ((wavelengths >= self._band_limits[:, :1])
+                          & (wavelengths <= self._band_limits[:, 1:]))
+            self._band_matrix = matrix
+            self._band_wavelengths = wavelengths.copy()
+
+        cube = self._cubes[name]
+        if (self._new_cube[name] or cube is None
+                or cube.pixels != line_path.shape[1]
+                or cube.axes != line_path.shape[0]
+                or not np.array_equal(cube.wavelengths, wavelengths)):
+            if cube is not None:
+                if self._keep_cubes:
+                    cube.flush()
+                else:
+                    cube.delete()
+            directory = os.path.join(self.cube_directory,
+                                     '{0}_{1}'.format(name, uuid.uuid4().hex))
+            cube = SpectralCube(directory, wavelengths, line_path.shape[1],
+                                line_path.shape[0], self._chunk_lines)
+            self._cubes[name] = cube
+            self._new_cube[name] = False
+        return cube
+
+    def _process_spectrum(self, cube, spectrum, line_index, pixel, count_data):
+        """ Store a spectrum in the cube and calculate the channel integrals.
+
+        @param SpectralCube cube: cube of the line
+        @param numpy.ndarray spectrum: wavelengths and intensities, shape (2, N)
+        @param int line_index: line index in the spectral cube
+        @param int pixel: pixel in the line
+        @param numpy.ndarray count_data: channel values of the line, filled at the pixel
+        """
+        cube.write(line_index, pixel, spectrum[1])
+        count_data[pixel] = np.dot(self._band_matrix, spectrum[1])
 
     def close_scanner(self):
         """ Closes the scanner and cleans up afterwards.
@@ -222,9 +476,16 @@ class SpectrometerScannerInterfuse(Base, ConfocalScannerInterface):
         """
 
         #self._scanner_hw.close_scanner()
-
+        self._scan_active = False
+        self._flush_cubes()
         return 0
 
+    def _flush_cubes(self):
+        """ Write all changes of the cubes to the files. """
+        for cube in self._cubes.values():
+            if cube is not None:
+                cube.flush()
+
     def close_scanner_clock(self):
         """ Closes the clock and cleans up afterwards.
 
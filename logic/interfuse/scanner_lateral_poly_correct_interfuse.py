@@ -22,6 +22,7 @@ import numpy as np
 
 from core.connector import Connector
 from core.configoption import ConfigOption
+from core.util.scanner_transforms import Polynomial2DTransform, TransformChain
 from logic.generic_logic import GenericLogic
 from interface.confocal_scanner_interface import ConfocalScannerInterface
 
@@ -64,9 +65,10 @@ class ScannerLateralPolyCorrectInterfuse(GenericLogic, ConfocalScannerInterface)
     def on_activate(self):
         """ Initialisation performed during activation of the module """
         try:
-            self._poly2d_x = np.array(self.config_poly2d_x)
-            self._poly2d_y = np.array(self.config_poly2d_y)
+            self._poly_transform = Polynomial2DTransform(self.config_poly2d_x, self.config_poly2d_y)
             _, _ = self._convert_point(0,0) # checks if works
+            self._transforms = TransformChain([self._poly_transform],
+                                              timer_name='{0}.transform_line'.format(self._name))
         except ValueError:
             self.log.error('Configuration options poly2d_x or poly2d_y are not correct.')
 
@@ -86,6 +88,7 @@ class ScannerLateralPolyCorrectInterfuse(GenericLogic, ConfocalScannerInterface)
         self._range_x = self.config_range_x
         self._range_y = self.config_range_y
         self._position = np.array([None, None])  # Position can not be known at activation
+        self._clock_frequency = None
 
     def on_deactivate(self):
         """ Deinitialisation performed during deactivation of the module """
@@ -134,6 +137,7 @@ class ScannerLateralPolyCorrectInterfuse(GenericLogic, ConfocalScannerInterface)
 
         @return int: error code (0:OK, -1:error)
         """
+        self._clock_frequency = clock_frequency
         return self.scanner().set_up_scanner_clock(clock_frequency, clock_channel)
 
     def set_up_scanner(self, counter_channel=None, photon_source=None, clock_channel=None, scanner_ao_channels=None):
@@ -167,10 +171,15 @@ class ScannerLateralPolyCorrectInterfuse(GenericLogic, ConfocalScannerInterface)
         @return float[]: current position in (x, y, z, a)
         """
         scanner_position = np.array(self.scanner().get_scanner_position())
+        if None in self._position:
+            # position not set since activation, calculate it from the hardware position
+            return list(self._transforms.inverse_point(scanner_position))
         return list(np.array([*self._position, *scanner_position[2:]]))
 
     def set_up_line(self, length=100):
         """ Sets up the analogue output for scanning a line. """
+        if self._clock_frequency:
+            self._transforms.set_line_period(length / self._clock_frequency)
         return self.scanner().set_up_line(length)
 
     def scan_line(self, line_path=None, pixel_clock=False):
@@ -181,11 +190,7 @@ class ScannerLateralPolyCorrectInterfuse(GenericLogic, ConfocalScannerInterface)
 
         @return float[]: the photon counts per second
         """
-        transformed = line_path.copy()
-        points_x, points_y = self._convert_point(line_path[0, :], line_path[1, :])
-        transformed[0, :] = points_x
-        transformed[1, :] = points_y
-        return self.scanner().scan_line(transformed, pixel_clock)
+        return self.scanner().scan_line(self._transforms.forward(line_path), pixel_clock)
 
     def close_scanner(self):
         """ Closes the scanner and cleans up afterwards """
@@ -197,6 +202,4 @@ class ScannerLateralPolyCorrectInterfuse(GenericLogic, ConfocalScannerInterface)
 
     def _convert_point(self, x, y):
         """ Convert one point or an array of point from input coordinate to output coordinate """
-        res_x = np.polynomial.polynomial.polyval2d(x, y, self._poly2d_x.T)
-        res_y = np.polynomial.polynomial.polyval2d(x, y, self._poly2d_y.T)
-        return res_x, res_y
+        return self._poly_transform.convert(x, y)
@@ -18,9 +18,8 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
-import copy
-
 from core.connector import Connector
+from core.util.scanner_transforms import TiltTransform, TransformChain
 from logic.generic_logic import GenericLogic
 from interface.confocal_scanner_interface import ConfocalScannerInterface
 
@@ -39,11 +38,55 @@ class ScannerTiltInterfuse(GenericLogic, ConfocalScannerInterface):
         """
         self._scanning_device = self.confocalscanner1()
 
-        self.tilt_variable_ax = 1
-        self.tilt_variable_ay = 1
-        self.tiltcorrection = False
-        self.tilt_reference_x = 0
-        self.tilt_reference_y = 0
+        self._tilt = TiltTransform(slope_x=1, slope_y=1, enabled=False)
+        self._transforms = TransformChain([self._tilt],
+                                          timer_name='{0}.transform_line'.format(self._name))
+        self._clock_frequency = None
+
+    @property
+    def tiltcorrection(self):
+        """ Whether the tilt correction is applied. """
+        return self._tilt.enabled
+
+    @tiltcorrection.setter
+    def tiltcorrection(self, value):
+        self._tilt.enabled = value
+
+    @property
+    def tilt_variable_ax(self):
+        """ Slope dz/dx of the tilted surface. """
+        return self._tilt.slope_x
+
+    @tilt_variable_ax.setter
+    def tilt_variable_ax(self, value):
+        self._tilt.slope_x = value
+
+    @property
+    def tilt_variable_ay(self):
+        """ Slope dz/dy of the tilted surface. """
+        return self._tilt.slope_y
+
+    @tilt_variable_ay.setter
+    def tilt_variable_ay(self, value):
+        self._tilt.slope_y = value
+
+    @property
+    def tilt_reference_x(self):
+        """ x position without z correction. """
+        return self._tilt.reference_x
+
+    @tilt_reference_x.setter
+    def tilt_reference_x(self, value):
+        self._tilt.reference_x = value
+
+    @property
+    def tilt_reference_y(self):
+        """ y position without z correction. """
+        return self._tilt.reference_y
+
+    @tilt_reference_y.setter
+    def tilt_reference_y(self, value):
+        self._tilt.reference_y = value
 
     def on_deactivate(self):
         """ Deinitialisation performed during deactivation of the module.
@@ -107,6 +150,7 @@ class ScannerTiltInterfuse(GenericLogic, ConfocalScannerInterface):
 
         @return int: error code (0:OK, -1:error)
         """
+        self._clock_frequency = clock_frequency
         return self._scanning_device.set_up_scanner_clock(clock_frequency, clock_channel)
 
     def set_up_scanner(self, counter_channel=None, photon_source=None,
@@ -158,12 +202,11 @@ class ScannerTiltInterfuse(GenericLogic, ConfocalScannerInterface):
 
         @return float[]: current position in (x, y, z, a).
         """
-        position = copy.copy(self._scanning_device.get_scanner_position())    # not tested atm
+        position = self._scanning_device.get_scanner_position()
         if self.tiltcorrection:
-            position[2] -= self._calc_dz(position[0], position[1])
-            return position
+            return list(self._transforms.inverse_point(position))
         else:
-            return position
+            return list(position)
 
     def set_up_line(self, length=100):
         """ Sets up the analoque output for scanning a line.
@@ -172,6 +215,8 @@ class ScannerTiltInterfuse(GenericLogic, ConfocalScannerInterface):
 
         @return int: error code (0:OK, -1:error)
         """
+        if self._clock_frequency:
+            self._transforms.set_line_period(length / self._clock_frequency)
         return self._scanning_device.set_up_line(length)
 
     def scan_line(self, line_path=None, pixel_clock=False):
@@ -183,7 +228,8 @@ class ScannerTiltInterfuse(GenericLogic, ConfocalScannerInterface):
         @return float[]: the photon counts per second
         """
         if self.tiltcorrection:
-            line_path[:][2] += self._calc_dz(line_path[:][0], line_path[:][1])
+            # the transform writes into its own buffer, line_path of the caller is not changed
+            line_path = self._transforms.forward(line_path)
         return self._scanning_device.scan_line(line_path, pixel_clock)
 
     def close_scanner(self):
@@ -202,11 +248,4 @@ class ScannerTiltInterfuse(GenericLogic, ConfocalScannerInterface):
 
     def _calc_dz(self, x, y):
         """Calculates the change in z for given tilt correction."""
-        if not self.tiltcorrection:
-            return 0.
-        else:
-            dz = -(
-                (x - self.tilt_reference_x) * self.tilt_variable_ax
-                + (y - self.tilt_reference_y) * self.tilt_variable_ay
-            )
-            return dz
+        return self._tilt.dz(x, y)
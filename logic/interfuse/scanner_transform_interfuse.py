@@ -0,0 +1,266 @@
+"""
+This file contains the Qudi interfuse applying a chain of coordinate transforms to a confocal scanner.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import numpy as np
+
+from core.connector import Connector
+from core.configoption import ConfigOption
+from core.util.scanner_transforms import TiltTransform, TransformChain, transform_from_config
+from logic.generic_logic import GenericLogic
+from interface.confocal_scanner_interface import ConfocalScannerInterface
+
+
+class ScannerTransformInterfuse(GenericLogic, ConfocalScannerInterface):
+    """ This interfuse applies several coordinate corrections to a scanner in one pass.
+
+    The transforms of core.util.scanner_transforms are applied in the configured order to every
+    scan line (from logic to hardware coordinates). Consecutive affine transforms are fused into
+    one matrix multiplication, so the correction overhead per line stays small even for long lines
+    at high pixel clocks. The time per line is recorded in the loop timer
+    '<module name>.transform_line' (manager GUI "Loop timing" dock).
+
+    A tilt correction is always the first transform. It is disabled by default and controlled by the
+    tilt correction of the ConfocalLogic, like with the ScannerTiltInterfuse.
+
+    Supported transform types: 'affine' (matrix, offset), 'tilt' (slope_x, slope_y, reference_x,
+    reference_y), 'poly2d' (poly2d_x, poly2d_y, see ScannerLateralPolyCorrectInterfuse) and
+    'function' (dotted paths of functions mapping arrays of shape (4, N), forward and optional
+    inverse).
+
+    Example config:
+
+    scanner_transform_interfuse:
+        module.Class: 'interfuse.scanner_transform_interfuse.ScannerTransformInterfuse'
+        connect:
+            scanner: 'mydummyscanner'
+        transforms:
+            - type: 'poly2d'
+              poly2d_x: [[0, 1], [0.5, 0]]
+              poly2d_y: [[0, 0.5], [1, 0]]
+            - type: 'function'
+              forward: 'mypackage.distortion.forward'
+              inverse: 'mypackage.distortion.inverse'
+    """
+
+    scanner = Connector(interface='ConfocalScannerInterface')
+
+    _transform_config = ConfigOption('transforms', list())
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+    def on_activate(self):
+        """ Initialisation performed during activation of the module """
+        self._tilt = TiltTransform(slope_x=1, slope_y=1, enabled=False)
+        transforms = [self._tilt]
+        for config in self._transform_config:
+            try:
+                transforms.append(transform_from_config(config))
+            except Exception:
+                self.log.exception('Scanner transform {0} could not be created.'.format(config))
+                raise
+        self._transforms = TransformChain(transforms,
+                                          timer_name='{0}.transform_line'.format(self._name))
+        self._clock_frequency = None
+        self._position = None  # Last position set by the logic
+
+    def on_deactivate(self):
+        """ Deinitialisation performed during deactivation of the module """
+        pass
+
+    @property
+    def tiltcorrection(self):
+        """ Whether the tilt correction is applied. """
+        return self._tilt.enabled
+
+    @tiltcorrection.setter
+    def tiltcorrection(self, value):
+        self._tilt.enabled = value
+
+    @property
+    def tilt_variable_ax(self):
+        """ Slope dz/dx of the tilted surface. """
+        return self._tilt.slope_x
+
+    @tilt_variable_ax.setter
+    def tilt_variable_ax(self, value):
+        self._tilt.slope_x = value
+
+    @property
+    def tilt_variable_ay(self):
+        """ Slope dz/dy of the tilted surface. """
+        return self._tilt.slope_y
+
+    @tilt_variable_ay.setter
+    def tilt_variable_ay(self, value):
+        self._tilt.slope_y = value
+
+    @property
+    def tilt_reference_x(self):
+        """ x position without z correction. """
+        return self._tilt.reference_x
+
+    @tilt_reference_x.setter
+    def tilt_reference_x(self, value):
+        self._tilt.reference_x = value
+
+    @property
+    def tilt_reference_y(self):
+        """ y position without z correction. """
+        return self._tilt.reference_y
+
+    @tilt_reference_y.setter
+    def tilt_reference_y(self, value):
+        self._tilt.reference_y = value
+
+    def reset_hardware(self):
+        """ Resets the hardware, so the connection is lost and other programs
+            can access it.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        return self.scanner().reset_hardware()
+
+    def get_position_range(self):
+        """ Returns the physical range of the scanner.
+
+        @return float [4][2]: array of 4 ranges with an array containing lower
+                              and upper limit
+        """
+        return self.scanner().get_position_range()
+
+    def set_position_range(self, myrange=None):
+        """ Sets the physical range of the scanner.
+
+        @param float [4][2] myrange: array of 4 ranges with an array containing
+                                     lower and upper limit
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if myrange is None:
+            myrange = [[0, 1], [0, 1], [0, 1], [0, 1]]
+        return self.scanner().set_position_range(myrange)
+
+    def set_voltage_range(self, myrange=None):
+        """ Sets the voltage range of the NI Card.
+
+        @param float [2] myrange: array containing lower and upper limit
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if myrange is None:
+            myrange = [-10., 10.]
+        return self.scanner().set_voltage_range(myrange)
+
+    def get_scanner_axes(self):
+        """ Pass through scanner axes """
+        return self.scanner().get_scanner_axes()
+
+    def get_scanner_count_channels(self):
+        """ Pass through scanner counting channels """
+        return self.scanner().get_scanner_count_channels()
+
+    def set_up_scanner_clock(self, clock_frequency=None, clock_channel=None):
+        """ Configures the hardware clock of the NiDAQ card to give the timing.
+
+        @param float clock_frequency: if defined, this sets the frequency of the
+                                      clock
+        @param str clock_channel: if defined, this is the physical channel of
+                                  the clock
+
+        @return int: error code (0:OK, -1:error)
+        """
+        self._clock_frequency = clock_frequency
+        return self.scanner().set_up_scanner_clock(clock_frequency, clock_channel)
+
+    def set_up_scanner(self, counter_channel=None, photon_source=None, clock_channel=None,
+                       scanner_ao_channels=None):
+        """ Configures the actual scanner with a given clock """
+        return self.scanner().set_up_scanner(
+            counter_channel, photon_source, clock_channel, scanner_ao_channels)
+
+    def scanner_set_position(self, x=None, y=None, z=None, a=None):
+        """Move stage to x, y, z, a (where a is the fourth voltage channel).
+
+        @param float x: position in x-direction (volts)
+        @param float y: position in y-direction (volts)
+        @param float z: position in z-direction (volts)
+        @param float a: position in a-direction (volts)
+
+        @return int: error code (0:OK, -1:error)
+        """
+        position = [x, y, z, a]
+        if None in position:
+            current = self.get_scanner_position()
+            position = [current[i] if value is None else value for i, value in enumerate(position)]
+        self._position = list(position)
+
+        target = self._transforms.forward_point(position)
+        scanner_range = np.array(self.get_position_range())
+        clipped = np.clip(target, scanner_range[:, 0], scanner_range[:, 1])
+        if np.any(clipped != target):
+            self.log.warning('The transformed position {0} is out of the scanner range and was '
+                             'set to min/max.'.format(target))
+        return self.scanner().scanner_set_position(*clipped)
+
+    def get_scanner_position(self):
+        """ Get the current position of the scanner hardware.
+
+        @return float[]: current position in (x, y, z, a)
+        """
+        scanner_position = self.scanner().get_scanner_position()
+        try:
+            return list(self._transforms.inverse_point(scanner_position))
+        except NotImplementedError:
+            # a transform without inverse, use the last position set by the logic
+            if self._position is None:
+                self.log.warning('Position can not be calculated from the hardware position '
+                                 'before it was set once.')
+                return list(scanner_position)
+            return list(self._position)
+
+    def set_up_line(self, length=100):
+        """ Sets up the analogue output for scanning a line.
+
+        @param int length: length of the line in pixel
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if self._clock_frequency:
+            self._transforms.set_line_period(length / self._clock_frequency)
+        return self.scanner().set_up_line(length)
+
+    def scan_line(self, line_path=None, pixel_clock=False):
+        """ Scans a line and returns the counts on that line.
+
+        @param float[][4] line_path: array of 4-part tuples defining the positions pixels
+        @param bool pixel_clock: whether we need to output a pixel clock for this line
+
+        @return float[]: the photon counts per second
+        """
+        return self.scanner().scan_line(self._transforms.forward(line_path), pixel_clock)
+
+    def close_scanner(self):
+        """ Closes the scanner and cleans up afterwards """
+        return self.scanner().close_scanner()
+
+    def close_scanner_clock(self, power=0):
+        """ Closes the clock and cleans up afterwards """
+        return self.scanner().close_scanner_clock()
@@ -29,6 +29,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 import time
 
+from core.configoption import ConfigOption
 from core.connector import Connector
 from core.statusvariable import StatusVar
 from core.util.mutex import Mutex
@@ -40,6 +41,19 @@ class LaserScannerLogic(GenericLogic):
 
     """This logic module controls scans of DC voltage on the fourth analog
     output channel of the NI Card.  It collects countrate as a function of voltage.
+
+    With repeats_per_scan_call > 1 the logic scans up to that many repeats (an up and a down ramp
+    each) in one scan_line call of the hardware and fills the line matrices in bulk. This saves the
+    per line overhead of short or fast PLE scans, but the plots are only updated once per call.
+
+    Example config:
+
+    laserscannerlogic:
+        module.Class: 'laser_scanner_logic.LaserScannerLogic'
+        repeats_per_scan_call: 10
+        connect:
+            confocalscanner1: 'mydummyscanner'
+            savelogic: 'savelogic'
     """
 
     sig_data_updated = QtCore.Signal()
@@ -48,6 +62,8 @@ class LaserScannerLogic(GenericLogic):
     confocalscanner1 = Connector(interface='ConfocalScannerInterface')
     savelogic = Connector(interface='SaveLogic')
 
+    _repeats_per_scan_call = ConfigOption('repeats_per_scan_call', 1)
+
     scan_range = StatusVar('scan_range', [-10, 10])
     number_of_repeats = StatusVar(default=10)
     resolution = StatusVar('resolution', 500)
@@ -78,6 +94,10 @@ class LaserScannerLogic(GenericLogic):
         self.plot_y = []
         self.plot_y2 = []
 
+        # voltage ramps by (voltage1, voltage2, speed, clock frequency, smoothing steps)
+        self._ramp_cache = OrderedDict()
+        self._ramp_cache_size = 16
+
     def on_activate(self):
         """ Initialisation performed during activation of the module.
         """
@@ -161,7 +181,8 @@ class LaserScannerLogic(GenericLogic):
 
         @return int: error code (0:OK, -1:error)
         """
-        ramp_scan = self._generate_ramp(self.get_current_voltage(), new_voltage, self._goto_speed)
+        position = self._scanning_device.get_scanner_position()
+        ramp_scan = self._generate_ramp(position[3], new_voltage, self._goto_speed, position)
         self._initialise_scanner()
         ignored_counts = self._scan_line(ramp_scan)
         self._close_scanner()
@@ -173,7 +194,8 @@ class LaserScannerLogic(GenericLogic):
         if voltage is None:
             return -1
 
-        goto_ramp = self._generate_ramp(self.get_current_voltage(), voltage, self._goto_speed)
+        position = self._scanning_device.get_scanner_position()
+        goto_ramp = self._generate_ramp(position[3], voltage, self._goto_speed, position)
         ignored_counts = self._scan_line(goto_ramp)
 
         return 0
@@ -278,9 +300,11 @@ class LaserScannerLogic(GenericLogic):
         self._scan_counter_down = 0
         self.upwards_scan = True
 
-        # TODO: Generate Ramps
-        self._upwards_ramp = self._generate_ramp(v_min, v_max, self._scan_speed)
-        self._downwards_ramp = self._generate_ramp(v_max, v_min, self._scan_speed)
+        self._upwards_ramp = self._generate_ramp(
+            v_min, v_max, self._scan_speed, position=self.current_position)
+        self._downwards_ramp = self._generate_ramp(
+            v_max, v_min, self._scan_speed, position=self.current_position)
+        self._repeat_ramp = np.hstack((self._upwards_ramp, self._downwards_ramp))
 
         self._initialise_data_matrix(len(self._upwards_ramp[3]))
 
@@ -327,7 +351,10 @@ class LaserScannerLogic(GenericLogic):
             # move from current voltage to start of scan range.
             self._goto_during_scan(self.scan_range[0])
 
-        if self.upwards_scan:
+        repeats = min(self._repeats_per_scan_call, self.number_of_repeats - self._scan_counter_up)
+        if self.upwards_scan and repeats > 1:
+            self._scan_repeats(repeats)
+        elif self.upwards_scan:
             counts = self._scan_line(self._upwards_ramp)
             self.scan_matrix[self._scan_counter_up] = counts
             self.plot_y += counts
@@ -343,7 +370,22 @@ class LaserScannerLogic(GenericLogic):
         self.sigUpdatePlots.emit()
         self.sigScanNextLine.emit()
 
-    def _generate_ramp(self, voltage1, voltage2, speed):
+    def _scan_repeats(self, repeats):
+        """ Scan several repeats of the up and down ramp in one hardware call.
+
+        @param int repeats: number of up and down ramp pairs to scan
+        """
+        counts = self._scan_line(np.tile(self._repeat_ramp, repeats))
+        counts = counts.reshape(repeats, 2, -1)
+        first = self._scan_counter_up
+        self.scan_matrix[first:first + repeats] = counts[:, 0]
+        self.scan_matrix2[first:first + repeats] = counts[:, 1]
+        self.plot_y += counts[:, 0].sum(axis=0)
+        self.plot_y2 += counts[:, 1].sum(axis=0)
+        self._scan_counter_up += repeats
+        self._scan_counter_down += repeats
+
+    def _generate_ramp(self, voltage1, voltage2, speed, position=None):
         """Generate a ramp vrom voltage1 to voltage2 that
         satisfies the speed, step, smoothing_steps parameters.  Smoothing_steps=0 means that the
         ramp is just linear.
@@ -351,6 +393,44 @@ class LaserScannerLogic(GenericLogic):
         @param float voltage1: voltage at start of ramp.
 
         @param float voltage2: voltage at end of ramp.
+
+        @param float speed: scan speed in volt per second.
+
+        @param list position: optional, scanner position (x, y, z) kept during the ramp. If not
+                              given, the current position is read from the hardware.
+
+        @return numpy.ndarray: scan line of shape (4, N) for the hardware
+        """
+        key = (voltage1, voltage2, speed, self._clock_frequency, self._smoothing_steps)
+        ramp = self._ramp_cache.get(key)
+        if ramp is None:
+            ramp = self._calculate_ramp(voltage1, voltage2, speed)
+            self._ramp_cache[key] = ramp
+            while len(self._ramp_cache) > self._ramp_cache_size:
+                self._ramp_cache.popitem(last=False)
+        else:
+            self._ramp_cache.move_to_end(key)
+
+        # Put the voltage ramp into a scan line for the hardware (4-dimension)
+        if position is None:
+            position = self._scanning_device.get_scanner_position()
+
+        scan_line = np.empty((4, len(ramp)))
+        scan_line[:3] = np.asarray(position[:3], dtype=float)[:, np.newaxis]
+        scan_line[3] = ramp
+
+        return scan_line
+
+    def _calculate_ramp(self, voltage1, voltage2, speed):
+        """Calculate the voltages of a ramp from voltage1 to voltage2.
+
+        @param float voltage1: voltage at start of ramp.
+
+        @param float voltage2: voltage at end of ramp.
+
+        @param float speed: scan speed in volt per second.
+
+        @return numpy.ndarray: voltages of the ramp
         """
 
         # It is much easier to calculate the smoothed ramp for just one direction (upwards),
@@ -366,12 +446,9 @@ class LaserScannerLogic(GenericLogic):
             linear_v_step = speed / self._clock_frequency
             smoothing_range = self._smoothing_steps + 1
 
-            # Sanity check in case the range is too short
-
-            # The voltage range covered while accelerating in the smoothing steps
-            v_range_of_accel = sum(
-                n * linear_v_step / smoothing_range for n in range(0, smoothing_range)
-                )
+            # The voltage range covered while accelerating in the smoothing steps,
+            # sum(n * linear_v_step / smoothing_range for n in range(smoothing_range))
+            v_range_of_accel = linear_v_step * (smoothing_range - 1) / 2
 
             # Obtain voltage bounds for the linear part of the ramp
             v_min_linear = v_min + v_range_of_accel
@@ -382,19 +459,17 @@ class LaserScannerLogic(GenericLogic):
                     'Voltage ramp too short to apply the '
                     'configured smoothing_steps. A simple linear ramp '
                     'was created instead.')
-                num_of_linear_steps = np.rint((v_max - v_min) / linear_v_step)
+                num_of_linear_steps = int(np.rint((v_max - v_min) / linear_v_step))
                 ramp = np.linspace(v_min, v_max, num_of_linear_steps)
 
             else:
 
-                num_of_linear_steps = np.rint((v_max_linear - v_min_linear) / linear_v_step)
+                num_of_linear_steps = int(np.rint((v_max_linear - v_min_linear) / linear_v_step))
 
-                # Calculate voltage step values for smooth acceleration part of ramp
-                smooth_curve = np.array(
-                    [sum(
-                        n * linear_v_step / smoothing_range for n in range(1, N)
-                        ) for N in range(1, smoothing_range)
-                    ])
+                # Voltage step values for smooth acceleration part of ramp,
+                # sum(n * linear_v_step / smoothing_range for n in range(1, N)) for each N
+                steps = np.arange(1, smoothing_range)
+                smooth_curve = linear_v_step / smoothing_range * (steps - 1) * steps / 2
 
                 accel_part = v_min + smooth_curve
                 decel_part = v_max - smooth_curve[::-1]
@@ -407,17 +482,9 @@ class LaserScannerLogic(GenericLogic):
         if voltage2 < voltage1:
             ramp = ramp[::-1]
 
-        # Put the voltage ramp into a scan line for the hardware (4-dimension)
-        spatial_pos = self._scanning_device.get_scanner_position()
-
-        scan_line = np.vstack((
-            np.ones((len(ramp), )) * spatial_pos[0],
-            np.ones((len(ramp), )) * spatial_pos[1],
-            np.ones((len(ramp), )) * spatial_pos[2],
-            ramp
-            ))
-
-        return scan_line
+        # the cached ramps are shared
+        ramp.setflags(write=False)
+        return ramp
 
     def _scan_line(self, line_to_scan=None):
         """do a single voltage scan from voltage1 to voltage2
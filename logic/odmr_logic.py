@@ -31,6 +31,7 @@ import matplotlib.pyplot as plt
 
 from logic.generic_logic import GenericLogic
 from core.util.mutex import Mutex
+from core.util.looptimer import timed_loop
 from core.connector import Connector
 from core.configoption import ConfigOption
 from core.statusvariable import StatusVar
@@ -733,6 +734,7 @@ class ODMRLogic(GenericLogic):
                 self._clearOdmrData = True
         return
 
+    @timed_loop()
     def _scan_odmr_line(self):
         """ Scans one line in ODMR
 
@@ -31,6 +31,7 @@ from core.connector import Connector
 from core.configoption import ConfigOption
 from core.statusvariable import StatusVar
 from core.util.mutex import Mutex
+from core.util.looptimer import timed_loop
 from core.util.network import netobtain
 from core.util import units
 from core.util.math import compute_ft
@@ -1097,6 +1098,7 @@ class PulsedMeasurementLogic(GenericLogic):
                                                                         self.__fast_counter_gates))
         return
 
+    @timed_loop(period=lambda self: self.__timer_interval)
     def _pulsed_analysis_loop(self):
         """ Acquires laser pulses from fast counter,
             calculates fluorescence signal and creates plots.
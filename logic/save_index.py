@@ -0,0 +1,397 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the SQLite index of the data files saved by the SaveLogic.
+
+Finding measurements in the daily directory tree (<data dir>/<year>/<month>/<yyyymmdd>/<module>)
+by module, label, parameters or time range otherwise means walking the file system and parsing
+the file headers. The SaveLogic adds every file to the index when it is saved. Existing trees
+are added with SaveIndex.rebuild, which lists and parses the daily directories in parallel
+worker processes:
+
+    python tools/rebuild_file_index.py <data directory> <index file>
+
+Every file is stored with its absolute path, modification time, saving module (python module of
+the caller), directory name (e.g. 'ODMR'), timestamp, label and the parameters of its header.
+Parameter values are stored as text and, if they can be converted, as number, so they can be
+queried by value or numeric range.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import datetime
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime REAL,
+    module TEXT,
+    folder TEXT,
+    timestamp REAL,
+    label TEXT
+);
+CREATE INDEX IF NOT EXISTS files_timestamp ON files (timestamp);
+CREATE INDEX IF NOT EXISTS files_module ON files (module, timestamp);
+CREATE INDEX IF NOT EXISTS files_folder ON files (folder, timestamp);
+CREATE INDEX IF NOT EXISTS files_label ON files (label, timestamp);
+CREATE TABLE IF NOT EXISTS parameters (
+    file_id INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value TEXT,
+    number REAL
+);
+CREATE INDEX IF NOT EXISTS parameters_file ON parameters (file_id);
+CREATE INDEX IF NOT EXISTS parameters_value ON parameters (key, value, file_id);
+CREATE INDEX IF NOT EXISTS parameters_number ON parameters (key, number, file_id);
+"""
+
+# e.g. 'Saved Data from the class odmr_logic on 24.12.2019 at 13h05m59s.'
+_FIRST_LINE = re.compile(
+    r'#\s*Saved Data from the class (.*) on (\d\d\.\d\d\.\d{4} at \d\dh\d\dm\d\ds)')
+# e.g. '20191224-1305-59_ODMR_data.dat'
+_FILENAME = re.compile(r'^(\d{8}-\d{4}-\d\d)_(.*)\.dat$')
+
+
+def _to_number(value):
+    """ Value as float for numeric queries, None if it is not a number. """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def read_header(path):
+    """ Read the module, timestamp, label and parameters from the header of a qudi data file.
+
+    @param str path: path of a text file written by SaveLogic.save_data
+
+    @return dict: index record with the keys 'path', 'mtime', 'module', 'folder', 'timestamp',
+                  'label' and 'parameters' (list of (key, value) tuples), None if the file has no
+                  qudi header
+    """
+    parameters = list()
+    with open(path, 'r', encoding='utf-8', errors='replace') as file:
+        match = _FIRST_LINE.match(file.readline())
+        if match is None:
+            return None
+        module = match.group(1)
+        timestamp = datetime.datetime.strptime(match.group(2), '%d.%m.%Y at %Hh%Mm%Ss')
+        in_parameters = False
+        for line in file:
+            if not line.startswith('#'):
+                break
+            line = line[1:].strip()
+            if line == 'Data:':
+                break
+            if line == 'Parameters:':
+                in_parameters = True
+            elif in_parameters and ': ' in line:
+                key, value = line.split(': ', 1)
+                parameters.append((key, value))
+
+    directory, filename = os.path.split(os.path.abspath(path))
+    label = None
+    match = _FILENAME.match(filename)
+    if match is not None:
+        label = match.group(2)
+        if label.endswith('_params'):
+            label = label[:-len('_params')]
+    if filename.endswith('_params.dat') and os.path.exists(path[:-len('_params.dat')] + '.npz'):
+        # parameter file of npz data
+        path = path[:-len('_params.dat')] + '.npz'
+    return {'path': os.path.abspath(path),
+            'mtime': os.path.getmtime(path),
+            'module': module,
+            'folder': os.path.basename(directory),
+            'timestamp': timestamp.timestamp(),
+            'label': label,
+            'parameters': parameters}
+
+
+def list_data_files(directory, recursive=True):
+    """ List the qudi data files in a directory. Entry point of the rebuild worker processes.
+
+    @param str directory: directory to list
+    @param bool recursive: also list the files in all subdirectories
+
+    @return list(tuple): (path, modification time) of all .dat files
+    """
+    files = list()
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return files
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if recursive:
+                files.extend(list_data_files(entry.path, True))
+        elif entry.name.endswith('.dat'):
+            files.append((os.path.abspath(entry.path), entry.stat().st_mtime))
+    return files
+
+
+def read_headers(paths):
+    """ Read the headers of several files. Entry point of the rebuild worker processes.
+
+    @param list(str) paths: paths of the data files
+
+    @return list(dict): index records of the files with qudi header (see read_header)
+    """
+    records = list()
+    for path in paths:
+        try:
+            record = read_header(path)
+        except (OSError, ValueError):
+            continue
+        if record is not None:
+            records.append(record)
+    return records
+
+
+def _split_tree(directory, depth=3):
+    """ Split a data directory into listing tasks of about one daily directory each.
+
+    @param str directory: root of the tree
+    @param int depth: depth of the daily directories (<year>/<month>/<yyyymmdd>)
+
+    @return list(tuple): (directory, recursive) tasks for list_data_files
+    """
+    if depth == 0:
+        return [(directory, True)]
+    tasks = [(directory, False)]
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return tasks
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            tasks.extend(_split_tree(entry.path, depth - 1))
+    return tasks
+
+
+class SaveIndex:
+    """ SQLite index of saved data files. Thread safe, every method can be called from any thread.
+    """
+
+    def __init__(self, path):
+        """
+        @param str path: path of the SQLite database file, created if it does not exist
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute('PRAGMA foreign_keys=ON')
+        self._connection.executescript(_SCHEMA)
+        self._connection.commit()
+
+    def close(self):
+        """ Close the database. """
+        with self._lock:
+            self._connection.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    def _insert(self, record):
+        """ Insert or replace a record. The caller holds the lock and commits. """
+        self._connection.execute('DELETE FROM files WHERE path = ?', (record['path'], ))
+        cursor = self._connection.execute(
+            'INSERT INTO files (path, mtime, module, folder, timestamp, label) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (record['path'], record.get('mtime'), record.get('module'), record.get('folder'),
+             record.get('timestamp'), record.get('label')))
+        file_id = cursor.lastrowid
+        self._connection.executemany(
+            'INSERT INTO parameters (file_id, key, value, number) VALUES (?, ?, ?, ?)',
+            [(file_id, str(key), str(value), _to_number(value))
+             for key, value in record.get('parameters', ())])
+
+    def add(self, path, module=None, timestamp=None, label=None, parameters=None):
+        """ Add a file to the index. A file already in the index is replaced.
+
+        @param str path: path of the file
+        @param str module: optional, name of the module that saved the file
+        @param datetime timestamp: optional, timestamp of the measurement
+        @param str label: optional, label of the file
+        @param dict parameters: optional, parameters saved in the header of the file
+        """
+        path = os.path.abspath(path)
+        record = {'path': path,
+                  'mtime': os.path.getmtime(path) if os.path.exists(path) else None,
+                  'module': module,
+                  'folder': os.path.basename(os.path.dirname(path)),
+                  'timestamp': None if timestamp is None else timestamp.timestamp(),
+                  'label': label,
+                  'parameters': list(parameters.items()) if parameters else list()}
+        with self._lock:
+            self._insert(record)
+            self._connection.commit()
+
+    def remove(self, path):
+        """ Remove a file from the index.
+
+        @param str path: path of the file
+        """
+        with self._lock:
+            self._connection.execute('DELETE FROM files WHERE path = ?', (os.path.abspath(path),))
+            self._connection.commit()
+
+    def find(self, module=None, folder=None, label=None, start=None, stop=None, parameters=None,
+             limit=None):
+        """ Find files in the index. All given criteria must match.
+
+        @param str module: optional, name of the python module that saved the file (e.g.
+                           'odmr_logic')
+        @param str folder: optional, name of the directory of the file (e.g. 'ODMR')
+        @param str label: optional, label of the file, may contain SQL wildcards ('%', '_')
+        @param start: optional, datetime or POSIX timestamp of the earliest file
+        @param stop: optional, datetime or POSIX timestamp of the latest file
+        @param dict parameters: optional, parameter values of the file. A value can be a number
+                                (equal number, also for strings like '1e3'), a string (equal
+                                text) or a tuple (min, max) for a numeric range, min or max can be
+                                None.
+        @param int limit: optional, maximum number of files returned
+
+        @return list(dict): the files sorted by timestamp, newest first, with the keys 'path',
+                            'module', 'folder', 'timestamp' (datetime) and 'label'
+        """
+        conditions = list()
+        arguments = list()
+        for column, value in (('module', module), ('folder', folder)):
+            if value is not None:
+                conditions.append('{0} = ?'.format(column))
+                arguments.append(value)
+        if label is not None:
+            conditions.append('label LIKE ?')
+            arguments.append(label)
+        for operator, value in (('>=', start), ('<=', stop)):
+            if value is not None:
+                if isinstance(value, datetime.datetime):
+                    value = value.timestamp()
+                conditions.append('timestamp {0} ?'.format(operator))
+                arguments.append(value)
+        for key, value in (parameters or dict()).items():
+            condition = 'id IN (SELECT file_id FROM parameters WHERE key = ?'
+            arguments.append(key)
+            if isinstance(value, tuple):
+                if value[0] is not None:
+                    condition += ' AND number >= ?'
+                    arguments.append(value[0])
+                if value[1] is not None:
+                    condition += ' AND number <= ?'
+                    arguments.append(value[1])
+            elif _to_number(value) is not None:
+                condition += ' AND number = ?'
+                arguments.append(_to_number(value))
+            else:
+                condition += ' AND value = ?'
+                arguments.append(str(value))
+            conditions.append(condition + ')')
+
+        query = 'SELECT path, module, folder, timestamp, label FROM files'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY timestamp DESC'
+        if limit is not None:
+            query += ' LIMIT {0:d}'.format(int(limit))
+        with self._lock:
+            rows = self._connection.execute(query, arguments).fetchall()
+        return [{'path': path,
+                 'module': module,
+                 'folder': folder,
+                 'timestamp': None if timestamp is None
+                 else datetime.datetime.fromtimestamp(timestamp),
+                 'label': label} for path, module, folder, timestamp, label in rows]
+
+    def get_parameters(self, path):
+        """ Get the parameters of an indexed file.
+
+        @param str path: path of the file
+
+        @return dict: parameters as strings
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT key, value FROM parameters JOIN files ON files.id = parameters.file_id '
+                'WHERE files.path = ?', (os.path.abspath(path),)).fetchall()
+        return dict(rows)
+
+    def rebuild(self, directory, workers=None, prune=True, chunk_size=500):
+        """ Add all data files of a directory tree that are new or changed since they were indexed.
+        The directories are listed and the headers are read in parallel worker processes.
+
+        @param str directory: root of the data directory tree
+        @param int workers: optional, number of worker processes (default: number of CPUs)
+        @param bool prune: remove files below directory from the index that do not exist anymore
+        @param int chunk_size: number of files read per worker task
+
+        @return tuple(int, int): number of added or updated files, number of removed files
+        """
+        directory = os.path.abspath(directory)
+        # all paths below directory, as a range because LIKE would treat '_' and '%' in the
+        # directory name as wildcards
+        prefix = os.path.join(directory, '')
+        with self._lock:
+            known = dict(self._connection.execute(
+                'SELECT path, mtime FROM files WHERE path >= ? AND path < ?',
+                (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1))).fetchall())
+
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            # indexed path: (modification time, file with the header)
+            listed = dict()
+            tasks = _split_tree(directory)
+            for files in executor.map(list_data_files, *zip(*tasks)):
+                for path, mtime in files:
+                    npz = path[:-len('_params.dat')] + '.npz'
+                    if path.endswith('_params.dat') and os.path.exists(npz):
+                        # npz data is indexed with the header of its parameter file
+                        listed[npz] = (os.path.getmtime(npz), path)
+                    else:
+                        listed[path] = (mtime, path)
+            changed = [header for path, (mtime, header) in listed.items()
+                       if known.get(path) != mtime]
+            chunks = [changed[i:i + chunk_size] for i in range(0, len(changed), chunk_size)]
+            added = 0
+            for records in executor.map(read_headers, chunks):
+                with self._lock:
+                    for record in records:
+                        self._insert(record)
+                    self._connection.commit()
+                added += len(records)
+
+        removed = 0
+        if prune:
+            missing = [(path, ) for path in known if path not in listed]
+            with self._lock:
+                self._connection.executemany('DELETE FROM files WHERE path = ?', missing)
+                self._connection.commit()
+            removed = len(missing)
+        with self._lock:
+            # statistics for the query planner
+            self._connection.execute('ANALYZE')
+            self._connection.commit()
+        return added, removed
@@ -21,23 +21,27 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 
 from cycler import cycler
 import datetime
+import functools
 import inspect
 import logging
-import matplotlib.pyplot as plt
+import multiprocessing
 import numpy as np
 import os
+import pickle
 import sys
+import threading
 import time
 
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from qtpy import QtCore
 from core.configoption import ConfigOption
 from core.util import units
 from core.util.mutex import Mutex
 from core.util.network import netobtain
 from logic.generic_logic import GenericLogic
-from matplotlib.backends.backend_pdf import PdfPages
-from PIL import Image
-from PIL import PngImagePlugin
+from logic.save_index import SaveIndex
+from logic.save_worker import DeferredFigure, run_pickled_save_job, write_save_job
 
 
 class DailyLogHandler(logging.FileHandler):
@@ -129,6 +133,22 @@ class SaveLogic(GenericLogic):
         log_into_daily_directory: True
         save_pdf: True
         save_png: True
+        background_saving: False
+        save_processes: 2
+        max_queued_save_memory: 512
+        file_index: True
+        file_index_path: 'C:/qudi/file_index.sqlite'  # optional, default in the app status dir
+
+    With background_saving, save_data hands a snapshot of the data and the figure to a pool of
+    save_processes worker processes and returns immediately. The figure is rendered and all files
+    are written in the workers. The result is reported with sigDataSaved or sigSaveFailed. If the
+    pending saves use more than max_queued_save_memory (in MB), save_data waits until enough saves
+    are finished.
+
+    With file_index, every saved file is added to a SQLite index (see logic.save_index) with its
+    module, label, timestamp and header parameters. find_files queries it in milliseconds
+    independent of the size of the data directory. Files saved before (or by other setups) are
+    added with rebuild_file_index or tools/rebuild_file_index.py.
     """
 
     _win_data_dir = ConfigOption('win_data_directory', 'C:/Data/')
@@ -136,6 +156,16 @@ class SaveLogic(GenericLogic):
     log_into_daily_directory = ConfigOption('log_into_daily_directory', False, missing='warn')
     save_pdf = ConfigOption('save_pdf', False)
     save_png = ConfigOption('save_png', True)
+    background_saving = ConfigOption('background_saving', False)
+    _save_processes = ConfigOption('save_processes', 2)
+    _max_queued_save_memory = ConfigOption('max_queued_save_memory', 512)
+    _use_file_index = ConfigOption('file_index', True)
+    _file_index_path = ConfigOption('file_index_path', None)
+
+    # (filename, list of written files)
+    sigDataSaved = QtCore.Signal(str, list)
+    # (filename, error message)
+    sigSaveFailed = QtCore.Signal(str, str)
 
     # Matplotlib style definition for saving plots
     mpl_qd_style = {
@@ -202,6 +232,14 @@ class SaveLogic(GenericLogic):
 
         self._daily_loghandler = None
 
+        # process pool for background saving, started with the first background save
+        self._save_executor = None
+        self._save_condition = threading.Condition()
+        self._queued_save_bytes = 0
+        self._pending_saves = 0
+
+        self._file_index = None
+
     def on_activate(self):
         """ Definition, configuration and initialisation of the SaveLogic.
         """
@@ -217,7 +255,25 @@ class SaveLogic(GenericLogic):
         else:
             self._daily_loghandler = None
 
+        if self._use_file_index:
+            path = self._file_index_path
+            if path is None:
+                path = os.path.join(self._manager.getStatusDir(), 'file_index.sqlite')
+            try:
+                self._file_index = SaveIndex(os.path.expandvars(path))
+            except Exception:
+                self.log.exception('Unable to open the file index "{0}". Saved files are not '
+                                   'indexed.'.format(path))
+                self._file_index = None
+
     def on_deactivate(self):
+        if self._save_executor is not None:
+            # finish all pending background saves
+            self._save_executor.shutdown(wait=True)
+            self._save_executor = None
+        if self._file_index is not None:
+            self._file_index.close()
+            self._file_index = None
         if self._daily_loghandler is not None:
             # removes the log handler logging into the daily directory
             logging.getLogger().removeHandler(self._daily_loghandler)
@@ -238,7 +294,8 @@ class SaveLogic(GenericLogic):
         self._daily_loghandler.setLevel(level)
 
     def save_data(self, data, filepath=None, parameters=None, filename=None, filelabel=None,
-                  timestamp=None, filetype='text', fmt='%.15e', delimiter='\t', plotfig=None):
+                  timestamp=None, filetype='text', fmt='%.15e', delimiter='\t', plotfig=None,
+                  block=None):
         """
         General save routine for data.
 
@@ -299,6 +356,12 @@ class SaveLogic(GenericLogic):
                                               behaviour or failure to save right away.
         @param string delimiter: optional, insert here the delimiter, like '\n' for new line, '\t'
                                  for tab, ',' for a comma ect.
+        @param plotfig: optional, matplotlib figure or logic.save_worker.DeferredFigure to save as
+                        PDF and/or PNG next to the data file. The figure is closed after saving.
+        @param bool block: optional, if False the files are written by the worker processes and this
+                           method returns immediately (see class documentation). If True the files
+                           are written before returning. Default is False if the ConfigOption
+                           background_saving is set, otherwise True.
 
         1D data
         =======
@@ -446,8 +509,17 @@ class SaveLogic(GenericLogic):
                 header += 'not specified parameters: {0}\n'.format(parameters)
         header += '\nData:\n=====\n'
 
-        # write data to file
+        # entry of the file index, header parameters as written into the file
+        index_entry = {'module': module_name, 'timestamp': timestamp, 'label': filelabel,
+                       'parameters': OrderedDict()}
+        if self.active_poi_name != '':
+            index_entry['parameters']['Measured at POI'] = self.active_poi_name
+        if isinstance(parameters, dict):
+            index_entry['parameters'].update(parameters)
+
+        # collect the files to write
         # FIXME: Implement other file formats
+        files = list()
         # write to textfile
         if filetype == 'text':
             # Reshape data if multiple 1D arrays have been passed to this method.
@@ -488,22 +560,24 @@ class SaveLogic(GenericLogic):
             else:
                 identifier_str = list(data)[0]
             header += list(data)[0]
-            self.save_array_as_text(data=data[identifier_str], filename=filename, filepath=filepath,
-                                    fmt=fmt, header=header, delimiter=delimiter, comments='#',
-                                    append=False)
+            files.append(('text', os.path.join(filepath, filename), data[identifier_str], fmt,
+                          header, delimiter))
         # write npz file and save parameters in textfile
         elif filetype == 'npz':
             header += str(list(data.keys()))[1:-1]
-            np.savez_compressed(filepath + '/' + filename[:-4], **data)
-            self.save_array_as_text(data=[], filename=filename[:-4]+'_params.dat', filepath=filepath,
-                                    fmt=fmt, header=header, delimiter=delimiter, comments='#',
-                                    append=False)
+            files.append(('npz', filepath + '/' + filename[:-4], data))
+            index_entry['path'] = filepath + '/' + filename[:-4] + '.npz'
+            files.append(('text', os.path.join(filepath, filename[:-4] + '_params.dat'), [], fmt,
+                          header, delimiter))
         else:
             self.log.error('Only saving of data as textfile and npz-file is implemented. Filetype "{0}" is not '
                            'supported yet. Saving as textfile.'.format(filetype))
-            self.save_array_as_text(data=data[identifier_str], filename=filename, filepath=filepath,
-                                    fmt=fmt, header=header, delimiter=delimiter, comments='#',
-                                    append=False)
+            identifier_str = list(data)[0]
+            files.append(('text', os.path.join(filepath, filename), data[identifier_str], fmt,
+                          header, delimiter))
+
+        index_entry.setdefault('path', files[0][1])
+        job = {'files': files, 'figure': plotfig}
 
         #--------------------------------------------------------------------------------------------
         # Save thumbnail figure of plot
@@ -515,57 +589,166 @@ class SaveLogic(GenericLogic):
             metadata['Subject'] = 'Find more information on: https://github.com/Ulm-IQO/qudi'
             metadata['Keywords'] = 'Python 3, Qt, experiment control, automation, measurement, software, framework, modular'
             metadata['Producer'] = 'qudi - Software Suite'
-            if timestamp is not None:
-                metadata['CreationDate'] = timestamp
-                metadata['ModDate'] = timestamp
-            else:
-                metadata['CreationDate'] = time
-                metadata['ModDate'] = time
-            
-            if self.save_pdf:
-                # determine the PDF-Filename
-                fig_fname_vector = os.path.join(filepath, filename)[:-4] + '_fig.pdf'
-
-                # Create the PdfPages object to which we will save the pages:
-                # The with statement makes sure that the PdfPages object is closed properly at
-                # the end of the block, even if an Exception occurs.
-                with PdfPages(fig_fname_vector) as pdf:
-                    pdf.savefig(plotfig, bbox_inches='tight', pad_inches=0.05)
-
-                    # We can also set the file's metadata via the PdfPages object:
-                    pdf_metadata = pdf.infodict()
-                    for x in metadata:
-                        pdf_metadata[x] = metadata[x]
-
-            if self.save_png:
-                # determine the PNG-Filename and save the plain PNG
-                fig_fname_image = os.path.join(filepath, filename)[:-4] + '_fig.png'
-                plotfig.savefig(fig_fname_image, bbox_inches='tight', pad_inches=0.05)
-
-                # Use Pillow (an fork for PIL) to attach metadata to the PNG
-                png_image = Image.open(fig_fname_image)
-                png_metadata = PngImagePlugin.PngInfo()
-
-                # PIL can only handle Strings, so let's convert our times
-                metadata['CreationDate'] = metadata['CreationDate'].strftime('%Y%m%d-%H%M-%S')
-                metadata['ModDate'] = metadata['ModDate'].strftime('%Y%m%d-%H%M-%S')
-
-                for x in metadata:
-                    # make sure every value of the metadata is a string
-                    if not isinstance(metadata[x], str):
-                        metadata[x] = str(metadata[x])
-
-                    # add the metadata to the picture
-                    png_metadata.add_text(x, metadata[x])
-
-                # save the picture again, this time including the metadata
-                png_image.save(fig_fname_image, "png", pnginfo=png_metadata)
-
-            # close matplotlib figure
-            plt.close(plotfig)
-            self.log.debug('Time needed to save data: {0:.2f}s'.format(time.time()-start_time))
+            metadata['CreationDate'] = timestamp
+            metadata['ModDate'] = timestamp
+
+            job['figure_path'] = os.path.join(filepath, filename)[:-4]
+            job['metadata'] = metadata
+            job['save_pdf'] = self.save_pdf
+            job['save_png'] = self.save_png
             #----------------------------------------------------------------------------------
 
+        if block is None:
+            block = not self.background_saving
+        if not block and self._submit_save_job(filename, job, index_entry):
+            return
+        written = write_save_job(job)
+        self._add_to_file_index(index_entry)
+        self.log.debug('Time needed to save data: {0:.2f}s'.format(time.time()-start_time))
+        self.sigDataSaved.emit(filename, written)
+
+    def _submit_save_job(self, filename, job, index_entry=None):
+        """ Hand a save job to the worker processes.
+
+        @param str filename: name of the data file, used to report the result
+        @param dict job: save job, see logic.save_worker
+        @param dict index_entry: optional, entry of the file index added when the job is done
+
+        @return bool: True if the job was submitted, False if it has to be written synchronously
+
+        The job is pickled here, so later changes of the data do not affect the saved files. Waits
+        while the pending jobs exceed the memory limit.
+        """
+        try:
+            pickled_job = pickle.dumps(job, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            self.log.warning('Save job for "{0}" can not be sent to a worker process ({1}). '
+                             'Saving in the calling thread.'.format(filename, e))
+            return False
+        if job['figure'] is not None and not isinstance(job['figure'], DeferredFigure):
+            # the figure has been copied to the job
+            import matplotlib.pyplot as plt
+            plt.close(job['figure'])
+
+        size = len(pickled_job)
+        limit = self._max_queued_save_memory * 1024**2
+        with self._save_condition:
+            # a single job larger than the limit is submitted as soon as the queue is empty
+            if self._pending_saves > 0 and self._queued_save_bytes + size > limit:
+                self.log.debug('Waiting for pending saves to free memory.')
+                self._save_condition.wait_for(
+                    lambda: self._pending_saves == 0 or self._queued_save_bytes + size <= limit)
+            if self._save_executor is None:
+                self._save_executor = ProcessPoolExecutor(
+                    max_workers=self._save_processes,
+                    mp_context=multiprocessing.get_context('spawn'))
+            self._queued_save_bytes += size
+            self._pending_saves += 1
+            future = self._save_executor.submit(run_pickled_save_job, pickled_job)
+        future.add_done_callback(
+            functools.partial(self._save_job_done, filename, size, index_entry))
+        return True
+
+    def _save_job_done(self, filename, size, index_entry, future):
+        """ Callback of a finished background save job. Runs in a thread of the process pool.
+
+        @param str filename: name of the data file
+        @param int size: size of the pickled job in bytes
+        @param dict index_entry: entry of the file index, None to not index the file
+        @param Future future: future of the save job
+        """
+        try:
+            written = future.result()
+        except Exception as e:
+            self.log.error('Saving "{0}" in the background failed: {1!r}'.format(filename, e))
+            self.sigSaveFailed.emit(filename, repr(e))
+        else:
+            self.log.debug('Saved "{0}" in the background.'.format(filename))
+            self._add_to_file_index(index_entry)
+            self.sigDataSaved.emit(filename, written)
+        finally:
+            with self._save_condition:
+                self._queued_save_bytes -= size
+                self._pending_saves -= 1
+                self._save_condition.notify_all()
+
+    def _add_to_file_index(self, index_entry):
+        """ Add a saved file to the file index. Errors are logged, saving does not fail because of
+        the index.
+
+        @param dict index_entry: keyword arguments of SaveIndex.add, None to do nothing
+        """
+        if self._file_index is None or index_entry is None:
+            return
+        try:
+            self._file_index.add(**index_entry)
+        except Exception as e:
+            self.log.warning('Unable to add "{0}" to the file index: {1!r}'
+                             ''.format(index_entry['path'], e))
+
+    @property
+    def file_index(self):
+        """ The SaveIndex of the saved files, None if the index is disabled. """
+        return self._file_index
+
+    def find_files(self, module=None, folder=None, label=None, start=None, stop=None,
+                   parameters=None, limit=None):
+        """ Find saved files in the file index. All given criteria must match.
+
+        @param str module: optional, name of the python module that saved the file (e.g.
+                           'odmr_logic')
+        @param str folder: optional, name of the directory of the file (e.g. 'ODMR')
+        @param str label: optional, label of the file, may contain SQL wildcards ('%', '_')
+        @param start: optional, datetime or POSIX timestamp of the earliest file
+        @param stop: optional, datetime or POSIX timestamp of the latest file
+        @param dict parameters: optional, parameter values of the file. A value can be a number or
+                                string (equal value) or a tuple (min, max) for a numeric range.
+        @param int limit: optional, maximum number of files returned
+
+        @return list(dict): the files, newest first, with the keys 'path', 'module', 'folder',
+                            'timestamp' and 'label'
+        """
+        if self._file_index is None:
+            self.log.error('The file index is disabled (ConfigOption file_index).')
+            return list()
+        return self._file_index.find(module=module, folder=folder, label=label, start=start,
+                                     stop=stop, parameters=parameters, limit=limit)
+
+    def rebuild_file_index(self, directory=None, workers=None):
+        """ Add all files of a data directory tree that are new or changed to the file index, and
+        remove the files that do not exist anymore. The tree is scanned in parallel processes.
+
+        @param str directory: optional, root of the tree, default is the data directory
+        @param int workers: optional, number of worker processes (default: number of CPUs)
+
+        @return int: error code (0: OK, -1: error)
+        """
+        if self._file_index is None:
+            self.log.error('The file index is disabled (ConfigOption file_index).')
+            return -1
+        directory = self.data_dir if directory is None else directory
+        start_time = time.time()
+        added, removed = self._file_index.rebuild(directory, workers=workers)
+        self.log.info('File index of "{0}" updated in {1:.1f}s: {2:d} files added or changed, '
+                      '{3:d} removed.'.format(directory, time.time() - start_time, added, removed))
+        return 0
+
+    def wait_for_saves(self, timeout=None):
+        """ Wait until all background saves are finished.
+
+        @param float timeout: optional, maximum time to wait in s
+
+        @return bool: True if all saves are finished, False on timeout
+        """
+        with self._save_condition:
+            return self._save_condition.wait_for(lambda: self._pending_saves == 0, timeout)
+
+    @property
+    def pending_saves(self):
+        """ Number of background saves that are not finished yet. """
+        with self._save_condition:
+            return self._pending_saves
+
     def save_array_as_text(self, data, filename, filepath='', fmt='%.15e', header='',
                            delimiter='\t', comments='#', append=False):
         """
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the file output of the SaveLogic that can run in worker processes.
+
+A save job is a dictionary describing all files to write for one SaveLogic.save_data call:
+
+    {'files': [('text', path, array, fmt, header, delimiter), ('npz', path, dict of arrays)],
+     'figure': matplotlib figure, DeferredFigure or None,
+     'figure_path': path of the figure files without extension,
+     'metadata': dict of figure metadata,
+     'save_pdf': bool,
+     'save_png': bool}
+
+write_save_job writes a job in the current process. run_pickled_save_job is the entry point for
+the process pool of the SaveLogic. It receives the job pickled by the logic thread, so the job is a
+snapshot of the data at the time of the save_data call. Figures are rendered with the Agg backend
+in the worker processes.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import pickle
+import numpy as np
+
+
+class DeferredFigure:
+    """ A figure that is only drawn when it is saved, e.g. in a save worker process.
+
+    Holds a module level function creating a matplotlib figure and its arguments. Function and
+    arguments must be picklable to be rendered in a worker process.
+
+    Usage example:
+
+        plotfig = DeferredFigure(draw_image_figure, data=image.copy(), style=mpl_qd_style)
+        save_logic.save_data(data, plotfig=plotfig)
+    """
+
+    def __init__(self, function, *args, **kwargs):
+        """
+        @param callable function: module level function returning a matplotlib figure
+        @param args: positional arguments for function
+        @param kwargs: keyword arguments for function
+        """
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+
+    def draw(self):
+        """ Create the figure.
+
+        @return matplotlib.figure.Figure: the figure
+        """
+        return self.function(*self.args, **self.kwargs)
+
+
+def save_figure(fig, figure_path, metadata, save_pdf=True, save_png=True):
+    """ Save a matplotlib figure as PDF and/or PNG including metadata.
+
+    @param matplotlib.figure.Figure fig: figure to save
+    @param str figure_path: path of the files without extension
+    @param dict metadata: metadata entries. CreationDate and ModDate must be datetime objects.
+    @param bool save_pdf: save the figure as PDF
+    @param bool save_png: save the figure as PNG
+
+    @return list: paths of the written files
+    """
+    written = list()
+    if save_pdf:
+        from matplotlib.backends.backend_pdf import PdfPages
+
+        fig_fname_vector = figure_path + '_fig.pdf'
+        # The with statement makes sure that the PdfPages object is closed properly at
+        # the end of the block, even if an Exception occurs.
+        with PdfPages(fig_fname_vector) as pdf:
+            pdf.savefig(fig, bbox_inches='tight', pad_inches=0.05)
+
+            # We can also set the file's metadata via the PdfPages object:
+            pdf_metadata = pdf.infodict()
+            for x in metadata:
+                pdf_metadata[x] = metadata[x]
+        written.append(fig_fname_vector)
+
+    if save_png:
+        from PIL import Image
+        from PIL import PngImagePlugin
+
+        # save the plain PNG
+        fig_fname_image = figure_path + '_fig.png'
+        fig.savefig(fig_fname_image, bbox_inches='tight', pad_inches=0.05)
+
+        # Use Pillow (an fork for PIL) to attach metadata to the PNG
+        png_image = Image.open(fig_fname_image)
+        png_metadata = PngImagePlugin.PngInfo()
+
+        for x, value in metadata.items():
+            # PIL can only handle strings, so let's convert our times
+            if x in ('CreationDate', 'ModDate'):
+                value = value.strftime('%Y%m%d-%H%M-%S')
+            # make sure every value of the metadata is a string
+            png_metadata.add_text(x, value if isinstance(value, str) else str(value))
+
+        # save the picture again, this time including the metadata
+        png_image.save(fig_fname_image, "png", pnginfo=png_metadata)
+        written.append(fig_fname_image)
+    return written
+
+
+def write_save_job(job):
+    """ Write all files of a save job.
+
+    @param dict job: save job, see module documentation
+
+    @return list: paths of the written files
+    """
+    written = list()
+    for entry in job['files']:
+        if entry[0] == 'text':
+            path, data, fmt, header, delimiter = entry[1:]
+            with open(path, 'wb') as file:
+                np.savetxt(file, data, fmt=fmt, delimiter=delimiter, header=header, comments='#')
+        elif entry[0] == 'npz':
+            path, data = entry[1:]
+            np.savez_compressed(path, **data)
+            path += '.npz'
+        else:
+            raise ValueError('Unknown file type "{0}" in save job.'.format(entry[0]))
+        written.append(path)
+
+    fig = job.get('figure')
+    if fig is None:
+        return written
+
+    import matplotlib.pyplot as plt
+    if isinstance(fig, DeferredFigure):
+        fig = fig.draw()
+    try:
+        written.extend(save_figure(fig, job['figure_path'], job['metadata'],
+                                   job['save_pdf'], job['save_png']))
+    finally:
+        plt.close(fig)
+    return written
+
+
+def run_pickled_save_job(pickled_job):
+    """ Write a pickled save job. Entry point of the SaveLogic worker processes.
+
+    @param bytes pickled_job: save job pickled with pickle.dumps
+
+    @return list: paths of the written files
+    """
+    # Render figures without GUI. Must happen before a pickled figure is restored.
+    import matplotlib
+    matplotlib.use('Agg')
+    return write_save_job(pickle.loads(pickled_job))
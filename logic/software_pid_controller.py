@@ -21,8 +21,10 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 from qtpy import QtCore
+from core.util.looptimer import get_loop_timer
 from core.util.mutex import Mutex
 import numpy as np
+import time
 
 from logic.generic_logic import GenericLogic
 from interface.pid_controller_interface import PIDControllerInterface
@@ -34,6 +36,27 @@ from core.statusvariable import StatusVar
 class SoftPIDController(GenericLogic, PIDControllerInterface):
     """
     Control a process via software PID.
+
+    The steps are scheduled against a monotonic clock every timestep (in ms), so the period does not
+    drift with the execution time of a step or the latency of the event loop. The integral and
+    derivative terms use the measured time since the previous step (in ms, like timestep). If a step
+    is late by more than one period, the missed steps are skipped (overrun_policy 'skip') or run
+    immediately one after the other until the schedule is met again (overrun_policy 'catch_up',
+    at most max_catch_up_steps steps, further steps are skipped).
+    The period jitter and overruns are recorded in the loop timer '<module name>.pid_step'
+    (manager GUI "Loop timing" dock), see also get_timing_statistics().
+
+    Example config for copy-paste:
+
+    softpid:
+        module.Class: 'software_pid_controller.SoftPIDController'
+        timestep: 100  # in ms
+        overrun_policy: 'skip'  # or 'catch_up'
+        max_catch_up_steps: 10
+        history_length: 100
+        connect:
+            process: 'processdummy'
+            control: 'processdummy'
     """
 
     # declare connectors
@@ -42,6 +65,9 @@ class SoftPIDController(GenericLogic, PIDControllerInterface):
 
     # config opt
     timestep = ConfigOption(default=100)
+    _overrun_policy = ConfigOption('overrun_policy', 'skip')
+    _max_catch_up_steps = ConfigOption('max_catch_up_steps', 10)
+    _history_length = ConfigOption('history_length', 100)
 
     # status vars
     kP = StatusVar(default=1)
@@ -74,25 +100,83 @@ class SoftPIDController(GenericLogic, PIDControllerInterface):
         self.previousdelta = 0
         self.cv = self._control.get_control_value()
 
+        if self._overrun_policy not in ('skip', 'catch_up'):
+            self.log.error('Unknown overrun_policy "{0}", using "skip".'.format(
+                self._overrun_policy))
+            self._overrun_policy = 'skip'
+
         self.timer = QtCore.QTimer()
         self.timer.setSingleShot(True)
-        self.timer.setInterval(self.timestep)
+        self.timer.setTimerType(QtCore.Qt.PreciseTimer)
 
         self.timer.timeout.connect(self._calcNextStep, QtCore.Qt.QueuedConnection)
         self.sigNewValue.connect(self._control.set_control_value)
 
-        self.history = np.zeros([3, 5])
+        # ring buffer of (time, process value, control value, setpoint)
+        self._history = np.zeros([4, max(int(self._history_length), 1)])
+        self._history_index = 0
         self.savingState = False
         self.enable = False
         self.integrated = 0
         self.countdown = 2
-
+        self.dt = self.timestep
+
+        self._step_timer = get_loop_timer('{0}.pid_step'.format(self._name),
+                                          period=self.timestep / 1000)
+        self._step_timer.reset()
+        self.skipped_steps = 0
+        self._max_lateness = 0
+        self._last_step_time = None
+        self._next_step_time = time.monotonic() + self.timestep / 1000
         self.timer.start(self.timestep)
 
     def on_deactivate(self):
         """ Perform required deactivation.
         """
-        pass
+        self.timer.stop()
+        self.timer.timeout.disconnect()
+        self.sigNewValue.disconnect()
+
+    @property
+    def history(self):
+        """ Process value, control value and setpoint of the last steps, oldest first.
+
+            @return numpy.ndarray: array of shape (3, history_length)
+        """
+        return np.roll(self._history[1:], -self._history_index, axis=1)
+
+    def get_history(self):
+        """ Time, process value, control value and setpoint of the last steps, oldest first.
+
+            @return numpy.ndarray: array of shape (4, history_length), time is time.monotonic()
+        """
+        return np.roll(self._history, -self._history_index, axis=1)
+
+    def get_timing_statistics(self):
+        """ Timing statistics of the control loop.
+
+            @return dict: statistics of the loop timer (iterations, jitter of the period, overruns,
+                          ...), number of skipped steps and maximal lateness of a step in s
+        """
+        statistics = self._step_timer.statistics()
+        statistics['skipped_steps'] = self.skipped_steps
+        statistics['max_lateness'] = self._max_lateness
+        return statistics
+
+    def _schedule_next_step(self):
+        """ Start the timer for the next step on the absolute schedule.
+        """
+        period = self.timestep / 1000
+        now = time.monotonic()
+        self._next_step_time += period
+        behind = int((now - self._next_step_time) / period)
+        if behind > 0:
+            if self._overrun_policy == 'catch_up':
+                # run the missed steps immediately, but not more than max_catch_up_steps
+                behind = max(behind - int(self._max_catch_up_steps), 0)
+            self.skipped_steps += behind
+            self._next_step_time += behind * period
+        self.timer.start(max(int(round((self._next_step_time - now) * 1000)), 0))
 
     def _calcNextStep(self):
         """ This function implements the Takahashi Type C PID
@@ -101,6 +185,18 @@ class SoftPIDController(GenericLogic, PIDControllerInterface):
              The D term is NOT low-pass filtered.
              This function should be called once every TS seconds.
         """
+        start = self._step_timer.start_iteration()
+        now = time.monotonic()
+        self._max_lateness = max(self._max_lateness, now - self._next_step_time)
+        # time since the last step in ms, the unit of timestep
+        # (not less than a tenth of timestep, so steps run back to back during a catch up do not
+        # amplify the noise in the derivative term)
+        if self._last_step_time is None:
+            self.dt = self.timestep
+        else:
+            self.dt = max((now - self._last_step_time) * 1000, self.timestep / 10)
+        self._last_step_time = now
+
         self.pv = self._process.get_process_value()
 
         if self.countdown > 0:
@@ -114,11 +210,11 @@ class SoftPIDController(GenericLogic, PIDControllerInterface):
 
         if self.enable:
             delta = self.setpoint - self.pv
-            self.integrated += delta
+            self.integrated += delta * self.dt
             ## Calculate PID controller:
             self.P = self.kP * delta
-            self.I = self.kI * self.timestep * self.integrated
-            self.D = self.kD / self.timestep * (delta - self.previousdelta)
+            self.I = self.kI * self.integrated
+            self.D = self.kD / self.dt * (delta - self.previousdelta)
 
             self.cv += self.P + self.I + self.D
             self.previousdelta = delta
@@ -130,10 +226,8 @@ class SoftPIDController(GenericLogic, PIDControllerInterface):
             if self.cv < limits[0]:
                 self.cv = limits[0]
 
-            self.history = np.roll(self.history, -1, axis=1)
-            self.history[0, -1] = self.pv
-            self.history[1, -1] = self.cv
-            self.history[2, -1] = self.setpoint
+            self._history[:, self._history_index] = now, self.pv, self.cv, self.setpoint
+            self._history_index = (self._history_index + 1) % self._history.shape[1]
             self.sigNewValue.emit(self.cv)
         else:
             self.cv = self.manualvalue
@@ -144,7 +238,8 @@ class SoftPIDController(GenericLogic, PIDControllerInterface):
                 self.cv = limits[0]
             self.sigNewValue.emit(self.cv)
 
-        self.timer.start(self.timestep)
+        self._step_timer.stop_iteration(start)
+        self._schedule_next_step()
 
     def startLoop(self):
         """ Start the control loop. """
@@ -309,5 +404,6 @@ class SoftPIDController(GenericLogic, PIDControllerInterface):
         return {
             'P': self.P,
             'I': self.I,
-            'D': self.D
+            'D': self.D,
+            'dt': self.dt
         }
@@ -21,9 +21,11 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 
 from qtpy import QtCore
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import matplotlib.pyplot as plt
 
+from core.configoption import ConfigOption
 from core.connector import Connector
 from core.statusvariable import StatusVar
 from core.util.mutex import Mutex
@@ -35,10 +37,19 @@ class SpectrumLogic(GenericLogic):
 
     """This logic module gathers data from the spectrometer.
 
+    Differential spectra are accumulated from pairs of spectra with the modulation on and off. With
+    pipelined_differential the transfer and accumulation of a spectrum run in a worker thread while
+    the modulation is toggled and the next spectrum is exposed. With pairs_per_update > 1 several
+    pairs are recorded before the spectrum is updated and sig_specdata_updated is emitted.
+    The standard deviation of the accumulated differential spectrum (per pixel, estimated from the
+    spread of the single pairs) is available as differential_spectrum_error.
+
     Demo config:
 
     spectrumlogic:
         module.Class: 'spectrum.SpectrumLogic'
+        pipelined_differential: False
+        pairs_per_update: 1
         connect:
             spectrometer: 'myspectrometer'
             savelogic: 'savelogic'
@@ -52,6 +63,10 @@ class SpectrumLogic(GenericLogic):
     savelogic = Connector(interface='SaveLogic')
     fitlogic = Connector(interface='FitLogic')
 
+    # declare config options
+    _pipelined_differential = ConfigOption('pipelined_differential', False)
+    _pairs_per_update = ConfigOption('pairs_per_update', 1)
+
     # declare status variables
     _spectrum_data = StatusVar('spectrum_data', np.empty((2, 0)))
     _spectrum_background = StatusVar('spectrum_background', np.empty((2, 0)))
@@ -88,19 +103,25 @@ class SpectrumLogic(GenericLogic):
         self.diff_spec_data_mod_on = np.array([])
         self.diff_spec_data_mod_off = np.array([])
         self.repetition_count = 0    # count loops for differential spectrum
+        self._clear_differential_statistics(0)
 
         self._spectrometer_device = self.spectrometer()
         self._odmr_logic = self.odmrlogic()
         self._save_logic = self.savelogic()
 
-        self.sig_next_diff_loop.connect(self._loop_differential_spectrum)
+        self._continue_differential = False
+        self._spectrum_processor = ThreadPoolExecutor(1)
+
+        self.sig_next_diff_loop.connect(self._loop_differential_spectrum,
+                                        QtCore.Qt.QueuedConnection)
         self.sig_specdata_updated.emit()
 
     def on_deactivate(self):
         """ Deinitialisation performed during deactivation of the module.
         """
-        if self.module_state() != 'idle' and self.module_state() != 'deactivated':
-            pass
+        self._continue_differential = False
+        self._spectrum_processor.shutdown()
+        self.sig_next_diff_loop.disconnect()
 
     @fc.constructor
     def sv_set_fits(self, val):
@@ -145,6 +166,7 @@ class SpectrumLogic(GenericLogic):
         # saved with this single spectrum.
         self.diff_spec_data_mod_on = np.array([])
         self.diff_spec_data_mod_off = np.array([])
+        self._clear_differential_statistics(0)
 
         self.sig_specdata_updated.emit()
 
@@ -198,10 +220,11 @@ class SpectrumLogic(GenericLogic):
         empty_signal = np.zeros(len(wavelengths))
 
         # Using this information to initialise the differential spectrum data arrays.
-        self._spectrum_data = np.array([wavelengths, empty_signal])
-        self.diff_spec_data_mod_on = np.array([wavelengths, empty_signal])
-        self.diff_spec_data_mod_off = np.array([wavelengths, empty_signal])
+        self._spectrum_data = np.array([wavelengths, empty_signal], dtype=np.float64)
+        self.diff_spec_data_mod_on = np.array([wavelengths, empty_signal], dtype=np.float64)
+        self.diff_spec_data_mod_off = np.array([wavelengths, empty_signal], dtype=np.float64)
         self.repetition_count = 0
+        self._clear_differential_statistics(len(wavelengths))
 
         # Starting the measurement loop
         self._loop_differential_spectrum()
@@ -215,6 +238,56 @@ class SpectrumLogic(GenericLogic):
         # Starting the measurement loop
         self._loop_differential_spectrum()
 
+    def _clear_differential_statistics(self, length):
+        """ Allocate the buffers of the differential spectrum statistics.
+
+        @param int length: number of pixels of the spectra
+        """
+        self._last_mod_on = np.zeros(length)
+        self._pair_difference = np.zeros(length)
+        self._difference_mean = np.zeros(length)
+        self._difference_m2 = np.zeros(length)
+        self._difference_delta = np.zeros(length)
+        self._difference_step = np.zeros(length)
+
+    def _add_differential_spectrum(self, spectrum, modulation_on):
+        """ Add a spectrum to the differential spectrum data in place.
+
+        For the spectrum with modulation off, the difference to the last spectrum with modulation on
+        is added to the running mean and variance of the differences (Welford's algorithm).
+
+        @param spectrum: spectrum (wavelengths, counts) from the spectrometer, possibly remote
+        @param bool modulation_on: whether the spectrum was recorded with modulation on
+        """
+        counts = netobtain(spectrum)[1, :]
+        if modulation_on:
+            np.add(self.diff_spec_data_mod_on[1, :], counts, out=self.diff_spec_data_mod_on[1, :])
+            np.copyto(self._last_mod_on, counts)
+            return
+
+        np.add(self.diff_spec_data_mod_off[1, :], counts, out=self.diff_spec_data_mod_off[1, :])
+        np.subtract(self._last_mod_on, counts, out=self._pair_difference)
+        pairs = self.repetition_count + 1
+        np.subtract(self._pair_difference, self._difference_mean, out=self._difference_delta)
+        np.divide(self._difference_delta, pairs, out=self._difference_step)
+        self._difference_mean += self._difference_step
+        np.subtract(self._pair_difference, self._difference_mean, out=self._pair_difference)
+        self._pair_difference *= self._difference_delta
+        self._difference_m2 += self._pair_difference
+        self.repetition_count = pairs
+
+    @property
+    def differential_spectrum_error(self):
+        """ Standard deviation of the accumulated differential spectrum per pixel.
+
+        Estimated from the spread of the differences of the single on/off pairs.
+
+        @return numpy.ndarray: standard deviation, zeros for less than 2 pairs
+        """
+        if self.repetition_count < 2:
+            return np.zeros(len(self._difference_m2))
+        return np.sqrt(self._difference_m2 * self.repetition_count / (self.repetition_count - 1))
+
     def _loop_differential_spectrum(self):
         """ This loop toggles the modulation and iteratively records a differential spectrum.
         """
@@ -224,23 +297,28 @@ class SpectrumLogic(GenericLogic):
         if not self._continue_differential:
             return
 
-        # Otherwise, we make a measurement and then emit a signal to repeat this loop.
-
-        # Toggle on, take spectrum and add data to the mod_on data
-        self.toggle_modulation(on=True)
-        these_data = netobtain(self._spectrometer_device.recordSpectrum())
-        self.diff_spec_data_mod_on[1, :] += these_data[1, :]
-
-        # Toggle off, take spectrum and add data to the mod_off data
-        self.toggle_modulation(on=False)
-        these_data = netobtain(self._spectrometer_device.recordSpectrum())
-        self.diff_spec_data_mod_off[1, :] += these_data[1, :]
-
-        self.repetition_count += 1    # increment the loop count
+        # Otherwise, we make pairs_per_update measurements and then emit a signal to repeat this
+        # loop. In pipelined mode the spectra are transferred and added in the processor thread
+        # while the next spectrum is recorded.
+        pending = list()
+        for pair in range(max(int(self._pairs_per_update), 1)):
+            for modulation_on in (True, False):
+                self.toggle_modulation(on=modulation_on)
+                these_data = self._spectrometer_device.recordSpectrum()
+                if self._pipelined_differential:
+                    pending.append(self._spectrum_processor.submit(
+                        self._add_differential_spectrum, these_data, modulation_on))
+                else:
+                    self._add_differential_spectrum(these_data, modulation_on)
+            if not self._continue_differential:
+                break
+        for future in pending:
+            future.result()
 
         # Calculate the differential spectrum
-        self._spectrum_data[1, :] = self.diff_spec_data_mod_on[
-            1, :] - self.diff_spec_data_mod_off[1, :]
+        np.subtract(self.diff_spec_data_mod_on[1, :],
+                    self.diff_spec_data_mod_off[1, :],
+                    out=self._spectrum_data[1, :])
 
         self.sig_specdata_updated.emit()
 
@@ -313,6 +391,7 @@ class SpectrumLogic(GenericLogic):
             data['signal_mod_on'] = self.diff_spec_data_mod_on[1, :]
             data['signal_mod_off'] = self.diff_spec_data_mod_off[1, :]
             data['differential'] = spectrum_data[1, :]
+            data['differential_error'] = self.differential_spectrum_error
         else:
             data['signal'] = spectrum_data[1, :]
 
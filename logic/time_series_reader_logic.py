@@ -30,6 +30,7 @@ from core.statusvariable import StatusVar
 from core.configoption import ConfigOption
 from logic.generic_logic import GenericLogic
 from core.util.mutex import Mutex
+from core.util.looptimer import timed_loop
 from core.util.units import ScaledFloat
 from interface.data_instream_interface import StreamChannelType, StreamingMode
 
@@ -530,6 +531,7 @@ class TimeSeriesReaderLogic(GenericLogic):
         return 0
 
     @QtCore.Slot()
+    @timed_loop(period=lambda self: self._samples_per_frame / self.data_rate)
     def acquire_data_block(self):
         """
         This method gets the available data from the hardware.
@@ -0,0 +1,545 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the qudi logic computing histograms and correlations of a time tag stream.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+from qtpy import QtCore
+from collections import OrderedDict
+import datetime
+import numpy as np
+import time
+
+from core.connector import Connector
+from core.configoption import ConfigOption
+from core.util.mutex import Mutex
+from core.util.looptimer import timed_loop
+from logic.generic_logic import GenericLogic
+
+
+class TagHistogram:
+    """ Histogram of delays between tags, which is accumulated chunk by chunk.
+
+    All times are integer timestamps in units of the time tagger resolution. The memory needed is
+    independent of the measurement time: only the histogram and the few tags of the last chunk
+    that are needed to process the next chunk are kept.
+    """
+    def __init__(self, channels, bin_width, number_of_bins, offset=0):
+        """
+        @param tuple(int) channels: indices of the start and stop channel
+        @param int bin_width: width of a bin in timestamp units
+        @param int number_of_bins: number of bins
+        @param int offset: delay of the left edge of the first bin
+        """
+        self.channels = tuple(channels)
+        self.bin_width = max(int(bin_width), 1)
+        self.number_of_bins = int(number_of_bins)
+        self.offset = int(offset)
+        self.histogram = np.zeros(self.number_of_bins, dtype=np.int64)
+        self.reset()
+
+    def reset(self):
+        """ Clear the histogram and the carried over tags. """
+        self.histogram[:] = 0
+
+    @property
+    def bin_centers(self):
+        """ Delays of the bin centers in timestamp units. """
+        return self.offset + (np.arange(self.number_of_bins) + 0.5) * self.bin_width
+
+    def _add_delays(self, delays):
+        """ Add delays to the histogram, delays outside of the histogram are ignored.
+
+        @param numpy.ndarray delays: delays in timestamp units
+        """
+        if delays.size == 0:
+            return
+        bins = delays - self.offset
+        bins //= self.bin_width
+        bins = bins[(bins >= 0) & (bins < self.number_of_bins)]
+        self.histogram += np.bincount(bins, minlength=self.number_of_bins)
+
+    def process(self, tags, end_time):
+        """ Add the tags of the next chunk.
+
+        @param dict tags: sorted timestamps of the tags in this chunk, keys are the channel indices
+        @param int end_time: timestamp up to which all tags have been read
+        """
+        raise NotImplementedError
+
+    def finish(self):
+        """ Process the carried over tags at the end of the measurement. """
+        pass
+
+
+class StartStopHistogram(TagHistogram):
+    """ Histogram of the delay between every stop tag and the last start tag before it.
+
+    This is the histogram of a time-correlated single photon counting (TCSPC) measurement with
+    the laser sync as start, e.g. to measure lifetimes.
+    A gate (first and last delay in timestamp units) optionally selects the stops counted into
+    gated_counts, e.g. to separate fluorescence from laser reflections.
+    """
+    def __init__(self, channels, bin_width, number_of_bins, gate=None):
+        self.gate = None if gate is None else (int(gate[0]), int(gate[1]))
+        super().__init__(channels, bin_width, number_of_bins)
+
+    def reset(self):
+        super().reset()
+        self._last_start = None
+        self.gated_counts = 0
+
+    def process(self, tags, end_time):
+        starts = tags[self.channels[0]]
+        stops = tags[self.channels[1]]
+        if stops.size:
+            last = np.searchsorted(starts, stops, side='right') - 1
+            if self._last_start is None:
+                # stops before the first start have no delay
+                valid = last >= 0
+                delays = stops[valid] - starts[last[valid]]
+            elif starts.size:
+                delays = stops - np.where(last >= 0, starts[np.maximum(last, 0)],
+                                          self._last_start)
+            else:
+                delays = stops - self._last_start
+            self._add_delays(delays)
+            if self.gate is not None:
+                self.gated_counts += int(np.count_nonzero(
+                    (delays >= self.gate[0]) & (delays <= self.gate[1])))
+        if starts.size:
+            self._last_start = starts[-1]
+
+
+class Correlation(TagHistogram):
+    """ Histogram of the delays (stop - start) of all pairs of start and stop tags within the
+    histogram range, i.e. a multi-start multi-stop correlation like the second order
+    autocorrelation g2 of a Hanbury Brown-Twiss setup.
+
+    The histogram is centered at zero delay. Starts are only processed when all stops within the
+    histogram range have been read, the remaining starts and the stops needed for them are carried
+    over to the next chunk. The pairs are computed in batches of at most max_pairs to limit the
+    memory for high count rates and wide histograms.
+    """
+    def __init__(self, channels, bin_width, number_of_bins, max_pairs=2**22):
+        self.max_pairs = int(max_pairs)
+        super().__init__(channels, bin_width, number_of_bins,
+                         offset=-(int(number_of_bins) * max(int(bin_width), 1)) // 2)
+        self.window = self.offset + self.number_of_bins * self.bin_width
+
+    def reset(self):
+        super().reset()
+        self._starts = np.empty(0, dtype=np.int64)
+        self._stops = np.empty(0, dtype=np.int64)
+        self.start_counts = 0
+        self.stop_counts = 0
+        self.first_time = None
+        self.last_time = None
+
+    @property
+    def g2(self):
+        """ Histogram normalized to uncorrelated tags with the average count rates. """
+        if not self.start_counts or not self.stop_counts or self.last_time == self.first_time:
+            return np.zeros(self.number_of_bins)
+        duration = self.last_time - self.first_time
+        return self.histogram * duration / (self.start_counts * self.stop_counts * self.bin_width)
+
+    def process(self, tags, end_time):
+        new_starts = tags[self.channels[0]]
+        new_stops = tags[self.channels[1]]
+        self.start_counts += new_starts.size
+        self.stop_counts += new_stops.size
+        if self.first_time is None:
+            self.first_time = end_time if not new_starts.size else int(new_starts[0])
+        self.last_time = end_time
+
+        starts = np.concatenate((self._starts, new_starts)) if self._starts.size else new_starts
+        stops = np.concatenate((self._stops, new_stops)) if self._stops.size else new_stops
+        # all stops of starts up to this time are known
+        settled = int(np.searchsorted(starts, end_time - self.window, side='right'))
+        if settled:
+            self._correlate(starts[:settled], stops)
+        self._starts = starts[settled:].copy()
+        # the stops needed by starts in the next chunks
+        first_stop = np.searchsorted(stops, end_time - self.window + self.offset, side='left')
+        self._stops = stops[first_stop:].copy()
+
+    def finish(self):
+        if self._starts.size:
+            self._correlate(self._starts, self._stops)
+        self._starts = self._starts[:0]
+        self._stops = self._stops[:0]
+
+    def _correlate(self, starts, stops):
+        """ Add all pairs of the given starts and stops to the histogram. """
+        lower = np.searchsorted(stops, starts + self.offset, side='left')
+        upper = np.searchsorted(stops, starts + self.window, side='left')
+        counts = upper - lower
+        cumulated = np.cumsum(counts)
+        begin = 0
+        while begin < starts.size:
+            done = cumulated[begin - 1] if begin else 0
+            end = max(int(np.searchsorted(cumulated, done + self.max_pairs, side='right')),
+                      begin + 1)
+            batch_counts = counts[begin:end]
+            pairs = int(batch_counts.sum())
+            if pairs:
+                # index of the stop of every pair
+                first_pair = np.cumsum(batch_counts) - batch_counts
+                indices = np.arange(pairs) - np.repeat(first_pair - lower[begin:end],
+                                                       batch_counts)
+                self._add_delays(stops[indices] - np.repeat(starts[begin:end], batch_counts))
+            begin = end
+
+
+class TimeTagLogic(GenericLogic):
+    """ Logic computing start-stop histograms, gated histograms and correlations of a time tag
+    stream online.
+
+    The tags are read in chunks of chunk_size into arrays allocated once at the start, and every
+    histogram is updated with vectorized numpy operations per chunk. The memory needed does not
+    grow with the measurement time. The processing time per chunk is recorded in the loop timer
+    '<module name>.process_tags' (manager GUI "Loop timing" dock).
+
+    Histogram types:
+        'start_stop': delay between each stop and the last start before it, 'channels' are
+                      [start, stop], optional 'gate': [first delay, last delay] in s counted as
+                      gated counts
+        'correlation': delays of all start/stop pairs within +-number_of_bins * bin_width / 2,
+                       'channels' are [start, stop]
+
+    Example config for copy-paste:
+
+    timetaglogic:
+        module.Class: 'time_tag_logic.TimeTagLogic'
+        chunk_size: 1000000
+        update_interval: 0.1
+        histograms:
+            g2:
+                type: 'correlation'
+                channels: ['det 1', 'det 2']
+                bin_width: 1e-9
+                number_of_bins: 200
+        connect:
+            timetagger: 'timetag_dummy'
+            savelogic: 'savelogic'
+    """
+
+    sigHistogramsUpdated = QtCore.Signal()
+    sigStatusChanged = QtCore.Signal(bool)
+    _sigNextChunk = QtCore.Signal()
+
+    timetagger = Connector(interface='TimeTagStreamInterface')
+    savelogic = Connector(interface='SaveLogic')
+
+    _chunk_size = ConfigOption('chunk_size', 1000000, missing='nothing')
+    _update_interval = ConfigOption('update_interval', 0.1, missing='nothing')
+    _read_interval = ConfigOption('read_interval', 0.01, missing='nothing')
+    _max_pairs = ConfigOption('max_pairs', 2**22, missing='nothing')
+    _histogram_config = ConfigOption('histograms', dict(), missing='nothing')
+
+    _histogram_types = {'start_stop': StartStopHistogram, 'correlation': Correlation}
+
+    def __init__(self, config, **kwargs):
+        super().__init__(config=config, **kwargs)
+        self.threadlock = Mutex()
+
+    def on_activate(self):
+        """ Initialisation performed during activation of the module.
+        """
+        self._timetagger = self.timetagger()
+        self._settings = OrderedDict()
+        self._histograms = OrderedDict()
+        self._timestamps = None
+        self._channels = None
+        self._channel_counts = None
+        self._count_rates = None
+        self._stop_requested = True
+        self._last_update = 0
+        self._rate_start = (0, None)
+        self._read_timer = QtCore.QTimer()
+        self._read_timer.setSingleShot(True)
+        self._read_timer.timeout.connect(self._process_tags, QtCore.Qt.QueuedConnection)
+        self._sigNextChunk.connect(self._process_tags, QtCore.Qt.QueuedConnection)
+        for name, settings in self._histogram_config.items():
+            self.add_histogram(name, **settings)
+
+    def on_deactivate(self):
+        """ Deinitialisation performed during deactivation of the module.
+        """
+        if self.module_state() == 'locked':
+            self._stop_requested = True
+            self._timetagger.stop_stream()
+            self.module_state.unlock()
+        self._read_timer.stop()
+        self._read_timer.timeout.disconnect()
+        self._sigNextChunk.disconnect()
+        self._timestamps = None
+        self._channels = None
+
+    @property
+    def histogram_names(self):
+        """ Names of the configured histograms. """
+        return tuple(self._settings)
+
+    @property
+    def channel_counts(self):
+        """ Number of tags per channel since the measurement was started. """
+        if self._channel_counts is None:
+            return dict()
+        return dict(zip(self._timetagger.active_channels, self._channel_counts.tolist()))
+
+    @property
+    def count_rates(self):
+        """ Tags per second per channel during the last update interval. """
+        if self._count_rates is None:
+            return dict()
+        return dict(zip(self._timetagger.active_channels, self._count_rates.tolist()))
+
+    def add_histogram(self, name, type, channels, bin_width, number_of_bins, gate=None):
+        """ Add a histogram, which is computed from the next start of the measurement on.
+
+        @param str name: name of the histogram
+        @param str type: 'start_stop' or 'correlation'
+        @param list(str) channels: names of the start and the stop channel
+        @param float bin_width: bin width in s
+        @param int number_of_bins: number of bins
+        @param list(float) gate: optional, first and last delay in s of the gate of a
+                                 start-stop histogram
+
+        @return int: error code (0: OK, -1: error)
+        """
+        if self.module_state() == 'locked':
+            self.log.error('Unable to add a histogram while the measurement is running.')
+            return -1
+        if type not in self._histogram_types:
+            self.log.error('Unknown histogram type "{0}" of histogram "{1}". Known types are {2}.'
+                           ''.format(type, name, tuple(self._histogram_types)))
+            return -1
+        if len(channels) != 2 or channels[0] == channels[1]:
+            self.log.error('Histogram "{0}" needs two different channels.'.format(name))
+            return -1
+        if gate is not None and type != 'start_stop':
+            self.log.warning('Only start-stop histograms are gated, the gate of histogram "{0}" '
+                             'is ignored.'.format(name))
+            gate = None
+        self._settings[name] = {'type': type,
+                                'channels': tuple(channels),
+                                'bin_width': float(bin_width),
+                                'number_of_bins': int(number_of_bins),
+                                'gate': None if gate is None else tuple(gate)}
+        self._histograms.pop(name, None)
+        return 0
+
+    def remove_histogram(self, name):
+        """ Remove a histogram.
+
+        @param str name: name of the histogram
+
+        @return int: error code (0: OK, -1: error)
+        """
+        if self.module_state() == 'locked':
+            self.log.error('Unable to remove a histogram while the measurement is running.')
+            return -1
+        self._settings.pop(name, None)
+        self._histograms.pop(name, None)
+        return 0
+
+    def get_histogram(self, name):
+        """ Get the delays and counts of a histogram.
+
+        @param str name: name of the histogram
+
+        @return tuple(numpy.ndarray, numpy.ndarray): delays of the bin centers in s and counts
+        """
+        with self.threadlock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                settings = self._settings[name]
+                return (np.zeros(settings['number_of_bins']),
+                        np.zeros(settings['number_of_bins'], dtype=np.int64))
+            return (histogram.bin_centers * self._timetagger.time_resolution,
+                    histogram.histogram.copy())
+
+    def get_g2(self, name):
+        """ Get the normalized correlation g2 of a correlation histogram.
+
+        @param str name: name of the correlation histogram
+
+        @return tuple(numpy.ndarray, numpy.ndarray): delays of the bin centers in s and g2
+        """
+        with self.threadlock:
+            histogram = self._histograms.get(name)
+            if not isinstance(histogram, Correlation):
+                self.log.error('"{0}" is not a measured correlation.'.format(name))
+                return np.zeros(0), np.zeros(0)
+            return histogram.bin_centers * self._timetagger.time_resolution, histogram.g2
+
+    def get_gated_counts(self, name):
+        """ Get the number of stops within the gate of a start-stop histogram.
+
+        @param str name: name of the start-stop histogram
+
+        @return int: gated counts
+        """
+        histogram = self._histograms.get(name)
+        return getattr(histogram, 'gated_counts', 0)
+
+    def _create_histograms(self):
+        """ Create the histogram accumulators for the active channels of the time tagger. """
+        active_channels = self._timetagger.active_channels
+        resolution = self._timetagger.time_resolution
+        self._histograms = OrderedDict()
+        for name, settings in self._settings.items():
+            if any(ch not in active_channels for ch in settings['channels']):
+                self.log.warning('Channels {0} of histogram "{1}" are not active, the histogram is '
+                                 'not measured.'.format(settings['channels'], name))
+                continue
+            kwargs = {'channels': [active_channels.index(ch) for ch in settings['channels']],
+                      'bin_width': round(settings['bin_width'] / resolution),
+                      'number_of_bins': settings['number_of_bins']}
+            if settings['type'] == 'correlation':
+                kwargs['max_pairs'] = self._max_pairs
+            elif settings['gate'] is not None:
+                kwargs['gate'] = [round(delay / resolution) for delay in settings['gate']]
+            self._histograms[name] = self._histogram_types[settings['type']](**kwargs)
+
+    @QtCore.Slot()
+    def start_measurement(self):
+        """ Start reading tags and computing the histograms from zero.
+
+        @return int: error code (0: OK, -1: error)
+        """
+        with self.threadlock:
+            if self.module_state() == 'locked':
+                self.log.warning('Time tag measurement is already running.')
+                return 0
+            self._create_histograms()
+            if self._timestamps is None or self._timestamps.size != self._chunk_size:
+                self._timestamps = np.empty(self._chunk_size, dtype=np.int64)
+                self._channels = np.empty(self._chunk_size, dtype=np.uint8)
+            number_of_channels = len(self._timetagger.active_channels)
+            self._channel_counts = np.zeros(number_of_channels, dtype=np.int64)
+            self._count_rates = np.zeros(number_of_channels)
+            if self._timetagger.start_stream() < 0:
+                self.log.error('Error while starting the time tag stream.')
+                return -1
+            self.module_state.lock()
+            self._stop_requested = False
+            self._last_update = time.perf_counter()
+            self._rate_start = (self._last_update, self._channel_counts.copy())
+            self.sigStatusChanged.emit(True)
+            self._sigNextChunk.emit()
+        return 0
+
+    @QtCore.Slot()
+    def stop_measurement(self):
+        """ Stop reading tags. The histograms are kept until the next start.
+
+        @return int: error code (0: OK, -1: error)
+        """
+        with self.threadlock:
+            if self.module_state() == 'locked':
+                self._stop_requested = True
+        return 0
+
+    @QtCore.Slot()
+    def reset_histograms(self):
+        """ Clear all histograms, also while the measurement is running. """
+        with self.threadlock:
+            for histogram in self._histograms.values():
+                histogram.reset()
+        self.sigHistogramsUpdated.emit()
+
+    @QtCore.Slot()
+    @timed_loop(name='process_tags')
+    def _process_tags(self):
+        """ Read the next chunk of tags and add it to all histograms. """
+        with self.threadlock:
+            if self.module_state() != 'locked':
+                return
+            if self._stop_requested:
+                if self._timetagger.stop_stream() < 0:
+                    self.log.error('Error while stopping the time tag stream.')
+                for histogram in self._histograms.values():
+                    histogram.finish()
+                self.module_state.unlock()
+                self.sigStatusChanged.emit(False)
+                self.sigHistogramsUpdated.emit()
+                return
+
+            number = self._timetagger.read_tags_into_buffer(self._timestamps, self._channels)
+            if number < 0:
+                self.log.error('Reading tags failed, stopping the measurement.')
+                self._stop_requested = True
+                self._sigNextChunk.emit()
+                return
+            if number:
+                timestamps = self._timestamps[:number]
+                channels = self._channels[:number]
+                counts = np.bincount(channels, minlength=self._channel_counts.size)
+                self._channel_counts += counts
+                tags = dict()
+                for index, count in enumerate(counts):
+                    if count == number:
+                        tags[index] = timestamps
+                    elif count:
+                        tags[index] = timestamps[channels == index]
+                    else:
+                        tags[index] = timestamps[:0]
+                end_time = int(timestamps[-1])
+                for histogram in self._histograms.values():
+                    histogram.process(tags, end_time)
+
+            now = time.perf_counter()
+            if now - self._last_update >= self._update_interval:
+                start, start_counts = self._rate_start
+                self._count_rates = (self._channel_counts - start_counts) / (now - start)
+                self._rate_start = (now, self._channel_counts.copy())
+                self._last_update = now
+                self.sigHistogramsUpdated.emit()
+
+            if number == self._timestamps.size:
+                # more tags are waiting
+                self._sigNextChunk.emit()
+            else:
+                self._read_timer.start(int(round(self._read_interval * 1000)))
+
+    def save_data(self, name_tag=''):
+        """ Save all histograms, each into its own file.
+
+        @param str name_tag: optional, postfix of the file names
+        """
+        save_logic = self.savelogic()
+        filepath = save_logic.get_path_for_module(module_name='TimeTags')
+        timestamp = datetime.datetime.now()
+        for name, settings in self._settings.items():
+            delays, counts = self.get_histogram(name)
+            data = OrderedDict()
+            data['delay (s)'] = delays
+            data['counts'] = counts
+            parameters = OrderedDict(settings)
+            parameters['channel counts'] = self.channel_counts
+            if name in self._histograms and settings['type'] == 'correlation':
+                data['g2'] = self.get_g2(name)[1]
+            elif settings['gate'] is not None:
+                parameters['gated counts'] = self.get_gated_counts(name)
+            filelabel = name if not name_tag else '{0}_{1}'.format(name, name_tag)
+            save_logic.save_data(data, filepath=filepath, parameters=parameters,
+                                 filelabel=filelabel, timestamp=timestamp, delimiter='\t')
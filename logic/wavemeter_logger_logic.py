@@ -124,10 +124,16 @@ class WavemeterLoggerLogic(GenericLogic):
 
         self._acqusition_start_time = 0
         self._bins = 200
-        self._data_index = 0
 
-        self._recent_wavelength_window = [0, 0]
-        self.counts_with_wavelength = []
+        # stitching progress in the wavelength and count data lists
+        self._wavelength_index = 0
+        self._count_index = 0
+
+        # preallocated buffer of stitched data (time, counts, wavelength), grows on demand
+        self._stitched_data = np.empty((1024, 3))
+        self._stitched_count = 0
+        self._recent_sum = np.zeros(3)
+        self._recent_count = 0
 
         self._xmin = 650
         self._xmax = 750
@@ -179,11 +185,15 @@ class WavemeterLoggerLogic(GenericLogic):
             self._xmax,
             (self._xmax - self._xmin) / self._bins
             )
-        self.histogram = np.zeros(self.histogram_axis.shape)
-        self.envelope_histogram = np.zeros(self.histogram_axis.shape)
+        self._reset_histogram()
+
+        # timer driving the stitching of counts and wavelength in the logic thread
+        self._stitch_timer = QtCore.QTimer()
+        self._stitch_timer.setSingleShot(False)
+        self._stitch_timer.timeout.connect(self._stitching_loop)
 
         self.sig_update_histogram_next.connect(
-            self._attach_counts_to_wavelength,
+            self._start_stitching,
             QtCore.Qt.QueuedConnection
             )
 
@@ -212,10 +222,22 @@ class WavemeterLoggerLogic(GenericLogic):
             self.stop_scanning()
         self.hardware_thread.quit()
         self.sig_handle_timer.disconnect()
+        self._stitch_timer.stop()
+        self._stitch_timer.timeout.disconnect()
+        self.sig_update_histogram_next.disconnect()
 
         if len(self.fc.fit_list) > 0:
             self._statusVariables['fits'] = self.fc.save_to_dict()
 
+    @property
+    def counts_with_wavelength(self):
+        """ All stitched data so far.
+
+            @return numpy.ndarray: view of shape (N, 3) containing time, counts and interpolated
+                                   wavelength of each count value
+        """
+        return self._stitched_data[:self._stitched_count]
+
     def get_max_wavelength(self):
         """ Current maximum wavelength of the scan.
 
@@ -252,9 +274,7 @@ class WavemeterLoggerLogic(GenericLogic):
             self._xmax = xmax
 
         # create a new x axis from xmin to xmax with bins points
-        self.rawhisto = np.zeros(self._bins)
-        self.envelope_histogram = np.zeros(self._bins)
-        self.sumhisto = np.ones(self._bins) * 1.0e-10
+        self._reset_histogram()
         self.histogram_axis = np.linspace(self._xmin, self._xmax, self._bins)
         self.sig_update_histogram_next.emit(True)
 
@@ -298,21 +318,18 @@ class WavemeterLoggerLogic(GenericLogic):
             self._acqusition_start_time = self._counter_logic._saving_start_time
             self._wavelength_data = []
 
-            self.data_index = 0
+            self._wavelength_index = 0
+            self._count_index = 0
+            self._stitched_count = 0
 
-            self._recent_wavelength_window = [0, 0]
-            self.counts_with_wavelength = []
-
-            self.rawhisto = np.zeros(self._bins)
-            self.sumhisto = np.ones(self._bins) * 1.0e-10
+            self._reset_histogram()
             self.intern_xmax = -1.0
             self.intern_xmin = 1.0e10
-            self.recent_avg = [0, 0, 0]
-            self.recent_count = 0
+            self._recent_sum = np.zeros(3)
+            self._recent_count = 0
 
         # start the measuring thread
         self.sig_handle_timer.emit(True)
-        self._complete_histogram = True
         self.sig_update_histogram_next.emit(False)
 
         return 0
@@ -333,136 +350,142 @@ class WavemeterLoggerLogic(GenericLogic):
 
         return 0
 
-    def _attach_counts_to_wavelength(self, complete_histogram):
+    def _start_stitching(self, complete_histogram):
+        """ Stitch all pending data and start the periodic stitching timer if the measurement is
+        running. Connected to sig_update_histogram_next and thus always executed in the logic
+        thread.
+
+        @param bool complete_histogram: should the complete histogram be recalculated from all
+                                        stitched data?
+        """
+        if complete_histogram:
+            self._update_histogram(complete_histogram=True)
+        self._stitching_loop()
+        if self.module_state() == 'running' and not self._stitch_timer.isActive():
+            self._stitch_timer.start(int(self._logic_update_timing))
+
+    def _stitching_loop(self):
+        """ Periodically called by the stitching timer. Stops the timer once the measurement is not
+        running anymore (after a last stitching pass).
+        """
+        self._attach_counts_to_wavelength()
+        self.sig_data_updated.emit()
+        if self.module_state() != 'running' and self._stitch_timer.isActive():
+            self._stitch_timer.stop()
+
+    def _attach_counts_to_wavelength(self):
         """ Interpolate a wavelength value for each photon count value.  This process assumes that
         the wavelength is varying smoothly and fairly continuously, which is sensible for most
         measurement conditions.
 
         Recent count values are those recorded AFTER the previous stitch operation, but BEFORE the
         most recent wavelength value (do not extrapolate beyond the current wavelength
-        information).
+        information). All recent counts are interpolated in one vectorized block, so the cost of a
+        stitching pass only depends on the amount of new data and not on the measurement duration.
         """
+        # Take a snapshot of the list lengths since both lists are growing in other threads
+        wavelength_count = len(self._wavelength_data)
+        count_count = len(self._counter_logic._data_to_save)
 
-        # If there is not yet any wavelength data, then wait and signal next loop
-        if len(self._wavelength_data) == 0:
-            time.sleep(self._logic_update_timing * 1e-3)
-            self.sig_data_updated.emit()
+        # If there is no new wavelength or count data, there is nothing to do
+        if wavelength_count == 0 or count_count <= self._count_index:
             return
 
-        # The end of the recent_wavelength_window is the time of the latest wavelength data
-        self._recent_wavelength_window[1] = self._wavelength_data[-1][0]
+        # Only convert the wavelength samples since the last one used for interpolation
+        recent_wavelengths = np.array(
+            self._wavelength_data[self._wavelength_index:wavelength_count])
+        recent_counts = np.array(
+            self._counter_logic._data_to_save[self._count_index:count_count])
 
-        # (speed-up) We only need to worry about "recent" counts, because as the count data gets
-        # very long all the earlier points will already be attached to wavelength values.
-        count_recentness = 100  # TODO: calculate this from count_freq and wavemeter refresh rate
-
-        # TODO: Does this depend on things, or do we loop fast enough to get every wavelength value?
-        wavelength_recentness = np.min([5, len(self._wavelength_data)])
-
-        recent_counts = np.array(self._counter_logic._data_to_save[-count_recentness:])
-        recent_wavelengths = np.array(self._wavelength_data[-wavelength_recentness:])
-
-        # The latest counts are those recorded during the recent_wavelength_window
-        count_idx = [0, 0]
-        count_idx[0] = np.searchsorted(recent_counts[:, 0], self._recent_wavelength_window[0])
-        count_idx[1] = np.searchsorted(recent_counts[:, 0], self._recent_wavelength_window[1])
-
-        latest_counts = recent_counts[count_idx[0]:count_idx[1]]
+        # The latest counts are those recorded before the latest wavelength value
+        stop = np.searchsorted(recent_counts[:, 0], recent_wavelengths[-1, 0], side='right')
+        if stop == 0:
+            return
+        latest_counts = recent_counts[:stop]
 
         # Interpolate to obtain wavelength values at the times of each count
         interpolated_wavelengths = np.interp(latest_counts[:, 0],
                                              xp=recent_wavelengths[:, 0],
-                                             fp=recent_wavelengths[:, 1]
-                                             )
-
-        # Stitch interpolated wavelength into latest counts array
-        latest_stitched_data = np.insert(latest_counts, 2, values=interpolated_wavelengths, axis=1)
-
-        # Add this latest data to the list of counts vs wavelength
-        self.counts_with_wavelength += latest_stitched_data.tolist()
-
-        # The start of the recent data window for the next round will be the end of this one.
-        self._recent_wavelength_window[0] = self._recent_wavelength_window[1]
-
-        # Run the old update histogram method to keep duplicate data
-        self._update_histogram(complete_histogram)
-
-        # Signal that data has been updated
-        self.sig_data_updated.emit()
-
-        # Wait and repeat if measurement is ongoing
-        time.sleep(self._logic_update_timing * 1e-3)
-
-        if self.module_state() == 'running':
-            self.sig_update_histogram_next.emit(False)
+                                             fp=recent_wavelengths[:, 1])
+
+        # Stitch interpolated wavelength into the preallocated buffer of counts vs wavelength
+        new_count = self._stitched_count + stop
+        if new_count > self._stitched_data.shape[0]:
+            buffer = np.empty((max(new_count, 2 * self._stitched_data.shape[0]), 3))
+            buffer[:self._stitched_count] = self._stitched_data[:self._stitched_count]
+            self._stitched_data = buffer
+        latest_stitched_data = self._stitched_data[self._stitched_count:new_count]
+        latest_stitched_data[:, 0] = latest_counts[:, 0]
+        latest_stitched_data[:, 1] = latest_counts[:, 1]
+        latest_stitched_data[:, 2] = interpolated_wavelengths
+        self._stitched_count = new_count
+
+        # The next round starts after the stitched counts. Keep the last wavelength value before the
+        # last stitched count as left interpolation anchor.
+        self._count_index += stop
+        self._wavelength_index += max(
+            np.searchsorted(recent_wavelengths[:, 0], latest_counts[-1, 0], side='right') - 1, 0)
+
+        # Add the new data to the histogram
+        self._update_histogram(complete_histogram=False, stitched_data=latest_stitched_data)
+
+        # Emit the average of all data points stitched during the last second
+        self._recent_sum += latest_stitched_data[:, (2, 0, 1)].sum(axis=0)
+        self._recent_count += stop
+        if time.time() - self.last_point_time > 1:
+            self.sig_new_data_point.emit(list(self._recent_sum / self._recent_count))
+            self.last_point_time = time.time()
+            self._recent_sum = np.zeros(3)
+            self._recent_count = 0
+
+    def _reset_histogram(self):
+        """ Reset the (preallocated) histogram accumulators to the current number of bins.
+        """
+        self.rawhisto = np.zeros(self._bins)
+        self.envelope_histogram = np.zeros(self._bins)
+        self.sumhisto = np.ones(self._bins) * 1.0e-10
+        self.histogram = np.zeros(self._bins)
 
-    def _update_histogram(self, complete_histogram):
+    def _update_histogram(self, complete_histogram, stitched_data=None):
         """ Calculate new points for the histogram.
 
         @param bool complete_histogram: should the complete histogram be recalculated, or just the
                                         most recent data?
-        @return:
+        @param numpy.ndarray stitched_data: optional, the most recent stitched data (time, counts,
+                                            wavelength) to add to the histogram
         """
-
         # If things like num_of_bins have changed, then recalculate the complete histogram
         # Note: The histogram may be recalculated (bins changed, etc) from the stitched data.
         # There is no need to recompute the interpolation for the stitched data.
         if complete_histogram:
-            count_window = len(self._counter_logic._data_to_save)
-            self._data_index = 0
             self.log.info('Recalcutating Laser Scanning Histogram for: '
                           '{0:d} counts and {1:d} wavelength.'.format(
-                              count_window,
+                              self._stitched_count,
                               len(self._wavelength_data)
                           )
                           )
-        else:
-            count_window = min(100, len(self._counter_logic._data_to_save))
+            self._reset_histogram()
+            stitched_data = self.counts_with_wavelength
 
-        if count_window < 2:
-            time.sleep(self._logic_update_timing * 1e-3)
-            self.sig_update_histogram_next.emit(False)
+        if stitched_data is None or len(stitched_data) == 0:
             return
 
-        temp = np.array(self._counter_logic._data_to_save[-count_window:])
-
-        # only do something if there is wavelength data to work with
-        if len(self._wavelength_data) > 0:
-
-            for i in self._wavelength_data[self._data_index:]:
-                self._data_index += 1
-
-                if i[1] < self._xmin or i[1] > self._xmax:
-                    continue
-
-                # calculate the bin the new wavelength needs to go in
-                newbin = np.digitize([i[1]], self.histogram_axis)[0]
-                # if the bin make no sense, start from the beginning
-                if newbin > len(self.rawhisto) - 1:
-                    continue
-
-                # sum the counts in rawhisto and count the occurence of the bin in sumhisto
-                interpolation = np.interp(i[0], xp=temp[:, 0], fp=temp[:, 1])
-                self.rawhisto[newbin] += interpolation
-                self.sumhisto[newbin] += 1.0
-
-                self.envelope_histogram[newbin] = np.max([interpolation,
-                                                          self.envelope_histogram[newbin]
-                                                          ])
+        # calculate the bins the wavelengths need to go in and drop the ones that make no sense
+        wavelengths = stitched_data[:, 2]
+        valid = (wavelengths >= self._xmin) & (wavelengths <= self._xmax)
+        bins = np.digitize(wavelengths[valid], self.histogram_axis)
+        counts = stitched_data[valid, 1]
+        valid = bins < self._bins
+        bins = bins[valid]
+        counts = counts[valid]
 
-                datapoint = [i[1], i[0], interpolation]
-                if time.time() - self.last_point_time > 1:
-                    self.sig_new_data_point.emit(self.recent_avg)
-                    self.last_point_time = time.time()
-                    self.recent_count = 0
-                else:
-                    self.recent_count += 1
-                    for j in range(3):
-                        self.recent_avg[j] -= self.recent_avg[j] / self.recent_count
-                        self.recent_avg[j] += datapoint[j] / self.recent_count
+        # sum the counts in rawhisto and count the occurence of the bin in sumhisto
+        self.rawhisto += np.bincount(bins, weights=counts, minlength=self._bins)
+        self.sumhisto += np.bincount(bins, minlength=self._bins)
+        np.maximum.at(self.envelope_histogram, bins, counts)
 
-            # the plot data is the summed counts divided by the occurence of the respective bins
-            self.histogram = self.rawhisto / self.sumhisto
+        # the plot data is the summed counts divided by the occurence of the respective bins
+        np.divide(self.rawhisto, self.sumhisto, out=self.histogram)
 
     def save_data(self, timestamp=None):
         """ Save the counter trace data and writes it to a file.
@@ -587,8 +610,8 @@ class WavemeterLoggerLogic(GenericLogic):
         """
         # TODO: Draw plot for second APD if it is connected
 
-        wavelength_data = [entry[2] for entry in self.counts_with_wavelength]
-        count_data = np.array([entry[1] for entry in self.counts_with_wavelength])
+        wavelength_data = self.counts_with_wavelength[:, 2]
+        count_data = self.counts_with_wavelength[:, 1]
 
         # Index of max counts, to use to position "0" of frequency-shift axis
         count_max_index = count_data.argmax()
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file contains a level-of-detail plot data item for long traces.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import numpy as np
+from pyqtgraph import PlotDataItem
+
+__all__ = ['DecimatedPlotDataItem', 'MinMaxPyramid']
+
+
+class MinMaxPyramid:
+    """
+    Cached min/max decimation pyramid of a 1D trace y(x).
+    Level i holds the minimum and maximum of blocks of factor**(i+1) consecutive samples together
+    with the x value of the first sample in each block. Appending data only recalculates the last
+    (incomplete) block of each level.
+    """
+
+    def __init__(self, factor=4):
+        if factor < 2:
+            raise ValueError('Decimation factor of MinMaxPyramid must be >= 2.')
+        self.factor = int(factor)
+        self._data = np.empty((2, 0))
+        self._length = 0
+        self._monotonic = True
+        # list of [array of shape (3, capacity) holding x, y_min, y_max; number of valid blocks]
+        self._levels = list()
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def x(self):
+        return self._data[0, :self._length]
+
+    @property
+    def y(self):
+        return self._data[1, :self._length]
+
+    @property
+    def levels(self):
+        return len(self._levels)
+
+    @property
+    def is_monotonic(self):
+        """ True if the x values are sorted in ascending order. """
+        return self._monotonic
+
+    def set_data(self, x, y):
+        """ Replace the trace and rebuild the complete pyramid.
+
+        @param numpy.ndarray x: x values of the trace (can be None to use the sample index)
+        @param numpy.ndarray y: y values of the trace
+        """
+        y = np.asarray(y, dtype=float)
+        x = np.arange(y.size, dtype=float) if x is None else np.asarray(x, dtype=float)
+        if x.ndim != 1 or x.shape != y.shape:
+            raise ValueError('MinMaxPyramid x and y data must be 1D arrays of same length.')
+        self._data = np.empty((2, x.size))
+        self._data[0] = x
+        self._data[1] = y
+        self._length = x.size
+        self._monotonic = bool(np.all(np.diff(x) >= 0))
+        self._levels = list()
+        self._update_levels(0)
+
+    def append(self, x, y):
+        """ Append data to the trace and update the tails of all pyramid levels.
+
+        @param numpy.ndarray x: x values to append
+        @param numpy.ndarray y: y values to append
+        """
+        y = np.asarray(y, dtype=float).ravel()
+        x = np.asarray(x, dtype=float).ravel()
+        if x.shape != y.shape:
+            raise ValueError('MinMaxPyramid x and y data must be 1D arrays of same length.')
+        if x.size == 0:
+            return
+        start = self._length
+        new_length = start + x.size
+        if new_length > self._data.shape[1]:
+            data = np.empty((2, max(new_length, 2 * self._data.shape[1])))
+            data[:, :start] = self._data[:, :start]
+            self._data = data
+        if self._monotonic:
+            last = self._data[0, start - 1] if start > 0 else -np.inf
+            self._monotonic = bool(x[0] >= last and np.all(np.diff(x) >= 0))
+        self._data[0, start:new_length] = x
+        self._data[1, start:new_length] = y
+        self._length = new_length
+        self._update_levels(start)
+
+    def _update_levels(self, start):
+        """ Recalculate all pyramid blocks containing raw samples from index start on.
+
+        @param int start: index of the first changed raw sample
+        """
+        x_prev = y_min_prev = y_max_prev = None
+        prev_length = self._length
+        level = 0
+        while prev_length > 1:
+            if level == 0:
+                x_prev = self.x
+                y_min_prev = y_max_prev = self.y
+            first = start // self.factor
+            indices = np.arange(first * self.factor, prev_length, self.factor)
+            new_length = first + indices.size
+
+            if level == len(self._levels):
+                self._levels.append([np.empty((3, 0)), 0])
+            buffer = self._levels[level][0]
+            if new_length > buffer.shape[1]:
+                new_buffer = np.empty((3, max(new_length, 2 * buffer.shape[1])))
+                new_buffer[:, :first] = buffer[:, :first]
+                buffer = new_buffer
+            buffer[0, first:new_length] = x_prev[indices]
+            buffer[1, first:new_length] = np.fmin.reduceat(y_min_prev, indices)
+            buffer[2, first:new_length] = np.fmax.reduceat(y_max_prev, indices)
+            self._levels[level] = [buffer, new_length]
+
+            x_prev = buffer[0, :new_length]
+            y_min_prev = buffer[1, :new_length]
+            y_max_prev = buffer[2, :new_length]
+            prev_length = new_length
+            start = first
+            level += 1
+        del self._levels[level:]
+
+    def select(self, x_range=None, max_points=1000):
+        """ Determine the pyramid level and index range to display a given x range with at most
+        max_points min/max pairs.
+
+        @param tuple x_range: optional, (x_min, x_max) of the visible range. Full trace if None.
+        @param int max_points: maximum number of raw samples or min/max pairs to return
+
+        @return tuple: (level, start, stop) with level -1 for raw data
+        """
+        start, stop = 0, self._length
+        if x_range is not None and self._monotonic and self._length > 0:
+            start = max(np.searchsorted(self.x, x_range[0], side='left') - 1, 0)
+            stop = min(np.searchsorted(self.x, x_range[1], side='right') + 1, self._length)
+        max_points = max(int(max_points), 1)
+        if stop - start <= max_points or not self._levels:
+            return -1, start, stop
+
+        # smallest level whose block count in the selected range does not exceed max_points
+        level = int(np.ceil(np.log((stop - start) / max_points) / np.log(self.factor))) - 1
+        level = min(max(level, 0), len(self._levels) - 1)
+        block = self.factor ** (level + 1)
+        return level, start // block, min(-(-stop // block), self._levels[level][1])
+
+    def get_data(self, x_range=None, max_points=1000):
+        """ Decimated data for display.
+
+        @param tuple x_range: optional, (x_min, x_max) of the visible range. Full trace if None.
+        @param int max_points: maximum number of raw samples or min/max pairs to return
+
+        @return tuple: x and y arrays. Decimated levels return min and max of each block as
+                       consecutive points at the x position of the block.
+        """
+        level, start, stop = self.select(x_range, max_points)
+        return self.get_level_data(level, start, stop)
+
+    def get_level_data(self, level, start, stop):
+        """ Data of a pyramid level in a given block index range (see select).
+
+        @param int level: pyramid level, -1 for raw data
+        @param int start: first block index
+        @param int stop: block index after the last one
+
+        @return tuple: x and y arrays
+        """
+        if level < 0:
+            return self.x[start:stop], self.y[start:stop]
+        buffer = self._levels[level][0]
+        x = np.repeat(buffer[0, start:stop], 2)
+        y = np.empty(x.size)
+        y[0::2] = buffer[1, start:stop]
+        y[1::2] = buffer[2, start:stop]
+        return x, y
+
+
+class DecimatedPlotDataItem(PlotDataItem):
+    """
+    Extension of pg.PlotDataItem to display very long traces.
+    The trace is kept in a MinMaxPyramid and only the visible x range is displayed in screen
+    resolution, preserving the minimum and maximum of each pixel column. The displayed data is
+    recalculated when the view range changes. Use appendData to extend the trace without
+    rebuilding the whole pyramid.
+    """
+
+    def __init__(self, *args, factor=4, points_per_pixel=1, **kwargs):
+        self._pyramid = MinMaxPyramid(factor=factor)
+        self._points_per_pixel = points_per_pixel
+        self._selection = None
+        super().__init__(*args, **kwargs)
+
+    def setData(self, *args, **kwargs):
+        """ Set the full trace. Accepts setData(y), setData(x, y) or setData(x=x, y=y) and any
+        other keyword argument pg.PlotDataItem.setData accepts.
+        """
+        x = kwargs.pop('x', None)
+        y = kwargs.pop('y', None)
+        if len(args) == 1:
+            y = args[0]
+        elif len(args) == 2:
+            x, y = args
+        elif len(args) > 2:
+            raise TypeError('DecimatedPlotDataItem.setData accepts at most 2 positional arguments.')
+
+        if y is None:
+            self._pyramid.set_data(None, [])
+        else:
+            self._pyramid.set_data(x, y)
+        self._selection = None
+        self._update_display(**kwargs)
+
+    def appendData(self, x, y):
+        """ Append data to the trace. Only the tail of the pyramid is recalculated.
+
+        @param numpy.ndarray x: x values to append
+        @param numpy.ndarray y: y values to append
+        """
+        self._pyramid.append(x, y)
+        self._selection = None
+        self._update_display()
+
+    def fullData(self):
+        """ The complete (not decimated) trace.
+
+        @return tuple: x and y arrays
+        """
+        return self._pyramid.x, self._pyramid.y
+
+    def dataBounds(self, ax, frac=1.0, orthoRange=None):
+        """ Range of the complete trace along an axis. Called by the ViewBox for auto range.
+        pg.PlotDataItem only holds the visible part of the trace, so its bounds would follow the
+        current view.
+
+        @param int ax: 0 for x, 1 for y
+        @param float frac: fraction of the data range to return (ignores outliers if < 1)
+        @param list orthoRange: optional, [min, max] of the other axis to restrict the data to
+
+        @return list: [min, max] of the data, [None, None] if there is no data
+        """
+        x, y = self.fullData()
+        if ax == 1 and frac >= 1.0 and (orthoRange is None or self._pyramid.is_monotonic):
+            # the min/max pairs of a coarse pyramid level have the same extrema as the raw data
+            data = self._pyramid.get_level_data(*self._pyramid.select(orthoRange, 1000))[1]
+        else:
+            data, ortho = (x, y) if ax == 0 else (y, x)
+            if orthoRange is not None:
+                data = data[(ortho >= orthoRange[0]) & (ortho <= orthoRange[1])]
+        data = data[np.isfinite(data)]
+        if data.size == 0:
+            return [None, None]
+        if frac >= 1.0:
+            return [float(data.min()), float(data.max())]
+        bounds = np.percentile(data, [50 * (1 - frac), 50 * (1 + frac)])
+        return [float(bounds[0]), float(bounds[1])]
+
+    def viewRangeChanged(self):
+        super().viewRangeChanged()
+        self._update_display()
+
+    def _update_display(self, **kwargs):
+        """ Hand the decimated visible part of the trace to pg.PlotDataItem. """
+        view_box = self.getViewBox()
+        if view_box is None:
+            x_range = None
+            max_points = 2000
+        else:
+            x_range = view_box.viewRange()[0]
+            max_points = max(int(view_box.width() * self._points_per_pixel), 100)
+
+        selection = self._pyramid.select(x_range, max_points)
+        if selection == self._selection and not kwargs:
+            return
+        self._selection = selection
+        x, y = self._pyramid.get_level_data(*selection)
+        super().setData(x=x, y=y, **kwargs)
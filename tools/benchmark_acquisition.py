@@ -0,0 +1,587 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the qudi acquisition loops with dummy hardware.
+
+Starts a headless qudi manager with config/example/acquisition_benchmark.cfg and times standard
+scenarios:
+
+    confocal        xy scan of the ConfocalLogic (_scan_line)
+    odmr            ODMR sweeps of the ODMRLogic (_scan_odmr_line)
+    pulsed          pulsed analysis loop with a simulated Rabi measurement
+    counter         continuous counting of the CounterLogic
+    time_series     streaming of the TimeSeriesReaderLogic
+    sample_ensemble sampling and writing of a large PulseBlockEnsemble
+    camera          video recording of the CameraLogic with a 500 Hz dummy camera
+    time_tags       online correlation of a 10 M tags/s dummy time tag stream (TimeTagLogic)
+
+For every scenario the wall time, the processed samples per second, the peak memory of the Python
+allocations (tracemalloc, includes numpy arrays), the rate of the signal updating the GUI and
+the loop timing statistics (core.util.looptimer) are recorded and written to a JSON file. If a
+baseline file from an earlier run is given, the results are compared against it and the script
+exits with code 1 if a scenario got slower than the tolerance.
+
+The configuration is copied to a temporary directory together with the data directories, so
+the benchmark does not touch the status variables or data of your qudi setup.
+
+Run from the qudi main directory:
+
+    python tools/benchmark_acquisition.py --output results.json
+    python tools/benchmark_acquisition.py --baseline results.json --tolerance 0.2
+    python tools/benchmark_acquisition.py --scenarios odmr counter --duration 10
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from qtpy import QtCore
+
+from core import config
+from core.util.looptimer import get_loop_timer, get_loop_timers
+from core.util.modules import get_main_dir
+from logic.camera_logic import FrameRecording
+
+CONFIG_FILE = os.path.join(get_main_dir(), 'config', 'example', 'acquisition_benchmark.cfg')
+
+SCENARIOS = OrderedDict()
+
+
+def scenario(name):
+    """ Decorator registering a benchmark scenario.
+
+    A scenario is a function taking the Benchmark and a Measurement. It sets up the logic modules,
+    calls measurement.start() and measurement.stop() around the timed part and sets
+    measurement.samples.
+    """
+    def decorator(func):
+        SCENARIOS[name] = func
+        return func
+    return decorator
+
+
+class SignalCounter:
+    """ Counts the emissions of Qt signals. Connected with a direct connection, so it counts in
+    the emitting thread and does not depend on the event loop of the benchmark.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+    def connect(self, signal):
+        signal.connect(self, QtCore.Qt.DirectConnection)
+
+
+class VideoControl(QtCore.QObject):
+    """ Signals to start and stop the video of the CameraLogic in its thread. """
+    sigVideoStart = QtCore.Signal()
+    sigVideoStop = QtCore.Signal()
+
+
+class Measurement:
+    """ Metrics of one benchmark scenario.
+    """
+
+    def __init__(self, name, trace_memory=True):
+        self.name = name
+        self.samples = 0
+        self.wall_time = None
+        self.peak_memory = None
+        self.loop_name = None
+        self.signals = SignalCounter()
+        self.info = OrderedDict()
+        self._trace_memory = trace_memory
+        self._start_time = None
+
+    def start(self, loop_name=None):
+        """ Start the timed part of the scenario.
+
+        @param str loop_name: optional, name of the LoopTimer of the benchmarked loop
+        """
+        self.loop_name = loop_name
+        for timer in get_loop_timers():
+            timer.reset()
+        if self._trace_memory:
+            tracemalloc.stop()
+            tracemalloc.start()
+        self.signals.count = 0
+        self._start_time = time.perf_counter()
+
+    def stop(self):
+        """ Stop the timed part of the scenario.
+        """
+        self.wall_time = time.perf_counter() - self._start_time
+        if self._trace_memory:
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    @property
+    def loop_statistics(self):
+        """ Statistics of the LoopTimer of the benchmarked loop, None if there is none. """
+        if self.loop_name is None:
+            return None
+        return get_loop_timer(self.loop_name).statistics()
+
+    def result(self):
+        """ Metrics as dictionary.
+
+        @return OrderedDict: metrics of the scenario
+        """
+        result = OrderedDict()
+        result['wall_time'] = self.wall_time
+        result['samples'] = self.samples
+        result['samples_per_s'] = self.samples / self.wall_time if self.wall_time else None
+        result['peak_memory_mb'] = None if self.peak_memory is None else self.peak_memory / 2**20
+        result['signal_rate'] = self.signals.count / self.wall_time if self.wall_time else None
+        stats = self.loop_statistics
+        if stats is not None:
+            result['loop'] = OrderedDict(
+                [('name', stats['name']),
+                 ('iterations', stats['iterations']),
+                 ('mean_time', stats['mean_time']),
+                 ('max_time', stats['max_time']),
+                 ('jitter', stats['jitter']),
+                 ('overruns', stats['overruns'])])
+        result.update(self.info)
+        return result
+
+
+class Benchmark:
+    """ Headless qudi manager running the benchmark scenarios.
+    """
+
+    def __init__(self, duration=5, trace_memory=True, ensemble_points=1000,
+                 confocal_resolution=50):
+        """
+        @param float duration: duration of the continuous scenarios in s
+        @param bool trace_memory: record the peak memory with tracemalloc
+        @param int ensemble_points: number of Rabi points of the sample_ensemble scenario
+        @param int confocal_resolution: pixels per line of the confocal scenario
+        """
+        self.duration = duration
+        self.confocal_resolution = confocal_resolution
+        self.trace_memory = trace_memory
+        self.ensemble_points = ensemble_points
+        self.app = QtCore.QCoreApplication.instance()
+        if self.app is None:
+            self.app = QtCore.QCoreApplication(sys.argv)
+        self.directory = tempfile.mkdtemp(prefix='qudi_acquisition_benchmark_')
+        self.manager = None
+
+    def start_manager(self):
+        """ Copy the configuration to the temporary directory and start the manager.
+        """
+        from core.logger import initialize_logger
+        from core.manager import Manager
+
+        cfg = config.load(CONFIG_FILE)
+        data_dir = os.path.join(self.directory, 'data')
+        cfg['logic']['savelogic']['unix_data_directory'] = data_dir
+        cfg['logic']['savelogic']['win_data_directory'] = data_dir
+        cfg['logic']['scannerlogic']['scan_data_dir'] = os.path.join(self.directory, 'scans')
+        cfg['logic']['sequencegeneratorlogic']['assets_storage_path'] = os.path.join(
+            self.directory, 'pulsed_assets')
+        config_file = os.path.join(self.directory, 'acquisition_benchmark.cfg')
+        config.save(config_file, cfg)
+
+        initialize_logger(self.directory)
+        args = argparse.Namespace(config=config_file, logdir=self.directory, no_gui=True,
+                                  sampling_profile=None, sampling_rate=100)
+        self.manager = Manager(args=args)
+
+    def quit(self):
+        """ Deactivate all modules, stop the threads and remove the temporary directory.
+        """
+        if self.manager is not None:
+            self.manager.realQuit()
+            self.manager.tm.quitAllThreads()
+            self.app.processEvents()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def module(self, name):
+        """ Start a logic module including its dependencies.
+
+        @param str name: name of the logic module in the configuration
+
+        @return object: the module instance
+        """
+        self.manager.startModule('logic', name)
+        module = self.manager.tree['loaded']['logic'].get(name)
+        if module is None or module.module_state() == 'deactivated':
+            raise RuntimeError('Starting module "{0}" failed, see {1}.'.format(
+                name, os.path.join(self.directory, 'qudi.log')))
+        return module
+
+    def hardware(self, name):
+        """ Loaded hardware module.
+
+        @param str name: name of the hardware module in the configuration
+
+        @return object: the module instance
+        """
+        return self.manager.tree['loaded']['hardware'][name]
+
+    def wait_until(self, condition, timeout=60):
+        """ Process events until a condition is met.
+
+        @param callable condition: function returning True when done
+        @param float timeout: maximum time to wait in s
+        """
+        stop = time.perf_counter() + timeout
+        while not condition():
+            if time.perf_counter() > stop:
+                raise TimeoutError('Condition not met within {0:.0f} s.'.format(timeout))
+            self.app.processEvents()
+            time.sleep(0.001)
+
+    def process_events(self, duration):
+        """ Process events for some time.
+
+        @param float duration: time in s
+        """
+        stop = time.perf_counter() + duration
+        while time.perf_counter() < stop:
+            self.app.processEvents()
+            time.sleep(0.001)
+
+    def run(self, names):
+        """ Run scenarios.
+
+        @param list(str) names: names of the scenarios to run
+
+        @return OrderedDict: results by scenario name
+        """
+        results = OrderedDict()
+        for name in names:
+            print('Running scenario {0}...'.format(name))
+            measurement = Measurement(name, self.trace_memory)
+            try:
+                SCENARIOS[name](self, measurement)
+            except Exception as e:
+                if measurement.wall_time is None and tracemalloc.is_tracing():
+                    tracemalloc.stop()
+                print('Scenario {0} failed: {1}'.format(name, e))
+                results[name] = OrderedDict([('error', str(e))])
+                continue
+            results[name] = measurement.result()
+        return results
+
+
+@scenario('confocal')
+def benchmark_confocal(bench, measurement):
+    logic = bench.module('scannerlogic')
+    logic.xy_resolution = bench.confocal_resolution
+    logic.return_slowness = 10
+    signal = SignalCounter()
+    signal.connect(logic.signal_xy_image_updated)
+    measurement.signals = signal
+
+    measurement.start('scannerlogic._scan_line')
+    logic.start_scanning()
+    bench.wait_until(lambda: logic.module_state() == 'locked')
+    bench.wait_until(lambda: logic.module_state() == 'idle', timeout=600)
+    measurement.stop()
+
+    lines = measurement.loop_statistics['iterations']
+    measurement.samples = lines * logic.xy_resolution * len(logic.get_scanner_count_channels())
+    measurement.info['resolution'] = logic.xy_resolution
+
+
+@scenario('odmr')
+def benchmark_odmr(bench, measurement):
+    logic = bench.module('odmrlogic')
+    logic.set_clock_frequency(1e6)
+    logic.set_sweep_parameters([2.8e9], [2.9e9 - 1e5], [1e5], -30)
+    logic.set_runtime(10 * bench.duration)
+    points = logic.odmr_plot_x.size
+    measurement.signals.connect(logic.sigOdmrPlotsUpdated)
+
+    measurement.start('odmrlogic._scan_odmr_line')
+    logic.start_odmr_scan()
+    bench.process_events(bench.duration)
+    logic.stop_odmr_scan()
+    bench.wait_until(lambda: logic.module_state() == 'idle')
+    measurement.stop()
+
+    lines = measurement.loop_statistics['iterations']
+    measurement.samples = lines * points * len(logic.get_odmr_channels())
+    measurement.info['points'] = points
+
+
+@scenario('pulsed')
+def benchmark_pulsed(bench, measurement):
+    master = bench.module('pulsedmasterlogic')
+    measurement_logic = bench.module('pulsedmeasurementlogic')
+    master.set_pulse_generator_settings(sample_rate=1e9)
+    master.set_generation_parameters(laser_channel='d_ch1', sync_channel='', gate_channel='')
+    master.set_measurement_settings(invoke_settings=True)
+    master.set_timer_interval(0.1)
+    master.generate_predefined_sequence(
+        'rabi', {'name': 'benchmark_rabi', 'num_of_points': 100}, True)
+    bench.wait_until(lambda: not master.status_dict['predefined_generation_busy']
+                     and not master.status_dict['sampload_busy'], timeout=600)
+    measurement.signals.connect(master.sigMeasurementDataUpdated)
+
+    measurement.start('pulsedmeasurementlogic._pulsed_analysis_loop')
+    master.toggle_pulsed_measurement(True)
+    bench.process_events(bench.duration)
+    master.toggle_pulsed_measurement(False)
+    bench.wait_until(lambda: measurement_logic.module_state() == 'idle')
+    measurement.stop()
+
+    iterations = measurement.loop_statistics['iterations']
+    measurement.samples = iterations * measurement_logic.raw_data.size
+    measurement.info['raw_data_bins'] = int(measurement_logic.raw_data.size)
+    measurement.info['elapsed_sweeps'] = master.elapsed_sweeps
+
+
+@scenario('counter')
+def benchmark_counter(bench, measurement):
+    logic = bench.module('counterlogic')
+    logic.set_count_frequency(1e5)
+    logic.set_counting_samples(1000)
+    logic.set_count_length(10000)
+    measurement.signals.connect(logic.sigCounterUpdated)
+
+    measurement.start('counterlogic.count_loop_body')
+    logic.startCount()
+    bench.process_events(bench.duration)
+    logic.stopCount()
+    bench.wait_until(lambda: logic.module_state() == 'idle')
+    measurement.stop()
+
+    iterations = measurement.loop_statistics['iterations']
+    measurement.samples = iterations * logic.get_counting_samples() * len(logic.get_channels())
+    measurement.info['nominal_samples_per_s'] = \
+        logic.get_count_frequency() * len(logic.get_channels())
+
+
+@scenario('time_series')
+def benchmark_time_series(bench, measurement):
+    logic = bench.module('timeserieslogic')
+    streamer = bench.hardware('benchmark_instreamer')
+    logic.configure_settings(data_rate=1e5, oversampling_factor=1)
+    channels = logic.number_of_active_channels
+    measurement.signals.connect(logic.sigDataChanged)
+
+    measurement.start('timeserieslogic.acquire_data_block')
+    logic.start_reading()
+    bench.wait_until(lambda: streamer.is_running)
+    stream_start = time.perf_counter()
+    bench.process_events(bench.duration)
+    # every sample generated by the dummy stream and not read from its buffer yet is a backlog
+    backlog = streamer.available_samples
+    stream_time = time.perf_counter() - stream_start
+    logic.stop_reading()
+    bench.wait_until(lambda: logic.module_state() == 'idle')
+    measurement.stop()
+
+    read_samples = max(streamer.sample_rate * stream_time - backlog, 0)
+    measurement.samples = int(read_samples * channels)
+    measurement.info['nominal_samples_per_s'] = streamer.sample_rate * channels
+    measurement.info['backlog_samples'] = int(backlog)
+
+
+@scenario('sample_ensemble')
+def benchmark_sample_ensemble(bench, measurement):
+    master = bench.module('pulsedmasterlogic')
+    generator = bench.module('sequencegeneratorlogic')
+    master.set_pulse_generator_settings(sample_rate=1e9)
+    master.set_generation_parameters(laser_channel='d_ch1', sync_channel='', gate_channel='')
+    master.generate_predefined_sequence(
+        'rabi', {'name': 'benchmark_large_rabi', 'num_of_points': bench.ensemble_points}, False)
+    bench.wait_until(lambda: not master.status_dict['predefined_generation_busy'])
+    measurement.signals.connect(master.sigSampleEnsembleComplete)
+
+    measurement.start()
+    master.sample_ensemble('benchmark_large_rabi', True)
+    bench.wait_until(lambda: not master.status_dict['sampload_busy'], timeout=600)
+    measurement.stop()
+
+    ensemble = generator.get_ensemble('benchmark_large_rabi')
+    measurement.samples = int(ensemble.sampling_information['number_of_samples'])
+    measurement.info['rabi_points'] = bench.ensemble_points
+
+
+@scenario('camera')
+def benchmark_camera(bench, measurement):
+    logic = bench.module('cameralogic')
+    # the video is started and stopped in the thread of the logic like from the GUI
+    control = VideoControl()
+    control.sigVideoStart.connect(logic.start_loop, QtCore.Qt.QueuedConnection)
+    control.sigVideoStop.connect(logic.stop_loop, QtCore.Qt.QueuedConnection)
+    measurement.signals.connect(logic.sigUpdateDisplay)
+
+    measurement.start('cameralogic.acquire_frame')
+    control.sigVideoStart.emit()
+    bench.wait_until(lambda: logic.enabled)
+    directory = logic.start_recording(os.path.join(bench.directory, 'video'))
+    bench.process_events(bench.duration)
+    control.sigVideoStop.emit()
+    bench.wait_until(lambda: not logic.enabled)
+    measurement.stop()
+
+    frames = logic.acquired_frames
+    measurement.samples = frames * int(np.prod(logic.get_last_image().shape))
+    measurement.info['frames_per_s'] = frames / measurement.wall_time
+    measurement.info['nominal_frames_per_s'] = 1 / logic.get_exposure()
+    measurement.info['recorded_frames'] = FrameRecording.load(directory).frames
+    measurement.info['dropped_frames'] = logic.dropped_frames
+    measurement.info['missed_frames'] = logic.missed_frames
+
+
+@scenario('time_tags')
+def benchmark_time_tags(bench, measurement):
+    logic = bench.module('timetaglogic')
+    timetagger = bench.hardware('benchmark_timetagger')
+    measurement.signals.connect(logic.sigHistogramsUpdated)
+
+    measurement.start('timetaglogic.process_tags')
+    logic.start_measurement()
+    bench.wait_until(lambda: timetagger.is_running)
+    bench.process_events(bench.duration)
+    # every tag generated by the dummy and not read from its buffer yet is a backlog
+    backlog = timetagger.available_tags
+    logic.stop_measurement()
+    bench.wait_until(lambda: logic.module_state() == 'idle')
+    measurement.stop()
+
+    tags = sum(logic.channel_counts.values())
+    measurement.samples = tags
+    measurement.info['backlog_tags'] = int(backlog)
+    measurement.info['buffer_overflown'] = timetagger.buffer_overflown
+    delays, g2 = logic.get_g2('g2')
+    measurement.info['g2_zero_delay'] = float(g2[np.argmin(np.abs(delays))])
+    measurement.info['g2_long_delay'] = float(np.mean(g2[:10]))
+
+
+def compare(results, baseline, tolerance):
+    """ Compare results against a baseline.
+
+    @param dict results: scenario results of this run
+    @param dict baseline: scenario results of the baseline run
+    @param float tolerance: allowed relative loss of samples per second
+
+    @return list(str): names of the scenarios that got slower than the tolerance
+    """
+    regressions = list()
+    print('\n{0:<18s} {1:>15s} {2:>15s} {3:>9s}'.format(
+        'scenario', 'baseline (S/s)', 'now (S/s)', 'change'))
+    for name, result in results.items():
+        reference = baseline.get(name, dict())
+        now = result.get('samples_per_s')
+        before = reference.get('samples_per_s')
+        if not now or not before:
+            print('{0:<18s} {1:>15s} {2:>15s} {3:>9s}'.format(name, '-', '-', '-'))
+            continue
+        change = now / before - 1
+        flag = ''
+        if change < -tolerance:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print('{0:<18s} {1:>15.4g} {2:>15.4g} {3:>+8.1%}{4}'.format(
+            name, before, now, change, flag))
+    return regressions
+
+
+def print_results(results):
+    """ Print the results as table.
+
+    @param dict results: scenario results
+    """
+    print('\n{0:<18s} {1:>10s} {2:>12s} {3:>12s} {4:>12s} {5:>12s}'.format(
+        'scenario', 'wall (s)', 'samples/s', 'peak (MB)', 'signals/s', 'loop (ms)'))
+    for name, result in results.items():
+        if 'error' in result:
+            print('{0:<18s} failed: {1}'.format(name, result['error']))
+            continue
+        loop = result.get('loop')
+        print('{0:<18s} {1:>10.2f} {2:>12.4g} {3:>12s} {4:>12.1f} {5:>12s}'.format(
+            name, result['wall_time'], result['samples_per_s'],
+            '-' if result['peak_memory_mb'] is None else '{0:.1f}'.format(
+                result['peak_memory_mb']),
+            result['signal_rate'],
+            '-' if not loop else '{0:.2f}'.format(loop['mean_time'] * 1e3)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the qudi acquisition loops.')
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS),
+                        default=list(SCENARIOS), help='scenarios to run (default: all)')
+    parser.add_argument('--duration', type=float, default=5,
+                        help='duration of the continuous scenarios in s (default: 5)')
+    parser.add_argument('--ensemble-points', type=int, default=1000,
+                        help='Rabi points of the sample_ensemble scenario (default: 1000)')
+    parser.add_argument('--confocal-resolution', type=int, default=50,
+                        help='pixels per line of the confocal scenario (default: 50)')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='do not trace the memory (tracemalloc slows down allocations)')
+    parser.add_argument('--output', default='',
+                        help='JSON file for the results (default: time stamped file)')
+    parser.add_argument('--baseline', default='', help='JSON results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative loss of samples/s against the baseline')
+    args = parser.parse_args()
+
+    bench = Benchmark(args.duration, not args.no_memory, args.ensemble_points,
+                      args.confocal_resolution)
+    try:
+        bench.start_manager()
+        results = bench.run(args.scenarios)
+    finally:
+        bench.quit()
+
+    output = OrderedDict()
+    output['date'] = datetime.datetime.now().isoformat()
+    output['platform'] = platform.platform()
+    output['python'] = platform.python_version()
+    output['duration'] = args.duration
+    output['scenarios'] = results
+    filename = args.output or 'acquisition_benchmark_{0}.json'.format(
+        time.strftime('%Y%m%d-%H%M%S'))
+    with open(filename, 'w') as file:
+        json.dump(output, file, indent=2)
+
+    print_results(results)
+    print('\nResults written to {0}'.format(filename))
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if compare(results, baseline['scenarios'], args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the render time of long traces with pg.PlotDataItem and the level-of-detail
+DecimatedPlotDataItem used in qudi trace plots.
+
+Run from the qudi main directory:
+
+    python tools/benchmark_plot_decimation.py
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import pyqtgraph as pg
+from qtpy import QtWidgets
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from qtwidgets.decimated_plot import DecimatedPlotDataItem
+
+
+def time_render(plot_widget, item, x, y, repetitions=5):
+    """ Average time (in s) to set the data of a plot item and render the plot widget.
+    """
+    start = time.perf_counter()
+    for i in range(repetitions):
+        item.setData(x=x, y=y)
+        plot_widget.grab()
+    return (time.perf_counter() - start) / repetitions
+
+
+def time_append(plot_widget, item, x, y, chunk_size, repetitions=5):
+    """ Average time (in s) to append a chunk of data to a DecimatedPlotDataItem and render.
+    """
+    item.setData(x=x, y=y)
+    start = time.perf_counter()
+    for i in range(repetitions):
+        offset = x[-1] + (i + 1) * chunk_size
+        item.appendData(np.arange(chunk_size) + offset, np.random.poisson(1000, chunk_size))
+        plot_widget.grab()
+    return (time.perf_counter() - start) / repetitions
+
+
+def main():
+    app = QtWidgets.QApplication.instance()
+    if app is None:
+        app = QtWidgets.QApplication(sys.argv)
+
+    plot_widget = pg.PlotWidget()
+    plot_widget.resize(1000, 600)
+    plot_widget.show()
+    app.processEvents()
+
+    print('{0:>10s} {1:>15s} {2:>15s} {3:>15s}'.format(
+        'length', 'plain (ms)', 'decimated (ms)', 'append (ms)'))
+    for exponent in range(3, 8):
+        length = 10 ** exponent
+        x = np.arange(length, dtype=float)
+        y = np.random.poisson(1000, length).astype(float)
+
+        plain_item = pg.PlotDataItem(pen='y')
+        plot_widget.addItem(plain_item)
+        plain_time = time_render(plot_widget, plain_item, x, y)
+        plot_widget.removeItem(plain_item)
+
+        decimated_item = DecimatedPlotDataItem(pen='y')
+        plot_widget.addItem(decimated_item)
+        decimated_time = time_render(plot_widget, decimated_item, x, y)
+        append_time = time_append(plot_widget, decimated_item, x, y, chunk_size=1000)
+        plot_widget.removeItem(decimated_item)
+
+        print('{0:>10d} {1:>15.2f} {2:>15.2f} {3:>15.2f}'.format(
+            length, plain_time * 1e3, decimated_time * 1e3, append_time * 1e3))
+        app.processEvents()
+
+
+if __name__ == '__main__':
+    main()
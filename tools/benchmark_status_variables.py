@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of saving and loading a large synthetic set of status variables in the YAML format
+(arrays in external npz files) and the binary status variable format of core.config.
+
+Run from the qudi main directory:
+
+    python tools/benchmark_status_variables.py [size in MB, default 500]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core import config
+
+
+def synthetic_status_variables(size_mb):
+    """ Status variables resembling confocal images, an ODMR matrix and pulsed raw data together
+    with some small settings.
+
+    @param float size_mb: approximate total size of the arrays in MB
+    @return OrderedDict: status variables
+    """
+    # split the size between 4 arrays of float64 (confocal, depth, ODMR) and int64 (raw data)
+    elements = int(size_mb * 2**20 / 8 / 4)
+    side = int(np.sqrt(elements / 3))
+    variables = OrderedDict()
+    variables['xy_image'] = np.random.rand(side, side, 3)
+    variables['depth_image'] = np.random.rand(side, side, 3)
+    variables['odmr_plot_xy'] = np.random.rand(elements // 1000, 1000)
+    variables['raw_data'] = np.random.randint(0, 100, elements, dtype=np.int64)
+    variables['mw_frequency'] = 2.87e9
+    variables['mw_power'] = -30.0
+    variables['scan_range'] = [0.0, 1e-4]
+    variables['fit_function'] = 'Lorentzian dip'
+    variables['settings'] = OrderedDict([('averages', 100), ('enabled', True)])
+    return variables
+
+
+def time_call(function, *args, **kwargs):
+    """ Call a function and return its result and the execution time in s.
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def touch_arrays(variables):
+    """ Sum all arrays, which forces memory mapped arrays to be read from disk.
+    """
+    return sum(float(np.sum(v)) for v in variables.values() if isinstance(v, np.ndarray))
+
+
+def main():
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 500
+    variables = synthetic_status_variables(size_mb)
+    total = sum(v.nbytes for v in variables.values() if isinstance(v, np.ndarray)) / 2**20
+    print('Synthetic status variables: {0:.0f} MB of arrays'.format(total))
+
+    directory = tempfile.mkdtemp(prefix='qudi_status_benchmark_')
+    try:
+        yaml_file = os.path.join(directory, 'status-Benchmark_logic_benchmark.cfg')
+        binary_file = os.path.join(directory, 'status-Benchmark_logic_benchmark.qstat')
+
+        _, yaml_save = time_call(config.save, yaml_file, variables)
+        loaded, yaml_load = time_call(config.load, yaml_file)
+        _, yaml_touch = time_call(touch_arrays, loaded)
+        del loaded
+
+        _, binary_save = time_call(config.save_binary, binary_file, variables)
+        loaded, binary_load = time_call(config.load_binary, binary_file)
+        _, binary_touch = time_call(touch_arrays, loaded)
+        del loaded
+        loaded, binary_read = time_call(config.load_binary, binary_file, mmap=False)
+        del loaded
+
+        print('{0:<30s} {1:>10s} {2:>10s} {3:>18s}'.format(
+            'format', 'save (s)', 'load (s)', 'first access (s)'))
+        print('{0:<30s} {1:>10.3f} {2:>10.3f} {3:>18.3f}'.format(
+            'YAML + external npz', yaml_save, yaml_load, yaml_touch))
+        print('{0:<30s} {1:>10.3f} {2:>10.3f} {3:>18.3f}'.format(
+            'binary, memory mapped', binary_save, binary_load, binary_touch))
+        print('{0:<30s} {1:>10s} {2:>10.3f} {3:>18s}'.format(
+            'binary, read', '', binary_read, ''))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+"""
+Check of the buffered writing of the InfluxDB data logger (hardware/influx_data_logger.py).
+
+A local http.server stands in for the /write endpoint of InfluxDB and counts the received points
+and requests. The script measures the time of log_to_channel and the throughput, checks the
+latency from logging to writing, an outage of the database (points go to the journal and are
+replayed afterwards), an outage during the replay (the batches not written yet stay in the replay
+file) and the replay of a journal with a corrupt line. Needs the influxdb package.
+Run from the qudi main directory:
+
+    python tools/check_influx_logger.py [--points 100000]
+
+The script exits with an error if a check fails.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from hardware.influx_data_logger import InfluxLogger
+
+
+class InfluxStandIn(BaseHTTPRequestHandler):
+    """ /write endpoint of InfluxDB. Answers 503 while server.outage is set or after
+    server.outage_after requests.
+    """
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.server.outage or (self.server.outage_after is not None
+                                  and self.server.requests >= self.server.outage_after):
+            self.send_response(503)
+            self.end_headers()
+            return
+        # simulate the processing time of the database
+        time.sleep(self.server.delay)
+        with self.server.lock:
+            self.server.points += len([line for line in body.splitlines() if line.strip()])
+            self.server.requests += 1
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def check(name, condition, details=''):
+    print('{0}: {1} {2}'.format(name, 'OK' if condition else 'FAILED', details))
+    if not condition:
+        raise SystemExit('Check "{0}" failed.'.format(name))
+
+
+def wait_for_journal_replay(logger, server, expected_points, timeout=10):
+    """ Log a point every 0.1 s until the server has received expected_points (the first write
+    after the retry interval replays the journal). Points logged before the retry interval is over
+    are journaled as well. Returns the number of points logged.
+    """
+    logged = 0
+    stop = time.monotonic() + timeout
+    while server.points < expected_points + logged and time.monotonic() < stop:
+        logger.log_to_channel('temperature', [0.0, 0.0])
+        logged += 1
+        logger.flush(timeout)
+        time.sleep(0.1)
+    return logged
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the buffered InfluxDB logger.')
+    parser.add_argument('--points', type=int, default=100000, help='number of points to log')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format='    %(levelname)s: %(message)s')
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), InfluxStandIn)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.points = 0
+    server.requests = 0
+    server.outage = False
+    server.outage_after = None
+    server.delay = 0.02
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    directory = tempfile.mkdtemp()
+    journal_file = os.path.join(directory, 'journal.jsonl')
+    config = {'user': 'user', 'password': 'password', 'dbname': 'db', 'host': '127.0.0.1',
+              'port': server.server_address[1], 'dataseries': 'series', 'field': 'value',
+              'criterion': 'criterion', 'batch_size': 1000, 'flush_interval': 0.5,
+              'buffer_size': 2 * args.points, 'retry_interval': 0.5, 'timeout': 1,
+              'journal_file': journal_file}
+    logger = InfluxLogger(manager=None, name='influx', config=config, callbacks={})
+    logger.module_state.activate()
+    logger.set_log_channels({'temperature': {'tags': {'lab': 'a'}, 'fields': ['t1', 't2']}})
+
+    try:
+        # throughput: log_to_channel must not wait for the database
+        call_times = list()
+        start = time.perf_counter()
+        for i in range(args.points):
+            call_start = time.perf_counter()
+            logger.log_to_channel('temperature', [i, 2.0 * i])
+            call_times.append(time.perf_counter() - call_start)
+        logged = time.perf_counter() - start
+        check('throughput', logger.flush(60) and server.points == args.points,
+              '{0:d} points logged in {1:.2f} s, written after {2:.2f} s in {3:d} requests, '
+              'log_to_channel mean {4:.1f} us, max {5:.2f} ms'.format(
+                  args.points, logged, time.perf_counter() - start, server.requests,
+                  sum(call_times) / len(call_times) * 1e6, max(call_times) * 1e3))
+        check('batching', server.requests <= args.points // config['batch_size'] + 2,
+              '{0:d} requests for batch size {1:d}'.format(server.requests,
+                                                         config['batch_size']))
+
+        # latency: points logged at 200 Hz are written within the flush interval
+        logger.reset_statistics()
+        for i in range(400):
+            logger.log_to_channel('temperature', [i, 0.0])
+            time.sleep(0.005)
+        logger.flush(10)
+        latency = logger.get_statistics()['max_latency']
+        check('latency', latency < config['flush_interval'] + 0.2,
+              'max {0:.3f} s with flush interval {1:.1f} s'.format(latency,
+                                                                 config['flush_interval']))
+
+        # outage: failed batches go to the journal and are replayed after the next good write
+        server.outage = True
+        points_before = server.points
+        for i in range(5000):
+            logger.log_to_channel('temperature', [i, 0.0])
+        logger.flush(10)
+        statistics = logger.get_statistics()
+        check('outage journal', os.path.isfile(journal_file)
+              and statistics['journaled_points'] == 5000 and server.points == points_before,
+              '{0:d} points journaled, {1:d} failed writes'.format(
+                  statistics['journaled_points'], statistics['failed_writes']))
+        server.outage = False
+        logged = wait_for_journal_replay(logger, server, points_before + 5000)
+        statistics = logger.get_statistics()
+        check('journal replay', server.points == points_before + 5000 + logged
+              and statistics['replayed_points'] == statistics['journaled_points']
+              and not os.path.isfile(journal_file),
+              '{0:d} points replayed'.format(statistics['replayed_points']))
+
+        # outage during the replay: written batches are removed, the others stay in the replay file
+        replay_file = journal_file + '.replay'
+        points_before = server.points
+        batches = [[{'measurement': 'temperature', 'tags': {'lab': 'a'},
+                     'fields': {'t1': float(batch), 't2': 0.0},
+                     'time': int(time.time() * 1e9) + 10 * batch + i} for i in range(10)]
+                   for batch in range(3)]
+        with open(journal_file, 'w') as file:
+            file.writelines(json.dumps(batch) + '\n' for batch in batches)
+        # the logged point and one batch of the journal get through
+        server.outage_after = server.requests + 2
+        logger.log_to_channel('temperature', [0.0, 0.0])
+        logger.flush(10)
+        with open(replay_file) as file:
+            remaining = [json.loads(line) for line in file]
+        check('outage during replay', server.points == points_before + 11
+              and remaining == batches[:2] and not os.path.isfile(journal_file),
+              '{0:d} batches left in the replay file'.format(len(remaining)))
+        server.outage_after = None
+        logged = wait_for_journal_replay(logger, server, points_before + 31)
+        check('interrupted replay', server.points == points_before + 31 + logged
+              and not os.path.isfile(replay_file) and not os.path.isfile(journal_file),
+              '{0:d} points written'.format(server.points - points_before))
+
+        # corrupt journal line: skipped, the writer thread keeps running and flush returns
+        points_before = server.points
+        valid_batch = [{'measurement': 'temperature', 'tags': {'lab': 'a'},
+                        'fields': {'t1': 1.0, 't2': 2.0}, 'time': int(time.time() * 1e9) + i}
+                       for i in range(5)]
+        with open(journal_file, 'w') as file:
+            file.write('[{"measurement": "temperature", "fie\n')
+            file.write(json.dumps(valid_batch) + '\n')
+        logger.log_to_channel('temperature', [0.0, 0.0])
+        flusher = threading.Thread(target=logger.flush, daemon=True)
+        flusher.start()
+        flusher.join(10)
+        check('corrupt journal line', not flusher.is_alive() and logger._writer.is_alive()
+              and server.points == points_before + 6 and not os.path.isfile(journal_file),
+              'flush() returned, {0:d} points written'.format(server.points - points_before))
+    finally:
+        logger.module_state.deactivate()
+        server.shutdown()
+        server.server_close()
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
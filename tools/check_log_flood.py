@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+"""
+Check that a flood of log messages does not block the event loop of the manager GUI log widget.
+
+A worker thread emits warnings at a fixed rate (default 100000 per second) with the
+sigLoggedMessage signal of the QtLogHandler of qudi, which is connected directly to
+LogWidget.addEntry like in the manager GUI. The log entries are formatted in advance, because
+formatting log records with the logging module alone limits the rate to a few 10000 per second
+(use --logging to log through the logging module instead). Meanwhile a 10 ms timer in the GUI
+thread measures by how much it is delayed. Two runs are made: the same warning repeated
+(collapsed into one entry with a repeat counter) and distinct warnings (only the last logLength
+entries are kept). Runs offscreen, from the qudi main directory:
+
+    python tools/check_log_flood.py [--rate 100000] [--duration 3] [--max-delay 100] [--logging]
+
+The script exits with an error if the event loop is delayed by more than max-delay ms, less than
+90 % of the rate is reached (without --logging) or the log widget does not show the expected
+entries.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from qtpy import QtCore, QtWidgets
+
+from core.logger import QtLogHandler
+
+
+def flood(log, rate, stop, counter):
+    """ Call log(index) at the given rate until stop is set. Runs in a worker thread. """
+    start = time.perf_counter()
+    chunk = max(rate // 1000, 1)
+    while not stop.is_set():
+        for i in range(chunk):
+            log(counter[0] + i)
+        counter[0] += chunk
+        # keep the rate, catch up if behind
+        ahead = counter[0] / rate - (time.perf_counter() - start)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+def run(app, widget, log, rate, duration):
+    """ Flood the log for duration s and measure the delay of a 10 ms timer.
+
+    @param callable log: called with the message index to log a message
+
+    @return tuple: logged messages, maximum and 99th percentile delay in s
+    """
+    delays = list()
+    last = [time.perf_counter()]
+
+    def probe():
+        now = time.perf_counter()
+        delays.append(now - last[0] - 0.01)
+        last[0] = now
+
+    timer = QtCore.QTimer()
+    timer.timeout.connect(probe)
+    timer.start(10)
+
+    stop = threading.Event()
+    counter = [0]
+    worker = threading.Thread(target=flood, args=(log, rate, stop, counter))
+    start = time.perf_counter()
+    last[0] = start
+    worker.start()
+    while time.perf_counter() - start < duration:
+        app.processEvents(QtCore.QEventLoop.AllEvents, 10)
+    stop.set()
+    worker.join()
+    timer.stop()
+    widget.flushEntries()
+    app.processEvents()
+    delays.sort()
+    return counter[0], delays[-1], delays[int(len(delays) * 0.99)]
+
+
+def check(name, condition, details=''):
+    print('{0}: {1} {2}'.format(name, 'OK' if condition else 'FAILED', details))
+    if not condition:
+        raise SystemExit('Check "{0}" failed.'.format(name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Flood the log widget with warnings.')
+    parser.add_argument('--rate', type=int, default=100000, help='warnings per second')
+    parser.add_argument('--duration', type=float, default=3, help='duration of each run in s')
+    parser.add_argument('--max-delay', type=float, default=100,
+                        help='maximum allowed delay of the event loop in ms')
+    parser.add_argument('--logging', action='store_true',
+                        help='log through the logging module instead of emitting entries')
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv)
+    from gui.manager.logwidget import LogWidget
+    widget = LogWidget()
+    widget.resize(1000, 600)
+    widget.show()
+
+    handler = QtLogHandler()
+    handler.sigLoggedMessage.connect(widget.addEntry, QtCore.Qt.DirectConnection)
+    logger = logging.getLogger('logic.flood')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    # log entry as formatted by the handler, only the message is replaced
+    record = logger.makeRecord(logger.name, logging.WARNING, __file__, 0, '', None, None)
+    record.message = ''
+    template = handler.formatter.format(record)
+
+    def message(index, distinct):
+        return 'Loop overrun {0:d}'.format(index) if distinct else 'Loop overrun'
+
+    def log_record(index, distinct):
+        logger.warning(message(index, distinct))
+
+    def emit_entry(index, distinct):
+        entry = dict(template)
+        entry['message'] = message(index, distinct)
+        handler.sigLoggedMessage.emit(entry)
+
+    for distinct in (False, True):
+        name = 'distinct warnings' if distinct else 'repeated warning'
+        rows_before = widget.model.rowCount()
+        function = log_record if args.logging else emit_entry
+        logged, max_delay, delay_99 = run(app, widget, lambda index: function(index, distinct),
+                                          args.rate, args.duration)
+        rate = logged / args.duration
+        check(name, max_delay * 1e3 <= args.max_delay
+              and (args.logging or rate >= 0.9 * args.rate),
+              '{0:.0f} messages/s, event loop delay max {1:.1f} ms, 99% {2:.1f} ms'.format(
+                  rate, max_delay * 1e3, delay_99 * 1e3))
+        if distinct:
+            check(name + ' rows', widget.model.rowCount() == widget.logLength
+                  and widget.model.entries[-1][3] == 'Loop overrun {0:d}'.format(logged - 1),
+                  '{0:d} rows kept'.format(widget.model.rowCount()))
+        else:
+            check(name + ' rows', widget.model.rowCount() == rows_before + 1
+                  and widget.model.entries[-1][4] == logged,
+                  'one row repeated {0:d} times'.format(widget.model.entries[-1][4]))
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+
+"""
+Check of the number of messages sent to SCPI instruments by core.util.scpi.ScpiBatch and by the
+list setup of the SMIQ microwave source.
+
+A local TCP socket stands in for the instrument. It splits the received byte stream into messages
+(at the termination character, skipping IEEE 488.2 binary blocks), answers the queries and counts
+messages and answers. Run from the qudi main directory:
+
+    python tools/check_scpi_round_trips.py [--points 4000]
+
+The script exits with an error if a message count differs from the expected one.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import importlib
+import os
+import socket
+import socketserver
+import sys
+import threading
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.util.scpi import ScpiBatch
+
+
+class SmiqStandIn(socketserver.BaseRequestHandler):
+    """ Minimal SCPI instrument answering the queries of the SMIQ hardware module. """
+
+    def setup(self):
+        self.server.messages = list()
+        self.server.answers = 0
+        self.state = {'OUTP:STAT': '0', 'FREQ:MODE': 'CW', 'FREQ': '2870000000.0',
+                      'POW': '-20.0', 'LIST:POW': '-20.0', 'LIST:FREQ': ''}
+
+    def handle(self):
+        buffer = b''
+        while True:
+            data = self.request.recv(65536)
+            if not data:
+                return
+            buffer += data
+            while True:
+                end, blocks = self._message_end(buffer)
+                if end is None:
+                    break
+                self._execute(buffer[:end], blocks)
+                buffer = buffer[end + 1:]
+
+    @staticmethod
+    def _message_end(buffer):
+        """ Index of the termination of the first complete message and its binary blocks. """
+        blocks = list()
+        index = 0
+        while index < len(buffer):
+            if buffer[index:index + 1] == b'#' and buffer[index + 1:index + 2].isdigit():
+                digits = int(buffer[index + 1:index + 2])
+                if len(buffer) < index + 2 + digits:
+                    return None, blocks
+                length = int(buffer[index + 2:index + 2 + digits])
+                start = index + 2 + digits
+                if len(buffer) < start + length:
+                    return None, blocks
+                blocks.append((index, start, start + length))
+                index = start + length
+            elif buffer[index:index + 1] == b'\n':
+                return index, blocks
+            else:
+                index += 1
+        return None, blocks
+
+    def _execute(self, message, blocks):
+        self.server.messages.append(message)
+        # replace binary blocks by placeholders, so the commands can be split at ';'
+        text = ''
+        payloads = list()
+        position = 0
+        for block_start, data_start, data_end in blocks:
+            text += message[position:block_start].decode('ascii') + '#BLOCK{0:d}'.format(
+                len(payloads))
+            payloads.append(message[data_start:data_end])
+            position = data_end
+        text += message[position:].decode('ascii')
+
+        answers = list()
+        for command in text.split(';'):
+            header, _, argument = command.strip().lstrip(':').partition(' ')
+            header = header.upper()
+            if header.endswith('?'):
+                answers.append(self._query(header[:-1]))
+            elif header == 'LIST:FREQ':
+                if argument.startswith('#BLOCK'):
+                    values = np.frombuffer(payloads[int(argument[6:])], dtype='<f8')
+                    argument = ','.join('{0:f}'.format(value) for value in values)
+                self.state['LIST:FREQ'] = argument
+            elif header in self.state:
+                self.state[header] = {'ON': '1', 'OFF': '0'}.get(argument.upper(), argument)
+        if answers:
+            self.server.answers += 1
+            self.request.sendall(';'.join(answers).encode('ascii') + b'\n')
+
+    def _query(self, header):
+        if header == '*IDN':
+            return 'Rohde&Schwarz,SMIQ06B,0,5.90'
+        if header == '*OPC':
+            return '1'
+        return self.state.get(header, '0')
+
+
+class SocketConnection:
+    """ Connection to the stand-in with the methods of a pyvisa message based resource. """
+
+    write_termination = '\n'
+    encoding = 'ascii'
+
+    def __init__(self, address):
+        self._socket = socket.create_connection(address)
+        self._file = self._socket.makefile('rb')
+
+    def write_raw(self, message):
+        self._socket.sendall(message)
+
+    def write(self, message):
+        self.write_raw((message + self.write_termination).encode(self.encoding))
+
+    def read(self):
+        return self._file.readline().decode(self.encoding).rstrip('\n')
+
+    def query(self, message):
+        self.write(message)
+        return self.read()
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+
+def connect(server):
+    """ Open a new connection to the stand-in and reset its counters. """
+    connection = SocketConnection(server.server_address)
+    # first message makes sure the handler of this connection is set up
+    connection.query('*IDN?')
+    server.messages = list()
+    server.answers = 0
+    return connection
+
+
+def check(name, value, expected):
+    print('{0}: {1:d} (expected {2:d})'.format(name, value, expected))
+    if value != expected:
+        raise SystemExit('Unexpected number of messages for {0}.'.format(name))
+
+
+def check_batch(server, points):
+    frequencies = np.linspace(2.8e9, 2.9e9, points)
+
+    connection = connect(server)
+    batch = ScpiBatch(connection)
+    batch.write(":LIST:SEL 'QUDI'")
+    batch.write_list(':LIST:FREQ', frequencies, fmt='{0:f}')
+    batch.write(':LIST:LEARN')
+    check('ScpiBatch.messages()', len(batch.messages()), 1)
+    answer = batch.flush()
+    check('ScpiBatch.flush() messages received', len(server.messages), 1)
+    check('ScpiBatch.flush() answers', server.answers, 1)
+    if answer != '1':
+        raise SystemExit('Unexpected answer {0!r} to *OPC?.'.format(answer))
+    connection.close()
+
+    # split into messages of at most 1000 bytes, every message is complete in itself
+    connection = connect(server)
+    batch = ScpiBatch(connection, max_length=1000)
+    for frequency in frequencies[:100]:
+        batch.write(':FREQ {0:f}'.format(frequency))
+    messages = batch.messages()
+    expected = int(np.ceil(sum(len(message) + 1 for message in messages) / 1000))
+    if any(len(message) > 1000 for message in messages):
+        raise SystemExit('ScpiBatch message exceeds max_length.')
+    check('ScpiBatch.messages() with max_length 1000', len(messages), expected)
+    batch.flush()
+    check('ScpiBatch.flush() with max_length 1000', len(server.messages), expected)
+    connection.close()
+
+    # binary blocks may contain the termination character
+    connection = connect(server)
+    batch = ScpiBatch(connection)
+    batch.write(':FORM PACK')
+    batch.write_list(':LIST:FREQ', frequencies, binary=True)
+    batch.write(':FORM ASC')
+    batch.flush()
+    check('ScpiBatch binary list messages', len(server.messages), 1)
+    connection.close()
+
+
+def check_smiq(server, points, binary):
+    try:
+        importlib.import_module('visa')
+    except ImportError:
+        # pyvisa >= 1.12 is only importable as pyvisa
+        try:
+            sys.modules['visa'] = importlib.import_module('pyvisa')
+        except ImportError:
+            print('SMIQ set_list: skipped, pyvisa is not installed.')
+            return
+    from hardware.microwave.mw_source_smiq import MicrowaveSmiq
+
+    smiq = MicrowaveSmiq(manager=None,
+                         name='smiq',
+                         config={'gpib_address': 'stand-in',
+                                 'gpib_timeout': 5,
+                                 'binary_list_transfer': binary},
+                         callbacks={})
+    # on_activate would open the connection with pyvisa
+    smiq._gpib_connection = connect(server)
+    smiq.model = 'SMIQ06B'
+    frequencies = np.linspace(2.8e9, 2.9e9, points)
+    actual_frequencies, _, mode = smiq.set_list(frequencies, -10)
+    if mode != 'list' or not np.allclose(actual_frequencies, frequencies):
+        raise SystemExit('SMIQ list was not set up correctly.')
+    # get_status (2 queries), one batch, get_frequency (3 queries), get_power (3 queries),
+    # get_status (2 queries)
+    check('SMIQ set_list({0:d} points{1}) messages'.format(points, ', binary' if binary else ''),
+          len(server.messages), 11)
+    smiq._gpib_connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Count the SCPI messages of list setups.')
+    parser.add_argument('--points', type=int, default=4000, help='number of list entries')
+    args = parser.parse_args()
+
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), SmiqStandIn)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        check_batch(server, args.points)
+        check_smiq(server, args.points, binary=False)
+        check_smiq(server, args.points, binary=True)
+    finally:
+        server.shutdown()
+        server.server_close()
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+"""
+Check of the step scheduling of the software PID controller (logic/software_pid_controller.py)
+with a loaded event loop.
+
+The SoftPIDController runs with the process dummy. A timer blocks the event loop of the controller
+for a while every second, and in a last run some steps read a slow process value that takes
+longer than the timestep. For both overrun policies ('skip' and 'catch_up') the script checks the
+number of steps, the skipped steps, the jitter of the period and the overruns recorded in the loop
+timer. Runs offscreen, from the qudi main directory:
+
+    python tools/check_software_pid.py [--timestep 50] [--duration 5] [--block 0.3]
+
+The script exits with an error if a check fails.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from qtpy import QtCore
+
+from hardware.process_dummy import ProcessDummy
+from logic.software_pid_controller import SoftPIDController
+
+
+class SlowProcessDummy(ProcessDummy):
+    """ Process dummy that takes slow_time s to read every slow_every-th process value. """
+
+    slow_every = 0
+    slow_time = 0
+
+    def get_process_value(self):
+        self.reads = getattr(self, 'reads', 0) + 1
+        if self.slow_every and self.reads % self.slow_every == 0:
+            time.sleep(self.slow_time)
+        return super().get_process_value()
+
+
+def check(name, condition, details=''):
+    print('{0}: {1} {2}'.format(name, 'OK' if condition else 'FAILED', details))
+    if not condition:
+        raise SystemExit('Check "{0}" failed.'.format(name))
+
+
+def run(app, policy, timestep, duration, block=0, slow_every=0, slow_time=0,
+        max_catch_up_steps=10):
+    """ Run the controller for duration s. With block, the event loop is blocked for block s every
+    second (duration blocks), and the controller runs for another 0.5 s after the last block.
+
+    @return tuple: timing statistics of the controller, number of blocks, number of scheduled
+                   steps
+    """
+    process = SlowProcessDummy(manager=None, name='process', config={}, callbacks={})
+    process.slow_every = slow_every
+    process.slow_time = slow_time
+    process.module_state.activate()
+    pid = SoftPIDController(manager=None,
+                            name='softpid_{0}'.format(policy),
+                            config={'timestep': timestep,
+                                    'overrun_policy': policy,
+                                    'max_catch_up_steps': max_catch_up_steps},
+                            callbacks={})
+    pid.connectors['process'].obj = process
+    pid.connectors['control'].obj = process
+
+    blocks = [0]
+    load_timer = QtCore.QTimer()
+    load_timer.setTimerType(QtCore.Qt.PreciseTimer)
+
+    def load():
+        blocks[0] += 1
+        time.sleep(block)
+        if blocks[0] >= int(duration):
+            load_timer.stop()
+            QtCore.QTimer.singleShot(500, app.quit)
+
+    load_timer.timeout.connect(load)
+    # the controller prints its countdown
+    with contextlib.redirect_stdout(io.StringIO()):
+        pid.module_state.activate()
+        start = time.monotonic()
+        if block > 0:
+            load_timer.start(1000)
+        else:
+            QtCore.QTimer.singleShot(int(duration * 1000), app.quit)
+        app.exec_()
+        pid.module_state.deactivate()
+        steps = (time.monotonic() - start) / (timestep / 1000)
+    process.module_state.deactivate()
+    return pid.get_timing_statistics(), blocks[0], steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the software PID step scheduling.')
+    parser.add_argument('--timestep', type=int, default=50, help='timestep of the controller in ms')
+    parser.add_argument('--duration', type=float, default=5, help='duration of each run in s')
+    parser.add_argument('--block', type=float, default=0.3,
+                        help='time the event loop is blocked every second in s')
+    args = parser.parse_args()
+
+    app = QtCore.QCoreApplication(sys.argv)
+    period = args.timestep / 1000
+    # steps scheduled during a block
+    missed = int(round(args.block / period))
+
+    def summary(statistics, blocks=0):
+        return ('{0:d} steps, {1:d} skipped, jitter {2:.1f} ms, {3:d} overruns, '
+                'max lateness {4:.0f} ms, {5:d} blocks'.format(
+                    statistics['iterations'], statistics['skipped_steps'],
+                    statistics['jitter'] * 1e3, statistics['overruns'],
+                    statistics['max_lateness'] * 1e3, blocks))
+
+    # reference without load: every step on time
+    statistics, _, steps = run(app, 'skip', args.timestep, args.duration)
+    reference_jitter = statistics['jitter']
+    check('no load', statistics['skipped_steps'] == 0 and statistics['overruns'] == 0
+          and abs(statistics['iterations'] - steps) <= 2 and reference_jitter < 0.2 * period,
+          summary(statistics))
+
+    for policy in ('skip', 'catch_up'):
+        # blocked event loop: the steps missed during a block are skipped or caught up, the
+        # schedule does not drift
+        statistics, blocks, steps = run(app, policy, args.timestep, args.duration,
+                                        block=args.block)
+        scheduled = statistics['iterations'] + statistics['skipped_steps']
+        if policy == 'skip':
+            # the late step runs, and the next step, which is late by less than one timestep,
+            # runs as well. The steps between are skipped.
+            skipped_ok = (blocks * (missed - 2) <= statistics['skipped_steps']
+                          <= blocks * (missed - 1))
+        else:
+            skipped_ok = statistics['skipped_steps'] == 0
+        check('{0}, blocked event loop'.format(policy),
+              skipped_ok and abs(scheduled - steps) <= 2
+              and statistics['jitter'] > reference_jitter
+              and statistics['max_lateness'] >= args.block - period
+              and statistics['overruns'] == 0,
+              summary(statistics, blocks))
+
+        # catch up limited to one step, the other missed steps are skipped
+        if policy == 'catch_up':
+            statistics, blocks, _ = run(app, policy, args.timestep, args.duration, block=args.block,
+                                        max_catch_up_steps=1)
+            check('catch_up, max_catch_up_steps 1',
+                  blocks * (missed - 3) <= statistics['skipped_steps'] <= blocks * (missed - 2),
+                  summary(statistics, blocks))
+
+        # slow steps: every 10th process value takes 2.5 timesteps, these steps are overruns. With
+        # 'skip' the step after a slow step is skipped.
+        statistics, _, steps = run(app, policy, args.timestep, args.duration, slow_every=10,
+                                   slow_time=2.5 * period)
+        scheduled = statistics['iterations'] + statistics['skipped_steps']
+        slow_steps = statistics['iterations'] // 10
+        if policy == 'skip':
+            skipped_ok = abs(statistics['skipped_steps'] - slow_steps) <= 1
+        else:
+            skipped_ok = statistics['skipped_steps'] == 0
+        check('{0}, slow steps'.format(policy),
+              abs(statistics['overruns'] - slow_steps) <= 1 and skipped_ok
+              and abs(scheduled - steps) <= 2,
+              summary(statistics))
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+"""
+Add the data files of a qudi data directory to the SQLite file index of the SaveLogic.
+
+Files that are new or changed since the last run are read, files that do not exist anymore are
+removed from the index. The daily directories are listed and read in parallel processes. Run
+from the qudi main directory, e.g. after copying old measurements into the data directory:
+
+    python tools/rebuild_file_index.py <data directory> <index file> [--workers 8]
+
+The default index file of the SaveLogic is file_index.sqlite in the app status directory
+(ConfigOption file_index_path). Queries can be tried out with --find, e.g.
+
+    python tools/rebuild_file_index.py Data/ index.sqlite --no-rebuild --find folder=ODMR
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logic.save_index import SaveIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Update the file index of a qudi data directory.')
+    parser.add_argument('directory', help='data directory (root of the daily directories)')
+    parser.add_argument('index', help='SQLite index file, created if it does not exist')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('--keep-missing', action='store_true',
+                        help='keep files in the index that do not exist anymore')
+    parser.add_argument('--no-rebuild', action='store_true', help='only query the index')
+    parser.add_argument('--find', nargs='*', metavar='KEY=VALUE',
+                        help='list the files matching module=, folder= or label= and parameters')
+    args = parser.parse_args()
+
+    index = SaveIndex(args.index)
+    if not args.no_rebuild:
+        start = time.perf_counter()
+        added, removed = index.rebuild(args.directory, workers=args.workers,
+                                       prune=not args.keep_missing)
+        print('{0:d} files added or changed, {1:d} removed in {2:.1f} s, {3:d} files indexed.'
+              ''.format(added, removed, time.perf_counter() - start, len(index)))
+
+    if args.find is not None:
+        criteria = dict()
+        parameters = dict()
+        for argument in args.find:
+            key, value = argument.split('=', 1)
+            if key in ('module', 'folder', 'label'):
+                criteria[key] = value
+            else:
+                parameters[key] = value
+        start = time.perf_counter()
+        files = index.find(parameters=parameters, **criteria)
+        duration = time.perf_counter() - start
+        for file in files:
+            print('{0:%Y-%m-%d %H:%M:%S}  {1}'.format(file['timestamp'], file['path']))
+        print('{0:d} files found in {1:.1f} ms.'.format(len(files), duration * 1000))
+    index.close()
+
+
+if __name__ == '__main__':
+    main()